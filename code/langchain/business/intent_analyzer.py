@@ -1,7 +1,8 @@
 import json
 import logging
 import re
-from ..infrastructure.chatbot import ChatBot
+from ..infrastructure.chatbot import ChatBot, micro_batcher, model_router
+from ..infrastructure.llm_scheduler import LLMOverloadedError
 
 # 配置日志
 logging.basicConfig(
@@ -146,6 +147,10 @@ class IntentAnalyzer:
             "entities": entities
         }
     
+    def ir_rule_identify_intent(self, user_input):
+        """只使用规则引擎识别用户意图和实体，不调用LLM"""
+        return self._rule_based_intent_recognition(user_input)
+    
     def ir_identify_intent(self, user_input):
         """识别用户意图和实体"""
         try:
@@ -155,10 +160,77 @@ class IntentAnalyzer:
             
             # 检查是否需要使用LLM进行更复杂的意图识别
             # 如果规则识别结果不明确或实体信息不足，使用LLM
-            if not result['needs_job_recommendation'] and not result['needs_policy_recommendation']:
+            if self._needs_llm(result):
                 logger.info("规则识别结果不明确，使用LLM进行意图识别")
-                # 生成意图识别提示
-                prompt = f"""
+                prompt = self._build_intent_prompt(user_input)
+                # chat_with_memory按提示检查LLM缓存（命中时不调用大模型），这里不再重复检查
+                logger.info("开始识别意图和实体，调用大模型")
+                logger.info(f"生成的意图识别提示: {prompt[:100]}...")
+                response = self.chatbot.chat_with_memory(prompt, prompt_type="intent", semantic_text=user_input)
+                self._raise_if_overloaded(response)
+                content = self._response_content(response)
+                result = self._parse_intent_content(content, result, response)
+            
+            return {
+                "result": result,
+                "time": 0  # 规则引擎耗时忽略
+            }
+        except LLMOverloadedError:
+            # LLM服务过载时请求直接失败，不使用默认意图继续处理
+            raise
+        except Exception as e:
+            logger.error(f"意图识别失败: {str(e)}")
+            return self._default_intent()
+    
+    async def ir_aidentify_intent(self, user_input):
+        """ir_identify_intent的异步版本，需要LLM识别时不阻塞事件循环"""
+        try:
+            logger.info("使用基于规则的意图识别")
+            result = self._rule_based_intent_recognition(user_input)
+            
+            if self._needs_llm(result):
+                logger.info("规则识别结果不明确，使用LLM进行意图识别")
+                prompt = self._build_intent_prompt(user_input)
+                logger.info("开始识别意图和实体，异步调用大模型")
+                response = await self.chatbot.achat_with_memory(prompt, prompt_type="intent", semantic_text=user_input)
+                self._raise_if_overloaded(response)
+                content = self._response_content(response)
+                result = self._parse_intent_content(content, result, response)
+            
+            return {
+                "result": result,
+                "time": 0
+            }
+        except LLMOverloadedError:
+            # LLM服务过载时请求直接失败，不使用默认意图继续处理
+            raise
+        except Exception as e:
+            logger.error(f"意图识别失败: {str(e)}")
+            return self._default_intent()
+    
+    @staticmethod
+    def _raise_if_overloaded(response):
+        """LLM调用因过载被调度器拒绝时抛出异常，其他失败仍保留规则识别结果"""
+        if isinstance(response, dict) and response.get("overloaded"):
+            raise LLMOverloadedError(response.get("error", "LLM服务繁忙"))
+    
+    @staticmethod
+    def _needs_llm(result):
+        """规则识别结果不明确（既不需要岗位也不需要政策推荐）时使用LLM"""
+        return not result['needs_job_recommendation'] and not result['needs_policy_recommendation']
+    
+    @staticmethod
+    def _default_intent():
+        """识别失败时返回默认意图"""
+        return {
+            "result": {"intent": "通用查询", "needs_job_recommendation": False, "needs_policy_recommendation": False, "entities": []},
+            "time": 0
+        }
+    
+    @staticmethod
+    def _build_intent_prompt(user_input):
+        """生成意图识别提示"""
+        return f"""
 分析用户输入，识别核心意图和实体，并判断需要的服务类型。
 
 用户输入: {user_input}
@@ -180,74 +252,76 @@ class IntentAnalyzer:
 
 实体类型：age(年龄)、gender(性别)、education_level(教育水平)、employment_status(就业状态)、certificate(证书)、concern(关注点)、business_type(经营类型)、employment_impact(就业影响)、location(场地信息)、work_type(工作类型)
 """
-
-                # 检查缓存
-                from ..infrastructure.cache_manager import CacheManager
-                cache_manager = CacheManager()
-                cached_response = cache_manager.get_llm_cache(prompt)
-                
-                if cached_response:
-                    logger.info("使用缓存的LLM响应")
-                    # 处理缓存的响应
-                    content = cached_response
-                    llm_time = 0
-                else:
-                    logger.info("开始识别意图和实体，调用大模型")
-                    logger.info(f"生成的意图识别提示: {prompt[:100]}...")
-                    response = self.chatbot.chat_with_memory(prompt)
-                    
-                    # 处理返回的新格式
-                    content = ""
-                    llm_time = 0
-                    
-                    try:
-                        if isinstance(response, dict) and 'content' in response:
-                            content = response['content']
-                            llm_time = response.get('time', 0)
-                            logger.info(f"大模型返回的意图识别结果: {content[:100]}...")
-                            logger.info(f"意图识别LLM调用耗时: {llm_time:.2f}秒")
-                        else:
-                            # 处理字符串响应
-                            content = response if isinstance(response, str) else str(response)
-                            llm_time = 0
-                            if isinstance(content, str):
-                                logger.info(f"大模型返回的意图识别结果: {content[:100]}...")
-                            else:
-                                logger.info(f"大模型返回的意图识别结果: {str(content)[:100]}...")
-                    except Exception as e:
-                        logger.error(f"处理LLM响应失败: {e}")
-                        content = ""
-                        llm_time = 0
-                    
-                    # 缓存LLM响应
-                    cache_manager.set_llm_cache(prompt, content)
-                
-                try:
-                    if isinstance(content, dict):
-                        result_json = content
-                    else:
-                        # 移除Markdown代码块标记
-                        if isinstance(content, str):
-                            # 移除开头的```json和结尾的```
-                            content = content.strip()
-                            if content.startswith('```json'):
-                                content = content[7:]
-                            if content.endswith('```'):
-                                content = content[:-3]
-                            content = content.strip()
-                        result_json = json.loads(content)
-                        result = result_json
-                except Exception as e:
-                    logger.error(f"解析意图识别结果失败: {str(e)}")
+    
+    @staticmethod
+    def _build_intent_batch_prompt(prompts, user_inputs):
+        """生成合并多个用户输入的意图识别提示，供微批处理器使用
+        
+        Args:
+            prompts: 各个用户输入的意图识别提示
+            user_inputs: 各个提示中的用户输入
             
-            return {
-                "result": result,
-                "time": 0  # 规则引擎耗时忽略
-            }
+        Returns:
+            合并提示，缺少用户输入时返回None（使用默认合并方式）
+        """
+        if not all(user_inputs):
+            return None
+        template = IntentAnalyzer._build_intent_prompt("{user_input}")
+        # 只保留模板中用户输入之后的输出格式和识别规则部分
+        instructions = template.split("{user_input}", 1)[1].replace("输出JSON格式：", "", 1).strip()
+        numbered = "\n".join(f"{i}. {user_input}" for i, user_input in enumerate(user_inputs, 1))
+        return f"""
+分别分析以下{len(user_inputs)}条相互独立的用户输入，识别每条输入的核心意图和实体，并判断需要的服务类型。
+
+用户输入:
+{numbered}
+
+只输出一个JSON数组，包含{len(user_inputs)}个元素，第i个元素是第i条用户输入的识别结果，每个元素的格式如下：
+{instructions}
+"""
+    
+    @staticmethod
+    def _response_content(response):
+        """提取LLM响应内容
+        
+        LLM响应已由ChatBot按相同的缓存键缓存，这里不再重复写入，避免覆盖为字符串
+        """
+        try:
+            if isinstance(response, dict) and 'content' in response:
+                content = response['content']
+                logger.info(f"大模型返回的意图识别结果: {content[:100]}...")
+                logger.info(f"意图识别LLM调用耗时: {response.get('time', 0):.2f}秒")
+                return content
+            # 处理字符串响应
+            content = response if isinstance(response, str) else str(response)
+            logger.info(f"大模型返回的意图识别结果: {content[:100]}...")
+            return content
         except Exception as e:
-            logger.error(f"意图识别失败: {str(e)}")
-            # 返回默认意图
-            return {
-                "result": {"intent": "通用查询", "needs_job_recommendation": False, "needs_policy_recommendation": False, "entities": []},
-                "time": 0
-            }
+            logger.error(f"处理LLM响应失败: {e}")
+            return ""
+    
+    @staticmethod
+    def _parse_intent_content(content, result, response=None):
+        """解析LLM返回的意图识别结果，解析失败时保留规则识别结果，并记为该响应所用路由的质量降级"""
+        try:
+            if isinstance(content, dict):
+                # 字典形式的响应无法确认格式，保留规则识别结果
+                return result
+            # 移除Markdown代码块标记
+            if isinstance(content, str):
+                # 移除开头的```json和结尾的```
+                content = content.strip()
+                if content.startswith('```json'):
+                    content = content[7:]
+                if content.endswith('```'):
+                    content = content[:-3]
+                content = content.strip()
+            return json.loads(content)
+        except Exception as e:
+            logger.error(f"解析意图识别结果失败: {str(e)}")
+            model_router.record_fallback("intent", response)
+            return result
+
+
+# 意图识别提示共享同一个模板，合并时模板只出现一次
+micro_batcher.register_builder("intent", IntentAnalyzer._build_intent_batch_prompt)
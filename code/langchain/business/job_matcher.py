@@ -1,6 +1,7 @@
 import json
 import os
 import logging
+from ..infrastructure.cache_manager import CacheManager
 
 # 配置日志
 logging.basicConfig(
@@ -29,15 +30,20 @@ class JobMatcher:
     def load_jobs(self):
         """加载岗位数据
         
-        从jobs.json文件中读取岗位数据
+        从jobs.json文件中读取岗位数据，并按文件内容更新岗位目录版本，
+        依赖旧版本岗位的缓存（包括重启前写入磁盘缓存的）不会再被读到
         
         Returns:
             list: 岗位数据列表
         """
         job_file = os.path.join(os.path.dirname(__file__), '..', 'data', 'data_files', 'jobs.json')
         try:
-            with open(job_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(job_file, 'rb') as f:
+                raw = f.read()
+            jobs = json.loads(raw.decode('utf-8'))
+            cache_manager = CacheManager()
+            cache_manager.update_catalog_version('jobs', cache_manager.catalog_version(raw))
+            return jobs
         except Exception as e:
             logger.error(f"加载岗位数据失败: {e}")
             return []
@@ -2,7 +2,7 @@ import json
 import os
 import time
 import logging
-from ..infrastructure.chatbot import ChatBot
+from ..infrastructure.chatbot import ChatBot, model_router
 from .job_matcher import JobMatcher
 from .user_matcher import UserMatcher
 from ..data.policy_retriever import PolicyRetriever
@@ -1341,8 +1341,8 @@ class PolicyMatcher:
             # 模拟延迟，使思考过程更自然
             time.sleep(0.5)
         
-        # 7. 调用LLM进行详细分析
-        llm_response = self.chatbot.chat_with_memory(prompt)
+        # 7. 调用LLM进行详细分析（输出较长，未单独配置路由时使用默认模型和max_tokens）
+        llm_response = self.chatbot.chat_with_memory(prompt, prompt_type="stream_analysis")
         
         # 8. 处理LLM响应
         try:
@@ -1363,6 +1363,7 @@ class PolicyMatcher:
                 result_data = json.loads(clean_content)
         except Exception as e:
             logger.error(f"解析LLM响应失败: {e}")
+            model_router.record_fallback("stream_analysis", llm_response)
             # 降级处理 - 基于用户身份和需求生成结果
             result_data = {
                 "analysis_type": "政策分析",
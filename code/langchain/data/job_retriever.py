@@ -30,36 +30,53 @@ class JobRetriever:
         Returns:
             岗位数据列表
         """
-        job_file = self.config_manager.get('data.job_file')
         try:
-            if os.path.exists(job_file):
-                with open(job_file, 'r', encoding='utf-8') as f:
-                    jobs = json.load(f)
-                logger.info(f"加载岗位数据成功，共 {len(jobs)} 个岗位")
-                # 缓存岗位数据
-                self.cache_manager.set_jobs_cache(jobs)
-                return jobs
-            else:
-                logger.warning(f"岗位数据文件不存在: {job_file}")
-                return []
+            jobs = self._read_job_file()
+            logger.info(f"加载岗位数据成功，共 {len(jobs)} 个岗位")
+            # 缓存岗位数据
+            self.cache_manager.set_jobs_cache(jobs)
+            return jobs
+        except FileNotFoundError:
+            logger.warning(f"岗位数据文件不存在: {self.config_manager.get('data.job_file')}")
+            return []
         except Exception as e:
             logger.error(f"加载岗位数据失败: {e}")
             return []
     
+    def _read_job_file(self):
+        """从配置的岗位文件读取岗位数据，并按文件内容更新岗位目录版本
+        
+        版本变化时，依赖旧版本岗位的查询、响应和LLM任务缓存被失效。
+        
+        Returns:
+            岗位数据列表
+        """
+        job_file = self.config_manager.get('data.job_file')
+        with open(job_file, 'rb') as f:
+            raw = f.read()
+        jobs = json.loads(raw.decode('utf-8'))
+        self.cache_manager.update_catalog_version('jobs', self.cache_manager.catalog_version(raw))
+        return jobs
+    
     def get_all_jobs(self):
         """获取所有岗位
         
+        缓存过期后先返回旧数据并在后台重新加载，请求不承担刷新耗时。
+        
         Returns:
             岗位数据列表
         """
-        # 尝试从缓存获取
-        cached_jobs = self.cache_manager.get_jobs_cache()
-        if cached_jobs:
-            logger.info("使用缓存的岗位数据")
-            return cached_jobs
+        try:
+            jobs, source = self.cache_manager.get_or_refresh(
+                'jobs', self._read_job_file, setter=self.cache_manager.set_jobs_cache
+            )
+        except Exception as e:
+            logger.error(f"加载岗位数据失败: {e}")
+            return []
         
-        # 缓存不存在，重新加载
-        return self._load_jobs()
+        if source in ('fresh', 'stale'):
+            logger.info("使用缓存的岗位数据")
+        return jobs
     
     def get_job_by_id(self, job_id):
         """根据ID获取岗位
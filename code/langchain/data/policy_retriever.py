@@ -1,9 +1,10 @@
 import json
 import os
+import time
 import logging
 from ..infrastructure.cache_manager import CacheManager
 from ..infrastructure.config_manager import ConfigManager
-from ..infrastructure.chatbot import ChatBot
+from ..infrastructure.chatbot import ChatBot, model_router
 
 # 配置日志
 logging.basicConfig(
@@ -24,35 +25,84 @@ class PolicyRetriever:
         # 缓存数据
         self._policies_cache = None
         self._policies_loaded = False
-        self.policies = self.pr_load_policies()
+        # 政策文件的 (修改时间, 大小)，文件变化后重新加载并更新目录版本
+        self._file_signature = None
+        self._last_check = 0
+        self.check_interval = 1.0
+        self.pr_load_policies()
         self.chatbot = ChatBot()
     
+    @property
+    def policies(self):
+        """政策数据，政策文件被修改后自动重新加载"""
+        self._reload_if_changed()
+        return self._policies_cache
+    
     def pr_load_policies(self):
-        """加载政策数据（带缓存）"""
-        # 尝试从缓存管理器获取
-        cached_policies = self.cache_manager.get_policies_cache()
-        if cached_policies:
-            logger.info("使用缓存的政策数据")
-            # 更新本地缓存
-            self._policies_cache = cached_policies
-            self._policies_loaded = True
-            return cached_policies
+        """加载政策数据（带缓存）
         
-        # 从配置中获取政策文件路径
-        policy_file = self.config_manager.get('data.policy_file')
+        缓存过期后先返回旧数据并在后台重新读取文件，请求不承担刷新耗时。
+        """
         try:
-            with open(policy_file, 'r', encoding='utf-8') as f:
-                policies = json.load(f)
-                # 缓存数据
-                self._policies_cache = policies
-                self._policies_loaded = True
-                # 缓存到缓存管理器
-                self.cache_manager.set_policies_cache(policies)
-                logger.info(f"加载政策数据成功，共 {len(policies)} 条政策")
-                return policies
+            policies, source = self.cache_manager.get_or_refresh(
+                'policies', self._read_policy_file, setter=self.cache_manager.set_policies_cache
+            )
         except Exception as e:
             logger.error(f"加载政策数据失败: {e}")
             return []
+        
+        if source in ('fresh', 'stale'):
+            logger.info("使用缓存的政策数据")
+        else:
+            logger.info(f"加载政策数据成功，共 {len(policies)} 条政策")
+        # 更新本地缓存
+        self._policies_cache = policies
+        self._policies_loaded = True
+        return policies
+    
+    def _read_policy_file(self):
+        """从配置的政策文件读取政策数据，并按文件内容更新政策目录版本
+        
+        版本变化时，依赖旧版本政策的查询、响应和LLM任务缓存被失效。
+        
+        Returns:
+            政策数据列表
+        """
+        policy_file = self.config_manager.get('data.policy_file')
+        signature = self._stat_policy_file(policy_file)
+        with open(policy_file, 'rb') as f:
+            raw = f.read()
+        policies = json.loads(raw.decode('utf-8'))
+        self._file_signature = signature
+        self.cache_manager.update_catalog_version('policies', self.cache_manager.catalog_version(raw))
+        return policies
+    
+    @staticmethod
+    def _stat_policy_file(policy_file):
+        """政策文件的 (修改时间, 大小)，文件不存在时返回None"""
+        try:
+            stat = os.stat(policy_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _reload_if_changed(self):
+        """政策文件被修改时重新加载（最多每check_interval秒检查一次）"""
+        now = time.time()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        signature = self._stat_policy_file(self.config_manager.get('data.policy_file'))
+        if signature is None or signature == self._file_signature:
+            return
+        try:
+            policies = self._read_policy_file()
+        except Exception as e:
+            logger.error(f"重新加载政策数据失败: {e}")
+            return
+        self.cache_manager.set_policies_cache(policies)
+        self._policies_cache = policies
+        logger.info(f"政策文件已更新，重新加载 {len(policies)} 条政策")
     
     def pr_retrieve_policies(self, intent, entities, original_input=None):
         """检索相关政策"""
@@ -280,7 +330,7 @@ class PolicyRetriever:
         prompt = self.pr_build_analysis_prompt(user_input, matched_user, all_policies, all_jobs)
         
         # 4. 调用LLM进行分析
-        llm_response = self.chatbot.chat_with_memory(prompt)
+        llm_response = self.chatbot.chat_with_memory(prompt, prompt_type="analysis", semantic_text=user_input)
         
         # 5. 处理LLM响应
         try:
@@ -296,6 +346,7 @@ class PolicyRetriever:
                 return json.loads(content)
         except Exception as e:
             logger.error(f"解析分析结果失败: {str(e)}")
+            model_router.record_fallback("analysis", llm_response)
             return {
                 "error": str(e)
             }
@@ -0,0 +1,107 @@
+import json
+import hashlib
+import threading
+
+# 数据实体的ID字段 -> 实体所属的数据目录
+ENTITY_ID_FIELDS = (
+    ('policy_id', 'policies'),
+    ('job_id', 'jobs'),
+)
+
+
+class CacheKeyBuilder:
+    """规范化缓存键生成器
+
+    政策、岗位等参数是完整的目录条目，带有很长的content等字段，整体序列化再哈希的开销
+    随参数大小线性增长。生成缓存键时：
+    - 缓存键已包含所依赖数据目录的版本时，该目录中的实体只用ID参与哈希，
+      实体内容由目录版本保证一致
+    - 长字符串（LLM提示、用户输入等）的摘要按字符串内容记忆，重复生成同一提示的缓存键时
+      只需一次字典查找
+    - 使用blake2b代替md5，摘要长度相同
+    """
+
+    def __init__(self, digest_size=16, memo_min_length=256, memo_max_entries=2048):
+        """初始化缓存键生成器
+
+        Args:
+            digest_size: 摘要字节数，16字节与原md5键长度相同
+            memo_min_length: 记忆摘要的最短字符串长度，更短的字符串直接计算更快
+            memo_max_entries: 最多记忆的摘要数量，超出时淘汰最早加入的摘要
+        """
+        self.digest_size = digest_size
+        self.memo_min_length = memo_min_length
+        self.memo_max_entries = memo_max_entries
+        self._memo_lock = threading.Lock()
+        self._memo = {}
+
+    def _hash(self, data):
+        return hashlib.blake2b(data.encode('utf-8'), digest_size=self.digest_size).hexdigest()
+
+    def digest_text(self, text):
+        """计算字符串摘要，长字符串的摘要会被记忆
+
+        Args:
+            text: 字符串
+
+        Returns:
+            十六进制摘要
+        """
+        if len(text) < self.memo_min_length:
+            return self._hash(text)
+        digest = self._memo.get(text)
+        if digest is None:
+            digest = self._hash(text)
+            with self._memo_lock:
+                self._memo[text] = digest
+                while len(self._memo) > self.memo_max_entries:
+                    self._memo.pop(next(iter(self._memo)), None)
+        return digest
+
+    def canonical(self, value, catalogs=()):
+        """把参数转换为参与哈希的规范形式
+
+        Args:
+            value: 参数值
+            catalogs: 缓存键中已包含版本的数据目录，这些目录中的实体只保留ID
+
+        Returns:
+            可JSON序列化的规范形式
+        """
+        if isinstance(value, str):
+            if len(value) >= self.memo_min_length:
+                return {'$blake2b': self.digest_text(value)}
+            return value
+        if isinstance(value, dict):
+            for field, catalog in ENTITY_ID_FIELDS:
+                entity_id = value.get(field)
+                if catalog in catalogs and isinstance(entity_id, str):
+                    return {f'${field}': entity_id}
+            return {str(k): self.canonical(v, catalogs) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.canonical(item, catalogs) for item in value]
+        return value
+
+    def build(self, prefix, args, kwargs=None, catalogs=()):
+        """生成缓存键
+
+        Args:
+            prefix: 缓存键前缀
+            args: 位置参数元组
+            kwargs: 关键字参数字典
+            catalogs: 缓存键中已包含版本的数据目录
+
+        Returns:
+            "前缀:摘要" 形式的缓存键
+        """
+        # 单个字符串参数直接计算摘要，不经过序列化
+        if len(args) == 1 and isinstance(args[0], str) and not kwargs:
+            return f"{prefix}:{self.digest_text(args[0])}"
+        content = [self.canonical(args, catalogs), self.canonical(kwargs or {}, catalogs)]
+        key_str = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        return f"{prefix}:{self._hash(key_str)}"
+
+    def clear(self):
+        """清空记忆的摘要"""
+        with self._memo_lock:
+            self._memo.clear()
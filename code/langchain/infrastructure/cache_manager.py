@@ -1,9 +1,21 @@
 import time
+import asyncio
 import hashlib
 import json
 import logging
-import re
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from difflib import SequenceMatcher
+from .cache_store import AtomicCounter
+from .cache_region import CacheRegionSet
+from .cache_key import CacheKeyBuilder
+from .query_similarity_index import QuerySimilarityIndex
+from .disk_cache import DiskCache
+from .single_flight import SingleFlight
+from .semantic_cache import SemanticLLMCache
+from .config_manager import ConfigManager
+from .llm_scheduler import llm_priority, PRIORITY_BACKGROUND
 
 # 配置日志
 logging.basicConfig(
@@ -12,75 +24,151 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 依赖数据目录的缓存命名空间 -> 所依赖的目录；这些缓存键包含目录版本，
+# 目录内容变化后只失效依赖旧版本的缓存项，不影响其他缓存
+CATALOG_DEPENDENCIES = {
+    'query': ('policies', 'jobs'),
+    'response': ('policies', 'jobs'),
+    'llm_task': ('policies', 'jobs'),
+}
+
 class CacheManager:
     """缓存管理器（单例模式）"""
     _instance = None
     
-    def __new__(cls, max_cache_size=1000):
+    def __new__(cls, max_cache_size=None, max_memory_mb=None):
         """创建单例实例"""
         if cls._instance is None:
             cls._instance = super(CacheManager, cls).__new__(cls)
             # 初始化单例
-            cls._instance.cache = {}
-            cls._instance.max_cache_size = max_cache_size
-            cls._instance.default_ttl = 3600  # 默认缓存时间1小时
-            cls._instance.llm_ttl = 7200  # LLM响应缓存时间2小时
-            cls._instance.query_ttl = 3600  # 查询结果缓存时间1小时（延长）
-            cls._instance.policy_ttl = 86400  # 政策数据缓存时间24小时
-            cls._instance.job_ttl = 86400  # 岗位数据缓存时间24小时
-            cls._instance.mapping_ttl = 86400  # 映射数据缓存时间24小时（延长）
+            # 缓存区域：llm、query、stream、catalog、mapping、response各自独立的容量、
+            # 内存预算、TTL、淘汰策略和统计，配置见 cache.regions；
+            # 区域内部为分片加锁的存储，LRU淘汰 + 过期堆惰性清理
+            cls._instance.cache = CacheRegionSet(
+                ConfigManager().get('cache.regions', {}),
+                on_remove=cls._instance._on_cache_remove,
+                max_size=max_cache_size,
+                max_memory_mb=max_memory_mb
+            )
+            cls._instance.max_cache_size = cls._instance.cache.max_size
+            cls._instance.max_memory_bytes = cls._instance.cache.max_bytes
+            regions = cls._instance.cache.regions
+            cls._instance.default_ttl = regions['default'].ttl  # 默认缓存时间1小时
+            cls._instance.llm_ttl = regions['llm'].ttl  # LLM响应缓存时间2小时
+            cls._instance.query_ttl = regions['query'].ttl  # 查询结果缓存时间1小时（延长）
+            cls._instance.policy_ttl = regions['catalog'].ttl  # 政策数据缓存时间24小时
+            cls._instance.job_ttl = regions['catalog'].ttl  # 岗位数据缓存时间24小时
+            cls._instance.mapping_ttl = regions['mapping'].ttl  # 映射数据缓存时间24小时（延长）
+            
+            # 缓存统计（线程安全计数器）
+            cls._instance.hit_count = AtomicCounter()
+            cls._instance.miss_count = AtomicCounter()
+            cls._instance.similarity_hit_count = AtomicCounter()  # 相似度匹配命中次数
+            cls._instance.stale_hit_count = AtomicCounter()  # 返回旧值并触发后台刷新的次数
+            cls._instance.refresh_count = AtomicCounter()
+            cls._instance.refresh_error_count = AtomicCounter()
+            # 缓存命中省下的LLM调用耗时（秒），按缓存项的cost累计
+            cls._instance.llm_seconds_saved = AtomicCounter(0.0)
             
-            # 缓存统计
-            cls._instance.hit_count = 0
-            cls._instance.miss_count = 0
-            cls._instance.similarity_hit_count = 0  # 相似度匹配命中次数
+            # 后台刷新线程池（首次需要刷新时创建）及正在刷新的缓存键
+            cls._instance._refresh_lock = threading.Lock()
+            cls._instance._refreshing = set()
+            cls._instance._refresh_executor = None
+            cls._instance._refresh_tasks = set()
             
             # 存储查询文本和缓存键的映射，用于相似度查找
+            # 映射和索引由_query_lock保护；分片锁内的移除回调会获取该锁，
+            # 因此持有_query_lock时不能再访问缓存存储
+            cls._instance._query_lock = threading.Lock()
             cls._instance.query_cache_map = {}
+            # 与query_cache_map同步维护的相似查询候选索引
+            cls._instance.query_index = QuerySimilarityIndex()
+            
+            # 磁盘二级缓存（可选），只持久化重新计算代价高的缓存前缀
+            cls._instance.disk_prefixes = ('llm', 'query', 'llm_task')
+            cls._instance.disk_hit_count = AtomicCounter()
+            cls._instance.disk_cache = cls._instance._create_disk_cache()
+            # 多工作进程共享磁盘缓存时，按该间隔读取其他进程的写入、删除事件并同步内存缓存
+            cls._instance.shared_sync_interval = ConfigManager().get('cache.disk.sync_interval_seconds', 0.5)
+            cls._instance._next_shared_sync = 0
+            cls._instance.shared_event_count = AtomicCounter()
+            
+            # 数据目录版本（目录名 -> 内容哈希）及 版本标签 -> 依赖该版本的缓存键
+            # 两者由_tag_lock保护，与_query_lock相同，持有该锁时不能再访问缓存存储
+            cls._instance._tag_lock = threading.Lock()
+            cls._instance.catalog_versions = {}
+            cls._instance._tag_index = {}
+            cls._instance.invalidated_count = AtomicCounter()
+            
+            # 相同缓存键的并发LLM调用合并为一次，follower计为合并命中
+            cls._instance.single_flight = SingleFlight()
+            
+            # LLM响应语义缓存，精确缓存键未命中时按用户输入的相似度查找
+            cls._instance.semantic_cache = cls._instance._create_semantic_cache()
             
-            # 缓存预热
-            cls._instance._prewarm_cache()
+            # 缓存键生成器，记忆长提示的摘要
+            cls._instance.key_builder = CacheKeyBuilder()
         return cls._instance
     
-    def __init__(self, max_cache_size=1000):
+    def __init__(self, max_cache_size=None, max_memory_mb=None):
         """初始化缓存管理器
         
         Args:
-            max_cache_size: 最大缓存项数量
+            max_cache_size: 每个缓存区域的最大缓存项数量，默认使用区域配置
+            max_memory_mb: 每个缓存区域的内存预算（MB），默认使用区域配置
         """
         # 单例模式下，__init__可能会被调用多次，所以这里不需要重复初始化
         pass
     
-    def set(self, key, value, ttl=None, query_text=None):
+    def set(self, key, value, ttl=None, query_text=None, cost=None):
         """设置缓存
         
         Args:
             key: 缓存键
             value: 缓存值
-            ttl: 缓存时间（秒），默认使用默认值
+            ttl: 缓存时间（秒），默认使用所属缓存区域的TTL
             query_text: 查询文本，用于相似度匹配
+            cost: 重新计算该值需要的秒数，默认取缓存值中的 'time' 字段（LLM调用耗时），
+                用于代价感知淘汰和节省时间统计
         """
-        # 清理过期缓存
-        self.cleanup_expired()
-        
-        # 检查缓存大小
-        if len(self.cache) >= self.max_cache_size:
-            self._evict_oldest()
-        
-        ttl = ttl or self.default_ttl
-        expiry = time.time() + ttl
-        self.cache[key] = {
+        region = self.cache.region_for(key)
+        # TTL加随机抖动，同一批写入的缓存项不会同时过期
+        ttl = region.jittered_ttl(ttl or region.ttl)
+        now = time.time()
+        expiry = now + ttl
+        # 写入时按序列化结果估算一次字节数，之后的淘汰和统计都使用该值
+        size, serialized = self._estimate_size(value)
+        # 依赖数据目录的缓存项记录写入时的目录版本标签
+        tags = self._catalog_tags(self._namespace(key))
+        entry = {
             'value': value,
-            'expiry': expiry,
-            'created': time.time()
+            # 存储层按该时间真正删除；新鲜期过后的stale_ttl内仍保留旧值，供后台刷新期间返回
+            'expiry': expiry + region.stale_ttl,
+            'fresh_until': expiry,
+            'created': now,
+            'query_text': query_text,
+            'size': size,
+            'cost': self._estimate_cost(value) if cost is None else cost,
+            'namespace': self._namespace(key)
         }
+        if tags:
+            entry['tags'] = tags
+        # 写入时由缓存存储负责容量淘汰和少量过期项清理
+        stored = self.cache.set(key, entry, now)
+        if not stored:
+            logger.warning(f"缓存项超出内存预算或未被淘汰策略准入，未写入内存缓存: {key}, 大小: {size}字节")
+        
+        # 写穿到磁盘二级缓存
+        on_disk = False
+        if self._is_disk_key(key) and serialized is not None:
+            on_disk = self.disk_cache.set(key, entry, now, serialized=serialized)
         
         # 如果提供了查询文本，存储查询文本和缓存键的映射
-        if query_text:
-            self.query_cache_map[query_text] = {
-                'key': key,
-                'expiry': expiry
-            }
+        if query_text and (stored or on_disk):
+            self._add_query_mapping(query_text, key, expiry)
+        
+        if tags and (stored or on_disk):
+            self._tag_key(key, tags)
         
         logger.debug(f"设置缓存: {key}, 过期时间: {expiry}")
     
@@ -93,38 +181,231 @@ class CacheManager:
         Returns:
             缓存值，如果缓存不存在或已过期则返回None
         """
-        item = self.cache.get(key)
-        if not item:
-            logger.debug(f"缓存不存在: {key}")
-            self.miss_count += 1
-            return None
-        
-        # 检查缓存是否过期
-        if time.time() > item['expiry']:
-            del self.cache[key]
-            logger.debug(f"缓存已过期: {key}")
-            self.miss_count += 1
+        item = self._get_item(key)
+        if not item or self._is_stale(item):
+            logger.debug(f"缓存不存在或已过期: {key}")
+            self._record(key, False)
             return None
         
         logger.debug(f"获取缓存: {key}")
-        self.hit_count += 1
+        self._record(key, True, item)
         return item['value']
     
+    def get_or_refresh(self, key, loader, setter=None):
+        """获取缓存，过期后先返回旧值并在后台刷新（stale-while-revalidate）
+        
+        - 新鲜：直接返回缓存值
+        - 已过期但仍在所属区域的stale_ttl内：立即返回旧值，后台刷新，同一缓存键同时只刷新一次
+        - 不存在：同步调用loader加载，相同缓存键的并发加载合并为一次
+        
+        Args:
+            key: 缓存键
+            loader: 无参加载函数，返回最新的值
+            setter: 写入缓存的函数，参数为加载结果；默认使用set(key, value)
+            
+        Returns:
+            (缓存值, 来源)，来源取值为 'fresh'、'stale'、'loaded'、'coalesced'
+        """
+        item = self._get_item(key)
+        if item:
+            self._record(key, True, item)
+            if not self._is_stale(item):
+                return item['value'], 'fresh'
+            self.stale_hit_count.increment()
+            self._schedule_refresh(key, loader, setter)
+            return item['value'], 'stale'
+        
+        self._record(key, False)
+        value, coalesced = self.coalesce(key, lambda: self._load(key, loader, setter))
+        return value, 'coalesced' if coalesced else 'loaded'
+    
+    def _get_item(self, key):
+        """获取缓存项（含新鲜期已过但尚未删除的旧值），内存未命中时尝试磁盘缓存"""
+        self._sync_shared_cache()
+        # 缓存存储会惰性判断过期，过期项在此处直接移除
+        item = self.cache.get(key)
+        if not item and self._is_disk_key(key):
+            item = self._promote_from_disk(key)
+        return item
+    
+    @staticmethod
+    def _is_stale(item, now=None):
+        """缓存项是否已过新鲜期"""
+        now = time.time() if now is None else now
+        return now > item.get('fresh_until', item['expiry'])
+    
+    def _record(self, key, hit, item=None):
+        """记录全局和所属区域的命中统计，命中时累计节省的重新计算耗时"""
+        (self.hit_count if hit else self.miss_count).increment()
+        saved = item.get('cost', 0) if item else 0
+        if saved:
+            self.llm_seconds_saved.increment(saved)
+        self.cache.record(key, hit, saved)
+    
+    def _load(self, key, loader, setter=None):
+        """调用加载函数并写入缓存"""
+        value = loader()
+        if setter:
+            setter(value)
+        else:
+            self.set(key, value)
+        return value
+    
+    def _schedule_refresh(self, key, loader, setter=None):
+        """提交后台刷新任务，同一缓存键已在刷新时不重复提交
+        
+        刷新沿用调用方的上下文，其中的LLM调用以后台优先级排队，不与交互请求争抢调度
+        """
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+        
+        def refresh():
+            try:
+                # 刷新期间到达的缓存未命中请求会合并到同一次加载
+                with llm_priority(PRIORITY_BACKGROUND):
+                    self.coalesce(key, lambda: self._load(key, loader, setter))
+                self._refresh_done(key)
+            except Exception as e:
+                self._refresh_done(key, e)
+        
+        self._refresh_executor.submit(contextvars.copy_context().run, refresh)
+    
+    def _refresh_done(self, key, error=None):
+        """记录后台刷新结果并释放缓存键"""
+        if error is None:
+            self.refresh_count.increment()
+            logger.info(f"后台刷新缓存完成: {key}")
+        else:
+            # 刷新失败保留旧值，等待下次访问再刷新
+            self.refresh_error_count.increment()
+            logger.error(f"后台刷新缓存失败: {key}, 错误: {error}")
+        with self._refresh_lock:
+            self._refreshing.discard(key)
+    
+    async def aget_or_refresh(self, key, aloader, setter=None):
+        """get_or_refresh的异步版本
+        
+        未命中时在事件循环中等待异步加载函数，不占用线程；与同步调用方共用请求合并，
+        过期旧值的后台刷新作为当前事件循环中的任务执行。
+        
+        Args:
+            key: 缓存键
+            aloader: 无参异步加载函数，返回最新的值
+            setter: 写入缓存的函数，参数为加载结果；默认使用set(key, value)
+            
+        Returns:
+            (缓存值, 来源)，取值同get_or_refresh
+        """
+        item = self._get_item(key)
+        if item:
+            self._record(key, True, item)
+            if not self._is_stale(item):
+                return item['value'], 'fresh'
+            self.stale_hit_count.increment()
+            self._schedule_async_refresh(key, aloader, setter)
+            return item['value'], 'stale'
+        
+        self._record(key, False)
+        value, coalesced = await self.acoalesce(key, lambda: self._aload(key, aloader, setter))
+        return value, 'coalesced' if coalesced else 'loaded'
+    
+    async def _aload(self, key, aloader, setter=None):
+        """等待异步加载函数并写入缓存"""
+        value = await aloader()
+        if setter:
+            setter(value)
+        else:
+            self.set(key, value)
+        return value
+    
+    def _schedule_async_refresh(self, key, aloader, setter=None):
+        """在当前事件循环中创建后台刷新任务（以后台优先级调用LLM），同一缓存键已在刷新时不重复创建"""
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        async def refresh():
+            try:
+                # 任务复制了创建时的上下文，这里设置的优先级只影响刷新任务
+                with llm_priority(PRIORITY_BACKGROUND):
+                    await self.acoalesce(key, lambda: self._aload(key, aloader, setter))
+                self._refresh_done(key)
+            except Exception as e:
+                self._refresh_done(key, e)
+        
+        # 事件循环只保存任务的弱引用，需要持有引用直到任务结束
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+    
     def delete(self, key):
         """删除缓存
         
         Args:
             key: 缓存键
         """
-        if key in self.cache:
-            del self.cache[key]
+        if self.cache.delete(key):
             logger.debug(f"删除缓存: {key}")
+        if self._is_disk_key(key):
+            self.disk_cache.delete(key)
     
     def clear(self):
         """清空所有缓存"""
-        self.cache.clear()
+        self._clear_memory()
+        if self.disk_cache:
+            self.disk_cache.clear()
         logger.info("清空所有缓存")
     
+    def _clear_memory(self):
+        """清空内存缓存及查询映射、版本标签和语义缓存"""
+        self.cache.clear()
+        with self._query_lock:
+            self.query_cache_map.clear()
+            self.query_index.clear()
+        with self._tag_lock:
+            self._tag_index.clear()
+        self.semantic_cache.clear()
+    
+    def _sync_shared_cache(self, force=False):
+        """同步其他工作进程对共享磁盘缓存的修改
+        
+        内存缓存是共享磁盘缓存前的一级缓存：其他进程写入或删除某个缓存键后，
+        丢弃本进程内存中的旧副本，下次读取时从磁盘获取最新值；带查询文本的写入同时登记
+        相似查询映射，使相似查询也能命中其他进程的缓存。
+        
+        Args:
+            force: 是否忽略同步间隔立即同步
+        """
+        disk_cache = self.disk_cache
+        if disk_cache is None or not disk_cache.shared:
+            return
+        now = time.monotonic()
+        if not force and now < self._next_shared_sync:
+            return
+        self._next_shared_sync = now + self.shared_sync_interval
+        try:
+            events, lost = disk_cache.poll_events()
+        except Exception as e:
+            logger.error(f"读取共享缓存事件失败: {e}")
+            return
+        if lost:
+            # 部分事件已被清理，无法确定哪些副本已失效，丢弃全部内存副本
+            logger.warning("共享缓存事件已被清理，丢弃全部内存缓存")
+            self._clear_memory()
+        for kind, key, query_text, expiry in events:
+            if kind == 'clear':
+                self._clear_memory()
+                continue
+            self.cache.delete(key)
+            if kind == 'set' and query_text:
+                self._add_query_mapping(query_text, key, expiry)
+        self.shared_event_count.increment(len(events))
+    
     def get_cache_size(self):
         """获取缓存大小
         
@@ -134,20 +415,188 @@ class CacheManager:
         return len(self.cache)
     
     def cleanup_expired(self):
-        """清理过期缓存"""
-        current_time = time.time()
-        expired_keys = [key for key, item in self.cache.items() if current_time > item['expiry']]
+        """清理过期缓存
+        
+        只从过期堆顶弹出已过期的缓存项，耗时与过期项数量成正比；
+        对应的查询映射在移除回调中同步清理。
+        """
+        query_map_size = len(self.query_cache_map)
+        expired_count = self.cache.pop_expired()
+        if self.disk_cache:
+            expired_count += self.disk_cache.remove_expired()
+        expired_queries = query_map_size - len(self.query_cache_map)
+        
+        if expired_count or expired_queries:
+            logger.info(f"清理过期缓存: {expired_count}个缓存项, {expired_queries}个查询映射")
+    
+    def _on_cache_remove(self, key, item, reason):
+        """缓存项被移除（过期、淘汰或删除）时的回调
+        
+        Args:
+            key: 缓存键
+            item: 被移除的缓存项
+            reason: 移除原因
+        """
+        query_text = item.get('query_text')
+        # 被淘汰但仍保存在磁盘缓存中的项保留查询映射，相似查询命中时再从磁盘提升
+        if query_text and not (reason == 'evicted' and self._is_disk_key(key)):
+            with self._query_lock:
+                mapping = self.query_cache_map.get(query_text)
+                # 只有映射仍指向该缓存键时才删除，避免误删新写入的映射
+                if mapping and mapping['key'] == key:
+                    self._remove_query_mapping(query_text)
+        tags = item.get('tags')
+        # 与查询映射相同，仍保存在磁盘缓存中的项保留版本标签，目录更新时一并从磁盘删除
+        if tags and not (reason == 'evicted' and self._is_disk_key(key)):
+            with self._tag_lock:
+                for tag in tags:
+                    keys = self._tag_index.get(tag)
+                    if keys is not None:
+                        keys.discard(key)
+                        if not keys:
+                            del self._tag_index[tag]
+        if reason == 'evicted':
+            logger.debug(f"缓存达到上限，淘汰缓存: {key}")
+    
+    def _add_query_mapping(self, query_text, key, expiry):
+        """添加查询映射，并同步更新相似查询索引
+        
+        Args:
+            query_text: 查询文本
+            key: 缓存键
+            expiry: 过期时间
+        """
+        with self._query_lock:
+            self.query_cache_map[query_text] = {
+                'key': key,
+                'expiry': expiry
+            }
+            self.query_index.add(query_text)
+    
+    def _remove_query_mapping(self, query_text):
+        """删除查询映射，并同步更新相似查询索引（调用方需持有_query_lock）
+        
+        Args:
+            query_text: 查询文本
+        """
+        self.query_cache_map.pop(query_text, None)
+        self.query_index.remove(query_text)
+    
+    def _create_semantic_cache(self):
+        """根据配置创建LLM响应语义缓存
+        
+        Returns:
+            SemanticLLMCache实例，配置无效时返回关闭状态的实例
+        """
+        config = ConfigManager().get('cache.semantic', {}) or {}
+        try:
+            return SemanticLLMCache(
+                mode=config.get('mode', 'off'),
+                thresholds=config.get('thresholds'),
+                default_threshold=config.get('default_threshold', 0.85),
+                max_entries=config.get('max_entries', 5000)
+            )
+        except ValueError as e:
+            logger.error(f"语义缓存配置无效: {e}，不启用语义缓存")
+            return SemanticLLMCache()
+    
+    def _create_disk_cache(self):
+        """根据配置创建磁盘二级缓存
         
-        for key in expired_keys:
-            del self.cache[key]
+        Returns:
+            DiskCache实例，未启用或创建失败时返回None
+        """
+        config_manager = ConfigManager()
+        if not config_manager.get('cache.disk.enabled', False):
+            return None
         
-        # 清理过期的查询映射
-        expired_queries = [query for query, item in self.query_cache_map.items() if current_time > item['expiry']]
-        for query in expired_queries:
-            del self.query_cache_map[query]
+        path = config_manager.get('cache.disk.path', 'data/cache/cache.db')
+        max_bytes = config_manager.get('cache.disk.max_bytes', 64 * 1024 * 1024)
+        shared = config_manager.get('cache.disk.shared', False)
+        try:
+            disk_cache = DiskCache(path, max_bytes=max_bytes, shared=shared)
+        except Exception as e:
+            logger.error(f"创建磁盘缓存失败: {e}，仅使用内存缓存")
+            return None
         
-        if expired_keys or expired_queries:
-            logger.info(f"清理过期缓存: {len(expired_keys)}个缓存项, {len(expired_queries)}个查询映射")
+        # 重建相似查询映射，重启后相似查询也能命中磁盘缓存
+        for key, query_text, expiry in disk_cache.iter_query_texts():
+            self._add_query_mapping(query_text, key, expiry)
+        logger.info(f"启用{'多进程共享' if shared else ''}磁盘缓存: {path}, 已有{len(disk_cache)}个缓存项")
+        return disk_cache
+    
+    @staticmethod
+    def _namespace(key):
+        """缓存键的命名空间（冒号前的前缀）"""
+        return key.split(':', 1)[0]
+    
+    @staticmethod
+    def _estimate_size(value):
+        """按JSON序列化结果估算缓存值的字节数
+        
+        Args:
+            value: 缓存值
+            
+        Returns:
+            (字节数, 序列化字符串)，值无法JSON序列化时序列化字符串为None
+        """
+        try:
+            serialized = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return len(json.dumps(value, ensure_ascii=False, default=repr).encode('utf-8')), None
+        return len(serialized.encode('utf-8')), serialized
+    
+    @staticmethod
+    def _estimate_cost(value):
+        """估算重新计算缓存值需要的秒数
+        
+        ChatBot缓存的LLM响应为 {"content", "time"} 字典，time即LLM调用耗时；
+        其余缓存值没有耗时信息，视为0。
+        
+        Args:
+            value: 缓存值
+            
+        Returns:
+            耗时（秒）
+        """
+        if isinstance(value, dict):
+            cost = value.get('time')
+            if isinstance(cost, (int, float)) and not isinstance(cost, bool) and cost > 0:
+                return float(cost)
+        return 0.0
+    
+    def _is_disk_key(self, key):
+        """判断缓存键是否需要写入磁盘二级缓存"""
+        return self.disk_cache is not None and self._namespace(key) in self.disk_prefixes
+    
+    def _promote_from_disk(self, key):
+        """从磁盘缓存读取缓存项并提升到内存缓存
+        
+        Args:
+            key: 缓存键
+            
+        Returns:
+            缓存项字典，如果不存在或已过期则返回None
+        """
+        item = self.disk_cache.get(key)
+        if item is None:
+            return None
+        item['namespace'] = self._namespace(key)
+        item['cost'] = self._estimate_cost(item['value'])
+        # 磁盘缓存键本身包含目录版本，能读到即说明依赖的是当前版本
+        tags = self._catalog_tags(item['namespace'])
+        if tags:
+            item['tags'] = tags
+        # 磁盘中的expiry已包含stale_ttl，据此还原新鲜期
+        item['fresh_until'] = item['expiry'] - self.cache.region_for(key).stale_ttl
+        self.cache.set(key, item)
+        if tags:
+            self._tag_key(key, tags)
+        if item.get('query_text'):
+            self._add_query_mapping(item['query_text'], key, item['fresh_until'])
+        self.disk_hit_count.increment()
+        logger.debug(f"磁盘缓存命中并提升到内存: {key}")
+        return item
     
     def _calculate_similarity(self, str1, str2):
         """计算两个字符串的相似度
@@ -159,18 +608,9 @@ class CacheManager:
         Returns:
             相似度分数（0-1）
         """
-        # 预处理字符串，移除标点符号和多余空格
-        def preprocess(s):
-            # 移除标点符号
-            s = re.sub(r'[\s\p{P}\p{S}]+', ' ', s)
-            # 转换为小写
-            s = s.lower()
-            # 移除多余空格
-            s = ' '.join(s.split())
-            return s
-        
-        str1_processed = preprocess(str1)
-        str2_processed = preprocess(str2)
+        # 预处理字符串：转小写，移除空白、标点和符号
+        str1_processed = QuerySimilarityIndex.normalize(str1)
+        str2_processed = QuerySimilarityIndex.normalize(str2)
         
         # 计算相似度
         return SequenceMatcher(None, str1_processed, str2_processed).ratio()
@@ -178,6 +618,9 @@ class CacheManager:
     def find_similar_queries(self, query_text, threshold=0.7):
         """查找相似的查询
         
+        先通过MinHash-LSH索引取出少量候选，只对候选计算精确相似度，
+        查找耗时与已缓存查询的总量无关。
+        
         Args:
             query_text: 查询文本
             threshold: 相似度阈值
@@ -188,13 +631,22 @@ class CacheManager:
         similar_queries = []
         current_time = time.time()
         
-        for cached_query, item in list(self.query_cache_map.items()):
-            # 检查缓存是否过期
-            if current_time > item['expiry']:
-                del self.query_cache_map[cached_query]
-                continue
-            
-            # 计算相似度
+        candidates = []
+        with self._query_lock:
+            for cached_query in self.query_index.candidates(query_text):
+                item = self.query_cache_map.get(cached_query)
+                if item is None:
+                    self.query_index.remove(cached_query)
+                    continue
+                
+                # 检查缓存是否过期
+                if current_time > item['expiry']:
+                    self._remove_query_mapping(cached_query)
+                    continue
+                candidates.append((cached_query, item))
+        
+        # 在锁外计算相似度，避免阻塞其他线程写入
+        for cached_query, item in candidates:
             similarity = self._calculate_similarity(query_text, cached_query)
             if similarity >= threshold:
                 similar_queries.append((cached_query, similarity, item['key']))
@@ -228,10 +680,10 @@ class CacheManager:
             result = self.get(similar_key)
             if result:
                 logger.info(f"使用相似度匹配的缓存，相似度: {most_similar[1]:.2f}")
-                self.similarity_hit_count += 1
+                self.similarity_hit_count.increment()
                 return result
         
-        self.miss_count += 1
+        self.miss_count.increment()
         return None
     
     def set_query_cache(self, user_input, intent_info, response, ttl=None):
@@ -266,38 +718,13 @@ class CacheManager:
         key = self.generate_cache_key('query', user_input, intent_info)
         return self.get(key)
     
-    def _evict_oldest(self):
-        """移除最旧的缓存项"""
-        if not self.cache:
-            return
-        
-        oldest_key = min(self.cache.items(), key=lambda x: x[1]['created'])[0]
-        del self.cache[oldest_key]
-        logger.debug(f"缓存达到上限，移除最旧缓存: {oldest_key}")
-    
-    def _prewarm_cache(self):
-        """缓存预热，提前缓存常用数据"""
-        logger.info("开始缓存预热...")
-        
-        # 预热常用查询缓存
-        common_queries = [
-            "我熟悉直播带货和网店运营，有场地补贴落地经验，想从事电商创业相关工作。",
-            "我有中级电工证，想了解技能补贴政策",
-            "我想找一份兼职工作",
-            "我是一名失业人员，有什么政策可以申请"
-        ]
-        
-        for query in common_queries:
-            # 为常用查询生成缓存键，实际缓存会在首次查询时填充
-            key = self.generate_cache_key('query_prewarm', query)
-            # 设置一个空值，标记为预热
-            self.set(key, {}, ttl=3600)
-        
-        logger.info("缓存预热完成")
-    
     def generate_cache_key(self, prefix, *args, **kwargs):
         """生成缓存键
         
+        CATALOG_DEPENDENCIES中的前缀会把所依赖数据目录的当前版本加入缓存键，
+        目录更新后旧版本的缓存项（包括磁盘缓存中的）不会再被读到；
+        这些键中的政策、岗位参数只按ID参与哈希，规范化规则见CacheKeyBuilder。
+        
         Args:
             prefix: 缓存键前缀
             *args: 用于生成缓存键的参数
@@ -306,27 +733,104 @@ class CacheManager:
         Returns:
             生成的缓存键
         """
-        # 优化：对于简单参数，直接使用参数值作为键的一部分
-        if len(args) == 1 and isinstance(args[0], str) and not kwargs:
-            # 对于单个字符串参数，直接使用字符串的哈希
-            key_str = args[0]
-            key_hash = hashlib.md5(key_str.encode('utf-8')).hexdigest()
-            return f"{prefix}:{key_hash}"
-        
-        # 对于复杂参数，使用原来的方法
-        # 构建键的内容
-        key_content = {
-            'prefix': prefix,
-            'args': args,
-            'kwargs': kwargs
-        }
+        tags = self._catalog_tags(prefix)
+        if not tags:
+            return self.key_builder.build(prefix, args, kwargs)
+        # 缓存键已包含目录版本，这些目录中的政策、岗位只用ID参与哈希
+        catalogs = tuple(tag.split('@', 1)[0] for tag in tags)
+        return self.key_builder.build(prefix, args + tags, kwargs, catalogs)
+    
+    def coalesce(self, key, fn):
+        """合并相同缓存键的并发计算
         
-        # 序列化并生成哈希
-        key_str = json.dumps(key_content, ensure_ascii=False, sort_keys=True)
-        key_hash = hashlib.md5(key_str.encode('utf-8')).hexdigest()
+        缓存未命中后调用：同一缓存键同时只有一个调用方执行fn，
+        其余调用方等待并共享其结果，避免突发流量下重复调用LLM。
         
-        # 返回带前缀的缓存键
-        return f"{prefix}:{key_hash}"
+        Args:
+            key: 缓存键
+            fn: 无参计算函数
+            
+        Returns:
+            (计算结果, 是否为合并命中)
+        """
+        result, shared = self.single_flight.do(key, fn)
+        if shared:
+            logger.debug(f"合并并发请求: {key}")
+        return result, shared
+    
+    async def acoalesce(self, key, afn):
+        """coalesce的异步版本，等待其他调用方的计算时不阻塞事件循环
+        
+        Args:
+            key: 缓存键
+            afn: 无参异步计算函数
+            
+        Returns:
+            (计算结果, 是否为合并命中)
+        """
+        result, shared = await self.single_flight.ado(key, afn)
+        if shared:
+            logger.debug(f"合并并发请求: {key}")
+        return result, shared
+    
+    @staticmethod
+    def catalog_version(raw):
+        """按数据文件内容计算目录版本
+        
+        Args:
+            raw: 数据文件的原始字节
+            
+        Returns:
+            内容哈希字符串
+        """
+        return hashlib.blake2b(raw, digest_size=8).hexdigest()
+    
+    def update_catalog_version(self, catalog, version):
+        """更新数据目录版本，失效依赖旧版本的缓存项
+        
+        只删除版本标签下登记的缓存项，耗时与受影响的缓存项数量成正比，
+        与缓存总量无关；不依赖该目录的LLM响应等缓存不受影响。
+        
+        Args:
+            catalog: 目录名称，如 'policies'、'jobs'
+            version: 新版本（内容哈希）
+            
+        Returns:
+            失效的缓存项数量
+        """
+        with self._tag_lock:
+            old_version = self.catalog_versions.get(catalog)
+            if old_version == version:
+                return 0
+            self.catalog_versions[catalog] = version
+            keys = self._tag_index.pop(f"{catalog}@{old_version}", set()) if old_version else set()
+        
+        for key in keys:
+            self.delete(key)
+        self.invalidated_count.increment(len(keys))
+        if old_version:
+            logger.info(f"数据目录已更新: {catalog} {old_version} -> {version}, 失效{len(keys)}个缓存项")
+        return len(keys)
+    
+    def _catalog_tags(self, namespace):
+        """命名空间所依赖数据目录的当前版本标签"""
+        catalogs = CATALOG_DEPENDENCIES.get(namespace)
+        if not catalogs:
+            return None
+        versions = self.catalog_versions
+        return tuple(f"{catalog}@{versions[catalog]}" for catalog in catalogs if catalog in versions) or None
+    
+    def _tag_key(self, key, tags):
+        """登记缓存键的版本标签，写入期间目录已更新时直接删除该缓存项"""
+        with self._tag_lock:
+            current = all(
+                self.catalog_versions.get(tag.split('@', 1)[0]) == tag.split('@', 1)[1] for tag in tags
+            )
+            if current:
+                for tag in tags:
+                    self._tag_index.setdefault(tag, set()).add(key)
+        if not current:
+            self.delete(key)
     
     def set_llm_cache(self, prompt, response, ttl=None):
         """设置LLM响应缓存
@@ -352,31 +856,57 @@ class CacheManager:
         key = self.generate_cache_key('llm', prompt)
         return self.get(key)
     
-    def set_query_cache(self, user_input, intent_info, response, ttl=None):
-        """设置查询结果缓存
+    def set_semantic_llm_cache(self, prompt_type, prompt, text):
+        """将已缓存的LLM响应加入语义缓存
         
         Args:
-            user_input: 用户输入
-            intent_info: 意图信息
-            response: 查询结果
-            ttl: 缓存时间（秒），默认使用查询缓存时间
+            prompt_type: 提示类型，不同类型使用各自的相似度阈值
+            prompt: 完整的LLM提示，响应已按该提示缓存
+            text: 提示中的用户输入部分
         """
-        ttl = ttl or self.query_ttl
-        key = self.generate_cache_key('query', user_input, intent_info)
-        self.set(key, response, ttl)
+        self.semantic_cache.add(prompt_type, prompt, text, self.generate_cache_key('llm', prompt))
     
-    def get_query_cache(self, user_input, intent_info):
-        """获取查询结果缓存
+    def get_semantic_llm_cache(self, prompt_type, prompt, text):
+        """按用户输入的相似度查找LLM响应缓存
+        
+        审计模式下只记录本可命中的请求，始终返回None，用于在启用前调整阈值。
         
         Args:
-            user_input: 用户输入
-            intent_info: 意图信息
+            prompt_type: 提示类型
+            prompt: 完整的LLM提示
+            text: 提示中的用户输入部分
             
         Returns:
-            缓存的查询结果，如果不存在则返回None
+            相似提示的缓存响应，如果不存在或处于审计模式则返回None
         """
-        key = self.generate_cache_key('query', user_input, intent_info)
-        return self.get(key)
+        semantic_cache = self.semantic_cache
+        if not semantic_cache.enabled:
+            return None
+        match = semantic_cache.lookup(prompt_type, prompt, text)
+        if match is None:
+            semantic_cache.miss_count.increment()
+            return None
+        
+        key, similarity, cached_text = match
+        item = self._get_item(key)
+        if not item:
+            # 响应已被淘汰或过期，移除对应的语义条目
+            semantic_cache.discard(key)
+            semantic_cache.miss_count.increment()
+            return None
+        
+        if semantic_cache.mode == 'audit':
+            semantic_cache.audit_hit_count.increment()
+            logger.info(
+                f"语义缓存审计（未启用）: 类型={prompt_type}, 相似度={similarity:.3f}, "
+                f"阈值={semantic_cache.threshold_for(prompt_type)}, 输入={text[:50]}, 缓存输入={cached_text[:50]}"
+            )
+            return None
+        
+        semantic_cache.hit_count.increment()
+        self._record(key, True, item)
+        logger.info(f"语义缓存命中: 类型={prompt_type}, 相似度={similarity:.3f}")
+        return item['value']
     
     def set_policy_cache(self, policy_id, policy_data, ttl=None):
         """设置政策数据缓存
@@ -508,25 +1038,60 @@ class CacheManager:
         Returns:
             缓存统计信息字典
         """
-        total_requests = self.hit_count + self.miss_count
-        hit_rate = (self.hit_count / total_requests * 100) if total_requests > 0 else 0
-        similarity_hit_rate = (self.similarity_hit_count / total_requests * 100) if total_requests > 0 else 0
+        hit_count = self.hit_count.value
+        miss_count = self.miss_count.value
+        similarity_hit_count = self.similarity_hit_count.value
+        total_requests = hit_count + miss_count
+        hit_rate = (hit_count / total_requests * 100) if total_requests > 0 else 0
+        similarity_hit_rate = (similarity_hit_count / total_requests * 100) if total_requests > 0 else 0
         
         return {
-            'hit_count': self.hit_count,
-            'miss_count': self.miss_count,
-            'similarity_hit_count': self.similarity_hit_count,
+            'hit_count': hit_count,
+            'miss_count': miss_count,
+            'similarity_hit_count': similarity_hit_count,
             'total_requests': total_requests,
             'hit_rate': hit_rate,
             'similarity_hit_rate': similarity_hit_rate,
             'cache_size': len(self.cache),
             'query_map_size': len(self.query_cache_map),
-            'max_cache_size': self.max_cache_size
+            'query_index': self.query_index.get_stats(),
+            'max_cache_size': self.max_cache_size,
+            'memory_bytes': self.cache.total_bytes,
+            'max_memory_bytes': self.max_memory_bytes,
+            'rejected_count': self.cache.rejected_count,
+            'namespaces': self.cache.get_namespace_usage(),
+            'eviction_policy': self.cache.policy_name,
+            'regions': self.cache.get_region_stats(),
+            'shard_count': self.cache.num_shards,
+            'eviction_count': self.cache.eviction_count,
+            'expired_count': self.cache.expired_count,
+            'disk_hit_count': self.disk_hit_count.value,
+            'shared_event_count': self.shared_event_count.value,
+            'stale_hit_count': self.stale_hit_count.value,
+            'refresh_count': self.refresh_count.value,
+            'refresh_error_count': self.refresh_error_count.value,
+            'llm_seconds_saved': round(self.llm_seconds_saved.value, 3),
+            'coalesced_hit_count': self.single_flight.shared_count,
+            'semantic_cache': self.semantic_cache.get_stats(),
+            'catalog_versions': dict(self.catalog_versions),
+            'invalidated_count': self.invalidated_count.value,
+            'in_flight_count': self.single_flight.in_flight_count(),
+            'disk_cache': self.disk_cache.get_stats() if self.disk_cache else None
         }
     
     def reset_cache_stats(self):
         """重置缓存统计信息"""
-        self.hit_count = 0
-        self.miss_count = 0
-        self.similarity_hit_count = 0
+        self.hit_count.reset()
+        self.miss_count.reset()
+        self.similarity_hit_count.reset()
+        self.disk_hit_count.reset()
+        self.shared_event_count.reset()
+        self.stale_hit_count.reset()
+        self.refresh_count.reset()
+        self.refresh_error_count.reset()
+        self.llm_seconds_saved.reset()
+        self.cache.reset_stats()
+        self.single_flight.reset_stats()
+        self.semantic_cache.reset_stats()
+        self.invalidated_count.reset()
         logger.info("缓存统计信息已重置")
@@ -0,0 +1,250 @@
+import random
+
+from .cache_store import ShardedCacheStore, AtomicCounter, EVICTION_POLICIES
+
+
+# 缓存区域默认配置，可在 config.json 的 cache.regions 中按区域覆盖
+# ttl_jitter：TTL随机抖动比例，同一批写入的缓存项过期时间错开
+# stale_ttl：过期后仍可作为旧值返回并在后台刷新的时长（秒），0表示不启用
+DEFAULT_REGION_CONFIG = {
+    'llm': {'max_size': 1000, 'ttl': 7200, 'policy': 'gds', 'max_memory_mb': 48, 'ttl_jitter': 0.1, 'stale_ttl': 1800},
+    'query': {'max_size': 1000, 'ttl': 3600, 'policy': 'lru', 'max_memory_mb': 32, 'ttl_jitter': 0.1, 'stale_ttl': 600},
+    'stream': {'max_size': 500, 'ttl': 1800, 'policy': 'lru', 'max_memory_mb': 16, 'ttl_jitter': 0.1, 'stale_ttl': 0},
+    'catalog': {'max_size': 2000, 'ttl': 86400, 'policy': 'fifo', 'max_memory_mb': 16, 'ttl_jitter': 0.1, 'stale_ttl': 3600},
+    'mapping': {'max_size': 100, 'ttl': 86400, 'policy': 'lru', 'max_memory_mb': 4, 'ttl_jitter': 0.1, 'stale_ttl': 3600},
+    'response': {'max_size': 500, 'ttl': 3600, 'policy': 'lru', 'max_memory_mb': 8, 'ttl_jitter': 0.1, 'stale_ttl': 0},
+    'default': {'max_size': 1000, 'ttl': 3600, 'policy': 'lru', 'max_memory_mb': 4, 'ttl_jitter': 0, 'stale_ttl': 0},
+}
+
+# 缓存键命名空间（冒号前的前缀）-> 缓存区域，未列出的命名空间归入default区域
+NAMESPACE_REGIONS = {
+    'llm': 'llm',
+    'llm_task': 'llm',
+    'query': 'query',
+    'stream_query': 'stream',
+    'policy': 'catalog',
+    'policies': 'catalog',
+    'job': 'catalog',
+    'jobs': 'catalog',
+    'user_profiles': 'catalog',
+    'mapping': 'mapping',
+    'response': 'response',
+}
+
+
+class CacheRegion:
+    """缓存区域
+
+    每个区域拥有独立的容量、内存预算、默认TTL、淘汰策略和统计计数，
+    一个区域的写入突增只会淘汰本区域的缓存项。
+    """
+
+    def __init__(self, name, max_size, ttl, policy='lru', max_memory_mb=None,
+                 ttl_jitter=0, stale_ttl=0, on_remove=None):
+        """初始化缓存区域
+
+        Args:
+            name: 区域名称
+            max_size: 最大缓存项数量
+            ttl: 默认缓存时间（秒）
+            policy: 淘汰策略名称，见EVICTION_POLICIES
+            max_memory_mb: 内存预算（MB），为空表示只按数量限制
+            ttl_jitter: TTL随机抖动比例，例如0.1表示在±10%范围内随机
+            stale_ttl: 过期后仍保留旧值用于后台刷新的时长（秒）
+            on_remove: 缓存项被移除时的回调
+        """
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"未知的淘汰策略: {policy}")
+        self.name = name
+        self.ttl = ttl
+        self.ttl_jitter = ttl_jitter
+        self.stale_ttl = stale_ttl
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024) if max_memory_mb else None
+        self.store = ShardedCacheStore(
+            max_size,
+            policy_factory=EVICTION_POLICIES[policy],
+            on_remove=on_remove,
+            max_bytes=self.max_memory_bytes
+        )
+        self.hit_count = AtomicCounter()
+        self.miss_count = AtomicCounter()
+        self.seconds_saved = AtomicCounter(0.0)
+
+    def jittered_ttl(self, ttl):
+        """对TTL加随机抖动
+
+        Args:
+            ttl: 原始缓存时间（秒）
+
+        Returns:
+            抖动后的缓存时间（秒）
+        """
+        if not self.ttl_jitter:
+            return ttl
+        return ttl * (1 + random.uniform(-self.ttl_jitter, self.ttl_jitter))
+
+    def get_stats(self):
+        """获取区域统计信息
+
+        Returns:
+            统计信息字典
+        """
+        hit_count = self.hit_count.value
+        miss_count = self.miss_count.value
+        total_requests = hit_count + miss_count
+        return {
+            'size': len(self.store),
+            'max_size': self.store.max_size,
+            'ttl': self.ttl,
+            'ttl_jitter': self.ttl_jitter,
+            'stale_ttl': self.stale_ttl,
+            'policy': self.store.policy_name,
+            'hit_count': hit_count,
+            'miss_count': miss_count,
+            'hit_rate': (hit_count / total_requests * 100) if total_requests > 0 else 0,
+            'llm_seconds_saved': round(self.seconds_saved.value, 3),
+            'eviction_count': self.store.eviction_count,
+            'expired_count': self.store.expired_count,
+            'memory_bytes': self.store.total_bytes,
+            'max_memory_bytes': self.max_memory_bytes
+        }
+
+    def reset_stats(self):
+        """重置命中统计"""
+        self.hit_count.reset()
+        self.miss_count.reset()
+        self.seconds_saved.reset()
+
+
+class CacheRegionSet:
+    """按命名空间把缓存键路由到各缓存区域
+
+    对外提供与ShardedCacheStore相同的接口，CacheManager无需关心缓存项位于哪个区域。
+    """
+
+    def __init__(self, region_config=None, on_remove=None, max_size=None, max_memory_mb=None):
+        """初始化缓存区域集合
+
+        Args:
+            region_config: 区域配置，按区域名覆盖DEFAULT_REGION_CONFIG中的字段
+            on_remove: 缓存项被移除时的回调
+            max_size: 统一覆盖每个区域的最大缓存项数量
+            max_memory_mb: 统一覆盖每个区域的内存预算（MB）
+        """
+        self.regions = {}
+        region_config = region_config or {}
+        for name, defaults in DEFAULT_REGION_CONFIG.items():
+            config = dict(defaults, **region_config.get(name, {}))
+            if max_size is not None:
+                config['max_size'] = max_size
+            if max_memory_mb is not None:
+                config['max_memory_mb'] = max_memory_mb
+            self.regions[name] = CacheRegion(name, on_remove=on_remove, **config)
+
+    def region_for(self, key):
+        """根据缓存键返回所属的缓存区域"""
+        namespace = key.split(':', 1)[0]
+        return self.regions[NAMESPACE_REGIONS.get(namespace, 'default')]
+
+    @property
+    def max_size(self):
+        return sum(region.store.max_size for region in self.regions.values())
+
+    @property
+    def policy_name(self):
+        """各区域淘汰策略名称"""
+        return {name: region.store.policy_name for name, region in self.regions.items()}
+
+    @property
+    def num_shards(self):
+        return sum(region.store.num_shards for region in self.regions.values())
+
+    @property
+    def eviction_count(self):
+        return sum(region.store.eviction_count for region in self.regions.values())
+
+    @property
+    def expired_count(self):
+        return sum(region.store.expired_count for region in self.regions.values())
+
+    @property
+    def rejected_count(self):
+        return sum(region.store.rejected_count for region in self.regions.values())
+
+    @property
+    def total_bytes(self):
+        return sum(region.store.total_bytes for region in self.regions.values())
+
+    @property
+    def max_bytes(self):
+        budgets = [region.max_memory_bytes for region in self.regions.values()]
+        return None if None in budgets else sum(budgets)
+
+    def __len__(self):
+        return sum(len(region.store) for region in self.regions.values())
+
+    def __contains__(self, key):
+        return key in self.region_for(key).store
+
+    def __iter__(self):
+        return iter([key for key, _ in self.items()])
+
+    def items(self):
+        """返回所有区域缓存项的快照"""
+        items = []
+        for region in self.regions.values():
+            items.extend(region.store.items())
+        return items
+
+    def get(self, key, now=None):
+        """获取缓存项（可能已不新鲜，由调用方判断 fresh_until）"""
+        return self.region_for(key).store.get(key, now)
+
+    def record(self, key, hit, saved=0):
+        """记录所属区域的一次命中或未命中
+
+        Args:
+            key: 缓存键
+            hit: 是否命中
+            saved: 命中省下的重新计算耗时（秒）
+        """
+        region = self.region_for(key)
+        if hit:
+            region.hit_count.increment()
+            if saved:
+                region.seconds_saved.increment(saved)
+        else:
+            region.miss_count.increment()
+
+    def set(self, key, entry, now=None):
+        """写入缓存项到所属区域"""
+        return self.region_for(key).store.set(key, entry, now)
+
+    def delete(self, key):
+        """删除缓存项"""
+        return self.region_for(key).store.delete(key)
+
+    def pop_expired(self, now=None, limit=None):
+        """清理所有区域的已过期缓存项"""
+        return sum(region.store.pop_expired(now, limit) for region in self.regions.values())
+
+    def clear(self):
+        """清空所有区域"""
+        for region in self.regions.values():
+            region.store.clear()
+
+    def get_namespace_usage(self):
+        """汇总所有区域的命名空间占用"""
+        usage = {}
+        for region in self.regions.values():
+            usage.update(region.store.get_namespace_usage())
+        return usage
+
+    def get_region_stats(self):
+        """获取各区域统计信息"""
+        return {name: region.get_stats() for name, region in self.regions.items()}
+
+    def reset_stats(self):
+        """重置各区域的命中统计"""
+        for region in self.regions.values():
+            region.reset_stats()
@@ -0,0 +1,528 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+class LRUEvictionPolicy:
+    """最近最少使用（LRU）淘汰策略
+
+    使用OrderedDict维护访问顺序，插入、访问、删除和选择淘汰对象均为O(1)。
+    """
+    name = 'lru'
+
+    def __init__(self):
+        """初始化淘汰策略"""
+        self._order = OrderedDict()
+
+    def on_insert(self, key, entry):
+        """记录新写入（或覆盖写入）的缓存项"""
+        self._order[key] = None
+        self._order.move_to_end(key)
+
+    def on_access(self, key, entry):
+        """记录一次命中，将缓存项移到最近使用端"""
+        if key in self._order:
+            self._order.move_to_end(key)
+
+    def on_remove(self, key):
+        """缓存项被删除时同步移除顺序记录"""
+        self._order.pop(key, None)
+
+    def victim(self):
+        """返回下一个应被淘汰的缓存键
+
+        Returns:
+            最久未使用的缓存键，如果为空则返回None
+        """
+        if not self._order:
+            return None
+        return next(iter(self._order))
+
+    def admit(self, entry):
+        """缓存已满时是否准入新缓存项，LRU总是准入"""
+        return True
+
+    def clear(self):
+        """清空顺序记录"""
+        self._order.clear()
+
+
+class FIFOEvictionPolicy(LRUEvictionPolicy):
+    """先进先出（FIFO）淘汰策略
+
+    命中不改变顺序，适合整体刷新的目录类数据（政策、岗位列表）。
+    """
+    name = 'fifo'
+
+    def on_access(self, key, entry):
+        """命中不影响淘汰顺序"""
+
+
+class GreedyDualSizeEvictionPolicy:
+    """代价感知的GreedyDual-Size淘汰策略
+
+    缓存项优先级 H = L + cost / size，其中cost为缓存项的 'cost' 字段（重新计算需要的秒数，
+    例如LLM调用耗时），size为 'size' 字段（字节数）。每次淘汰优先级最低的缓存项，
+    并把L抬高到被淘汰项的优先级；命中时按当前L重新计算优先级，
+    长期未访问的缓存项会随L上涨而逐渐被淘汰。
+    优先级放在最小堆中，更新后遗留的旧堆元素在选择淘汰对象时校验并丢弃。
+    """
+    name = 'gds'
+
+    def __init__(self):
+        """初始化淘汰策略"""
+        # 膨胀值L
+        self._inflation = 0.0
+        self._priority = {}
+        # 堆元素为 (优先级, 序号, 缓存键)，优先级相同时先写入的先淘汰
+        self._heap = []
+        self._counter = itertools.count()
+
+    def _score(self, entry):
+        """按当前膨胀值计算缓存项优先级"""
+        return self._inflation + entry.get('cost', 0) / max(entry.get('size', 0), 1)
+
+    def _push(self, key, entry):
+        priority = self._score(entry)
+        self._priority[key] = priority
+        heapq.heappush(self._heap, (priority, next(self._counter), key))
+        if len(self._heap) > 2 * len(self._priority) + 64:
+            self._heap = [(priority, next(self._counter), key) for key, priority in self._priority.items()]
+            heapq.heapify(self._heap)
+
+    def on_insert(self, key, entry):
+        """记录新写入（或覆盖写入）的缓存项"""
+        self._push(key, entry)
+
+    def on_access(self, key, entry):
+        """命中时按当前膨胀值恢复优先级"""
+        if key in self._priority:
+            self._push(key, entry)
+
+    def on_remove(self, key):
+        """缓存项被删除时移除优先级记录"""
+        self._priority.pop(key, None)
+
+    def _peek(self):
+        """丢弃堆顶失效元素，返回优先级最低的 (优先级, 缓存键)"""
+        heap = self._heap
+        while heap:
+            priority, _, key = heap[0]
+            if self._priority.get(key) == priority:
+                return priority, key
+            heapq.heappop(heap)
+        return None
+
+    def victim(self):
+        """返回优先级最低的缓存键，并把膨胀值抬高到其优先级
+
+        Returns:
+            缓存键，如果为空则返回None
+        """
+        top = self._peek()
+        if top is None:
+            return None
+        self._inflation = top[0]
+        return top[1]
+
+    def admit(self, entry):
+        """缓存已满时，新缓存项的优先级不低于最低优先级才准入
+
+        避免重新计算几乎没有代价的缓存项挤掉耗时很长的LLM结果。
+        """
+        top = self._peek()
+        return top is None or self._score(entry) >= top[0]
+
+    def clear(self):
+        """清空优先级记录"""
+        self._priority.clear()
+        self._heap = []
+        self._inflation = 0.0
+
+
+# 淘汰策略名称 -> 策略类，缓存区域配置中按名称选择
+EVICTION_POLICIES = {
+    LRUEvictionPolicy.name: LRUEvictionPolicy,
+    FIFOEvictionPolicy.name: FIFOEvictionPolicy,
+    GreedyDualSizeEvictionPolicy.name: GreedyDualSizeEvictionPolicy,
+}
+
+
+class CacheStore:
+    """缓存存储引擎
+
+    - 容量淘汰交给可替换的淘汰策略（默认LRU），每次写入只淘汰O(1)个缓存项
+    - 过期时间放入最小堆，读取时惰性判断过期，写入时只清理堆顶有限个已过期项，
+      避免每次写入都全量扫描
+    - 可选的字节预算：缓存项的 'size' 字段为写入时估算的字节数，
+      总字节数超出预算时继续按淘汰策略淘汰；按 'namespace' 字段分别统计占用
+    - 缓存已满时由淘汰策略决定是否准入新缓存项（代价感知策略会拒绝低价值的缓存项）
+    """
+
+    # 每次写入时最多顺带清理的过期项数量
+    expire_batch_size = 16
+
+    def __init__(self, max_size=1000, policy=None, on_remove=None, max_bytes=None):
+        """初始化缓存存储
+
+        Args:
+            max_size: 最大缓存项数量
+            policy: 淘汰策略实例，默认使用LRUEvictionPolicy
+            on_remove: 缓存项被移除时的回调，签名为 (key, entry, reason)，
+                reason取值为 'expired'、'evicted'、'deleted'
+            max_bytes: 缓存项字节预算，None表示只按数量限制
+        """
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.policy = policy or LRUEvictionPolicy()
+        self.on_remove = on_remove
+        self.entries = {}
+        # 过期堆，元素为 (过期时间, 缓存键)；覆盖写入后旧元素会在弹出时校验并丢弃
+        self._expiry_heap = []
+        self.eviction_count = 0
+        self.expired_count = 0
+        self.rejected_count = 0
+        self.total_bytes = 0
+        # 命名空间 -> [缓存项数量, 字节数]
+        self.namespace_usage = defaultdict(lambda: [0, 0])
+
+    @property
+    def policy_name(self):
+        """淘汰策略名称"""
+        return self.policy.name
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(list(self.entries))
+
+    def items(self):
+        """返回所有缓存项（含尚未惰性清理的过期项）"""
+        return list(self.entries.items())
+
+    def get(self, key, now=None):
+        """获取缓存项
+
+        Args:
+            key: 缓存键
+            now: 当前时间戳，默认取time.time()
+
+        Returns:
+            缓存项字典，如果不存在或已过期则返回None
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        now = time.time() if now is None else now
+        if now > entry['expiry']:
+            self._remove(key, 'expired')
+            return None
+
+        self.policy.on_access(key, entry)
+        return entry
+
+    def set(self, key, entry, now=None):
+        """写入缓存项
+
+        Args:
+            key: 缓存键
+            entry: 缓存项字典，必须包含 'expiry' 字段，可选 'size' 和 'namespace' 字段
+            now: 当前时间戳，默认取time.time()
+
+        Returns:
+            是否写入成功，单个缓存项超出字节预算或未被淘汰策略准入时返回False
+        """
+        now = time.time() if now is None else now
+        # 顺带清理少量已过期项，单次写入的额外开销有上限
+        self.pop_expired(now, limit=self.expire_batch_size)
+
+        size = entry.get('size', 0)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # 单个缓存项就超出预算，不缓存，同时删除旧值避免读到过期数据
+            self.delete(key)
+            self.rejected_count += 1
+            return False
+
+        old_entry = self.entries.get(key)
+        if old_entry is not None:
+            self._account(old_entry, -1)
+            self.entries[key] = entry
+        else:
+            if len(self.entries) >= self.max_size and not self.policy.admit(entry):
+                self.rejected_count += 1
+                return False
+            while len(self.entries) >= self.max_size and self.entries:
+                self.evict()
+            self.entries[key] = entry
+        self._account(entry, 1)
+
+        self.policy.on_insert(key, entry)
+        # 超出字节预算时继续淘汰；LRU下新写入的缓存项最后才会被选中，
+        # 代价感知策略下新缓存项的优先级最低时会被立即淘汰
+        while self.max_bytes is not None and self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            self.evict()
+        if key not in self.entries:
+            self.rejected_count += 1
+            return False
+
+        heapq.heappush(self._expiry_heap, (entry['expiry'], key))
+        self._maybe_compact_heap()
+        return True
+
+    def delete(self, key):
+        """删除缓存项
+
+        Returns:
+            是否删除成功
+        """
+        if key not in self.entries:
+            return False
+        self._remove(key, 'deleted')
+        return True
+
+    def evict(self):
+        """按淘汰策略移除一个缓存项
+
+        Returns:
+            被淘汰的缓存键，如果为空则返回None
+        """
+        key = self.policy.victim()
+        if key is None:
+            return None
+        if key not in self.entries:
+            # 策略与存储不同步时直接丢弃该记录
+            self.policy.on_remove(key)
+            return key
+        self._remove(key, 'evicted')
+        self.eviction_count += 1
+        return key
+
+    def pop_expired(self, now=None, limit=None):
+        """从过期堆顶依次清理已过期的缓存项
+
+        Args:
+            now: 当前时间戳，默认取time.time()
+            limit: 最多清理的数量，None表示清理全部已过期项
+
+        Returns:
+            清理的缓存项数量
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] < now:
+            if limit is not None and removed >= limit:
+                break
+            expiry, key = heapq.heappop(heap)
+            entry = self.entries.get(key)
+            # 覆盖写入后遗留的旧堆元素，直接丢弃
+            if entry is None or entry['expiry'] != expiry:
+                continue
+            self._remove(key, 'expired')
+            removed += 1
+        return removed
+
+    def clear(self):
+        """清空所有缓存项"""
+        self.entries.clear()
+        self.policy.clear()
+        self._expiry_heap = []
+        self.total_bytes = 0
+        self.namespace_usage.clear()
+
+    def _remove(self, key, reason):
+        """移除缓存项并通知回调"""
+        entry = self.entries.pop(key)
+        self._account(entry, -1)
+        self.policy.on_remove(key)
+        if reason == 'expired':
+            self.expired_count += 1
+        if self.on_remove:
+            self.on_remove(key, entry, reason)
+
+    def _account(self, entry, sign):
+        """更新总字节数和命名空间占用"""
+        size = entry.get('size', 0)
+        self.total_bytes += sign * size
+        usage = self.namespace_usage[entry.get('namespace')]
+        usage[0] += sign
+        usage[1] += sign * size
+        if usage[0] == 0:
+            del self.namespace_usage[entry.get('namespace')]
+
+    def _maybe_compact_heap(self):
+        """覆盖写入过多导致堆中失效元素堆积时，重建过期堆"""
+        if len(self._expiry_heap) > 2 * len(self.entries) + 64:
+            self._expiry_heap = [(entry['expiry'], key) for key, entry in self.entries.items()]
+            heapq.heapify(self._expiry_heap)
+
+
+class AtomicCounter:
+    """线程安全的计数器
+
+    `count += 1` 在多线程下不是原子操作，会丢失计数，这里用锁保护。
+    """
+
+    def __init__(self, value=0):
+        self._value = value
+        self._lock = threading.Lock()
+
+    def increment(self, amount=1):
+        """增加计数
+
+        Returns:
+            增加后的值
+        """
+        with self._lock:
+            self._value += amount
+            return self._value
+
+    @property
+    def value(self):
+        """当前计数"""
+        return self._value
+
+    def reset(self):
+        """重置计数"""
+        with self._lock:
+            self._value = 0
+
+
+class ShardedCacheStore:
+    """分片加锁的线程安全缓存存储
+
+    缓存键按哈希分布到多个分片，每个分片是一个独立的CacheStore并持有自己的锁，
+    不同分片上的读写互不阻塞；容量按分片均分，淘汰和过期清理都在分片内完成。
+    移除回调在分片锁内调用，回调中不能再访问缓存存储。
+    """
+
+    def __init__(self, max_size=1000, num_shards=16, policy_factory=None, on_remove=None, max_bytes=None):
+        """初始化分片缓存存储
+
+        Args:
+            max_size: 最大缓存项数量（所有分片之和）
+            num_shards: 分片数量，容量较小时自动减少，保证每个分片至少能容纳64项
+            policy_factory: 为每个分片创建淘汰策略的工厂函数，默认使用LRUEvictionPolicy
+            on_remove: 缓存项被移除时的回调，签名同CacheStore
+            max_bytes: 字节预算（所有分片之和），None表示只按数量限制
+        """
+        num_shards = max(1, min(num_shards, max_size // 64))
+        shard_size = -(-max_size // num_shards)
+        shard_bytes = max_bytes // num_shards if max_bytes is not None else None
+        policy_factory = policy_factory or LRUEvictionPolicy
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._shards = [
+            CacheStore(shard_size, policy=policy_factory(), on_remove=on_remove, max_bytes=shard_bytes)
+            for _ in range(num_shards)
+        ]
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+
+    @property
+    def num_shards(self):
+        return len(self._shards)
+
+    @property
+    def policy_name(self):
+        """淘汰策略名称"""
+        return self._shards[0].policy.name
+
+    @property
+    def eviction_count(self):
+        return sum(shard.eviction_count for shard in self._shards)
+
+    @property
+    def expired_count(self):
+        return sum(shard.expired_count for shard in self._shards)
+
+    @property
+    def rejected_count(self):
+        return sum(shard.rejected_count for shard in self._shards)
+
+    @property
+    def total_bytes(self):
+        return sum(shard.total_bytes for shard in self._shards)
+
+    def _index(self, key):
+        return hash(key) % len(self._shards)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def __contains__(self, key):
+        index = self._index(key)
+        with self._locks[index]:
+            return key in self._shards[index]
+
+    def __iter__(self):
+        return iter([key for key, _ in self.items()])
+
+    def items(self):
+        """返回所有缓存项的快照（含尚未惰性清理的过期项）"""
+        items = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                items.extend(shard.items())
+        return items
+
+    def get(self, key, now=None):
+        """获取缓存项，语义同CacheStore.get"""
+        index = self._index(key)
+        with self._locks[index]:
+            return self._shards[index].get(key, now)
+
+    def set(self, key, entry, now=None):
+        """写入缓存项，语义同CacheStore.set"""
+        index = self._index(key)
+        with self._locks[index]:
+            return self._shards[index].set(key, entry, now)
+
+    def delete(self, key):
+        """删除缓存项，语义同CacheStore.delete"""
+        index = self._index(key)
+        with self._locks[index]:
+            return self._shards[index].delete(key)
+
+    def pop_expired(self, now=None, limit=None):
+        """逐个分片清理已过期的缓存项
+
+        Returns:
+            清理的缓存项数量
+        """
+        removed = 0
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                removed += shard.pop_expired(now, limit)
+        return removed
+
+    def clear(self):
+        """清空所有分片"""
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                shard.clear()
+
+    def get_namespace_usage(self):
+        """汇总各分片的命名空间占用
+
+        Returns:
+            {命名空间: {'entries': 缓存项数量, 'bytes': 字节数}}
+        """
+        usage = {}
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                for namespace, (count, size) in shard.namespace_usage.items():
+                    total = usage.setdefault(namespace, {'entries': 0, 'bytes': 0})
+                    total['entries'] += count
+                    total['bytes'] += size
+        return usage
+
+    def get_shard_sizes(self):
+        """各分片当前的缓存项数量"""
+        return [len(shard) for shard in self._shards]
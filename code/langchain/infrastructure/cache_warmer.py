@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .llm_scheduler import llm_priority, PRIORITY_BACKGROUND
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - CacheWarmer - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 默认的对话历史文件（HistoryManager的存储文件）
+DEFAULT_HISTORY_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'data_files', 'chat_history.json')
+
+
+def mine_popular_queries(history_file=DEFAULT_HISTORY_FILE, top_n=20):
+    """从对话历史中统计出现最多的用户消息
+
+    Args:
+        history_file: 对话历史文件路径，格式同HistoryManager的存储文件
+        top_n: 返回的查询数量
+
+    Returns:
+        (查询文本, 出现次数) 列表，按出现次数降序，次数相同时最近出现的在前
+    """
+    try:
+        with open(history_file, 'r', encoding='utf-8') as f:
+            sessions = json.load(f)
+    except FileNotFoundError:
+        logger.info(f"对话历史文件不存在，跳过预热查询统计: {history_file}")
+        return []
+    except Exception as e:
+        logger.error(f"读取对话历史失败: {e}")
+        return []
+
+    counts = Counter()
+    last_seen = {}
+    for session in sessions.values():
+        for message in session.get('messages', []):
+            content = message.get('content')
+            if message.get('role') != 'user' or not isinstance(content, str) or not content.strip():
+                continue
+            query = content.strip()
+            counts[query] += 1
+            last_seen[query] = max(last_seen.get(query, 0), message.get('timestamp', 0))
+
+    ranked = sorted(counts.items(), key=lambda item: (item[1], last_seen[item[0]]), reverse=True)
+    return ranked[:top_n]
+
+
+class CacheWarmer:
+    """启动时缓存预热
+
+    从真实对话历史中挑出最常见的用户消息，在后台线程中依次执行：
+    - 规则阶段：规则意图识别和政策/岗位检索，只预热检索路径（模块导入、匹配器初始化），不调用LLM，
+      也不写入查询缓存
+    - LLM阶段（可选）：以后台优先级完整处理查询，写入首个真实请求读取的意图、LLM响应和查询结果缓存；
+      并发数受限，避免挤占线上请求
+
+    整个预热有时间上限，超时后不再提交新任务，服务启动不等待预热完成。
+    """
+
+    def __init__(self, rule_fn, llm_fn=None, history_file=None, top_n=20,
+                 time_budget=30, use_llm=False, llm_concurrency=2):
+        """初始化缓存预热
+
+        Args:
+            rule_fn: 规则阶段的处理函数，参数为查询文本
+            llm_fn: LLM阶段的处理函数，参数为查询文本
+            history_file: 对话历史文件路径，默认使用HistoryManager的存储文件
+            top_n: 预热的查询数量
+            time_budget: 预热总时长上限（秒）
+            use_llm: 是否执行LLM阶段
+            llm_concurrency: LLM阶段的最大并发数
+        """
+        self.rule_fn = rule_fn
+        self.llm_fn = llm_fn
+        self.history_file = history_file or DEFAULT_HISTORY_FILE
+        self.top_n = top_n
+        self.time_budget = time_budget
+        self.use_llm = use_llm and llm_fn is not None
+        self.llm_concurrency = max(1, llm_concurrency)
+        self._thread = None
+        self.stats = {
+            'status': 'idle',
+            'queries': 0,
+            'rule_warmed': 0,
+            'llm_warmed': 0,
+            'error_count': 0,
+            'timed_out': False,
+            'elapsed': 0
+        }
+
+    def start(self):
+        """在后台线程中执行预热
+
+        Returns:
+            预热线程
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=self.warm_up, name='cache-warmer', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def join(self, timeout=None):
+        """等待后台预热结束"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def warm_up(self):
+        """执行预热
+
+        Returns:
+            预热统计信息
+        """
+        start_time = time.time()
+        deadline = start_time + self.time_budget
+        self.stats['status'] = 'running'
+        queries = [query for query, _ in mine_popular_queries(self.history_file, self.top_n)]
+        self.stats['queries'] = len(queries)
+        logger.info(f"开始缓存预热: {len(queries)}个热门查询, 时间上限{self.time_budget}秒")
+
+        for query in queries:
+            if time.time() >= deadline:
+                self.stats['timed_out'] = True
+                break
+            try:
+                self.rule_fn(query)
+                self.stats['rule_warmed'] += 1
+            except Exception as e:
+                self.stats['error_count'] += 1
+                logger.error(f"规则预热失败: {query[:30]}..., 错误: {e}")
+
+        if self.use_llm and not self.stats['timed_out']:
+            self._warm_up_llm(queries, deadline)
+
+        self.stats['elapsed'] = time.time() - start_time
+        self.stats['status'] = 'completed'
+        logger.info(
+            f"缓存预热完成: 规则阶段{self.stats['rule_warmed']}个, LLM阶段{self.stats['llm_warmed']}个, "
+            f"失败{self.stats['error_count']}个, 耗时{self.stats['elapsed']:.2f}秒"
+            + ("（已超时）" if self.stats['timed_out'] else "")
+        )
+        return self.stats
+
+    def _warm_up_llm(self, queries, deadline):
+        """在并发上限内执行LLM阶段，超时后不再提交新任务"""
+        executor = ThreadPoolExecutor(max_workers=self.llm_concurrency, thread_name_prefix='cache-warmer-llm')
+        pending = set()
+        remaining = list(queries)
+        try:
+            while remaining or pending:
+                # 只在并发上限内提交，超时后的查询不再提交
+                while remaining and len(pending) < self.llm_concurrency and time.time() < deadline:
+                    pending.add(executor.submit(self._warm_llm_query, remaining.pop(0)))
+                if not pending:
+                    break
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    break
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        future.result()
+                        self.stats['llm_warmed'] += 1
+                    except Exception as e:
+                        self.stats['error_count'] += 1
+                        logger.error(f"LLM预热失败: {e}")
+            if remaining or pending:
+                self.stats['timed_out'] = True
+        finally:
+            # 已在执行的LLM调用继续完成并写入缓存，不阻塞预热线程
+            executor.shutdown(wait=False)
+
+    def _warm_llm_query(self, query):
+        """以后台优先级执行一个查询的LLM阶段，不与交互请求争抢LLM服务的限速额度"""
+        with llm_priority(PRIORITY_BACKGROUND):
+            return self.llm_fn(query)
@@ -2,8 +2,10 @@ from langchain_openai import ChatOpenAI
 from langchain_core.chat_history import InMemoryChatMessageHistory
 from langchain_core.messages import HumanMessage, AIMessage
 import time
+import asyncio
 import logging
-import json
+import httpx
+import itertools
 from functools import lru_cache
 
 # 配置日志
@@ -19,195 +21,481 @@ import os
 
 # 导入缓存管理器
 from .cache_manager import CacheManager
+from .http_pool import HTTPClientPool
+from .micro_batcher import LLMMicroBatcher
+from .session_memory import SessionMemoryStore
+from .prompt_budget import token_estimator, prompt_budget
+from .mock_llm_server import MockResponder, MockLLMServer
+from .hedging import LLMHedger
+from .llm_scheduler import LLMScheduler, LLMOverloadedError
+from .model_router import ModelRouter
 
 # 加载环境变量
 load_dotenv()
 
-# 模拟模式配置
-USE_MOCK = False  # 设置为True使用模拟数据，False使用真实LLM
+# 模拟模式，由环境变量 LLM_MOCK 切换，无需修改代码：
+# - inprocess（或1、true）：在进程内直接返回模拟数据，不经过HTTP
+# - server：在后台线程启动本地OpenAI兼容的模拟服务（延迟和故障按 llm.mock_server 配置），
+#   经真实的HTTP客户端调用，用于离线压测
+LLM_MOCK = os.getenv("LLM_MOCK", "").strip().lower()
+USE_MOCK = LLM_MOCK in ("1", "true", "inprocess")
 
-# 加载模拟响应数据
-mock_responses = {}
-try:
-    mock_file_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'data_files', 'mock_responses.json')
-    with open(mock_file_path, 'r', encoding='utf-8') as f:
-        mock_data = json.load(f)
-        mock_responses = mock_data.get('mock_responses', {})
-    logger.info(f"加载模拟响应数据成功，共 {len(mock_responses)} 条")
-except Exception as e:
-    logger.error(f"加载模拟响应数据失败: {e}")
+# 单次LLM调用的输入token上限
+MAX_INPUT_TOKENS = prompt_budget("max_input_tokens", 4000)
+
+# 模拟回答，进程内模拟和模拟服务共用
+mock_responder = MockResponder()
+mock_server = MockLLMServer.from_config(responder=mock_responder).start() if LLM_MOCK == "server" else None
 
 # 初始化模型和记忆
 # 使用OpenAI兼容API配置Doubao-Seed-1.6模型
 # 优化模型参数，减少响应时间
-llm = ChatOpenAI(
-    temperature=0.5,  # 降低温度，减少模型思考时间
-    openai_api_key=os.getenv("OPENAI_API_KEY"),
-    # 火山引擎Doubao API端点
-    openai_api_base=os.getenv("OPENAI_API_BASE", "https://ark.cn-beijing.volces.com/api/v3"),
-    model=os.getenv("LLM_MODEL", "deepseek-v3-2-251201"),  # DeepSeek V3模型ID
-    timeout=int(os.getenv("LLM_TIMEOUT", "1800")),  # 深度思考模型耗费时间会较长，推荐30分钟以上
-    max_tokens=int(os.getenv("LLM_MAX_TOKENS", "8192"))
-)
+# 同步和异步调用共用按 llm.http_pool 配置的长连接池，避免频繁建立连接和TLS握手
+http_pool = HTTPClientPool.from_config(timeout=int(os.getenv("LLM_TIMEOUT", "1800")))
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") or ("mock" if mock_server else None)
+# 火山引擎Doubao API端点，模拟服务模式下指向本地模拟服务
+OPENAI_API_BASE = mock_server.base_url if mock_server else os.getenv("OPENAI_API_BASE", "https://ark.cn-beijing.volces.com/api/v3")
+
+
+def _create_llm(model=None, max_tokens=None, temperature=None, api_base=None, api_key_env=None, read_timeout=None):
+    """创建LLM实例，未指定的参数使用环境变量中的默认值
+    
+    Args:
+        model: 模型ID
+        max_tokens: 最大输出token数
+        temperature: 温度
+        api_base: API端点，模拟服务模式下忽略
+        api_key_env: 该端点的API密钥所在的环境变量
+        read_timeout: 读取超时（秒），即等待首字节和相邻片段的最长时间，默认与总超时相同
+        
+    Returns:
+        ChatOpenAI实例
+    """
+    timeout = int(os.getenv("LLM_TIMEOUT", "1800"))  # 深度思考模型耗费时间会较长，推荐30分钟以上
+    return ChatOpenAI(
+        temperature=0.5 if temperature is None else temperature,  # 降低温度，减少模型思考时间
+        openai_api_key=(os.getenv(api_key_env) if api_key_env and not mock_server else None) or OPENAI_API_KEY,
+        openai_api_base=api_base if api_base and not mock_server else OPENAI_API_BASE,
+        model=model or os.getenv("LLM_MODEL", "deepseek-v3-2-251201"),  # DeepSeek V3模型ID
+        timeout=httpx.Timeout(timeout, read=read_timeout) if read_timeout else timeout,
+        max_tokens=max_tokens or int(os.getenv("LLM_MAX_TOKENS", "8192")),
+        http_client=http_pool.client,
+        http_async_client=http_pool.async_client
+    )
+
+
+llm = _create_llm()
+
+# 按提示类型选择模型和生成参数，主路由变慢时切换到备用路由，按 llm.routing 配置
+model_router = ModelRouter.from_config(llm, _create_llm)
+
+# 按会话保存的对话记忆，所有ChatBot实例共享
+session_memory = SessionMemoryStore.from_config()
+
+# 幂等提示类型的对冲请求，按 llm.hedging 配置
+hedger = LLMHedger.from_config()
+
+# 对冲调用使用的LLM实例（路由名 -> 实例），读取超时有界：同步调用阻塞在读取上时无法取消，
+# 落败的调用最多占用对冲线程和连接 hedger.attempt_read_timeout 秒
+_hedge_llms = {}
+
+
+def _hedge_llm(route):
+    """获取路由对应的对冲用LLM实例，生成参数与路由相同，只是读取超时有界"""
+    hedge_llm = _hedge_llms.get(route.name)
+    if hedge_llm is None:
+        hedge_llm = _hedge_llms.setdefault(route.name, _create_llm(
+            model=route.model, max_tokens=route.max_tokens, temperature=route.temperature,
+            api_base=route.api_base, api_key_env=route.api_key_env, read_timeout=hedger.attempt_read_timeout))
+    return hedge_llm
+
+
+# 所有LLM调用共用的调度器（服务级限速、按优先级排队、过载拒绝），按 llm.scheduler 配置
+llm_scheduler = LLMScheduler.from_config()
 
 class ChatBot:
     def __init__(self):
-        self.memory = InMemoryChatMessageHistory()
         self.cache_manager = CacheManager()
     
-    def chat_with_memory(self, user_input):
+    def chat_with_memory(self, user_input, prompt_type="general", semantic_text=None, session_id=None):
+        """生成回复
+        
+        Args:
+            user_input: 发送给LLM的完整提示
+            prompt_type: 提示类型，用于选择语义缓存的相似度阈值
+            semantic_text: 提示中的用户输入部分，提供时精确缓存未命中后按其相似度查找语义缓存
+            session_id: 会话ID，提供时把本轮对话记入该会话的记忆
+            
+        Returns:
+            包含content和time的字典，命中缓存时包含from_cache
+        """
         start_time = time.time()
         logger.info(f"开始生成回复: {user_input[:50]}...")
         
         try:
-            # 对于长输入，进行截断处理
-            if len(user_input) > 2000:
-                user_input = user_input[:2000] + "..."
-                logger.info("输入过长，已截断")
+            user_input = self._truncate(user_input)
             
-            # 检查缓存中是否有对应的响应
-            cached_response = self.cache_manager.get_llm_cache(user_input)
-            if cached_response:
-                logger.info("使用缓存的LLM响应")
-                # 添加用户消息到记忆
-                self.memory.add_user_message(user_input)
-                # 添加AI回复到记忆
-                self.memory.add_ai_message(cached_response["content"])
-                
-                total_time = time.time() - start_time
-                logger.info(f"回复生成完成（使用缓存），总耗时: {total_time:.2f}秒")
-                
-                return {
-                    "content": cached_response["content"],
-                    "time": 0,
-                    "from_cache": True
-                }
-            
-            # 检查是否使用模拟模式
+            # 查询缓存：新鲜时直接返回；过期不久时先返回旧响应并在后台刷新；
+            # 未命中时调用LLM，相同输入的并发请求只调用一次，其余请求等待并共享结果
+            cache_key = self.cache_manager.generate_cache_key('llm', user_input)
             if USE_MOCK:
-                logger.info("使用模拟数据生成响应")
-                
-                # 根据输入类型返回不同格式的模拟数据
-                if "请分析用户输入，识别核心意图和实体" in user_input:
-                    # 意图分析器的模拟响应
-                    mock_content = self._get_intent_analyzer_mock_response(user_input)
-                else:
-                    # 响应生成器的模拟响应
-                    mock_content = self._get_response_generator_mock_response(user_input)
-                
-                # 添加用户消息到记忆
-                self.memory.add_user_message(user_input)
-                # 添加AI回复到记忆
-                self.memory.add_ai_message(mock_content)
-                
-                # 缓存模拟响应
-                self.cache_manager.set_llm_cache(user_input, {
-                    "content": mock_content,
-                    "time": 0
-                })
-                
-                total_time = time.time() - start_time
-                logger.info(f"模拟响应生成完成，总耗时: {total_time:.2f}秒")
-                
-                return {
-                    "content": mock_content,
-                    "time": 0,
-                    "from_mock": True
-                }
-            
-            # 添加用户消息到记忆
-            self.memory.add_user_message(user_input)
-            
-            # 限制历史消息数量，避免上下文过长
-            if len(self.memory.messages) > 10:
-                self.memory.messages = self.memory.messages[-10:]
-                logger.info("历史消息过多，已裁剪")
+                generate = lambda: self._generate_mock_response(user_input)
+            elif micro_batcher.handles(prompt_type):
+                # 与其他请求的同类小型任务合并为一次LLM调用
+                generate = lambda: micro_batcher.submit(prompt_type, user_input, semantic_text)
+            else:
+                generate = lambda: self._invoke_llm(user_input, prompt_type)
             
-            # 生成AI回复
-            llm_start = time.time()
-            # 优化：只发送最新的消息，减少上下文长度
-            simple_message = HumanMessage(content=self.memory.messages[-1].content)
-            response = llm.invoke([simple_message])
-            llm_time = time.time() - llm_start
-            logger.info(f"LLM调用完成，耗时: {llm_time:.2f}秒")
+            def loader():
+                # 精确缓存未命中时先查找用户输入相似的已缓存提示
+                cached = self._semantic_lookup(user_input, prompt_type, semantic_text)
+                return cached if cached is not None else generate()
             
-            # 添加AI回复到记忆
-            self.memory.add_ai_message(response.content)
+            result, source = self.cache_manager.get_or_refresh(cache_key, loader)
+            return self._finish_reply(user_input, result, source, prompt_type, semantic_text, session_id, start_time)
+        except Exception as e:
+            return self._error_reply(e, start_time)
+    
+    async def achat_with_memory(self, user_input, prompt_type="general", semantic_text=None, session_id=None):
+        """chat_with_memory的异步版本，等待LLM响应期间不阻塞事件循环
+        
+        Args:
+            user_input: 发送给LLM的完整提示
+            prompt_type: 提示类型，用于选择语义缓存的相似度阈值
+            semantic_text: 提示中的用户输入部分
+            session_id: 会话ID
             
-            # 缓存LLM响应
-            self.cache_manager.set_llm_cache(user_input, {
-                "content": response.content,
-                "time": llm_time
-            })
+        Returns:
+            与chat_with_memory相同
+        """
+        start_time = time.time()
+        logger.info(f"开始生成回复（异步）: {user_input[:50]}...")
+        
+        try:
+            user_input = self._truncate(user_input)
+            cache_key = self.cache_manager.generate_cache_key('llm', user_input)
             
-            total_time = time.time() - start_time
-            logger.info(f"回复生成完成，总耗时: {total_time:.2f}秒")
+            async def aloader():
+                cached = self._semantic_lookup(user_input, prompt_type, semantic_text)
+                if cached is not None:
+                    return cached
+                if USE_MOCK:
+                    return self._generate_mock_response(user_input)
+                if micro_batcher.handles(prompt_type):
+                    return await micro_batcher.asubmit(prompt_type, user_input, semantic_text)
+                return await self._ainvoke_llm(user_input, prompt_type)
             
-            return {
-                "content": response.content,
-                "time": llm_time
-            }
+            result, source = await self.cache_manager.aget_or_refresh(cache_key, aloader)
+            return self._finish_reply(user_input, result, source, prompt_type, semantic_text, session_id, start_time)
         except Exception as e:
-            total_time = time.time() - start_time
-            logger.error(f"发生错误，耗时: {total_time:.2f}秒, 错误: {type(e).__name__}: {str(e)}")
-            # 返回错误信息作为字典，确保上层调用不会因为类型错误而失败
+            return self._error_reply(e, start_time)
+    
+    @staticmethod
+    def _truncate(user_input):
+        """对于超出token上限的输入，按token截断
+        
+        按PromptBuilder构建的提示已在各自的预算内，这里只防止异常长的输入
+        """
+        if token_estimator.count(user_input) > MAX_INPUT_TOKENS:
+            logger.info("输入过长，已截断")
+            return token_estimator.truncate(user_input, MAX_INPUT_TOKENS) + "..."
+        return user_input
+    
+    def _semantic_lookup(self, user_input, prompt_type, semantic_text):
+        """精确缓存未命中时查找用户输入相似的已缓存响应，未找到时返回None"""
+        if not semantic_text:
+            return None
+        cached = self.cache_manager.get_semantic_llm_cache(prompt_type, user_input, semantic_text)
+        if isinstance(cached, dict) and "content" in cached:
+            return dict(cached, semantic=True)
+        return None
+    
+    def _finish_reply(self, user_input, result, source, prompt_type, semantic_text, session_id, start_time):
+        """记录语义缓存和对话记忆，按结果来源构建回复"""
+        if source == 'loaded' and semantic_text:
+            if result.get("semantic"):
+                source = 'semantic'
+            else:
+                self.cache_manager.set_semantic_llm_cache(prompt_type, user_input, semantic_text)
+        
+        # 添加用户消息和AI回复到会话记忆，消息数量和总大小由会话记忆存储限制
+        if session_id:
+            session_memory.add_messages(session_id, [("user", user_input), ("ai", result["content"])])
+        
+        total_time = time.time() - start_time
+        if source in ('fresh', 'stale', 'coalesced', 'semantic'):
+            logger.info(f"回复生成完成（使用缓存: {source}），总耗时: {total_time:.2f}秒")
+            response = {
+                "content": result["content"],
+                "time": 0,
+                "from_cache": True
+            }
+            if source == 'coalesced':
+                response["coalesced"] = True
+            elif source == 'semantic':
+                response["semantic_hit"] = True
+            return response
+        
+        if USE_MOCK:
+            logger.info(f"模拟响应生成完成，总耗时: {total_time:.2f}秒")
             return {
-                "content": "抱歉，我暂时无法回答你的问题，请稍后再试。",
+                "content": result["content"],
                 "time": 0,
-                "error": str(e)
+                "from_mock": True
             }
+        
+        logger.info(f"回复生成完成，总耗时: {total_time:.2f}秒")
+        return result
+    
+    @staticmethod
+    def _error_reply(error, start_time):
+        """生成失败时的回复，调度器因过载拒绝时标记overloaded"""
+        total_time = time.time() - start_time
+        logger.error(f"发生错误，耗时: {total_time:.2f}秒, 错误: {type(error).__name__}: {str(error)}")
+        # 返回错误信息作为字典，确保上层调用不会因为类型错误而失败
+        reply = {
+            "content": "抱歉，我暂时无法回答你的问题，请稍后再试。",
+            "time": 0,
+            "error": str(error)
+        }
+        if isinstance(error, LLMOverloadedError):
+            reply["overloaded"] = True
+        return reply
+    
+    @staticmethod
+    def raise_for_error(response):
+        """回复是生成失败的回复时抛出异常，避免调用方把它当作LLM的回答解析和缓存
+        
+        Args:
+            response: chat_with_memory返回的回复
             
-            # 添加用户消息到记忆
-            self.memory.add_user_message(user_input)
-            
-            # 限制历史消息数量，避免上下文过长
-            if len(self.memory.messages) > 10:
-                self.memory.messages = self.memory.messages[-10:]
-                logger.info("历史消息过多，已裁剪")
-            
-            # 生成AI回复
-            llm_start = time.time()
-            # 优化：只发送最新的消息，减少上下文长度
-            simple_message = HumanMessage(content=self.memory.messages[-1].content)
-            response = llm.invoke([simple_message])
-            llm_time = time.time() - llm_start
-            logger.info(f"LLM调用完成，耗时: {llm_time:.2f}秒")
+        Raises:
+            LLMOverloadedError: 调度器因过载拒绝了LLM调用
+            RuntimeError: 其他LLM调用失败
+        """
+        if isinstance(response, dict) and response.get("error"):
+            if response.get("overloaded"):
+                raise LLMOverloadedError(response["error"])
+            raise RuntimeError(response["error"])
+    
+    @staticmethod
+    def _invoke_llm(user_input, prompt_type="general", batch_size=1):
+        """调用LLM生成回复
+        
+        先经调度器排队（优先级取当前上下文），按提示类型的路由选择模型；启用对冲的提示类型
+        以流式方式请求，首字节超过对冲延迟时发出备份请求，每次尝试各占一个调度名额
+        
+        Args:
+            user_input: 用户输入
+            prompt_type: 提示类型
+            batch_size: 输入中合并的提示数（微批），大于1时按提示数放大路由的max_tokens
             
-            # 添加AI回复到记忆
-            self.memory.add_ai_message(response.content)
+        Returns:
+            包含content、time和本次使用的路由（route、model）的字典
+        """
+        llm_start = time.time()
+        tokens = llm_scheduler.estimate_tokens(user_input)
+        # 在调用线程中获得调度名额，对冲时作为主请求的名额，排队时间不计入首字节延迟
+        llm_scheduler.acquire(tokens)
+        owns_slot = True
+        try:
+            route = model_router.route(prompt_type)
+            call_kwargs = ChatBot._call_kwargs(route, batch_size)
+            call_start = time.time()
+            try:
+                if hedger.handles(prompt_type):
+                    attempt = ChatBot._scheduled_attempts(tokens, lambda on_first_byte, cancelled: ChatBot._stream_content(
+                        _hedge_llm(route), user_input, on_first_byte, cancelled, **call_kwargs))
+                    # 名额交给对冲的各次尝试，由尝试结束时释放（落败的尝试可能在返回之后才结束）
+                    owns_slot = False
+                    content = hedger.call(prompt_type, attempt)
+                else:
+                    # 优化：只发送最新的消息，减少上下文长度
+                    content = route.llm.invoke([HumanMessage(content=user_input)], **call_kwargs).content
+            except Exception:
+                model_router.record(route, time.time() - call_start, ok=False)
+                raise
+            model_router.record(route, time.time() - call_start)
+        finally:
+            if owns_slot:
+                llm_scheduler.release()
+        llm_time = time.time() - llm_start
+        logger.info(f"LLM调用完成（路由: {route.name}），耗时: {llm_time:.2f}秒")
+        
+        return ChatBot._llm_reply(content, llm_time, route)
+    
+    @staticmethod
+    async def _ainvoke_llm(user_input, prompt_type="general", batch_size=1):
+        """异步调用LLM生成回复，返回值同_invoke_llm"""
+        llm_start = time.time()
+        tokens = llm_scheduler.estimate_tokens(user_input)
+        await llm_scheduler.aacquire(tokens)
+        owns_slot = True
+        try:
+            route = model_router.route(prompt_type)
+            call_kwargs = ChatBot._call_kwargs(route, batch_size)
+            call_start = time.time()
+            try:
+                if hedger.handles(prompt_type):
+                    attempt = ChatBot._ascheduled_attempts(tokens, lambda on_first_byte: ChatBot._astream_content(
+                        _hedge_llm(route), user_input, on_first_byte, **call_kwargs))
+                    owns_slot = False
+                    content = await hedger.acall(prompt_type, attempt)
+                else:
+                    content = (await route.llm.ainvoke([HumanMessage(content=user_input)], **call_kwargs)).content
+            except Exception:
+                model_router.record(route, time.time() - call_start, ok=False)
+                raise
+            model_router.record(route, time.time() - call_start)
+        finally:
+            if owns_slot:
+                llm_scheduler.release()
+        llm_time = time.time() - llm_start
+        logger.info(f"LLM异步调用完成（路由: {route.name}），耗时: {llm_time:.2f}秒")
+        
+        return ChatBot._llm_reply(content, llm_time, route)
+    
+    @staticmethod
+    def _scheduled_attempts(tokens, attempt):
+        """让对冲调用的每次尝试各占一个调度名额，尝试结束时释放
+        
+        第一次尝试（主请求）使用调用方已获得的名额；备份请求只使用空闲的名额，无法立即获得调度时
+        放弃该次尝试，由主请求完成。落败的同步尝试在读取超时前一直占用名额，调度器的并发上限因此
+        也限制了对冲线程池中的尝试数。
+        
+        Args:
+            tokens: 每次尝试预计消耗的token数
+            attempt: 对冲调用函数，参数为 (on_first_byte, cancelled)
             
-            # 缓存LLM响应
-            self.cache_manager.set_llm_cache(user_input, {
-                "content": response.content,
-                "time": llm_time
-            })
+        Returns:
+            包装后的调用函数
+        """
+        attempts = itertools.count()
+        
+        def scheduled(on_first_byte, cancelled):
+            if next(attempts):
+                llm_scheduler.acquire(tokens, deadline=0)
+            try:
+                return attempt(on_first_byte, cancelled)
+            finally:
+                llm_scheduler.release()
+        return scheduled
+    
+    @staticmethod
+    def _ascheduled_attempts(tokens, attempt):
+        """_scheduled_attempts的异步版本，任务被取消时同样释放名额"""
+        attempts = itertools.count()
+        
+        async def scheduled(on_first_byte):
+            if next(attempts):
+                await llm_scheduler.aacquire(tokens, deadline=0)
+            try:
+                return await attempt(on_first_byte)
+            finally:
+                llm_scheduler.release()
+        return scheduled
+    
+    @staticmethod
+    def _call_kwargs(route, batch_size):
+        """单次调用覆盖的生成参数：合并了多个提示的微批调用按提示数放大max_tokens，不超过LLM_MAX_TOKENS"""
+        max_tokens = route.max_tokens_for(batch_size)
+        if max_tokens is None:
+            return {}
+        return {"max_tokens": min(max_tokens, int(os.getenv("LLM_MAX_TOKENS", "8192")))}
+    
+    @staticmethod
+    def _llm_reply(content, llm_time, route):
+        """构建LLM调用的回复，记录路由的级别和模型，用于按路由统计质量降级"""
+        return {
+            "content": content,
+            "time": llm_time,
+            "route": route.tier,
+            "model": route.model
+        }
+    
+    @staticmethod
+    def _stream_content(route_llm, user_input, on_first_byte, cancelled, **call_kwargs):
+        """流式请求LLM并拼接回复内容，用于对冲请求
+        
+        Args:
+            route_llm: 路由对应的对冲用LLM实例（读取超时有界）
+            user_input: 用户输入
+            on_first_byte: 收到第一个片段时调用
+            cancelled: 被取消时停止读取并关闭响应
+            call_kwargs: 本次调用覆盖的生成参数
             
-            total_time = time.time() - start_time
-            logger.info(f"回复生成完成，总耗时: {total_time:.2f}秒")
+        Returns:
+            回复内容，被取消时为None
+        """
+        parts = []
+        stream = route_llm.stream([HumanMessage(content=user_input)], **call_kwargs)
+        try:
+            for chunk in stream:
+                if cancelled.is_set():
+                    return None
+                on_first_byte()
+                if chunk.content:
+                    parts.append(chunk.content)
+        finally:
+            stream.close()
+        return "".join(parts)
+    
+    @staticmethod
+    async def _astream_content(route_llm, user_input, on_first_byte, **call_kwargs):
+        """_stream_content的异步版本，任务被取消时关闭响应"""
+        parts = []
+        stream = route_llm.astream([HumanMessage(content=user_input)], **call_kwargs)
+        try:
+            async for chunk in stream:
+                on_first_byte()
+                if chunk.content:
+                    parts.append(chunk.content)
+        finally:
+            await stream.aclose()
+        return "".join(parts)
+    
+    def _generate_mock_response(self, user_input):
+        """使用模拟数据生成回复
+        
+        Args:
+            user_input: 用户输入
             
-            return {
-                "content": response.content,
-                "time": llm_time
-            }
-        except Exception as e:
-            total_time = time.time() - start_time
-            logger.error(f"发生错误，耗时: {total_time:.2f}秒, 错误: {type(e).__name__}: {str(e)}")
-            # 返回错误信息作为字典，确保上层调用不会因为类型错误而失败
-            return {
-                "content": "抱歉，我暂时无法回答你的问题，请稍后再试。",
-                "time": 0,
-                "error": str(e)
-            }
+        Returns:
+            包含content和time的字典
+        """
+        logger.info("使用模拟数据生成响应")
+        # 根据输入类型返回不同格式的模拟数据
+        if "请分析用户输入，识别核心意图和实体" in user_input:
+            # 意图分析器的模拟响应
+            mock_content = self._get_intent_analyzer_mock_response(user_input)
+        else:
+            # 响应生成器的模拟响应
+            mock_content = self._get_response_generator_mock_response(user_input)
+        
+        return {
+            "content": mock_content,
+            "time": 0
+        }
     
     def get_model_status(self):
-        """检查模型状态"""
+        """检查模型状态
+        
+        只请求模型列表接口确认服务可达且密钥有效，不发送提示、不占用限速额度，同时返回调度器的排队情况
+        """
         try:
-            # 发送一个简单的测试请求
-            test_message = HumanMessage(content="你好")
-            response = llm.invoke([test_message])
+            response = http_pool.client.get(
+                f"{OPENAI_API_BASE.rstrip('/')}/models",
+                headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+                timeout=5
+            )
+            # 404表示服务可达但未提供模型列表接口
+            healthy = response.status_code < 400 or response.status_code == 404
+            scheduler_stats = llm_scheduler.get_stats()
             return {
-                "status": "healthy",
-                "response": response.content[:50]
+                "status": "healthy" if healthy else "unhealthy",
+                "status_code": response.status_code,
+                "in_flight": scheduler_stats["in_flight"],
+                "queued": {name: item["queued"] for name, item in scheduler_stats["by_priority"].items()}
             }
         except Exception as e:
             logger.error(f"模型状态检查失败: {e}")
@@ -216,146 +504,105 @@ class ChatBot:
                 "error": str(e)
             }
     
-    def chat_stream(self, user_input):
-        """流式生成回复"""
+    def chat_stream(self, user_input, include_reasoning=True, prompt_type="general"):
+        """流式生成回复
+        
+        Args:
+            user_input: 提示
+            include_reasoning: 是否输出深度思考内容，增量解析结构化回答时只需要常规回复内容
+            prompt_type: 提示类型，用于选择路由；流式输出的耗时取决于读取速度，不计入路由的耗时统计
+        """
         try:
-            # 对于长输入，进行截断处理
-            if len(user_input) > 2000:
-                user_input = user_input[:2000] + "..."
+            user_input = self._truncate(user_input)
             
             # 检查是否使用模拟模式
             if USE_MOCK:
                 logger.info("使用模拟数据生成流式响应")
-                # 查找匹配的模拟响应
-                matched_response = None
-                for key, response in mock_responses.items():
-                    if key in user_input:
-                        matched_response = response
-                        break
-                
-                if matched_response:
-                    # 模拟流式输出
-                    content = json.dumps(matched_response, ensure_ascii=False)
-                else:
-                    # 默认模拟响应
-                    content = json.dumps({
-                        "positive": "",
-                        "negative": "",
-                        "suggestions": "建议：请提供更多个人信息，以便为您提供更精准的政策咨询和个性化建议。"
-                    }, ensure_ascii=False)
-                
+                content = self._get_response_generator_mock_response(user_input)
                 # 模拟流式输出，逐字符或逐词发送
                 for i in range(0, len(content), 50):
                     yield content[i:i+50]
                     time.sleep(0.05)  # 模拟流式延迟
             else:
                 simple_message = HumanMessage(content=user_input)
-                for chunk in llm.stream([simple_message]):
-                    # 优先提取 DeepSeek 的深度思考内容
-                    reasoning = chunk.additional_kwargs.get("reasoning_content", "")
-                    if reasoning:
-                        yield reasoning
-                    
-                    # 再提取常规回复内容
-                    if chunk.content:
-                        yield chunk.content
+                with llm_scheduler.slot(llm_scheduler.estimate_tokens(user_input)):
+                    for chunk in model_router.route(prompt_type).llm.stream([simple_message]):
+                        yield from self._chunk_texts(chunk, include_reasoning)
+        except Exception as e:
+            logger.error(f"流式生成错误: {e}")
+            yield f"错误: {str(e)}"
+    
+    async def achat_stream(self, user_input, include_reasoning=True, prompt_type="general"):
+        """chat_stream的异步版本（异步生成器），等待下一段输出时不阻塞事件循环"""
+        try:
+            user_input = self._truncate(user_input)
+            
+            if USE_MOCK:
+                logger.info("使用模拟数据生成流式响应")
+                content = self._get_response_generator_mock_response(user_input)
+                for i in range(0, len(content), 50):
+                    yield content[i:i+50]
+                    await asyncio.sleep(0.05)
+            else:
+                simple_message = HumanMessage(content=user_input)
+                async with llm_scheduler.aslot(llm_scheduler.estimate_tokens(user_input)):
+                    async for chunk in model_router.route(prompt_type).llm.astream([simple_message]):
+                        for text in self._chunk_texts(chunk, include_reasoning):
+                            yield text
         except Exception as e:
             logger.error(f"流式生成错误: {e}")
             yield f"错误: {str(e)}"
     
+    @staticmethod
+    def _chunk_texts(chunk, include_reasoning=True):
+        """提取流式输出片段中的文本"""
+        # 优先提取 DeepSeek 的深度思考内容
+        reasoning = chunk.additional_kwargs.get("reasoning_content", "") if include_reasoning else ""
+        if reasoning:
+            yield reasoning
+        
+        # 再提取常规回复内容
+        if chunk.content:
+            yield chunk.content
+    
     def _get_intent_analyzer_mock_response(self, user_input):
         """获取意图分析器的模拟响应"""
-        # 提取实体
-        entities = []
-        
-        # 提取年龄
-        import re
-        age_match = re.search(r'(\d+)岁', user_input)
-        if age_match:
-            entities.append({"type": "年龄", "value": age_match.group(1)})
-        
-        # 提取性别
-        if "女性" in user_input:
-            entities.append({"type": "性别", "value": "女性"})
-        elif "男性" in user_input:
-            entities.append({"type": "性别", "value": "男性"})
-        
-        # 提取职业技能证书
-        if "中级电工证" in user_input:
-            entities.append({"type": "证书", "value": "中级电工证"})
-        elif "高级电工证" in user_input:
-            entities.append({"type": "证书", "value": "高级电工证"})
-        elif "电工证" in user_input:
-            entities.append({"type": "证书", "value": "电工证"})
-        
-        # 提取就业状态
-        if "失业" in user_input:
-            entities.append({"type": "就业状态", "value": "失业"})
-        elif "在职" in user_input:
-            entities.append({"type": "就业状态", "value": "在职"})
-        
-        # 提取关注点
-        if "补贴" in user_input:
-            entities.append({"type": "关注点", "value": "补贴申领"})
-        if "灵活时间" in user_input:
-            entities.append({"type": "关注点", "value": "灵活时间"})
-        
-        # 根据用户输入内容返回不同的意图识别结果
-        # 优先检查政策相关关键词
-        if "政策" in user_input or "补贴" in user_input or "创业" in user_input or "贷款" in user_input or "返乡" in user_input:
-            return json.dumps({
-                "intent": "政策咨询",
-                "needs_job_recommendation": False,
-                "needs_policy_recommendation": True,
-                "entities": entities
-            }, ensure_ascii=False)
-        # 然后检查求职相关关键词
-        elif "推荐工作" in user_input or "找工作" in user_input or "兼职工作" in user_input or "想找一份" in user_input:
-            return json.dumps({
-                "intent": "求职咨询",
-                "needs_job_recommendation": True,
-                "needs_policy_recommendation": True,  # 同时需要政策咨询（因为关注补贴）
-                "entities": entities
-            }, ensure_ascii=False)
-        else:
-            # 默认意图
-            return json.dumps({
-                "intent": "政策咨询",
-                "needs_job_recommendation": False,
-                "needs_policy_recommendation": False,
-                "entities": entities
-            }, ensure_ascii=False)
+        return mock_responder.intent_reply(user_input)
     
     def _get_response_generator_mock_response(self, user_input):
         """获取响应生成器的模拟响应"""
-        # 查找匹配的模拟响应
-        matched_response = None
-        for key, response in mock_responses.items():
-            if key in user_input:
-                matched_response = response
-                break
+        return mock_responder.answer_reply(user_input)
+    
+    @staticmethod
+    def get_memory(session_id):
+        """获取会话的对话记忆
         
-        if matched_response:
-            # 将模拟响应转换为JSON字符串
-            return json.dumps(matched_response, ensure_ascii=False)
-        else:
-            # 默认模拟响应
-            return json.dumps({
-                "positive": "",
-                "negative": "",
-                "suggestions": "建议：请提供更多个人信息，以便为您提供更精准的政策咨询和个性化建议。"
-            }, ensure_ascii=False)
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            包含该会话消息的InMemoryChatMessageHistory
+        """
+        memory = InMemoryChatMessageHistory()
+        for role, content in session_memory.get_messages(session_id):
+            memory.add_message(HumanMessage(content=content) if role == "user" else AIMessage(content=content))
+        return memory
     
-    def clear_memory(self):
-        """清空对话记忆"""
-        self.memory = InMemoryChatMessageHistory()
+    @staticmethod
+    def clear_memory(session_id=None):
+        """清空会话的对话记忆，session_id为None时清空所有会话"""
+        session_memory.clear(session_id)
+
+# 跨请求的LLM微批处理器，按 llm.micro_batch 配置合并意图识别、岗位推荐理由等小型任务
+micro_batcher = LLMMicroBatcher.from_config(ChatBot._invoke_llm, ChatBot._ainvoke_llm)
 
 # 测试代码
 if __name__ == "__main__":
     bot = ChatBot()
     print("开始测试对话...")
     print("用户: 你好，我叫小明")
-    print("AI:", bot.chat_with_memory("你好，我叫小明"))
+    print("AI:", bot.chat_with_memory("你好，我叫小明", session_id="demo"))
     print("用户: 我刚才说了我的名字吗？")
-    print("AI:", bot.chat_with_memory("我刚才说了我的名字吗？"))  # 模型会记住名字
+    print("AI:", bot.chat_with_memory("我刚才说了我的名字吗？", session_id="demo"))
+    print("会话记忆:", len(bot.get_memory("demo").messages), "条消息")
     print("测试完成！")
@@ -57,7 +57,144 @@ class ConfigManager:
             },
             'cache': {
                 'default_ttl': 3600,
-                'max_size': 1000
+                'max_size': 1000,
+                # 各缓存区域的配置，未配置的区域使用 cache_region.DEFAULT_REGION_CONFIG
+                'regions': {},
+                'disk': {
+                    'enabled': False,
+                    'path': os.path.join(os.path.dirname(__file__), '..', 'data', 'cache', 'cache.db'),
+                    'max_bytes': 64 * 1024 * 1024,
+                    # 多个工作进程共享同一个文件，内存缓存作为一级缓存并按事件日志同步
+                    'shared': False,
+                    'sync_interval_seconds': 0.5
+                },
+                # LLM响应语义缓存：mode为off/audit/on，audit只记录本可命中的请求
+                'semantic': {
+                    'mode': 'audit',
+                    'default_threshold': 0.85,
+                    'thresholds': {},
+                    'max_entries': 5000
+                },
+                # 启动时从对话历史中挑选热门查询在后台预热缓存：LLM阶段以后台优先级完整处理查询，
+                # 写入首个真实请求读取的意图、LLM响应和查询结果缓存；查询数、并发和总时长都有上限
+                'warmup': {
+                    'enabled': True,
+                    'top_n': 10,
+                    'time_budget_seconds': 60,
+                    'use_llm': True,
+                    'llm_concurrency': 1
+                }
+            },
+            'llm': {
+                # LLM服务的HTTP连接池，同步和异步调用共用
+                'http_pool': {
+                    'max_connections': 100,
+                    'max_keepalive_connections': 20,
+                    'keepalive_expiry': 30,
+                    'http2': False,
+                    'per_host_limit': 20,
+                    'connect_timeout': 10
+                },
+                # LLM批处理：单个批次的并发任务数和单个任务的超时时间（秒）
+                'batch': {
+                    'max_concurrency': 4,
+                    'task_timeout_seconds': 120
+                },
+                # 跨请求微批处理：在收集窗口内把同类小型提示合并为一次LLM调用
+                'micro_batch': {
+                    'enabled': True,
+                    'window_ms': 10,
+                    'max_batch_size': 8,
+                    'prompt_types': ['intent', 'job_analysis']
+                },
+                # 按会话保存的对话记忆：单个会话的消息数上限、空闲过期时间（秒）和所有会话的总字符数上限
+                'session_memory': {
+                    'max_messages': 10,
+                    'idle_ttl_seconds': 1800,
+                    'max_total_chars': 2000000
+                },
+                # 提示的token预算，超出时按段的优先级裁剪；max_input_tokens为单次LLM调用的输入上限
+                'prompt_budget': {
+                    'combined_generation': 1200,
+                    'job_analysis': 800,
+                    'max_input_tokens': 4000
+                },
+                # 本地OpenAI兼容模拟服务（LLM_MOCK=server时启动）：首token时间的对数正态分布参数、
+                # 输出速度（token/秒）、错误率和挂起率；port为0时随机分配端口
+                'mock_server': {
+                    'host': '127.0.0.1',
+                    'port': 0,
+                    'ttft_median_ms': 300,
+                    'ttft_sigma': 0.5,
+                    'tokens_per_second': 40,
+                    'error_rate': 0.0,
+                    'timeout_rate': 0.0,
+                    'timeout_seconds': 30,
+                    'chunk_chars': 4
+                },
+                # 对冲请求：幂等提示类型在对冲延迟（最近首字节延迟的百分位数，限制在上下限之间）内
+                # 没有收到首字节时发出备份请求；max_hedge_ratio限制最近请求中对冲请求的比例。
+                # 只对冲短小的提示，重复发送最大的合并生成提示代价太高；每次尝试各占一个调度名额，
+                # 线程池（max_workers）应大于 llm.scheduler.max_concurrency
+                'hedging': {
+                    'enabled': True,
+                    'prompt_types': ['intent', 'job_analysis'],
+                    'percentile': 95,
+                    'window_size': 200,
+                    'min_samples': 20,
+                    'initial_delay_seconds': 3.0,
+                    'min_delay_seconds': 0.5,
+                    'max_delay_seconds': 15.0,
+                    'max_hedge_ratio': 0.1,
+                    'max_workers': 64,
+                    # 对冲调用的读取超时：落败且阻塞在读取上的同步调用最多占用线程和连接这么长时间
+                    'attempt_read_timeout_seconds': 30.0
+                },
+                # LLM调度器：服务级令牌桶限制每分钟请求数和token数（0为不限制），按优先级排队
+                # （交互 > 批处理 > 后台）；预计排队时间超过该优先级的截止时间时直接拒绝
+                'scheduler': {
+                    'enabled': True,
+                    'requests_per_minute': 1000,
+                    'tokens_per_minute': 1000000,
+                    'max_concurrency': 32,
+                    'interactive_reserve': 8,
+                    'expected_output_tokens': 500,
+                    'deadline_seconds': {
+                        'interactive': 30,
+                        'batch': 120,
+                        'background': 60
+                    }
+                },
+                # 按提示类型路由：每个类型配置主路由和可选的备用路由（model为None时使用LLM_MODEL，
+                # 可选api_base和api_key_env指向其他端点）；主路由最近p95超过p95_budget_seconds时
+                # 切换到备用路由，cooldown_seconds后回到主路由试探；未配置的类型使用默认模型和参数。
+                # 只有配置了secondary的类型才会切换：默认只给intent配置备用路由（同一模型、更小的max_tokens，
+                # 限制异常冗长的输出），其他类型需要切换时按部署实际可用的模型/端点添加secondary
+                'routing': {
+                    'enabled': True,
+                    'window_size': 100,
+                    'min_samples': 20,
+                    'cooldown_seconds': 60,
+                    'routes': {
+                        'intent': {
+                            'primary': {'model': None, 'max_tokens': 1024, 'temperature': 0.1},
+                            'secondary': {'model': None, 'max_tokens': 512, 'temperature': 0.1},
+                            'p95_budget_seconds': 4.0
+                        },
+                        'job_analysis': {
+                            'primary': {'model': None, 'max_tokens': 2048, 'temperature': 0.3},
+                            'p95_budget_seconds': 8.0
+                        },
+                        'analysis': {
+                            'primary': {'model': None, 'max_tokens': 2048, 'temperature': 0.3},
+                            'p95_budget_seconds': 10.0
+                        },
+                        'combined_generation': {
+                            'primary': {'model': None, 'max_tokens': 3072, 'temperature': 0.5},
+                            'p95_budget_seconds': 20.0
+                        }
+                    }
+                }
             },
             'data': {
                 'policy_file': os.path.join(os.path.dirname(__file__), '..', 'data', 'data_files', 'policies.json'),
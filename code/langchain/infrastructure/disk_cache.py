@@ -0,0 +1,350 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - DiskCache - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """基于SQLite的磁盘二级缓存
+
+    - 缓存项以JSON序列化后写入单个SQLite文件，进程重启后仍然可用
+    - 保留与内存缓存一致的过期时间，读取时判断过期
+    - 超出容量预算时先删除过期项，再按最近访问时间淘汰，并增量回收文件空间
+    - 共享模式下多个工作进程使用同一个文件：写入、删除和清空同时记录到事件日志，
+      其他进程通过poll_events读取后同步各自的内存缓存
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, shared=False, event_retention=3600):
+        """初始化磁盘缓存
+
+        Args:
+            path: SQLite文件路径
+            max_bytes: 缓存值占用的字节预算
+            shared: 是否由多个进程共享，共享时记录事件日志
+            event_retention: 事件日志保留的秒数，进程超过该时长未读取事件时视为丢失事件
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.event_retention = event_retention
+        # 本进程写入的事件不需要再同步给自己
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # 压缩时淘汰到预算的该比例以下，避免每次写入都触发压缩
+        self.low_watermark = 0.9
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # 多进程共享时其他进程可能正持有写锁，等待而不是立即报错
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        # auto_vacuum必须在建表前设置，之后才能使用incremental_vacuum回收空间
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expiry REAL NOT NULL,
+                created REAL NOT NULL,
+                query_text TEXT,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expiry ON cache_entries (expiry)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache_entries (last_access)")
+        # 事件日志：kind为set、delete或clear，AUTOINCREMENT保证seq按提交顺序递增且不复用
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                key TEXT,
+                query_text TEXT,
+                expiry REAL,
+                origin TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_events_created ON cache_events (created)")
+        self._conn.commit()
+
+        self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        # 启动时内存缓存为空，只需同步之后的事件
+        self._last_event = self._max_event_seq()
+        self._last_prune = 0
+        self.hit_count = 0
+        self.miss_count = 0
+        self.write_count = 0
+        self.eviction_count = 0
+        self.compaction_count = 0
+
+    def get(self, key, now=None):
+        """获取缓存项
+
+        Args:
+            key: 缓存键
+            now: 当前时间戳，默认取time.time()
+
+        Returns:
+            缓存项字典（value、expiry、created、query_text、size），不存在或已过期则返回None
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expiry, created, query_text, size FROM cache_entries WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                self.miss_count += 1
+                return None
+
+            value, expiry, created, query_text, size = row
+            if now > expiry:
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self.total_bytes -= size
+                self.miss_count += 1
+                return None
+
+            self._conn.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hit_count += 1
+
+        return {
+            'value': json.loads(value),
+            'expiry': expiry,
+            'created': created,
+            'query_text': query_text,
+            'size': size
+        }
+
+    def set(self, key, entry, now=None, serialized=None):
+        """写入缓存项
+
+        Args:
+            key: 缓存键
+            entry: 缓存项字典，包含 value、expiry、created，可选 query_text
+            now: 当前时间戳，默认取time.time()
+            serialized: 调用方已序列化好的值，避免重复序列化
+
+        Returns:
+            是否写入成功，值无法JSON序列化时返回False
+        """
+        value = serialized
+        if value is None:
+            try:
+                value = json.dumps(entry['value'], ensure_ascii=False)
+            except (TypeError, ValueError) as e:
+                logger.debug(f"缓存值无法序列化，跳过磁盘缓存: {key}, {e}")
+                return False
+
+        now = time.time() if now is None else now
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries "
+                "(key, value, expiry, created, query_text, size, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, value, entry['expiry'], entry.get('created', now), entry.get('query_text'), size, now)
+            )
+            self._publish('set', now, key, entry.get('query_text'), entry['expiry'])
+            self._conn.commit()
+            self.total_bytes += size - (old[0] if old else 0)
+            self.write_count += 1
+            if self.shared and self.write_count % 64 == 0:
+                # 其他进程的写入不会计入本进程的计数，定期按文件内容校正
+                self.total_bytes = self._conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM cache_entries"
+                ).fetchone()[0]
+            over_budget = self.total_bytes > self.max_bytes
+
+        if over_budget:
+            self.compact(now)
+        return True
+
+    def delete(self, key):
+        """删除缓存项
+
+        Args:
+            key: 缓存键
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            # 共享模式下即使磁盘中已没有该项，其他进程的内存中仍可能有副本
+            if row is None and not self.shared:
+                return
+            self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            self._publish('delete', time.time(), key)
+            self._conn.commit()
+            if row is not None:
+                self.total_bytes -= row[0]
+
+    def clear(self):
+        """清空磁盘缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries")
+            self._publish('clear', time.time())
+            self._conn.commit()
+            self._conn.execute("PRAGMA incremental_vacuum")
+            self.total_bytes = 0
+
+    def remove_expired(self, now=None):
+        """删除所有已过期的缓存项
+
+        Returns:
+            删除的缓存项数量
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._remove_expired(now)
+
+    def compact(self, now=None):
+        """压缩磁盘缓存
+
+        先删除过期项，仍超出预算时按最近访问时间淘汰到低水位，最后回收空闲页。
+
+        Returns:
+            删除的缓存项数量
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.shared:
+                self.total_bytes = self._conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM cache_entries"
+                ).fetchone()[0]
+            removed = self._remove_expired(now)
+
+            target = self.max_bytes * self.low_watermark
+            while self.total_bytes > target:
+                rows = self._conn.execute(
+                    "SELECT key, size FROM cache_entries ORDER BY last_access LIMIT 64"
+                ).fetchall()
+                if not rows:
+                    self.total_bytes = 0
+                    break
+                for key, size in rows:
+                    self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                    self.total_bytes -= size
+                    self.eviction_count += 1
+                    removed += 1
+                    if self.total_bytes <= target:
+                        break
+            self._conn.commit()
+            self._conn.execute("PRAGMA incremental_vacuum")
+            self.compaction_count += 1
+
+        logger.info(f"磁盘缓存压缩完成: 删除{removed}个缓存项, 当前占用{self.total_bytes}字节")
+        return removed
+
+    def poll_events(self, now=None):
+        """读取其他进程在上次读取之后记录的事件
+
+        Args:
+            now: 当前时间戳，默认取time.time()
+
+        Returns:
+            (事件列表, 是否丢失事件)。事件为 (kind, key, query_text, expiry) 元组；
+            超过保留时长未读取、部分事件已被清理时第二项为True，调用方应丢弃全部内存副本
+        """
+        if not self.shared:
+            return [], False
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, kind, key, query_text, expiry, origin FROM cache_events WHERE seq > ? ORDER BY seq",
+                (self._last_event,)
+            ).fetchall()
+            if rows:
+                lost = rows[0][0] > self._last_event + 1
+                self._last_event = rows[-1][0]
+            else:
+                latest = self._max_event_seq()
+                lost = latest > self._last_event
+                self._last_event = latest
+            if now - self._last_prune > 60:
+                self._conn.execute("DELETE FROM cache_events WHERE created < ?", (now - self.event_retention,))
+                self._conn.commit()
+                self._last_prune = now
+        events = [(kind, key, query_text, expiry) for _, kind, key, query_text, expiry, origin in rows
+                  if origin != self.origin]
+        return events, lost
+
+    def iter_query_texts(self, now=None):
+        """列出未过期且带查询文本的缓存项，用于重建相似查询映射
+
+        Returns:
+            (缓存键, 查询文本, 过期时间) 的列表
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, query_text, expiry FROM cache_entries WHERE query_text IS NOT NULL AND expiry >= ?",
+                (now,)
+            ).fetchall()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+    def get_stats(self):
+        """获取磁盘缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            'path': self.path,
+            'shared': self.shared,
+            'entries': len(self),
+            'total_bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hit_count': self.hit_count,
+            'miss_count': self.miss_count,
+            'write_count': self.write_count,
+            'eviction_count': self.eviction_count,
+            'compaction_count': self.compaction_count
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def _publish(self, kind, now, key=None, query_text=None, expiry=None):
+        """共享模式下记录事件（调用方需持有锁，并在同一事务中提交）"""
+        if self.shared:
+            self._conn.execute(
+                "INSERT INTO cache_events (kind, key, query_text, expiry, origin, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, key, query_text, expiry, self.origin, now)
+            )
+
+    def _max_event_seq(self):
+        """已分配的最大事件序号，事件被清理后仍保留"""
+        row = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cache_events'").fetchone()
+        return row[0] if row else 0
+
+    def _remove_expired(self, now):
+        """删除过期项（调用方需持有锁）"""
+        expired_bytes, expired_count = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM cache_entries WHERE expiry < ?", (now,)
+        ).fetchone()
+        if expired_count:
+            self._conn.execute("DELETE FROM cache_entries WHERE expiry < ?", (now,))
+            self._conn.commit()
+            self.total_bytes -= expired_bytes
+        return expired_count
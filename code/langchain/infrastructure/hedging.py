@@ -0,0 +1,314 @@
+import time
+import asyncio
+import threading
+import contextvars
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .cache_store import AtomicCounter
+from .config_manager import ConfigManager
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - LLMHedger - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class _TypeStats:
+    """单个提示类型的首字节延迟样本和计数"""
+
+    def __init__(self, window_size):
+        self.samples = deque(maxlen=window_size)
+        self.request_count = AtomicCounter()
+        self.hedged_count = AtomicCounter()
+        self.backup_win_count = AtomicCounter()
+
+
+class LLMHedger:
+    """LLM对冲请求
+
+    偶发的极慢响应决定了尾延迟。对幂等的提示类型，请求发出后在对冲延迟内没有收到首字节时，
+    再发出一个相同的备份请求，采用先成功完成的结果并取消另一个请求。
+
+    - 对冲延迟取该提示类型最近首字节延迟的百分位数（默认p95），样本不足时使用初始值，并限制在上下限之间
+    - 对冲预算：最近window_size次请求和对冲中，对冲不超过max_hedge_ratio的比例，服务整体变慢时不会让请求量翻倍
+    - 调用函数以流式方式请求LLM，收到第一个片段时调用on_first_byte；同步版本在每个片段之间检查
+      cancelled，被取消时停止读取并关闭响应，异步版本直接取消任务
+    - 同步的调用阻塞在读取上时无法被取消，调用函数应使用attempt_read_timeout作为读取超时
+      （首字节和相邻片段之间的最长等待），落败的调用最多占用线程和连接这么长时间，而不是整个LLM超时
+    - 每次尝试应各占一个LLM调度名额（见ChatBot._scheduled_attempts），线程池应大于调度器的并发上限，
+      主请求不会因落败的调用占满线程而在线程池中排队、被误判为首字节慢
+    """
+
+    def __init__(self, prompt_types=(), percentile=95, window_size=200, min_samples=20, initial_delay=3.0,
+                 min_delay=0.5, max_delay=15.0, max_hedge_ratio=0.1, max_workers=64, attempt_read_timeout=30.0):
+        """初始化对冲器
+
+        Args:
+            prompt_types: 启用对冲的提示类型，只应包含幂等的提示
+            percentile: 对冲延迟取最近首字节延迟的百分位数
+            window_size: 每个提示类型保留的延迟样本数，也是对冲预算的统计窗口
+            min_samples: 样本数达到该值前使用initial_delay
+            initial_delay: 初始对冲延迟（秒）
+            min_delay: 对冲延迟下限（秒）
+            max_delay: 对冲延迟上限（秒）
+            max_hedge_ratio: 最近请求中对冲请求的最大比例
+            max_workers: 同步调用的线程池大小，应大于调度器的并发上限
+            attempt_read_timeout: 对冲调用的读取超时（秒），不小于max_delay，避免备份请求发出前主请求就超时
+        """
+        self.prompt_types = frozenset(prompt_types)
+        self.percentile = percentile
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.max_workers = max_workers
+        self.attempt_read_timeout = max(attempt_read_timeout, max_delay)
+        self._lock = threading.Lock()
+        self._stats = {}
+        # 最近的请求（False）和对冲请求（True），用于对冲预算
+        self._recent = deque(maxlen=window_size)
+        self._executor = None
+        self.budget_skipped_count = AtomicCounter()
+
+    @classmethod
+    def from_config(cls, config_manager=None):
+        """按配置文件中的 llm.hedging 创建对冲器，未启用时不处理任何提示类型
+
+        Args:
+            config_manager: 配置管理器实例
+
+        Returns:
+            LLMHedger实例
+        """
+        config = (config_manager or ConfigManager()).get('llm.hedging', {}) or {}
+        prompt_types = config.get('prompt_types', ()) if config.get('enabled', False) else ()
+        return cls(prompt_types=prompt_types,
+                   percentile=config.get('percentile', 95),
+                   window_size=config.get('window_size', 200),
+                   min_samples=config.get('min_samples', 20),
+                   initial_delay=config.get('initial_delay_seconds', 3.0),
+                   min_delay=config.get('min_delay_seconds', 0.5),
+                   max_delay=config.get('max_delay_seconds', 15.0),
+                   max_hedge_ratio=config.get('max_hedge_ratio', 0.1),
+                   max_workers=config.get('max_workers', 64),
+                   attempt_read_timeout=config.get('attempt_read_timeout_seconds', 30.0))
+
+    def handles(self, prompt_type):
+        """该提示类型是否启用对冲"""
+        return prompt_type in self.prompt_types
+
+    def hedge_delay(self, prompt_type):
+        """当前的对冲延迟（秒）"""
+        with self._lock:
+            samples = sorted(self._type_stats(prompt_type).samples)
+        if len(samples) < self.min_samples:
+            delay = self.initial_delay
+        else:
+            delay = samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100))]
+        return min(max(delay, self.min_delay), self.max_delay)
+
+    def call(self, prompt_type, attempt):
+        """执行可对冲的同步调用
+
+        Args:
+            prompt_type: 提示类型
+            attempt: 调用函数，参数为 (on_first_byte, cancelled)，cancelled为threading.Event
+
+        Returns:
+            先成功完成的调用结果
+        """
+        stats = self._begin(prompt_type)
+        delay = self.hedge_delay(prompt_type)
+        primary_cancel = threading.Event()
+        primary, primary_progress = self._submit(prompt_type, attempt, primary_cancel)
+        # 收到首字节或调用结束（包括失败）时停止等待
+        if primary_progress.wait(delay) or not self._allow_hedge():
+            return primary.result()
+
+        self._count_hedge(stats, prompt_type, delay)
+        backup_cancel = threading.Event()
+        backup, _ = self._submit(prompt_type, attempt, backup_cancel)
+        cancels = {primary: primary_cancel, backup: backup_cancel}
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # 同时完成时优先采用主请求的结果
+            for future in sorted(done, key=lambda future: future is not primary):
+                if future.exception() is None:
+                    for other in pending:
+                        cancels[other].set()
+                    if future is backup:
+                        stats.backup_win_count.increment()
+                    return future.result()
+                # 都失败时抛出主请求的异常（备份请求可能只是未获得调度）
+                if future is primary or error is None:
+                    error = future.exception()
+        raise error
+
+    async def acall(self, prompt_type, attempt):
+        """call的异步版本
+
+        Args:
+            prompt_type: 提示类型
+            attempt: 异步调用函数，参数为on_first_byte，被取消时应关闭响应
+
+        Returns:
+            先成功完成的调用结果
+        """
+        stats = self._begin(prompt_type)
+        delay = self.hedge_delay(prompt_type)
+        primary, primary_first_byte = self._acreate(prompt_type, attempt)
+        tasks = [primary]
+        try:
+            waiter = asyncio.ensure_future(primary_first_byte.wait())
+            try:
+                await asyncio.wait({primary, waiter}, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+            if primary_first_byte.is_set() or primary.done() or not self._allow_hedge():
+                return await primary
+
+            self._count_hedge(stats, prompt_type, delay)
+            backup, _ = self._acreate(prompt_type, attempt)
+            tasks.append(backup)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda task: task is not primary):
+                    if task.exception() is None:
+                        if task is backup:
+                            stats.backup_win_count.increment()
+                        return task.result()
+                    if task is primary or error is None:
+                        error = task.exception()
+            raise error
+        finally:
+            # 取消未完成的请求（包括调用方被取消时）
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _submit(self, prompt_type, attempt, cancelled):
+        """在线程池中发起一次调用，返回 (Future, 进展事件)，收到首字节或调用结束时设置进展事件
+
+        调用在调用方上下文的副本中执行，沿用调用方的LLM调度优先级
+        """
+        first_byte = threading.Event()
+        progress = threading.Event()
+        started = time.monotonic()
+
+        def on_first_byte():
+            if not first_byte.is_set():
+                first_byte.set()
+                progress.set()
+                self._record(prompt_type, time.monotonic() - started)
+
+        def run():
+            try:
+                return attempt(on_first_byte, cancelled)
+            finally:
+                # 未收到首字节就被放弃的请求以放弃时的耗时作为样本，避免只统计快的请求
+                if not first_byte.is_set() and cancelled.is_set():
+                    self._record(prompt_type, time.monotonic() - started)
+                progress.set()
+
+        return self._get_executor().submit(contextvars.copy_context().run, run), progress
+
+    def _acreate(self, prompt_type, attempt):
+        """创建一次异步调用的任务，返回 (任务, 首字节事件)"""
+        first_byte = asyncio.Event()
+        started = time.monotonic()
+
+        def on_first_byte():
+            if not first_byte.is_set():
+                first_byte.set()
+                self._record(prompt_type, time.monotonic() - started)
+
+        async def run():
+            try:
+                return await attempt(on_first_byte)
+            except asyncio.CancelledError:
+                if not first_byte.is_set():
+                    self._record(prompt_type, time.monotonic() - started)
+                raise
+
+        return asyncio.ensure_future(run()), first_byte
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='llm-hedge')
+            return self._executor
+
+    def _type_stats(self, prompt_type):
+        """获取提示类型的统计（调用方需持有锁）"""
+        stats = self._stats.get(prompt_type)
+        if stats is None:
+            stats = self._stats[prompt_type] = _TypeStats(self.window_size)
+        return stats
+
+    def _begin(self, prompt_type):
+        with self._lock:
+            stats = self._type_stats(prompt_type)
+            self._recent.append(False)
+        stats.request_count.increment()
+        return stats
+
+    def _record(self, prompt_type, latency):
+        with self._lock:
+            self._type_stats(prompt_type).samples.append(latency)
+
+    def _allow_hedge(self):
+        """对冲预算是否允许再发出一个备份请求"""
+        with self._lock:
+            allowed = sum(self._recent) < self.max_hedge_ratio * self.window_size
+            if allowed:
+                self._recent.append(True)
+        if not allowed:
+            self.budget_skipped_count.increment()
+        return allowed
+
+    def _count_hedge(self, stats, prompt_type, delay):
+        stats.hedged_count.increment()
+        logger.info(f"{prompt_type} 请求 {delay:.2f}秒内未收到首字节，发出对冲请求")
+
+    def get_stats(self):
+        """获取对冲统计信息
+
+        Returns:
+            统计信息字典，包含总体和各提示类型的请求数、对冲率、备份请求胜出次数和当前对冲延迟
+        """
+        with self._lock:
+            prompt_types = list(self._stats.items())
+        by_type = {}
+        for prompt_type, stats in prompt_types:
+            requests = stats.request_count.value
+            hedged = stats.hedged_count.value
+            by_type[prompt_type] = {
+                'requests': requests,
+                'hedged': hedged,
+                'hedge_rate': round(hedged / requests, 4) if requests else 0,
+                'backup_wins': stats.backup_win_count.value,
+                'hedge_delay_seconds': round(self.hedge_delay(prompt_type), 3),
+                'samples': len(stats.samples)
+            }
+        requests = sum(item['requests'] for item in by_type.values())
+        hedged = sum(item['hedged'] for item in by_type.values())
+        return {
+            'prompt_types': sorted(self.prompt_types),
+            'percentile': self.percentile,
+            'requests': requests,
+            'hedged': hedged,
+            'hedge_rate': round(hedged / requests, 4) if requests else 0,
+            'backup_wins': sum(item['backup_wins'] for item in by_type.values()),
+            'budget_skipped': self.budget_skipped_count.value,
+            'by_type': by_type
+        }
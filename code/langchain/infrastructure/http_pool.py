@@ -0,0 +1,384 @@
+import asyncio
+import threading
+import logging
+
+import httpx
+
+from .cache_store import AtomicCounter
+from .config_manager import ConfigManager
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - HTTPClientPool - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 连接池默认配置，对应配置文件中的 llm.http_pool
+DEFAULT_HTTP_POOL_CONFIG = {
+    'max_connections': 100,
+    'max_keepalive_connections': 20,
+    'keepalive_expiry': 30,
+    'http2': False,
+    'per_host_limit': 20,
+    'connect_timeout': 10
+}
+
+
+class HTTPPoolMetrics:
+    """连接池指标
+
+    - in_use: 正在占用连接（已发出请求、响应尚未关闭）的请求数
+    - waiting: 因单主机并发上限而排队等待连接的请求数
+    - created: 新建的TCP连接数，requests - created 即复用已有连接的请求数
+    - tls_handshakes: TLS握手次数
+    """
+
+    def __init__(self):
+        self.requests = AtomicCounter()
+        self.in_use = AtomicCounter()
+        self.waiting = AtomicCounter()
+        self.created = AtomicCounter()
+        self.tls_handshakes = AtomicCounter()
+
+    def on_trace(self, event_name):
+        """根据httpcore的trace事件统计新建连接和TLS握手"""
+        if event_name == 'connection.connect_tcp.complete':
+            self.created.increment()
+        elif event_name == 'connection.start_tls.complete':
+            self.tls_handshakes.increment()
+
+    def snapshot(self):
+        """获取指标快照
+
+        Returns:
+            指标字典
+        """
+        requests = self.requests.value
+        created = self.created.value
+        return {
+            'requests': requests,
+            'in_use': self.in_use.value,
+            'waiting': self.waiting.value,
+            'created': created,
+            'reused': max(requests - created, 0),
+            'tls_handshakes': self.tls_handshakes.value
+        }
+
+    def reset(self):
+        """重置累计指标（in_use和waiting是当前状态，不重置）"""
+        self.requests.reset()
+        self.created.reset()
+        self.tls_handshakes.reset()
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """响应体关闭时释放连接名额"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    """异步响应体关闭时释放连接名额"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+def _host_of(request):
+    """请求的目标主机（协议、主机、端口）"""
+    url = request.url
+    return (url.scheme, url.host, url.port)
+
+
+def _once(fn):
+    """包装为只执行一次的回调，响应可能被多次关闭"""
+    lock = threading.Lock()
+    called = []
+
+    def wrapper():
+        with lock:
+            if called:
+                return
+            called.append(True)
+        fn()
+    return wrapper
+
+
+class PooledTransport(httpx.BaseTransport):
+    """带单主机并发上限和指标统计的同步传输层
+
+    连接本身由httpx.HTTPTransport的连接池管理；这里在其外层按主机限制同时占用连接的请求数，
+    超出时请求在本地排队（计入waiting），并通过trace扩展统计新建连接。
+    """
+
+    def __init__(self, transport, per_host_limit, metrics):
+        """初始化传输层
+
+        Args:
+            transport: 实际发送请求的httpx.HTTPTransport
+            per_host_limit: 单个主机同时占用连接的请求数上限
+            metrics: 连接池指标
+        """
+        self._transport = transport
+        self.per_host_limit = per_host_limit
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._semaphores[host] = semaphore
+            return semaphore
+
+    def handle_request(self, request):
+        semaphore = self._semaphore(_host_of(request))
+        if not semaphore.acquire(blocking=False):
+            self.metrics.waiting.increment()
+            try:
+                semaphore.acquire()
+            finally:
+                self.metrics.waiting.increment(-1)
+        self.metrics.in_use.increment()
+        self.metrics.requests.increment()
+
+        def release():
+            self.metrics.in_use.increment(-1)
+            semaphore.release()
+        release = _once(release)
+
+        user_trace = request.extensions.get('trace')
+
+        def trace(event_name, info):
+            self.metrics.on_trace(event_name)
+            if user_trace is not None:
+                user_trace(event_name, info)
+        request.extensions['trace'] = trace
+
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, release),
+            extensions=response.extensions
+        )
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncPooledTransport(httpx.AsyncBaseTransport):
+    """带单主机并发上限和指标统计的异步传输层，与PooledTransport相同"""
+
+    def __init__(self, transport, per_host_limit, metrics):
+        """初始化传输层
+
+        Args:
+            transport: 实际发送请求的httpx.AsyncHTTPTransport
+            per_host_limit: 单个主机同时占用连接的请求数上限
+            metrics: 连接池指标
+        """
+        self._transport = transport
+        self.per_host_limit = per_host_limit
+        self.metrics = metrics
+        self._semaphores = {}
+
+    def _semaphore(self, host):
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    async def handle_async_request(self, request):
+        semaphore = self._semaphore(_host_of(request))
+        if semaphore.locked():
+            self.metrics.waiting.increment()
+            try:
+                await semaphore.acquire()
+            finally:
+                self.metrics.waiting.increment(-1)
+        else:
+            await semaphore.acquire()
+        self.metrics.in_use.increment()
+        self.metrics.requests.increment()
+
+        def release():
+            self.metrics.in_use.increment(-1)
+            semaphore.release()
+        release = _once(release)
+
+        user_trace = request.extensions.get('trace')
+
+        async def trace(event_name, info):
+            self.metrics.on_trace(event_name)
+            if user_trace is not None:
+                await user_trace(event_name, info)
+        request.extensions['trace'] = trace
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_AsyncReleasingStream(response.stream, release),
+            extensions=response.extensions
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class HTTPClientPool:
+    """LLM服务的共享HTTP连接池
+
+    同步和异步调用使用同一份连接池配置：httpx.Client与httpx.AsyncClient分别维护各自的连接
+    （同步连接不能在事件循环中使用），两者都保持长连接、复用TLS会话，并按主机限制并发，
+    避免高负载下频繁建立连接和TLS握手。
+    """
+
+    def __init__(self, max_connections=100, max_keepalive_connections=20, keepalive_expiry=30,
+                 http2=False, per_host_limit=20, connect_timeout=10, timeout=1800):
+        """初始化连接池
+
+        Args:
+            max_connections: 最大连接数
+            max_keepalive_connections: 最多保持的空闲长连接数
+            keepalive_expiry: 空闲长连接的保持时间（秒）
+            http2: 是否启用HTTP/2，需要安装h2，未安装时使用HTTP/1.1
+            per_host_limit: 单个主机同时占用连接的请求数上限，不超过max_connections
+            connect_timeout: 建立连接的超时时间（秒）
+            timeout: 读写超时时间（秒）
+        """
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("未安装h2，HTTP/2不可用，使用HTTP/1.1")
+                http2 = False
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.per_host_limit = min(per_host_limit or max_connections, max_connections)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.sync_metrics = HTTPPoolMetrics()
+        self.async_metrics = HTTPPoolMetrics()
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+
+    @classmethod
+    def from_config(cls, config_manager=None, timeout=1800):
+        """按配置文件中的 llm.http_pool 创建连接池
+
+        Args:
+            config_manager: 配置管理器实例
+            timeout: 读写超时时间（秒）
+
+        Returns:
+            HTTPClientPool实例
+        """
+        config = dict(DEFAULT_HTTP_POOL_CONFIG)
+        config.update((config_manager or ConfigManager()).get('llm.http_pool', {}) or {})
+        return cls(timeout=timeout, **config)
+
+    @property
+    def client(self):
+        """同步HTTP客户端（首次使用时创建）"""
+        with self._lock:
+            if self._client is None:
+                transport = httpx.HTTPTransport(limits=self.limits, http2=self.http2)
+                self._client = httpx.Client(
+                    transport=PooledTransport(transport, self.per_host_limit, self.sync_metrics),
+                    timeout=self.timeout
+                )
+            return self._client
+
+    @property
+    def async_client(self):
+        """异步HTTP客户端（首次使用时创建）"""
+        with self._lock:
+            if self._async_client is None:
+                transport = httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+                self._async_client = httpx.AsyncClient(
+                    transport=AsyncPooledTransport(transport, self.per_host_limit, self.async_metrics),
+                    timeout=self.timeout
+                )
+            return self._async_client
+
+    def get_stats(self):
+        """获取连接池指标
+
+        Returns:
+            指标字典，sync/async为分项指标，其余为两者合计
+        """
+        sync_stats = self.sync_metrics.snapshot()
+        async_stats = self.async_metrics.snapshot()
+        stats = {key: sync_stats[key] + async_stats[key] for key in sync_stats}
+        stats.update({
+            'sync': sync_stats,
+            'async': async_stats,
+            'http2': self.http2,
+            'max_connections': self.max_connections,
+            'max_keepalive_connections': self.max_keepalive_connections,
+            'keepalive_expiry': self.keepalive_expiry,
+            'per_host_limit': self.per_host_limit
+        })
+        return stats
+
+    def reset_stats(self):
+        """重置累计指标"""
+        self.sync_metrics.reset()
+        self.async_metrics.reset()
+
+    def close(self):
+        """关闭同步客户端"""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self):
+        """关闭异步客户端"""
+        with self._lock:
+            client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
@@ -1,79 +1,326 @@
 import logging
 import json
-from typing import List, Dict, Any, Optional
-from .chatbot import ChatBot
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional, Generator, AsyncGenerator
+from .chatbot import ChatBot, model_router
+from .llm_scheduler import LLMOverloadedError
 from .cache_manager import CacheManager
+from .config_manager import ConfigManager
+from .stream_json import StreamingJSONExtractor
 
 logger = logging.getLogger(__name__)
 
 class LMBatchProcessor:
     """LLM批处理处理器，用于优化LLM调用"""
     
-    def __init__(self):
-        """初始化批处理器"""
+    def __init__(self, max_concurrency: Optional[int] = None, task_timeout: Optional[float] = None):
+        """初始化批处理器
+        
+        Args:
+            max_concurrency: 单个批次同时调用LLM的任务数上限，默认读取配置 llm.batch.max_concurrency
+            task_timeout: 单个任务的超时时间（秒），从任务开始执行时计时，默认读取配置
+                llm.batch.task_timeout_seconds，为None时不限制
+        """
         self.chatbot = ChatBot()
         self.cache_manager = CacheManager()
+        config = ConfigManager().get('llm.batch', {}) or {}
+        self.max_concurrency = max(1, max_concurrency or config.get('max_concurrency', 4))
+        self.task_timeout = task_timeout if task_timeout is not None else config.get('task_timeout_seconds')
+        # 超时后仍在后台执行的异步任务，保留引用避免被回收
+        self._background_tasks = set()
     
     def batch_process(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         批量处理LLM任务
         
+        未命中缓存的任务在线程池中并发执行（最多max_concurrency个），总耗时约为最慢任务的耗时；
+        超时的任务返回错误结果，其LLM调用在后台继续执行并写入缓存。
+        
         Args:
             tasks: 任务列表，每个任务包含id、prompt等信息
             
         Returns:
-            处理结果列表
+            处理结果列表，与任务列表顺序一致
         """
-        results = []
-        
         # 1. 检查缓存
-        cached_results = []
-        remaining_tasks = []
+        results, remaining = self._split_cached(tasks)
+        if not remaining:
+            return results
+        
+        # 2. 并发处理剩余任务，按完成顺序收集结果
+        if len(remaining) == 1 and not self.task_timeout:
+            index = remaining[0]
+            results[index] = self._process_task(tasks[index])
+            return results
+        
+        executor = ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(remaining)))
+        started = {}
+        
+        def run(index):
+            started[index] = time.monotonic()
+            return self._process_task(tasks[index])
+        
+        # 在调用方的上下文中执行，LLM调用沿用调用方的调度优先级
+        futures = {executor.submit(contextvars.copy_context().run, run, index): index for index in remaining}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=self._next_timeout(pending, futures, started),
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures[future]] = future.result()
+                # 3. 标记已超时的任务
+                for future in self._expired(pending, futures, started):
+                    pending.discard(future)
+                    index = futures[future]
+                    results[index] = self._task_timeout_error(tasks[index])
+        finally:
+            # 不等待超时任务结束，尚未开始的任务直接取消
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return results
+    
+    async def abatch_process(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量处理LLM任务的异步版本，等待LLM响应期间不阻塞事件循环
+        
+        未命中缓存的任务并发执行，并发数和超时规则同batch_process。
+        
+        Args:
+            tasks: 任务列表，格式同batch_process
+            
+        Returns:
+            处理结果列表，格式同batch_process
+        """
+        results, remaining = self._split_cached(tasks)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def run(index):
+            async with semaphore:
+                # shield：超时只停止等待，LLM调用继续执行，完成后写入缓存并唤醒合并的请求
+                work = asyncio.ensure_future(self._aprocess_task(tasks[index]))
+                try:
+                    results[index] = await asyncio.wait_for(asyncio.shield(work), self.task_timeout)
+                except asyncio.TimeoutError:
+                    self._background_tasks.add(work)
+                    work.add_done_callback(self._background_tasks.discard)
+                    results[index] = self._task_timeout_error(tasks[index])
+        
+        await asyncio.gather(*(run(index) for index in remaining))
+        return results
+    
+    def stream_task(self, task: Dict[str, Any], fields=(), array_fields=()) -> Generator[Dict[str, Any], None, Dict[str, Any]]:
+        """
+        流式处理单个结构化任务，回答中的字段一完成就产出
+        
+        命中缓存时一次性产出各字段；否则流式调用LLM，用增量JSON提取器逐段解析输出。
+        完整解析的结果与batch_process使用相同的缓存键写入缓存；流式调用出错或输出不完整时
+        返回失败结果且不写入缓存，由调用方退回其他生成方式。
+        
+        Args:
+            task: 任务信息
+            fields: 完成后整体产出的顶层字段
+            array_fields: 每完成一个元素就产出的顶层数组字段
+        
+        Yields:
+            字段事件 {"field": 字段名, "value": 值}，数组元素额外包含index
+        
+        Returns:
+            任务结果，格式与batch_process的单个结果相同
+        """
+        extractor = StreamingJSONExtractor(fields, array_fields)
+        try:
+            cache_key = self._generate_task_cache_key(task)
+            cached_result = self.cache_manager.get(cache_key)
+            if cached_result:
+                yield from extractor.replay(cached_result)
+                return {"id": task.get("id"), "result": cached_result, "from_cache": True}
+        
+            task_type, prompt, _ = self._task_input(task)
+            start_time = time.time()
+            # 只解析常规回复内容，深度思考内容中可能包含不完整的JSON
+            for text in self.chatbot.chat_stream(prompt, include_reasoning=False, prompt_type=task_type):
+                yield from extractor.feed(text)
+            return self._finish_stream_task(task, task_type, extractor, cache_key, start_time)
+        except Exception as e:
+            return self._task_error(task, e)
+    
+    async def astream_task(self, task: Dict[str, Any], fields=(), array_fields=(),
+                           outcome: Optional[Dict[str, Any]] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        stream_task的异步版本（异步生成器），等待LLM输出期间不占用线程
         
-        for task in tasks:
+        异步生成器不能返回值，任务结果写入outcome["task_result"]。
+        
+        Args:
+            task: 任务信息
+            fields: 完成后整体产出的顶层字段
+            array_fields: 每完成一个元素就产出的顶层数组字段
+            outcome: 接收任务结果的字典
+        
+        Yields:
+            字段事件，同stream_task
+        """
+        outcome = {} if outcome is None else outcome
+        extractor = StreamingJSONExtractor(fields, array_fields)
+        try:
             cache_key = self._generate_task_cache_key(task)
             cached_result = self.cache_manager.get(cache_key)
             if cached_result:
-                cached_results.append({
+                for event in extractor.replay(cached_result):
+                    yield event
+                outcome["task_result"] = {"id": task.get("id"), "result": cached_result, "from_cache": True}
+                return
+        
+            task_type, prompt, _ = self._task_input(task)
+            start_time = time.time()
+            async for text in self.chatbot.achat_stream(prompt, include_reasoning=False, prompt_type=task_type):
+                for event in extractor.feed(text):
+                    yield event
+            outcome["task_result"] = self._finish_stream_task(task, task_type, extractor, cache_key, start_time)
+        except Exception as e:
+            outcome["task_result"] = self._task_error(task, e)
+    
+    def _finish_stream_task(self, task, task_type, extractor, cache_key, start_time) -> Dict[str, Any]:
+        """解析流式输出的完整结果并写入缓存"""
+        # 输出不完整（如流式调用出错）时解析只能得到默认结果，按失败处理
+        if not extractor.complete:
+            return self._task_error(task, ValueError(f"LLM流式输出不完整: {extractor.text[-100:]}"))
+        result = self._parse_task_response(task_type, {"content": extractor.text})
+        self.cache_manager.set(cache_key, result, ttl=3600, cost=time.time() - start_time)
+        return self._task_result(task, result, False)
+    
+    def _process_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        处理单个未命中缓存的任务
+        
+        Args:
+            task: 任务信息
+            
+        Returns:
+            任务结果，失败时为错误结果
+        """
+        try:
+            # 其他请求正在处理相同任务时等待其结果，不重复调用LLM
+            cache_key = self._generate_task_cache_key(task)
+            result, coalesced = self.cache_manager.coalesce(
+                cache_key, lambda: self._process_and_cache_task(task, cache_key)
+            )
+            return self._task_result(task, result, coalesced)
+        except Exception as e:
+            return self._task_error(task, e)
+    
+    async def _aprocess_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """_process_task的异步版本"""
+        try:
+            cache_key = self._generate_task_cache_key(task)
+            result, coalesced = await self.cache_manager.acoalesce(
+                cache_key, lambda: self._aprocess_and_cache_task(task, cache_key)
+            )
+            return self._task_result(task, result, coalesced)
+        except Exception as e:
+            return self._task_error(task, e)
+    
+    def _next_timeout(self, pending, futures, started) -> Optional[float]:
+        """距离最早一个执行中任务超时的等待时间，没有设置超时时返回None"""
+        if not self.task_timeout:
+            return None
+        deadlines = [started[futures[future]] + self.task_timeout
+                     for future in pending if futures[future] in started]
+        if not deadlines:
+            return self.task_timeout
+        return max(min(deadlines) - time.monotonic(), 0)
+    
+    def _expired(self, pending, futures, started) -> List[Any]:
+        """已超过超时时间的执行中任务"""
+        if not self.task_timeout:
+            return []
+        now = time.monotonic()
+        return [future for future in pending
+                if futures[future] in started and now - started[futures[future]] >= self.task_timeout]
+    
+    def _split_cached(self, tasks: List[Dict[str, Any]]):
+        """
+        按缓存拆分任务
+        
+        Args:
+            tasks: 任务列表
+            
+        Returns:
+            (与任务列表等长的结果列表，未命中缓存的位置为None, 未命中缓存的任务下标列表)
+        """
+        results = [None] * len(tasks)
+        remaining = []
+        
+        for index, task in enumerate(tasks):
+            cache_key = self._generate_task_cache_key(task)
+            cached_result = self.cache_manager.get(cache_key)
+            if cached_result:
+                results[index] = {
                     "id": task.get("id"),
                     "result": cached_result,
                     "from_cache": True
-                })
+                }
             else:
-                remaining_tasks.append(task)
+                remaining.append(index)
+        return results, remaining
+    
+    @staticmethod
+    def _task_result(task: Dict[str, Any], result: Any, coalesced: bool) -> Dict[str, Any]:
+        """构建单个任务的处理结果"""
+        return {
+            "id": task.get("id"),
+            "result": result,
+            "from_cache": coalesced,
+            "coalesced": coalesced
+        }
+    
+    @staticmethod
+    def _task_error(task: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """构建单个任务的失败结果，调度器因过载拒绝时标记overloaded"""
+        logger.error(f"处理任务失败: {error}")
+        result = {
+            "id": task.get("id"),
+            "result": None,
+            "error": str(error),
+            "from_cache": False
+        }
+        if isinstance(error, LLMOverloadedError):
+            result["overloaded"] = True
+        return result
+    
+    def _task_timeout_error(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """构建单个任务的超时结果"""
+        result = self._task_error(task, TimeoutError(f"任务处理超时（{self.task_timeout}秒）"))
+        result["timeout"] = True
+        return result
+    
+    def _process_and_cache_task(self, task: Dict[str, Any], cache_key: str) -> Any:
+        """
+        处理单个任务并缓存结果
         
-        # 2. 批量处理剩余任务
-        if remaining_tasks:
-            # 对于不同类型的任务，采用不同的批处理策略
-            # 这里我们先实现简单的逐个处理，后续可以根据需要优化为真正的批量API调用
-            for task in remaining_tasks:
-                try:
-                    result = self._process_single_task(task)
-                    results.append({
-                        "id": task.get("id"),
-                        "result": result,
-                        "from_cache": False
-                    })
-                    
-                    # 缓存结果
-                    cache_key = self._generate_task_cache_key(task)
-                    self.cache_manager.set(cache_key, result, ttl=3600)
-                except Exception as e:
-                    logger.error(f"处理任务失败: {e}")
-                    results.append({
-                        "id": task.get("id"),
-                        "result": None,
-                        "error": str(e),
-                        "from_cache": False
-                    })
-        
-        # 3. 合并结果
-        all_results = cached_results + results
-        
-        # 4. 按原始顺序排序
-        all_results.sort(key=lambda x: x.get("id"))
-        
-        return all_results
+        Args:
+            task: 任务信息
+            cache_key: 任务缓存键
+            
+        Returns:
+            处理结果
+        """
+        start_time = time.time()
+        result = self._process_single_task(task)
+        # 记录处理耗时，作为代价感知淘汰的重新计算代价
+        self.cache_manager.set(cache_key, result, ttl=3600, cost=time.time() - start_time)
+        return result
+    
+    async def _aprocess_and_cache_task(self, task: Dict[str, Any], cache_key: str) -> Any:
+        """_process_and_cache_task的异步版本"""
+        start_time = time.time()
+        result = await self._aprocess_single_task(task)
+        self.cache_manager.set(cache_key, result, ttl=3600, cost=time.time() - start_time)
+        return result
     
     def _process_single_task(self, task: Dict[str, Any]) -> Any:
         """
@@ -85,34 +332,68 @@ class LMBatchProcessor:
         Returns:
             处理结果
         """
+        task_type, prompt, semantic_text = self._task_input(task)
+        response = self.chatbot.chat_with_memory(prompt, prompt_type=task_type, semantic_text=semantic_text)
+        # 失败的回复不解析为默认结果，任务按失败处理，不写入缓存
+        self.chatbot.raise_for_error(response)
+        return self._parse_task_response(task_type, response)
+    
+    async def _aprocess_single_task(self, task: Dict[str, Any]) -> Any:
+        """_process_single_task的异步版本"""
+        task_type, prompt, semantic_text = self._task_input(task)
+        response = await self.chatbot.achat_with_memory(prompt, prompt_type=task_type, semantic_text=semantic_text)
+        self.chatbot.raise_for_error(response)
+        return self._parse_task_response(task_type, response)
+    
+    @staticmethod
+    def _task_input(task: Dict[str, Any]):
+        """
+        提取任务的类型、提示和语义缓存文本
+        
+        Args:
+            task: 任务信息
+            
+        Returns:
+            (任务类型, 提示, 提示中的用户输入部分)
+        """
         task_type = task.get("type", "general")
         prompt = task.get("prompt")
-        
         if not prompt:
             raise ValueError("任务必须包含prompt")
+        # 提示中的用户输入部分，提供时启用语义缓存查找
+        return task_type, prompt, task.get("semantic_text")
+    
+    def _parse_task_response(self, task_type: str, response: Any) -> Any:
+        """
+        按任务类型解析LLM响应
         
-        # 根据任务类型选择不同的处理方式
+        Args:
+            task_type: 任务类型
+            response: ChatBot返回的响应
+            
+        Returns:
+            处理结果
+        """
         if task_type == "job_analysis":
-            return self._process_job_analysis(prompt)
+            return self._parse_job_analysis(response)
         elif task_type == "response_generation":
-            return self._process_response_generation(prompt)
+            return self._parse_response_generation(response)
         elif task_type == "combined_generation":
-            return self._process_combined_generation(prompt)
+            return self._parse_combined_generation(response)
         else:
-            # 通用处理
-            return self.chatbot.chat_with_memory(prompt)
+            # 通用任务直接返回响应
+            return response
     
-    def _process_job_analysis(self, prompt: str) -> Dict[str, Any]:
+    def _parse_job_analysis(self, response: Any) -> Dict[str, Any]:
         """
-        处理岗位分析任务
+        解析岗位分析任务的响应
         
         Args:
-            prompt: 分析提示
+            response: LLM响应
             
         Returns:
             分析结果
         """
-        response = self.chatbot.chat_with_memory(prompt)
         content = self._process_llm_response(response)
         
         # 清理并解析JSON
@@ -122,39 +403,39 @@ class LMBatchProcessor:
             return json.loads(clean_content)
         except json.JSONDecodeError as e:
             logger.error(f"解析岗位分析结果失败: {e}")
+            model_router.record_fallback("job_analysis", response)
             return {"job_analysis": []}
     
-    def _process_response_generation(self, prompt: str) -> Dict[str, Any]:
+    def _parse_response_generation(self, response: Any) -> Dict[str, Any]:
         """
-        处理响应生成任务
+        解析响应生成任务的响应
         
         Args:
-            prompt: 生成提示
+            response: LLM响应
             
         Returns:
             生成结果
         """
-        response = self.chatbot.chat_with_memory(prompt)
         content = self._process_llm_response(response)
         
         try:
             return json.loads(content)
         except json.JSONDecodeError as e:
             logger.error(f"解析响应结果失败: {e}")
+            model_router.record_fallback("response_generation", response)
             # 返回一个默认的响应，但是我们会在response_generator.py中生成不符合条件的政策信息
             return {"positive": "", "negative": "", "suggestions": ""}
     
-    def _process_combined_generation(self, prompt: str) -> Dict[str, Any]:
+    def _parse_combined_generation(self, response: Any) -> Dict[str, Any]:
         """
-        处理合并生成任务，同时生成岗位推荐理由和结构化回答
+        解析合并生成任务的响应，同时包含岗位推荐理由和结构化回答
         
         Args:
-            prompt: 生成提示
+            response: LLM响应
             
         Returns:
             生成结果，包含job_analysis、positive、negative和suggestions
         """
-        response = self.chatbot.chat_with_memory(prompt)
         content = self._process_llm_response(response)
         
         # 清理并解析JSON
@@ -164,6 +445,7 @@ class LMBatchProcessor:
             return json.loads(clean_content)
         except json.JSONDecodeError as e:
             logger.error(f"解析合并生成结果失败: {e}")
+            model_router.record_fallback("combined_generation", response)
             # 返回一个默认的响应
             return {
                 "job_analysis": [],
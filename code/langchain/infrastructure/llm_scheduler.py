@@ -0,0 +1,380 @@
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import contextvars
+import logging
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+
+from .cache_store import AtomicCounter
+from .config_manager import ConfigManager
+from .prompt_budget import token_estimator
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - LLMScheduler - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# LLM调用的优先级，数值越小越优先
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BATCH: 'batch', PRIORITY_BACKGROUND: 'background'}
+
+# 当前请求的LLM调用优先级，随请求上下文传递到异步任务和asyncio.to_thread
+_current_priority = contextvars.ContextVar('llm_priority', default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority):
+    """在with块内以指定优先级调用LLM
+
+    Args:
+        priority: PRIORITY_INTERACTIVE、PRIORITY_BATCH或PRIORITY_BACKGROUND
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority():
+    """当前上下文的LLM调用优先级，默认为交互请求"""
+    return _current_priority.get()
+
+
+class LLMOverloadedError(RuntimeError):
+    """LLM调用在截止时间内无法获得调度（排队预计超时或已超时），被主动拒绝"""
+
+
+class TokenBucket:
+    """令牌桶：按每分钟速率补充令牌，容量为一分钟的量"""
+
+    def __init__(self, rate_per_minute):
+        """初始化令牌桶
+
+        Args:
+            rate_per_minute: 每分钟补充的令牌数，为0时不限制
+        """
+        self.rate_per_minute = rate_per_minute
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self):
+        return not self.rate_per_minute
+
+    def _refill(self, now):
+        if now > self._updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate_per_minute / 60)
+            self._updated = now
+
+    def time_until(self, amount, now):
+        """补充到amount个令牌还需等待的时间（秒），amount可以超过容量，用于估算排队时间"""
+        if self.unlimited:
+            return 0
+        self._refill(now)
+        deficit = amount - self.tokens
+        return max(deficit, 0) * 60 / self.rate_per_minute
+
+    def consume(self, amount, now):
+        """取出amount个令牌（超过容量时按容量计）"""
+        if self.unlimited:
+            return
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def level(self):
+        if self.unlimited:
+            return None
+        self._refill(time.monotonic())
+        return round(self.tokens, 1)
+
+
+class _Waiter:
+    """排队中的LLM调用"""
+
+    __slots__ = ('priority', 'tokens', 'enqueued', 'deadline', 'future', 'cancelled')
+
+    def __init__(self, priority, tokens, enqueued, deadline):
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued = enqueued
+        self.deadline = deadline
+        self.future = Future()
+        self.cancelled = False
+
+
+class _PriorityStats:
+    """单个优先级的调度统计"""
+
+    def __init__(self):
+        self.granted_count = AtomicCounter()
+        self.shed_count = AtomicCounter()
+        self.expired_count = AtomicCounter()
+        self.queue_times = deque(maxlen=500)
+
+
+class LLMScheduler:
+    """LLM调用的集中调度器
+
+    交互请求、批处理、缓存预热和健康检查都经过同一个调度器调用LLM服务：
+    - 服务级令牌桶同时限制每分钟请求数和每分钟token数（提示token数加预计输出token数）
+    - 资源不足时按优先级排队：交互 > 批处理 > 后台，同优先级先到先得
+    - 可选的并发上限，其中interactive_reserve个名额只留给交互请求，批处理占满时交互请求仍可立即执行
+    - 入队时按前面排队的请求估算等待时间，超过截止时间的请求直接拒绝（LLMOverloadedError），
+      排队中超过截止时间的请求同样被拒绝，不会在过载时无限堆积
+    不限速、不限并发时调用不经过排队，只做统计。
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, max_concurrency=0, interactive_reserve=0,
+                 deadlines=None, expected_output_tokens=500):
+        """初始化调度器
+
+        Args:
+            requests_per_minute: 每分钟请求数上限，0表示不限制
+            tokens_per_minute: 每分钟token数上限，0表示不限制
+            max_concurrency: 同时执行的LLM调用数上限，0表示不限制
+            interactive_reserve: 并发名额中只留给交互请求的数量
+            deadlines: 各优先级默认的截止时间（秒），键为优先级名称
+            expected_output_tokens: 每次调用预计的输出token数，计入token限速
+        """
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.interactive_reserve = min(interactive_reserve, max(max_concurrency - 1, 0))
+        deadlines = deadlines or {}
+        self.deadlines = {priority: deadlines.get(name, 60) for priority, name in PRIORITY_NAMES.items()}
+        self.expected_output_tokens = expected_output_tokens
+        self._cond = threading.Condition()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._dispatcher = None
+        self._stats = {priority: _PriorityStats() for priority in PRIORITY_NAMES}
+
+    @classmethod
+    def from_config(cls, config_manager=None):
+        """按配置文件中的 llm.scheduler 创建调度器，未启用时不限速、不限并发
+
+        Args:
+            config_manager: 配置管理器实例
+
+        Returns:
+            LLMScheduler实例
+        """
+        config = (config_manager or ConfigManager()).get('llm.scheduler', {}) or {}
+        if not config.get('enabled', False):
+            return cls(deadlines=config.get('deadline_seconds'))
+        return cls(requests_per_minute=config.get('requests_per_minute', 0),
+                   tokens_per_minute=config.get('tokens_per_minute', 0),
+                   max_concurrency=config.get('max_concurrency', 0),
+                   interactive_reserve=config.get('interactive_reserve', 0),
+                   deadlines=config.get('deadline_seconds'),
+                   expected_output_tokens=config.get('expected_output_tokens', 500))
+
+    def estimate_tokens(self, prompt):
+        """估算一次调用消耗的token数：提示token数加预计输出token数"""
+        return token_estimator.count(prompt) + self.expected_output_tokens
+
+    @contextmanager
+    def slot(self, tokens, priority=None, deadline=None):
+        """获得调度后执行with块，结束时释放并发名额
+
+        Args:
+            tokens: 本次调用预计消耗的token数
+            priority: 优先级，默认取当前上下文的优先级
+            deadline: 截止时间（秒，从现在起），默认按优先级配置
+
+        Raises:
+            LLMOverloadedError: 截止时间内无法获得调度
+        """
+        self.acquire(tokens, priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, tokens, priority=None, deadline=None):
+        """slot的异步版本，排队期间不阻塞事件循环"""
+        await self.aacquire(tokens, priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, tokens, priority=None, deadline=None):
+        """排队等待调度，获得后占用一个并发名额，需调用release释放"""
+        waiter = self._enqueue(tokens, priority, deadline)
+        if waiter.future.done():
+            return
+        try:
+            waiter.future.result(timeout=max(waiter.deadline - time.monotonic(), 0))
+        except FuturesTimeoutError:
+            self._expire(waiter)
+
+    async def aacquire(self, tokens, priority=None, deadline=None):
+        """acquire的异步版本"""
+        waiter = self._enqueue(tokens, priority, deadline)
+        if waiter.future.done():
+            return
+        try:
+            # shield：等待超时时不能取消调度器持有的Future
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(waiter.future)),
+                                   max(waiter.deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            self._expire(waiter)
+        except asyncio.CancelledError:
+            # 调用方被取消：未获得调度时退出队列，已获得时归还名额
+            if not self._withdraw(waiter):
+                self.release()
+            raise
+
+    def release(self):
+        """释放一个并发名额"""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def _enqueue(self, tokens, priority, deadline):
+        """入队，资源充足且无人排队时立即获得调度；预计等待超过截止时间时拒绝"""
+        priority = current_priority() if priority is None else priority
+        deadline = self.deadlines[priority] if deadline is None else deadline
+        now = time.monotonic()
+        waiter = _Waiter(priority, tokens, now, now + deadline)
+        with self._cond:
+            if not self._heap and self._grantable(waiter, now) == 0:
+                self._grant(waiter, now)
+                return waiter
+
+            estimated = self._estimate_wait(waiter, now)
+            if estimated > deadline:
+                self._stats[priority].shed_count.increment()
+                logger.warning(f"{PRIORITY_NAMES[priority]} LLM调用预计排队{estimated:.1f}秒，超过截止时间{deadline}秒，已拒绝")
+                raise LLMOverloadedError(f"LLM服务繁忙，预计排队{estimated:.1f}秒，请稍后再试")
+
+            heapq.heappush(self._heap, (priority, next(self._sequence), waiter))
+            self._ensure_dispatcher()
+            self._cond.notify()
+        return waiter
+
+    def _estimate_wait(self, waiter, now):
+        """按令牌桶估算排在本请求之前（优先级不低于本请求）的调用都获得调度所需的时间（调用方需持有锁）
+
+        并发名额的等待取决于执行中调用的耗时，无法估算，不计入
+        """
+        ahead = [other for _, _, other in self._heap if not other.cancelled and other.priority <= waiter.priority]
+        return max(self.request_bucket.time_until(len(ahead) + 1, now),
+                   self.token_bucket.time_until(sum(other.tokens for other in ahead) + waiter.tokens, now))
+
+    def _grantable(self, waiter, now):
+        """资源是否允许立即调度（调用方需持有锁）
+
+        Returns:
+            0表示可以调度；正数为令牌桶还需等待的秒数；None表示需等待并发名额释放
+        """
+        if self.max_concurrency:
+            limit = self.max_concurrency
+            if waiter.priority != PRIORITY_INTERACTIVE:
+                limit -= self.interactive_reserve
+            if self._in_flight >= limit:
+                return None
+        return max(self.request_bucket.time_until(1, now),
+                   self.token_bucket.time_until(min(waiter.tokens, self.token_bucket.capacity or waiter.tokens), now))
+
+    def _grant(self, waiter, now):
+        """调度一个调用（调用方需持有锁）"""
+        self.request_bucket.consume(1, now)
+        self.token_bucket.consume(waiter.tokens, now)
+        self._in_flight += 1
+        stats = self._stats[waiter.priority]
+        stats.granted_count.increment()
+        stats.queue_times.append(now - waiter.enqueued)
+        waiter.future.set_result(True)
+
+    def _ensure_dispatcher(self):
+        """启动调度线程（调用方需持有锁）"""
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch, name='llm-scheduler', daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch(self):
+        """调度线程：按优先级调度队首的调用，资源不足时等待令牌补充或并发名额释放"""
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                waiter = self._heap[0][2]
+                wait_time = self._grantable(waiter, now)
+                if wait_time == 0:
+                    heapq.heappop(self._heap)
+                    self._grant(waiter, now)
+                    continue
+                self._cond.wait(timeout=wait_time)
+
+    def _withdraw(self, waiter):
+        """退出队列，已获得调度时返回False"""
+        with self._cond:
+            if waiter.future.done():
+                return False
+            waiter.cancelled = True
+            self._cond.notify()
+            return True
+
+    def _expire(self, waiter):
+        """排队超过截止时间：退出队列并拒绝，已在最后时刻获得调度时照常执行"""
+        if self._withdraw(waiter):
+            self._stats[waiter.priority].expired_count.increment()
+            raise LLMOverloadedError(f"LLM服务繁忙，排队超过{waiter.deadline - waiter.enqueued:.0f}秒，请稍后再试")
+
+    def get_stats(self):
+        """获取调度统计信息
+
+        Returns:
+            统计信息字典，包含各优先级的排队数、调度数、拒绝数和排队时间
+        """
+        with self._cond:
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for _, _, waiter in self._heap:
+                if not waiter.cancelled:
+                    queued[PRIORITY_NAMES[waiter.priority]] += 1
+            in_flight = self._in_flight
+            request_level = self.request_bucket.level()
+            token_level = self.token_bucket.level()
+            queue_times = {priority: sorted(stats.queue_times) for priority, stats in self._stats.items()}
+
+        by_priority = {}
+        for priority, name in PRIORITY_NAMES.items():
+            stats = self._stats[priority]
+            times = queue_times[priority]
+            by_priority[name] = {
+                'queued': queued[name],
+                'granted': stats.granted_count.value,
+                'shed': stats.shed_count.value,
+                'expired': stats.expired_count.value,
+                'avg_queue_ms': round(sum(times) / len(times) * 1000, 1) if times else 0,
+                'p95_queue_ms': round(times[min(len(times) - 1, int(len(times) * 0.95))] * 1000, 1) if times else 0,
+                'deadline_seconds': self.deadlines[priority]
+            }
+        return {
+            'requests_per_minute': self.request_bucket.rate_per_minute,
+            'tokens_per_minute': self.token_bucket.rate_per_minute,
+            'request_tokens_available': request_level,
+            'token_tokens_available': token_level,
+            'max_concurrency': self.max_concurrency,
+            'interactive_reserve': self.interactive_reserve,
+            'in_flight': in_flight,
+            'by_priority': by_priority
+        }
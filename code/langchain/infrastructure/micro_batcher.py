@@ -0,0 +1,297 @@
+import json
+import asyncio
+import contextvars
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+from .cache_store import AtomicCounter
+from .config_manager import ConfigManager
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - LLMMicroBatcher - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    """正在收集的一批提示"""
+
+    def __init__(self):
+        # (提示, 提示中的用户输入部分, 等待结果的Future)
+        self.items = []
+        # 批次达到上限时完成，唤醒正在等待窗口结束的leader
+        self.full = Future()
+
+
+class LLMMicroBatcher:
+    """跨请求的LLM微批处理器
+
+    高峰期大量并发请求会触发同一类小型LLM任务（意图识别、岗位推荐理由）。微批处理器把
+    同一提示类型的提示收集一个很短的窗口，合并为一个多任务提示、要求LLM输出JSON数组，
+    再把数组元素按顺序分发给各个等待的调用方，减少LLM往返次数和服务端QPS。
+
+    - 窗口内第一个到达的调用方作为leader，等待窗口结束或批次满后发起调用，其余调用方等待结果
+    - 批次只有一个提示时直接单独调用
+    - 合并响应无法解析为等长的JSON数组时，退回为逐个单独调用
+    - 只负责LLM调用本身，缓存、请求合并和语义缓存仍由ChatBot按每个原始提示处理
+    """
+
+    def __init__(self, invoke, ainvoke=None, window_ms=10, max_batch_size=8, prompt_types=()):
+        """初始化微批处理器
+
+        Args:
+            invoke: 同步LLM调用函数，参数为提示、提示类型和合并的提示数，返回包含content和time的字典
+            ainvoke: 异步LLM调用函数，返回值同invoke
+            window_ms: 收集窗口（毫秒）
+            max_batch_size: 单个批次的最大提示数，达到后立即发起调用
+            prompt_types: 参与微批处理的提示类型
+        """
+        self.invoke = invoke
+        self.ainvoke = ainvoke
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.prompt_types = frozenset(prompt_types)
+        self._lock = threading.Lock()
+        # 提示类型 -> 正在收集的批次
+        self._open = {}
+        # 提示类型 -> 合并提示构建函数
+        self._builders = {}
+        self.batch_count = AtomicCounter()
+        self.batched_prompt_count = AtomicCounter()
+        self.single_call_count = AtomicCounter()
+        self.fallback_count = AtomicCounter()
+        # 合并后少调用的LLM次数，退回单独调用的批次多调用一次
+        self.llm_calls_saved = AtomicCounter()
+
+    @classmethod
+    def from_config(cls, invoke, ainvoke=None, config_manager=None):
+        """按配置文件中的 llm.micro_batch 创建微批处理器，未启用时不处理任何提示类型
+
+        Args:
+            invoke: 同步LLM调用函数
+            ainvoke: 异步LLM调用函数
+            config_manager: 配置管理器实例
+
+        Returns:
+            LLMMicroBatcher实例
+        """
+        config = (config_manager or ConfigManager()).get('llm.micro_batch', {}) or {}
+        prompt_types = config.get('prompt_types', ()) if config.get('enabled', False) else ()
+        return cls(invoke, ainvoke,
+                   window_ms=config.get('window_ms', 10),
+                   max_batch_size=config.get('max_batch_size', 8),
+                   prompt_types=prompt_types)
+
+    def handles(self, prompt_type):
+        """该提示类型是否参与微批处理"""
+        return prompt_type in self.prompt_types
+
+    def register_builder(self, prompt_type, builder):
+        """注册某个提示类型的合并提示构建函数
+
+        默认把各个完整提示按编号拼接；同一类提示共享大段模板时可以注册更紧凑的构建函数。
+
+        Args:
+            prompt_type: 提示类型
+            builder: 参数为(提示列表, 用户输入列表)，返回合并提示，返回None时使用默认构建方式
+        """
+        self._builders[prompt_type] = builder
+
+    def submit(self, prompt_type, prompt, semantic_text=None):
+        """提交一个提示，等待所在批次的结果
+
+        Args:
+            prompt_type: 提示类型
+            prompt: 完整提示
+            semantic_text: 提示中的用户输入部分，供合并提示构建函数使用
+
+        Returns:
+            包含content和time的字典
+        """
+        batch, future, leader = self._join(prompt_type, prompt, semantic_text)
+        if leader:
+            try:
+                batch.full.result(timeout=self.window)
+            except FuturesTimeoutError:
+                pass
+            self._close(prompt_type, batch)
+            self._execute(prompt_type, batch)
+        return future.result()
+
+    async def asubmit(self, prompt_type, prompt, semantic_text=None):
+        """submit的异步版本，等待期间不阻塞事件循环"""
+        batch, future, leader = self._join(prompt_type, prompt, semantic_text)
+        if leader:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(batch.full)), self.window)
+            except asyncio.TimeoutError:
+                pass
+            self._close(prompt_type, batch)
+            await self._aexecute(prompt_type, batch)
+        # shield：等待方被取消时不能连带取消Future
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def _join(self, prompt_type, prompt, semantic_text):
+        """加入正在收集的批次，返回 (批次, 本提示的Future, 是否为leader)"""
+        future = Future()
+        with self._lock:
+            batch = self._open.get(prompt_type)
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._open[prompt_type] = batch
+            batch.items.append((prompt, semantic_text, future))
+            if len(batch.items) >= self.max_batch_size:
+                del self._open[prompt_type]
+                batch.full.set_result(True)
+        return batch, future, leader
+
+    def _close(self, prompt_type, batch):
+        """停止收集批次（批次满时已在加入时停止）"""
+        with self._lock:
+            if self._open.get(prompt_type) is batch:
+                del self._open[prompt_type]
+
+    def _execute(self, prompt_type, batch):
+        """调用LLM并把结果分发给批次中的各个提示"""
+        items = batch.items
+        try:
+            if len(items) == 1:
+                self.single_call_count.increment()
+                self._resolve(items, [self.invoke(items[0][0], prompt_type)])
+                return
+            self._count_batch(items)
+            response = self.invoke(self._build_prompt(prompt_type, items), prompt_type, len(items))
+            replies = self._split(response, len(items))
+            if replies is None:
+                self._count_fallback(items)
+                with ThreadPoolExecutor(max_workers=len(items)) as executor:
+                    futures = [executor.submit(contextvars.copy_context().run, self.invoke, prompt, prompt_type)
+                               for prompt, _, _ in items]
+                    replies = [self._outcome(future.result) for future in futures]
+            self._resolve(items, replies)
+        except BaseException as e:
+            self._fail(items, e)
+            if not isinstance(e, Exception):
+                raise
+
+    async def _aexecute(self, prompt_type, batch):
+        """_execute的异步版本"""
+        items = batch.items
+        try:
+            if len(items) == 1:
+                self.single_call_count.increment()
+                self._resolve(items, [await self.ainvoke(items[0][0], prompt_type)])
+                return
+            self._count_batch(items)
+            response = await self.ainvoke(self._build_prompt(prompt_type, items), prompt_type, len(items))
+            replies = self._split(response, len(items))
+            if replies is None:
+                self._count_fallback(items)
+                replies = await asyncio.gather(*(self.ainvoke(prompt, prompt_type) for prompt, _, _ in items),
+                                               return_exceptions=True)
+            self._resolve(items, replies)
+        except BaseException as e:
+            self._fail(items, e)
+            if not isinstance(e, Exception):
+                raise
+
+    def _count_batch(self, items):
+        self.batch_count.increment()
+        self.batched_prompt_count.increment(len(items))
+        self.llm_calls_saved.increment(len(items) - 1)
+        logger.info(f"合并 {len(items)} 个提示为一次LLM调用")
+
+    def _count_fallback(self, items):
+        self.fallback_count.increment()
+        self.llm_calls_saved.increment(-len(items))
+
+    @staticmethod
+    def _outcome(fn):
+        """执行函数，异常作为结果返回"""
+        try:
+            return fn()
+        except Exception as e:
+            return e
+
+    @staticmethod
+    def _resolve(items, replies):
+        """把结果或异常分发给各个提示的Future"""
+        for (_, _, future), reply in zip(items, replies):
+            if future.done():
+                continue
+            if isinstance(reply, BaseException):
+                future.set_exception(reply)
+            else:
+                future.set_result(reply)
+
+    @staticmethod
+    def _fail(items, error):
+        """批次执行失败时让所有尚未得到结果的提示失败"""
+        for _, _, future in items:
+            if not future.done():
+                future.set_exception(error if isinstance(error, Exception) else RuntimeError("微批处理被中断"))
+
+    def _build_prompt(self, prompt_type, items):
+        """构建合并提示"""
+        prompts = [prompt for prompt, _, _ in items]
+        builder = self._builders.get(prompt_type)
+        if builder is not None:
+            merged = builder(prompts, [semantic_text for _, semantic_text, _ in items])
+            if merged:
+                return merged
+        sections = "\n\n".join(f"### 任务{i}\n{prompt.strip()}" for i, prompt in enumerate(prompts, 1))
+        return (
+            f"以下是{len(prompts)}个相互独立的任务，请分别完成。\n"
+            f"只输出一个JSON数组，包含{len(prompts)}个元素，第i个元素是第i个任务要求输出的JSON对象，"
+            f"不要输出数组以外的内容。\n\n{sections}"
+        )
+
+    @staticmethod
+    def _split(response, count):
+        """把合并响应拆分为各个提示的响应，无法解析为等长JSON数组时返回None"""
+        content = response.get("content", "") if isinstance(response, dict) else str(response)
+        content = content.strip()
+        if content.startswith('```'):
+            content = content.split('\n', 1)[1] if '\n' in content else ''
+        if content.endswith('```'):
+            content = content[:-3]
+        try:
+            parsed = json.loads(content.strip())
+        except (json.JSONDecodeError, ValueError):
+            logger.warning("合并响应不是合法的JSON，逐个单独调用")
+            return None
+        if not isinstance(parsed, list) or len(parsed) != count:
+            logger.warning(f"合并响应不是包含 {count} 个元素的JSON数组，逐个单独调用")
+            return None
+        llm_time = response.get("time", 0) if isinstance(response, dict) else 0
+        # 保留合并调用所用的路由，便于按路由统计各个提示的质量降级
+        route = {key: response[key] for key in ("route", "model") if key in response} if isinstance(response, dict) else {}
+        # 各提示分摊合并调用的耗时，缓存的成本和节省的LLM时间按调用方累加时不会重复计算；
+        # 整个合并调用的耗时另存为micro_batch_time
+        return [dict({
+            "content": element if isinstance(element, str) else json.dumps(element, ensure_ascii=False),
+            "time": llm_time / count,
+            "micro_batch_time": llm_time,
+            "micro_batch_size": count
+        }, **route) for element in parsed]
+
+    def get_stats(self):
+        """获取微批处理统计信息
+
+        Returns:
+            统计信息字典，llm_calls_saved为合并后少调用的LLM次数
+        """
+        return {
+            'prompt_types': sorted(self.prompt_types),
+            'window_ms': self.window * 1000,
+            'max_batch_size': self.max_batch_size,
+            'batches': self.batch_count.value,
+            'batched_prompts': self.batched_prompt_count.value,
+            'single_calls': self.single_call_count.value,
+            'fallbacks': self.fallback_count.value,
+            'llm_calls_saved': self.llm_calls_saved.value
+        }
@@ -0,0 +1,452 @@
+import re
+import os
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+import logging
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from .cache_store import AtomicCounter
+from .config_manager import ConfigManager
+from .prompt_budget import token_estimator
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - MockLLMServer - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MOCK_RESPONSES_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'data_files', 'mock_responses.json')
+
+
+class MockResponder:
+    """按提示内容回放 mock_responses.json 中的模拟回答
+
+    意图识别提示按关键词返回意图和实体；其他提示匹配模拟数据中的问题，未匹配时返回默认回答。
+    """
+
+    def __init__(self, mock_file_path=MOCK_RESPONSES_FILE):
+        """初始化模拟回答
+
+        Args:
+            mock_file_path: 模拟响应数据文件
+        """
+        self.mock_responses = {}
+        try:
+            with open(mock_file_path, 'r', encoding='utf-8') as f:
+                self.mock_responses = json.load(f).get('mock_responses', {})
+            logger.info(f"加载模拟响应数据成功，共 {len(self.mock_responses)} 条")
+        except Exception as e:
+            logger.error(f"加载模拟响应数据失败: {e}")
+
+    def reply(self, prompt):
+        """生成提示的模拟回答
+
+        Args:
+            prompt: 提示
+
+        Returns:
+            回答内容
+        """
+        if "请分析用户输入，识别核心意图和实体" in prompt:
+            return self.intent_reply(prompt)
+        return self.answer_reply(prompt)
+
+    @staticmethod
+    def intent_reply(user_input):
+        """意图分析器的模拟响应"""
+        # 提取实体
+        entities = []
+
+        # 提取年龄
+        age_match = re.search(r'(\d+)岁', user_input)
+        if age_match:
+            entities.append({"type": "年龄", "value": age_match.group(1)})
+
+        # 提取性别
+        if "女性" in user_input:
+            entities.append({"type": "性别", "value": "女性"})
+        elif "男性" in user_input:
+            entities.append({"type": "性别", "value": "男性"})
+
+        # 提取职业技能证书
+        if "中级电工证" in user_input:
+            entities.append({"type": "证书", "value": "中级电工证"})
+        elif "高级电工证" in user_input:
+            entities.append({"type": "证书", "value": "高级电工证"})
+        elif "电工证" in user_input:
+            entities.append({"type": "证书", "value": "电工证"})
+
+        # 提取就业状态
+        if "失业" in user_input:
+            entities.append({"type": "就业状态", "value": "失业"})
+        elif "在职" in user_input:
+            entities.append({"type": "就业状态", "value": "在职"})
+
+        # 提取关注点
+        if "补贴" in user_input:
+            entities.append({"type": "关注点", "value": "补贴申领"})
+        if "灵活时间" in user_input:
+            entities.append({"type": "关注点", "value": "灵活时间"})
+
+        # 根据用户输入内容返回不同的意图识别结果
+        # 优先检查政策相关关键词
+        if "政策" in user_input or "补贴" in user_input or "创业" in user_input or "贷款" in user_input or "返乡" in user_input:
+            return json.dumps({
+                "intent": "政策咨询",
+                "needs_job_recommendation": False,
+                "needs_policy_recommendation": True,
+                "entities": entities
+            }, ensure_ascii=False)
+        # 然后检查求职相关关键词
+        elif "推荐工作" in user_input or "找工作" in user_input or "兼职工作" in user_input or "想找一份" in user_input:
+            return json.dumps({
+                "intent": "求职咨询",
+                "needs_job_recommendation": True,
+                "needs_policy_recommendation": True,  # 同时需要政策咨询（因为关注补贴）
+                "entities": entities
+            }, ensure_ascii=False)
+        else:
+            # 默认意图
+            return json.dumps({
+                "intent": "政策咨询",
+                "needs_job_recommendation": False,
+                "needs_policy_recommendation": False,
+                "entities": entities
+            }, ensure_ascii=False)
+
+    def answer_reply(self, user_input):
+        """响应生成器的模拟响应"""
+        # 查找匹配的模拟响应
+        for key, response in self.mock_responses.items():
+            if key in user_input:
+                # 将模拟响应转换为JSON字符串
+                return json.dumps(response, ensure_ascii=False)
+        # 默认模拟响应
+        return json.dumps({
+            "positive": "",
+            "negative": "",
+            "suggestions": "建议：请提供更多个人信息，以便为您提供更精准的政策咨询和个性化建议。"
+        }, ensure_ascii=False)
+
+
+class LatencyModel:
+    """模拟LLM服务的延迟和故障
+
+    - 首token时间（TTFT）服从对数正态分布，中位数为ttft_median_ms，离散程度为ttft_sigma
+    - 之后按tokens_per_second的速度输出
+    - 每个请求以error_rate的概率返回500错误，以timeout_rate的概率挂起timeout_seconds秒后断开连接
+    """
+
+    def __init__(self, ttft_median_ms=300, ttft_sigma=0.5, tokens_per_second=40, error_rate=0.0,
+                 timeout_rate=0.0, timeout_seconds=30, seed=None):
+        """初始化延迟模型
+
+        Args:
+            ttft_median_ms: 首token时间的中位数（毫秒）
+            ttft_sigma: 首token时间对数的标准差，0表示固定延迟
+            tokens_per_second: 输出速度，0表示不限速
+            error_rate: 返回500错误的概率
+            timeout_rate: 挂起不响应的概率
+            timeout_seconds: 挂起的时间（秒）
+            seed: 随机数种子，便于复现压测
+        """
+        self.ttft_median_ms = ttft_median_ms
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def outcome(self):
+        """抽取请求结果：ok、error或timeout"""
+        with self._lock:
+            value = self._random.random()
+        if value < self.error_rate:
+            return 'error'
+        if value < self.error_rate + self.timeout_rate:
+            return 'timeout'
+        return 'ok'
+
+    def ttft(self):
+        """抽取首token时间（秒）"""
+        if self.ttft_median_ms <= 0:
+            return 0
+        with self._lock:
+            value = self._random.lognormvariate(math.log(self.ttft_median_ms), self.ttft_sigma)
+        return value / 1000
+
+    def output_time(self, tokens):
+        """输出tokens个token所需的时间（秒）"""
+        if self.tokens_per_second <= 0:
+            return 0
+        return tokens / self.tokens_per_second
+
+
+class MockLLMServer:
+    """本地OpenAI兼容的模拟LLM服务
+
+    提供 POST /v1/chat/completions（支持stream）和 GET /v1/models，回答由MockResponder回放，
+    延迟和故障由LatencyModel注入。把 OPENAI_API_BASE 指向 base_url 后，压测和基准测试
+    经过真实的HTTP客户端、连接池和流式解析路径，不需要付费的LLM服务。
+    """
+
+    def __init__(self, responder=None, latency=None, host='127.0.0.1', port=0, model='mock-llm', chunk_chars=4):
+        """初始化模拟服务
+
+        Args:
+            responder: MockResponder实例
+            latency: LatencyModel实例
+            host: 监听地址
+            port: 监听端口，0表示随机分配
+            model: 返回的模型名称
+            chunk_chars: 流式输出时每个片段的字符数
+        """
+        self.responder = responder or MockResponder()
+        self.latency = latency or LatencyModel()
+        self.model = model
+        self.chunk_chars = max(1, chunk_chars)
+        self.request_count = AtomicCounter()
+        self.error_count = AtomicCounter()
+        self.timeout_count = AtomicCounter()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config_manager=None, responder=None, **overrides):
+        """按配置文件中的 llm.mock_server 创建模拟服务
+
+        Args:
+            config_manager: 配置管理器实例
+            responder: MockResponder实例
+            overrides: 覆盖配置的参数，值为None时忽略
+
+        Returns:
+            MockLLMServer实例
+        """
+        config = dict((config_manager or ConfigManager()).get('llm.mock_server', {}) or {})
+        config.update({key: value for key, value in overrides.items() if value is not None})
+        latency = LatencyModel(ttft_median_ms=config.get('ttft_median_ms', 300),
+                               ttft_sigma=config.get('ttft_sigma', 0.5),
+                               tokens_per_second=config.get('tokens_per_second', 40),
+                               error_rate=config.get('error_rate', 0.0),
+                               timeout_rate=config.get('timeout_rate', 0.0),
+                               timeout_seconds=config.get('timeout_seconds', 30),
+                               seed=config.get('seed'))
+        return cls(responder=responder, latency=latency, host=config.get('host', '127.0.0.1'), port=config.get('port', 0),
+                   chunk_chars=config.get('chunk_chars', 4))
+
+    @property
+    def base_url(self):
+        """OpenAI兼容的API地址，用作 OPENAI_API_BASE"""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        """在后台线程中启动服务
+
+        Returns:
+            self，便于链式调用
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name='mock-llm-server', daemon=True)
+            self._thread.start()
+            logger.info(f"模拟LLM服务已启动: {self.base_url}")
+        return self
+
+    def serve_forever(self):
+        """在当前线程中运行服务，直到被中断"""
+        logger.info(f"模拟LLM服务已启动: {self.base_url}")
+        self._server.serve_forever()
+
+    def stop(self):
+        """停止服务"""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread = None
+
+    def get_stats(self):
+        """获取模拟服务统计信息
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            'base_url': self.base_url,
+            'requests': self.request_count.value,
+            'errors': self.error_count.value,
+            'timeouts': self.timeout_count.value
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(_MockLLMHandler):
+            mock_server = server
+
+        return Handler
+
+    def completion(self, prompt):
+        """生成非流式回答，返回 (回答, 输出token数)"""
+        content = self.responder.reply(prompt)
+        return content, token_estimator.count(content)
+
+    def chunks(self, prompt):
+        """按chunk_chars切分流式回答，返回 (片段, token数) 列表"""
+        content = self.responder.reply(prompt)
+        pieces = [content[i:i + self.chunk_chars] for i in range(0, len(content), self.chunk_chars)]
+        return [(piece, token_estimator.count(piece)) for piece in pieces]
+
+
+class _MockLLMHandler(BaseHTTPRequestHandler):
+    """模拟服务的请求处理，HTTP/1.1长连接，流式响应使用分块传输"""
+
+    protocol_version = 'HTTP/1.1'
+    mock_server = None
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": self.mock_server.model, "object": "model", "owned_by": "mock"}
+            ]})
+        else:
+            self._send_json(404, {"error": {"message": f"未知路径: {self.path}", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)) or 0)
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": f"未知路径: {self.path}", "type": "invalid_request_error"}})
+            return
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            self._send_json(400, {"error": {"message": "请求体不是合法的JSON", "type": "invalid_request_error"}})
+            return
+
+        server = self.mock_server
+        server.request_count.increment()
+        outcome = server.latency.outcome()
+        if outcome == 'error':
+            server.error_count.increment()
+            self._send_json(500, {"error": {"message": "模拟服务错误", "type": "server_error"}})
+            return
+        if outcome == 'timeout':
+            # 挂起后断开连接，不发送任何响应
+            server.timeout_count.increment()
+            time.sleep(server.latency.timeout_seconds)
+            self.close_connection = True
+            return
+
+        prompt = self._prompt(request.get('messages', []))
+        if request.get('stream'):
+            self._stream(prompt, request)
+        else:
+            content, tokens = server.completion(prompt)
+            time.sleep(server.latency.ttft() + server.latency.output_time(tokens))
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get('model') or server.model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": self._usage(prompt, tokens)
+            })
+
+    def _stream(self, prompt, request):
+        """以SSE分块输出回答，首个片段前等待TTFT，之后按输出速度发送"""
+        server = self.mock_server
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get('model') or server.model
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def event(delta, finish_reason=None):
+            self._write_chunk('data: ' + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }, ensure_ascii=False) + '\n\n')
+
+        try:
+            time.sleep(server.latency.ttft())
+            event({"role": "assistant", "content": ""})
+            for piece, tokens in server.chunks(prompt):
+                time.sleep(server.latency.output_time(tokens))
+                event({"content": piece})
+            event({}, "stop")
+            self._write_chunk('data: [DONE]\n\n')
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前断开
+            self.close_connection = True
+
+    def _write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    @staticmethod
+    def _prompt(messages):
+        """取最后一条用户消息的文本"""
+        for message in reversed(messages):
+            if message.get('role') == 'user':
+                content = message.get('content', '')
+                if isinstance(content, list):
+                    return ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+                return content or ''
+        return ''
+
+    @staticmethod
+    def _usage(prompt, completion_tokens):
+        prompt_tokens = token_estimator.count(prompt)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def main():
+    """命令行入口：python -m langchain.infrastructure.mock_llm_server --port 8900"""
+    parser = argparse.ArgumentParser(description='本地OpenAI兼容的模拟LLM服务')
+    parser.add_argument('--host', default=None, help='监听地址')
+    parser.add_argument('--port', type=int, default=8900, help='监听端口')
+    parser.add_argument('--ttft-ms', dest='ttft_median_ms', type=float, default=None, help='首token时间的中位数（毫秒）')
+    parser.add_argument('--ttft-sigma', dest='ttft_sigma', type=float, default=None, help='首token时间对数的标准差')
+    parser.add_argument('--tokens-per-second', dest='tokens_per_second', type=float, default=None, help='输出速度')
+    parser.add_argument('--error-rate', dest='error_rate', type=float, default=None, help='返回500错误的概率')
+    parser.add_argument('--timeout-rate', dest='timeout_rate', type=float, default=None, help='挂起不响应的概率')
+    parser.add_argument('--timeout-seconds', dest='timeout_seconds', type=float, default=None, help='挂起的时间（秒）')
+    parser.add_argument('--seed', type=int, default=None, help='随机数种子')
+    args = parser.parse_args()
+
+    server = MockLLMServer.from_config(**vars(args))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
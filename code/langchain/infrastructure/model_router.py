@@ -0,0 +1,259 @@
+import time
+import math
+import threading
+import logging
+from collections import deque
+
+from .cache_store import AtomicCounter
+from .config_manager import ConfigManager
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - ModelRouter - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 未在路由表中配置的提示类型使用的路由
+DEFAULT_ROUTE = 'default'
+PRIMARY = 'primary'
+SECONDARY = 'secondary'
+# 判断p95所需的最少样本数，样本更少时p95就是最慢的一次，单次失败或慢调用就会触发切换
+MIN_P95_SAMPLES = 20
+
+
+class ModelRoute:
+    """一条路由：某个提示类型在某一级（主/备）使用的模型和生成参数"""
+
+    def __init__(self, prompt_type, tier, llm, model=None, max_tokens=None, temperature=None, api_base=None,
+                 api_key_env=None):
+        self.prompt_type = prompt_type
+        self.tier = tier
+        self.llm = llm
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.api_base = api_base
+        self.api_key_env = api_key_env
+
+    @property
+    def name(self):
+        return f"{self.prompt_type}:{self.tier}"
+
+    def max_tokens_for(self, batch_size):
+        """合并了batch_size个提示的微批调用的max_tokens，输出按提示数增长，未配置或单个提示时返回None"""
+        if not self.max_tokens or batch_size <= 1:
+            return None
+        return self.max_tokens * batch_size
+
+
+class _RouteStats:
+    """单条路由最近的调用耗时和计数"""
+
+    def __init__(self, window_size):
+        # 调用耗时（秒），失败的调用记为无穷大
+        self.samples = deque(maxlen=window_size)
+        self.request_count = AtomicCounter()
+        self.error_count = AtomicCounter()
+        self.fallback_count = AtomicCounter()
+
+
+class _RouteTable:
+    """一个提示类型的主备路由和当前状态"""
+
+    def __init__(self, primary, secondary=None, p95_budget=None):
+        self.primary = primary
+        self.secondary = secondary
+        self.p95_budget = p95_budget
+        self.active = primary
+        self.failed_over_at = None
+        self.failover_count = AtomicCounter()
+
+
+class ModelRouter:
+    """按提示类型路由LLM调用
+
+    意图识别、岗位推荐理由等短小的结构化任务和长篇的合并生成共用同一个模型和max_tokens=8192时，
+    短任务的延迟被拖长。路由表按提示类型配置主路由（模型、max_tokens、temperature，可选独立的
+    API端点），并可配置备用路由（另一个模型或端点）：
+    - 每条路由在线统计最近window_size次调用的耗时（失败记为无穷大）和质量降级次数
+      （响应无法解析、退回默认结果）
+    - 主路由样本数达到min_samples（至少20，p95不会只取决于最慢的一次）且p95超过该类型的
+      p95_budget_seconds时，自动切换到备用路由
+    - 切换cooldown_seconds后回到主路由试探，清空主路由的样本重新统计，仍然变慢时再次切换
+    未配置的提示类型使用默认路由，不做切换。
+    """
+
+    def __init__(self, default_llm, llm_factory=None, routes=None, window_size=100, min_samples=20,
+                 cooldown_seconds=60):
+        """初始化路由器
+
+        Args:
+            default_llm: 默认路由使用的LLM实例
+            llm_factory: 按路由配置创建LLM实例的函数，参数为model、max_tokens、temperature、api_base、api_key_env
+            routes: 路由表，键为提示类型，值包含primary、可选的secondary和p95_budget_seconds
+            window_size: 每条路由保留的耗时样本数
+            min_samples: 样本数达到该值后才判断是否切换，小于20时按20计
+            cooldown_seconds: 切换到备用路由后回到主路由试探的间隔（秒）
+        """
+        self.window_size = window_size
+        self.min_samples = max(min_samples, MIN_P95_SAMPLES)
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._tables = {DEFAULT_ROUTE: _RouteTable(ModelRoute(DEFAULT_ROUTE, PRIMARY, default_llm))}
+        for prompt_type, config in (routes or {}).items():
+            primary = self._create_route(llm_factory, prompt_type, PRIMARY, config.get('primary') or {})
+            secondary = config.get('secondary')
+            if secondary:
+                secondary = self._create_route(llm_factory, prompt_type, SECONDARY, secondary)
+            self._tables[prompt_type] = _RouteTable(primary, secondary, config.get('p95_budget_seconds'))
+        self._stats = {}
+
+    @classmethod
+    def from_config(cls, default_llm, llm_factory, config_manager=None):
+        """按配置文件中的 llm.routing 创建路由器，未启用时所有提示类型使用默认路由
+
+        Args:
+            default_llm: 默认路由使用的LLM实例
+            llm_factory: 按路由配置创建LLM实例的函数
+            config_manager: 配置管理器实例
+
+        Returns:
+            ModelRouter实例
+        """
+        config = (config_manager or ConfigManager()).get('llm.routing', {}) or {}
+        return cls(default_llm, llm_factory,
+                   routes=config.get('routes', {}) if config.get('enabled', False) else {},
+                   window_size=config.get('window_size', 100),
+                   min_samples=config.get('min_samples', 20),
+                   cooldown_seconds=config.get('cooldown_seconds', 60))
+
+    @staticmethod
+    def _create_route(llm_factory, prompt_type, tier, config):
+        llm = llm_factory(model=config.get('model'), max_tokens=config.get('max_tokens'),
+                          temperature=config.get('temperature'), api_base=config.get('api_base'),
+                          api_key_env=config.get('api_key_env'))
+        return ModelRoute(prompt_type, tier, llm, model=config.get('model'), max_tokens=config.get('max_tokens'),
+                          temperature=config.get('temperature'), api_base=config.get('api_base'),
+                          api_key_env=config.get('api_key_env'))
+
+    def route(self, prompt_type):
+        """选择提示类型当前使用的路由
+
+        Args:
+            prompt_type: 提示类型
+
+        Returns:
+            ModelRoute实例
+        """
+        table = self._tables.get(prompt_type) or self._tables[DEFAULT_ROUTE]
+        with self._lock:
+            if table.active is table.secondary and time.monotonic() - table.failed_over_at >= self.cooldown_seconds:
+                # 冷却结束，回到主路由试探
+                table.active = table.primary
+                self._route_stats(table.primary).samples.clear()
+                logger.info(f"{table.primary.prompt_type} 路由冷却结束，回到主路由试探")
+            return table.active
+
+    def record(self, route, latency, ok=True):
+        """记录一次调用的耗时，主路由p95超过预算时切换到备用路由
+
+        Args:
+            route: 本次调用使用的路由
+            latency: 调用耗时（秒）
+            ok: 调用是否成功
+        """
+        table = self._tables.get(route.prompt_type)
+        with self._lock:
+            stats = self._route_stats(route)
+            stats.samples.append(latency if ok else math.inf)
+            samples = sorted(stats.samples)
+            should_fail_over = (
+                table is not None and route is table.primary and table.active is table.primary
+                and table.secondary is not None and table.p95_budget is not None
+                and len(samples) >= self.min_samples and self._p95(samples) > table.p95_budget
+            )
+            if should_fail_over:
+                table.active = table.secondary
+                table.failed_over_at = time.monotonic()
+        stats.request_count.increment()
+        if not ok:
+            stats.error_count.increment()
+        if should_fail_over:
+            table.failover_count.increment()
+            logger.warning(f"{route.prompt_type} 主路由最近p95 {self._p95(samples):.2f}秒超过预算"
+                           f"{table.p95_budget}秒，切换到备用路由")
+
+    def record_fallback(self, prompt_type, response):
+        """记录一次质量降级（响应无法解析、退回默认结果）
+
+        Args:
+            prompt_type: 提示类型
+            response: ChatBot返回的响应，只统计本次调用LLM得到的响应（包含route），忽略缓存和模拟响应
+        """
+        if not isinstance(response, dict) or response.get('route') not in (PRIMARY, SECONDARY):
+            return
+        table = self._tables.get(prompt_type) or self._tables[DEFAULT_ROUTE]
+        route = table.primary if response['route'] == PRIMARY else table.secondary
+        if route is None:
+            return
+        with self._lock:
+            stats = self._route_stats(route)
+        stats.fallback_count.increment()
+
+    def _route_stats(self, route):
+        """获取路由的统计（调用方需持有锁）"""
+        stats = self._stats.get(route.name)
+        if stats is None:
+            stats = self._stats[route.name] = _RouteStats(self.window_size)
+        return stats
+
+    @staticmethod
+    def _p95(samples):
+        """已排序样本的p95（最近秩法：不小于95%样本的最小值），20个样本时为第二慢的一次"""
+        return samples[max(math.ceil(len(samples) * 0.95) - 1, 0)]
+
+    def get_stats(self):
+        """获取路由统计信息
+
+        Returns:
+            统计信息字典，包含各提示类型当前使用的路由、切换次数，以及各路由的请求数、错误数、
+            质量降级率和最近p95耗时
+        """
+        with self._lock:
+            tables = list(self._tables.items())
+            snapshot = {name: (sorted(stats.samples), stats) for name, stats in self._stats.items()}
+
+        def describe(route):
+            samples, stats = snapshot.get(route.name, ([], None))
+            requests = stats.request_count.value if stats else 0
+            fallbacks = stats.fallback_count.value if stats else 0
+            p95 = self._p95(samples) if samples else None
+            return {
+                'model': route.model,
+                'max_tokens': route.max_tokens,
+                'temperature': route.temperature,
+                'api_base': route.api_base,
+                'requests': requests,
+                'errors': stats.error_count.value if stats else 0,
+                'fallbacks': fallbacks,
+                'fallback_rate': round(fallbacks / requests, 4) if requests else 0,
+                'p95_seconds': None if p95 is None else (round(p95, 3) if math.isfinite(p95) else 'inf'),
+                'samples': len(samples)
+            }
+
+        routes = {}
+        for prompt_type, table in tables:
+            routes[prompt_type] = {
+                'active': table.active.tier,
+                'p95_budget_seconds': table.p95_budget,
+                'failovers': table.failover_count.value,
+                PRIMARY: describe(table.primary)
+            }
+            if table.secondary is not None:
+                routes[prompt_type][SECONDARY] = describe(table.secondary)
+        return {
+            'window_size': self.window_size,
+            'cooldown_seconds': self.cooldown_seconds,
+            'routes': routes
+        }
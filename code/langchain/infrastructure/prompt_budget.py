@@ -0,0 +1,282 @@
+import json
+import math
+import logging
+import threading
+from functools import lru_cache
+
+from .config_manager import ConfigManager
+
+# 尝试导入 tiktoken，如果不可用则使用按字符类型估算的分词计数
+tiktoken = None
+try:
+    import tiktoken
+except ImportError:
+    pass
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - PromptBudget - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class TokenEstimator:
+    """本地token数估算器
+
+    安装了tiktoken且能加载编码时按其分词计数；否则按字符类型估算：中文等非ASCII字符约1个token，
+    ASCII字符约4个一个token。估算只用于控制提示长度，不要求与服务端计费完全一致。
+
+    编码在后台线程中加载（服务启动时调用start_loading，或第一次计数时自动开始），加载完成前按字符类型估算：
+    本地缓存中没有编码文件时tiktoken会联网下载且没有超时，不能阻塞启动或请求；超过load_timeout秒仍未
+    完成时放弃加载。离线部署可设置 TIKTOKEN_CACHE_DIR 并预先放入编码文件。
+    """
+
+    def __init__(self, encoding_name='cl100k_base', memo_size=1024, load_timeout=10.0):
+        """初始化估算器
+
+        Args:
+            encoding_name: tiktoken编码名称
+            memo_size: 记忆计数结果的字符串数量，模板、示例等固定片段每次构建提示都会重复计数
+            load_timeout: 后台加载编码的最长时间（秒），超时后一直使用估算计数
+        """
+        self.encoding_name = encoding_name
+        self.load_timeout = load_timeout
+        self._encoding = None
+        self._loading_started = False
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self.count = lru_cache(maxsize=memo_size)(self._count)
+
+    def start_loading(self):
+        """在后台线程中加载tiktoken编码，立即返回，重复调用时只加载一次"""
+        with self._load_lock:
+            if self._loading_started:
+                return
+            self._loading_started = True
+            if tiktoken is None:
+                self._loaded = True
+                return
+        timer = threading.Timer(self.load_timeout, self._abandon_loading)
+        timer.daemon = True
+        timer.start()
+        threading.Thread(target=self._load, args=(timer,), name='tiktoken-loader', daemon=True).start()
+
+    def _load(self, timer):
+        """加载编码，超时后才完成的结果丢弃"""
+        encoding = None
+        try:
+            encoding = tiktoken.get_encoding(self.encoding_name)
+        except Exception as e:
+            logger.warning(f"加载tiktoken编码失败，使用估算计数: {e}")
+        finally:
+            timer.cancel()
+        with self._load_lock:
+            if self._loaded:
+                return
+            self._encoding = encoding
+            self._loaded = True
+        if encoding is not None:
+            # 加载完成前记忆的是估算计数，清空后按tiktoken重新计数
+            self.count.cache_clear()
+            logger.info(f"tiktoken编码 {self.encoding_name} 加载完成")
+
+    def _abandon_loading(self):
+        """加载超时：放弃加载，一直使用估算计数"""
+        with self._load_lock:
+            if self._loaded:
+                return
+            self._loaded = True
+        logger.warning(f"加载tiktoken编码超过{self.load_timeout}秒，使用估算计数；"
+                       f"离线部署可设置 TIKTOKEN_CACHE_DIR 预先放入编码文件")
+
+    @property
+    def encoding(self):
+        """tiktoken编码，尚未加载完成或不可用时为None（不等待加载）"""
+        if not self._loading_started:
+            self.start_loading()
+        return self._encoding
+
+    @property
+    def source(self):
+        """计数方式：tiktoken或heuristic"""
+        return 'tiktoken' if self.encoding is not None else 'heuristic'
+
+    def _count(self, text):
+        if not text:
+            return 0
+        encoding = self.encoding
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        return (len(text) - ascii_chars) + math.ceil(ascii_chars / 4)
+
+    def truncate(self, text, max_tokens):
+        """截取不超过max_tokens的最长前缀
+
+        Args:
+            text: 文本
+            max_tokens: token数上限
+
+        Returns:
+            截取后的文本
+        """
+        if self.count(text) <= max_tokens:
+            return text
+        encoding = self.encoding
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())[:max_tokens]
+            # 截断位置可能落在中文等多字节字符中间，丢弃末尾不完整的字节，避免产生替换字符
+            return encoding.decode_bytes(tokens).decode('utf-8', errors='ignore')
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
+
+
+class PromptBuilder:
+    """按token预算组装提示
+
+    提示由若干段组成，每段有优先级；超出预算时按优先级从低到高裁剪：
+    - 文本段整段保留或整段移除，不会在JSON示例等结构中间截断
+    - 列表段（政策、岗位）按顺序渲染，从末尾逐条移除排名靠后的条目
+    - required段（指令、用户输入、输出格式）始终保留
+    各段按添加顺序拼接，build返回提示和各段的token数报告。
+    """
+
+    def __init__(self, budget, estimator=None, name='prompt', separator='\n\n'):
+        """初始化提示构建器
+
+        Args:
+            budget: 提示的token预算
+            estimator: TokenEstimator实例，默认使用共享的估算器
+            name: 提示名称，用于日志
+            separator: 段之间的分隔符
+        """
+        self.budget = budget
+        self.estimator = estimator or token_estimator
+        self.name = name
+        self.separator = separator
+        self._sections = []
+
+    def add(self, name, text, priority=0, required=False):
+        """添加文本段
+
+        Args:
+            name: 段名称
+            text: 段内容，为空时忽略
+            priority: 优先级，超出预算时优先级低的段先被移除
+            required: 是否必须保留
+
+        Returns:
+            self，便于链式调用
+        """
+        if text:
+            self._sections.append({'name': name, 'text': text, 'priority': priority,
+                                   'required': required, 'items': None})
+        return self
+
+    def add_items(self, name, items, render, priority=0, max_tokens=None):
+        """添加列表段
+
+        Args:
+            name: 段名称
+            items: 按重要性排序的条目列表
+            render: 把条目列表渲染为段内容的函数
+            priority: 优先级
+            max_tokens: 该段单独的token上限，超出时从末尾移除条目
+
+        Returns:
+            self，便于链式调用
+        """
+        if items:
+            self._sections.append({'name': name, 'items': list(items), 'render': render,
+                                   'priority': priority, 'required': False, 'max_tokens': max_tokens,
+                                   'text': render(items), 'dropped_items': 0})
+        return self
+
+    def _drop_item(self, section):
+        """移除列表段末尾的条目，移除最后一条时清空该段"""
+        section['items'].pop()
+        section['dropped_items'] += 1
+        section['text'] = section['render'](section['items']) if section['items'] else ''
+
+    def build(self):
+        """按预算组装提示
+
+        Returns:
+            (提示, 报告)，报告包含预算、总token数、各段token数、被移除和被裁剪的段
+        """
+        count = self.estimator.count
+        separator_tokens = count(self.separator)
+
+        # 先按各列表段自身的上限裁剪
+        for section in self._sections:
+            if section['items'] is not None and section['max_tokens']:
+                while section['items'] and count(section['text']) > section['max_tokens']:
+                    self._drop_item(section)
+
+        def total():
+            texts = [section['text'] for section in self._sections if section['text']]
+            return sum(count(text) for text in texts) + separator_tokens * max(len(texts) - 1, 0)
+
+        # 超出预算时按优先级从低到高裁剪，同优先级先处理靠后的段
+        candidates = sorted(((section['priority'], -index, section) for index, section in enumerate(self._sections)
+                             if not section['required']), key=lambda candidate: candidate[:2])
+        for _, _, section in candidates:
+            if total() <= self.budget:
+                break
+            if section['items'] is None:
+                section['text'] = ''
+                continue
+            while section['items'] and total() > self.budget:
+                self._drop_item(section)
+
+        kept = [section for section in self._sections if section['text']]
+        prompt = self.separator.join(section['text'] for section in kept)
+        report = {
+            'name': self.name,
+            'budget': self.budget,
+            'total_tokens': total(),
+            'estimator': self.estimator.source,
+            'sections': {section['name']: count(section['text']) for section in kept},
+            'dropped': [section['name'] for section in self._sections if not section['text']],
+            'trimmed': {section['name']: section['dropped_items']
+                        for section in self._sections if section['items'] is not None and section['dropped_items']}
+        }
+        report['over_budget'] = report['total_tokens'] > self.budget
+        logger.info(f"{self.name}提示token数: {report['total_tokens']}/{self.budget}，各段: {report['sections']}，"
+                    f"移除: {report['dropped']}，裁剪条目: {report['trimmed']}")
+        return prompt, report
+
+
+def compact_json(value):
+    """紧凑JSON，提示中的结构化数据统一使用该格式"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+@lru_cache(maxsize=None)
+def _prompt_budgets():
+    """配置 llm.prompt_budget，只在首次使用时读取"""
+    return ConfigManager().get('llm.prompt_budget', {}) or {}
+
+
+def prompt_budget(prompt_name, default):
+    """读取某类提示的token预算
+
+    Args:
+        prompt_name: 提示名称
+        default: 未配置时的预算
+
+    Returns:
+        token预算
+    """
+    return _prompt_budgets().get(prompt_name, default)
+
+
+# 所有提示共享的token估算器
+token_estimator = TokenEstimator()
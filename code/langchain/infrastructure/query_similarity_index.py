@@ -0,0 +1,157 @@
+import hashlib
+import random
+import unicodedata
+from collections import defaultdict
+
+
+class QuerySimilarityIndex:
+    """相似查询候选索引（字符n-gram + MinHash-LSH）
+
+    中文查询没有天然的分词边界，因此以字符二元组（bigram）作为特征：
+    - 每条查询计算MinHash签名，签名按band切分后放入LSH桶
+    - 查找时只取与目标查询至少落入一个相同桶的查询作为候选，
+      候选数量与缓存总量无关，精确相似度只在少量候选上计算
+    """
+
+    def __init__(self, num_perm=32, bands=16, ngram=2, max_candidates=20, max_bucket_scan=256, seed=42):
+        """初始化索引
+
+        Args:
+            num_perm: MinHash签名长度
+            bands: LSH分段数，每段行数为 num_perm // bands
+            ngram: 字符n-gram长度
+            max_candidates: 单次查找返回的最大候选数量
+            max_bucket_scan: 单个桶超过该大小时视为无区分度（类似停用词）不再扫描，
+                保证单次查找的工作量有上限
+            seed: 生成哈希掩码的随机种子，保证签名在进程间稳定
+        """
+        if num_perm % bands != 0:
+            raise ValueError("num_perm必须能被bands整除")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+        self.max_candidates = max_candidates
+        self.max_bucket_scan = max_bucket_scan
+        rng = random.Random(seed)
+        self._masks = [rng.getrandbits(64) for _ in range(num_perm)]
+        # (band序号, band签名) -> 查询集合
+        self._buckets = defaultdict(set)
+        # 查询 -> 所在的桶键列表，用于删除
+        self._query_bands = {}
+
+    def __len__(self):
+        return len(self._query_bands)
+
+    def __contains__(self, query):
+        return query in self._query_bands
+
+    @staticmethod
+    def normalize(text):
+        """归一化查询文本：转小写，去除空白、标点和符号
+
+        Args:
+            text: 原始文本
+
+        Returns:
+            归一化后的文本
+        """
+        return ''.join(
+            ch for ch in text.lower()
+            if unicodedata.category(ch)[0] not in ('P', 'S', 'Z', 'C')
+        )
+
+    def _shingles(self, text):
+        """提取字符n-gram特征"""
+        normalized = self.normalize(text)
+        if len(normalized) < self.ngram:
+            return {normalized} if normalized else set()
+        return {normalized[i:i + self.ngram] for i in range(len(normalized) - self.ngram + 1)}
+
+    def _signature(self, text):
+        """计算MinHash签名"""
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+            for shingle in self._shingles(text)
+        ]
+        if not hashes:
+            return None
+        return [min(h ^ mask for h in hashes) for mask in self._masks]
+
+    def _band_keys(self, signature):
+        """将签名切分为LSH桶键"""
+        rows = self.rows
+        return [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def add(self, query):
+        """将查询加入索引
+
+        Args:
+            query: 查询文本
+        """
+        if query in self._query_bands:
+            return
+        signature = self._signature(query)
+        if signature is None:
+            return
+        band_keys = self._band_keys(signature)
+        for band_key in band_keys:
+            self._buckets[band_key].add(query)
+        self._query_bands[query] = band_keys
+
+    def remove(self, query):
+        """从索引中移除查询
+
+        Args:
+            query: 查询文本
+        """
+        band_keys = self._query_bands.pop(query, None)
+        if not band_keys:
+            return
+        for band_key in band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is None:
+                continue
+            bucket.discard(query)
+            if not bucket:
+                del self._buckets[band_key]
+
+    def candidates(self, query, limit=None):
+        """查找可能相似的候选查询
+
+        Args:
+            query: 查询文本
+            limit: 最大候选数量，默认使用max_candidates
+
+        Returns:
+            候选查询列表，按命中的桶数量降序排列
+        """
+        signature = self._signature(query)
+        if signature is None:
+            return []
+        collisions = defaultdict(int)
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key, ())
+            if len(bucket) > self.max_bucket_scan:
+                continue
+            for candidate in bucket:
+                collisions[candidate] += 1
+        limit = limit or self.max_candidates
+        ranked = sorted(collisions.items(), key=lambda x: x[1], reverse=True)
+        return [candidate for candidate, _ in ranked[:limit]]
+
+    def clear(self):
+        """清空索引"""
+        self._buckets.clear()
+        self._query_bands.clear()
+
+    def get_stats(self):
+        """获取索引统计信息
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            'indexed_queries': len(self._query_bands),
+            'bucket_count': len(self._buckets)
+        }
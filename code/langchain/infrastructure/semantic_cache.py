@@ -0,0 +1,254 @@
+import math
+import hashlib
+import threading
+import logging
+from collections import OrderedDict, defaultdict
+
+from .cache_store import AtomicCounter
+from .query_similarity_index import QuerySimilarityIndex
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - SemanticCache - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 语义缓存模式：off 不查找；audit 只记录本可命中的请求，不返回缓存；on 返回相似提示的缓存响应
+SEMANTIC_CACHE_MODES = ('off', 'audit', 'on')
+
+
+class SemanticLLMCache:
+    """LLM响应语义缓存（字符n-gram TF-IDF + 余弦相似度）
+
+    同一类提示中，用户输入部分措辞略有不同时精确缓存键无法命中。语义缓存对提示中的
+    用户输入部分计算字符n-gram TF-IDF向量，找出余弦相似度超过该提示类型阈值的已缓存提示，
+    复用其LLM响应。
+
+    - 提示中去掉用户输入后的其余部分（模板、检索到的政策和岗位等）必须完全相同，
+      只在这部分相同的提示之间比较用户输入，避免把基于不同上下文生成的回答返回给用户
+    - 只保存向量和对应的精确缓存键，响应本身仍由CacheManager的llm区域保存；
+      缓存项被淘汰或过期后，对应的语义条目在下次查找时移除
+    - 通过倒排索引只对共享n-gram的少量候选计算相似度
+    """
+
+    def __init__(self, mode='off', thresholds=None, default_threshold=0.85, ngram=2,
+                 max_entries=5000, max_candidates=20, max_posting_scan=256):
+        """初始化语义缓存
+
+        Args:
+            mode: 语义缓存模式，见SEMANTIC_CACHE_MODES
+            thresholds: 提示类型 -> 余弦相似度阈值
+            default_threshold: 未配置阈值的提示类型使用的阈值
+            ngram: 字符n-gram长度
+            max_entries: 最多保存的语义条目数量，超出时淘汰最早加入的条目
+            max_candidates: 单次查找最多计算相似度的候选数量
+            max_posting_scan: 倒排列表超过该长度的n-gram区分度太低，查找候选时跳过
+        """
+        if mode not in SEMANTIC_CACHE_MODES:
+            raise ValueError(f"未知的语义缓存模式: {mode}")
+        self.mode = mode
+        self.thresholds = dict(thresholds or {})
+        self.default_threshold = default_threshold
+        self.ngram = ngram
+        self.max_entries = max_entries
+        self.max_candidates = max_candidates
+        self.max_posting_scan = max_posting_scan
+        self._lock = threading.Lock()
+        # 条目ID -> (分区, 用户输入, n-gram词频, 精确缓存键)，按加入顺序淘汰
+        self._entries = OrderedDict()
+        # 分区 -> n-gram -> 条目ID集合
+        self._postings = defaultdict(lambda: defaultdict(set))
+        # 分区+用户输入 -> 条目ID，相同输入只保留一条
+        self._text_ids = {}
+        # 精确缓存键 -> 条目ID集合
+        self._key_ids = defaultdict(set)
+        # n-gram -> 包含该n-gram的条目数量，用于计算IDF
+        self._document_frequency = defaultdict(int)
+        self._next_id = 0
+        self.hit_count = AtomicCounter()
+        self.miss_count = AtomicCounter()
+        self.audit_hit_count = AtomicCounter()
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def threshold_for(self, prompt_type):
+        """提示类型对应的相似度阈值"""
+        return self.thresholds.get(prompt_type, self.default_threshold)
+
+    @staticmethod
+    def partition(prompt_type, prompt, text):
+        """按提示类型和提示中除用户输入外的内容划分比较范围
+
+        Args:
+            prompt_type: 提示类型
+            prompt: 完整提示
+            text: 提示中的用户输入部分
+
+        Returns:
+            分区标识
+        """
+        context = prompt.replace(text, '', 1) if text else prompt
+        digest = hashlib.blake2b(context.encode('utf-8'), digest_size=16).hexdigest()
+        return f"{prompt_type}:{digest}"
+
+    def _term_frequency(self, text):
+        """提取字符n-gram词频"""
+        normalized = QuerySimilarityIndex.normalize(text)
+        if len(normalized) < self.ngram:
+            return {normalized: 1} if normalized else {}
+        tf = defaultdict(int)
+        for i in range(len(normalized) - self.ngram + 1):
+            tf[normalized[i:i + self.ngram]] += 1
+        return dict(tf)
+
+    def _idf(self, gram, query_tf):
+        """平滑IDF，把查询本身也计入语料，避免查询独有的n-gram权重过高"""
+        document_frequency = self._document_frequency.get(gram, 0) + (1 if gram in query_tf else 0)
+        return math.log((len(self._entries) + 2) / (document_frequency + 1)) + 1
+
+    def _vector(self, tf, query_tf):
+        """按当前IDF计算归一化的TF-IDF稀疏向量"""
+        vector = {gram: count * self._idf(gram, query_tf) for gram, count in tf.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if not norm:
+            return {}
+        return {gram: weight / norm for gram, weight in vector.items()}
+
+    @staticmethod
+    def _cosine(vector_a, vector_b):
+        """两个归一化稀疏向量的余弦相似度"""
+        if len(vector_a) > len(vector_b):
+            vector_a, vector_b = vector_b, vector_a
+        return sum(weight * vector_b.get(gram, 0) for gram, weight in vector_a.items())
+
+    def add(self, prompt_type, prompt, text, key):
+        """记录一条已缓存的LLM响应
+
+        Args:
+            prompt_type: 提示类型
+            prompt: 完整提示
+            text: 提示中的用户输入部分
+            key: 响应在CacheManager中的精确缓存键
+        """
+        if not self.enabled or not text:
+            return
+        tf = self._term_frequency(text)
+        if not tf:
+            return
+        partition = self.partition(prompt_type, prompt, text)
+        with self._lock:
+            existing = self._text_ids.get((partition, text))
+            if existing is not None:
+                self._remove(existing)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (partition, text, tf, key)
+            self._text_ids[(partition, text)] = entry_id
+            self._key_ids[key].add(entry_id)
+            postings = self._postings[partition]
+            for gram in tf:
+                postings[gram].add(entry_id)
+                self._document_frequency[gram] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def lookup(self, prompt_type, prompt, text):
+        """查找用户输入最相似的已缓存提示
+
+        Args:
+            prompt_type: 提示类型
+            prompt: 完整提示
+            text: 提示中的用户输入部分
+
+        Returns:
+            (精确缓存键, 相似度, 已缓存的用户输入)，没有超过阈值的候选时返回None
+        """
+        if not self.enabled or not text:
+            return None
+        tf = self._term_frequency(text)
+        partition = self.partition(prompt_type, prompt, text)
+        with self._lock:
+            postings = self._postings.get(partition)
+            if not tf or not postings:
+                return None
+            shared = defaultdict(int)
+            for gram in tf:
+                ids = postings.get(gram, ())
+                if len(ids) > self.max_posting_scan:
+                    continue
+                for entry_id in ids:
+                    shared[entry_id] += 1
+            candidates = sorted(shared, key=shared.get, reverse=True)[:self.max_candidates]
+
+            query_vector = self._vector(tf, tf)
+            best = None
+            for entry_id in candidates:
+                _, cached_text, cached_tf, key = self._entries[entry_id]
+                similarity = self._cosine(query_vector, self._vector(cached_tf, tf))
+                if best is None or similarity > best[1]:
+                    best = (key, similarity, cached_text)
+
+        if best is None or best[1] < self.threshold_for(prompt_type):
+            return None
+        return best
+
+    def discard(self, key):
+        """移除指向某个精确缓存键的语义条目（缓存项已不存在时调用）"""
+        with self._lock:
+            for entry_id in list(self._key_ids.get(key, ())):
+                self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        """移除语义条目（调用方需持有锁）"""
+        partition, text, tf, key = self._entries.pop(entry_id)
+        self._text_ids.pop((partition, text), None)
+        key_ids = self._key_ids.get(key)
+        if key_ids is not None:
+            key_ids.discard(entry_id)
+            if not key_ids:
+                del self._key_ids[key]
+        postings = self._postings[partition]
+        for gram in tf:
+            ids = postings.get(gram)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del postings[gram]
+            self._document_frequency[gram] -= 1
+            if self._document_frequency[gram] <= 0:
+                del self._document_frequency[gram]
+        if not postings:
+            del self._postings[partition]
+
+    def clear(self):
+        """清空语义缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            self._text_ids.clear()
+            self._key_ids.clear()
+            self._document_frequency.clear()
+
+    def reset_stats(self):
+        """重置统计"""
+        self.hit_count.reset()
+        self.miss_count.reset()
+        self.audit_hit_count.reset()
+
+    def get_stats(self):
+        """获取语义缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            'mode': self.mode,
+            'entries': len(self._entries),
+            'hit_count': self.hit_count.value,
+            'miss_count': self.miss_count.value,
+            'audit_hit_count': self.audit_hit_count.value,
+            'thresholds': dict(self.thresholds, default=self.default_threshold)
+        }
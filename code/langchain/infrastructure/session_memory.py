@@ -0,0 +1,181 @@
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+
+from .cache_store import AtomicCounter
+from .config_manager import ConfigManager
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - SessionMemory - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class _SessionMemory:
+    """单个会话的对话记忆"""
+
+    __slots__ = ('messages', 'chars', 'last_access')
+
+    def __init__(self, now):
+        # (角色, 内容)，角色为user或ai
+        self.messages = deque()
+        self.chars = 0
+        self.last_access = now
+
+
+class SessionMemoryStore:
+    """按会话保存的有界对话记忆
+
+    - 每个会话最多保留max_messages条消息，超出时丢弃最早的消息
+    - 超过idle_ttl秒未访问的会话被移除
+    - 所有会话的消息总字符数超过max_total_chars时，按最近最少访问顺序移除会话
+    会话按访问顺序保存在OrderedDict中，过期和超预算检查都只需从头部开始，追加消息的开销与会话数量无关。
+    """
+
+    def __init__(self, max_messages=10, idle_ttl=1800, max_total_chars=2000000):
+        """初始化对话记忆存储
+
+        Args:
+            max_messages: 单个会话保留的最大消息数
+            idle_ttl: 会话的空闲过期时间（秒）
+            max_total_chars: 所有会话消息的总字符数上限
+        """
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.max_total_chars = max_total_chars
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._total_chars = 0
+        self.idle_evicted_count = AtomicCounter()
+        self.budget_evicted_count = AtomicCounter()
+
+    @classmethod
+    def from_config(cls, config_manager=None):
+        """按配置文件中的 llm.session_memory 创建对话记忆存储
+
+        Args:
+            config_manager: 配置管理器实例
+
+        Returns:
+            SessionMemoryStore实例
+        """
+        config = (config_manager or ConfigManager()).get('llm.session_memory', {}) or {}
+        return cls(max_messages=config.get('max_messages', 10),
+                   idle_ttl=config.get('idle_ttl_seconds', 1800),
+                   max_total_chars=config.get('max_total_chars', 2000000))
+
+    def add_messages(self, session_id, messages, now=None):
+        """向会话追加消息
+
+        Args:
+            session_id: 会话ID
+            messages: (角色, 内容) 列表
+            now: 当前时间，默认为time.time()
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            session = self._touch(session_id, now, create=True)
+            for role, content in messages:
+                content = content if isinstance(content, str) else str(content)
+                session.messages.append((role, content))
+                session.chars += len(content)
+                self._total_chars += len(content)
+            while len(session.messages) > self.max_messages:
+                self._drop_oldest(session)
+            self._evict(now, session_id)
+
+    def get_messages(self, session_id, now=None):
+        """获取会话的消息
+
+        Args:
+            session_id: 会话ID
+            now: 当前时间，默认为time.time()
+
+        Returns:
+            (角色, 内容) 列表，会话不存在或已过期时为空列表
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._evict(now)
+            session = self._touch(session_id, now)
+            return list(session.messages) if session else []
+
+    def clear(self, session_id=None):
+        """清空某个会话的记忆，session_id为None时清空所有会话"""
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+                self._total_chars = 0
+                return
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._total_chars -= session.chars
+
+    def _touch(self, session_id, now, create=False):
+        """获取会话并移到访问顺序末尾（调用方需持有锁）"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = _SessionMemory(now)
+            self._sessions[session_id] = session
+        else:
+            self._sessions.move_to_end(session_id)
+            session.last_access = now
+        return session
+
+    def _drop_oldest(self, session):
+        """丢弃会话中最早的消息（调用方需持有锁）"""
+        _, content = session.messages.popleft()
+        session.chars -= len(content)
+        self._total_chars -= len(content)
+
+    def _evict(self, now, current=None):
+        """移除空闲过期的会话，超出总预算时按最近最少访问顺序移除会话（调用方需持有锁）
+
+        Args:
+            now: 当前时间
+            current: 正在写入的会话，超出预算时最后才处理，只丢弃其最早的消息
+        """
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_access + self.idle_ttl > now:
+                break
+            del self._sessions[session_id]
+            self._total_chars -= session.chars
+            self.idle_evicted_count.increment()
+
+        while self._total_chars > self.max_total_chars and self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session_id == current:
+                # 只剩当前会话时保留最新一条消息
+                if len(session.messages) <= 1:
+                    break
+                self._drop_oldest(session)
+                continue
+            del self._sessions[session_id]
+            self._total_chars -= session.chars
+            self.budget_evicted_count.increment()
+
+    def get_stats(self):
+        """获取对话记忆统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            sessions = len(self._sessions)
+            messages = sum(len(session.messages) for session in self._sessions.values())
+            total_chars = self._total_chars
+        return {
+            'sessions': sessions,
+            'messages': messages,
+            'total_chars': total_chars,
+            'max_total_chars': self.max_total_chars,
+            'max_messages': self.max_messages,
+            'idle_evicted': self.idle_evicted_count.value,
+            'budget_evicted': self.budget_evicted_count.value
+        }
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """请求合并（single-flight）
+
+    同一个键同一时刻只执行一次计算：第一个调用方（leader）执行计算，
+    其余并发调用方（follower）等待同一个Future并共享结果或异常。
+    计算结束后键即被释放，之后的调用会重新执行（通常已能命中缓存）。
+    """
+
+    def __init__(self):
+        """初始化请求合并器"""
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.leader_count = 0
+        self.shared_count = 0
+
+    def do(self, key, fn):
+        """执行或等待同一个键的计算
+
+        Args:
+            key: 合并键，通常为缓存键
+            fn: 无参计算函数
+
+        Returns:
+            (计算结果, 是否为共享结果)
+
+        Raises:
+            计算函数抛出的异常会同时抛给leader和所有follower
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._release(key)
+
+    async def ado(self, key, afn):
+        """do的异步版本，等待期间不阻塞事件循环
+
+        与do共用同一组进行中的计算：异步调用方可以等待线程中的同步计算，反之亦然。
+
+        Args:
+            key: 合并键，通常为缓存键
+            afn: 无参异步计算函数
+
+        Returns:
+            (计算结果, 是否为共享结果)
+        """
+        future, leader = self._join(key)
+        if not leader:
+            # shield：follower被取消时不能连带取消共享的Future
+            return await asyncio.shield(asyncio.wrap_future(future)), True
+
+        try:
+            result = await afn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._release(key)
+
+    def _join(self, key):
+        """加入同一个键的计算，返回 (Future, 是否为leader)"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.shared_count += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.leader_count += 1
+            return future, True
+
+    def _release(self, key):
+        """计算结束后释放键"""
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def in_flight_count(self):
+        """当前正在执行的计算数量"""
+        with self._lock:
+            return len(self._in_flight)
+
+    def get_stats(self):
+        """获取请求合并统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                'in_flight': len(self._in_flight),
+                'leader_count': self.leader_count,
+                'shared_count': self.shared_count
+            }
+
+    def reset_stats(self):
+        """重置统计信息"""
+        with self._lock:
+            self.leader_count = 0
+            self.shared_count = 0
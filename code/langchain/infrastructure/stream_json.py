@@ -0,0 +1,190 @@
+import json
+import logging
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - StreamJSON - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class StreamingJSONExtractor:
+    """LLM流式输出的增量JSON字段提取器
+
+    结构化回答是一个JSON对象，整体生成完才能json.loads。提取器逐段接收流式输出，
+    按字符维护字符串、转义和嵌套层级状态，顶层对象中的指定字段一完成就产出，
+    指定的数组字段则每完成一个元素就产出一个，不必等待整个对象生成结束。
+
+    - 第一个"{"之前的内容（如```json代码块标记）被忽略，顶层对象结束后的内容也被忽略
+    - 每个字符只扫描一次，字段完成时只解析该字段对应的片段
+    - 产出的事件为 {"field": 字段名, "value": 值}，数组元素额外包含 "index"
+    """
+
+    def __init__(self, fields=(), array_fields=()):
+        """初始化提取器
+
+        Args:
+            fields: 完成后整体产出的顶层字段
+            array_fields: 每完成一个元素就产出的顶层数组字段
+        """
+        self.fields = frozenset(fields)
+        self.array_fields = frozenset(array_fields)
+        self._text = ''
+        self._pos = 0
+        # 容器栈，元素为 {"kind": object/array, "key", "expect", "start", "literal", "index"}
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._root_start = None
+        self._root_end = None
+
+    @property
+    def complete(self):
+        """顶层对象是否已经完整接收"""
+        return self._root_end is not None
+
+    @property
+    def text(self):
+        """已接收的全部内容"""
+        return self._text
+
+    def feed(self, text):
+        """接收一段流式输出
+
+        Args:
+            text: 新的输出片段
+
+        Returns:
+            本段输出中完成的字段事件列表
+        """
+        events = []
+        if not text or self.complete:
+            self._text += text or ''
+            return events
+        self._text += text
+        for index in range(self._pos, len(self._text)):
+            self._scan(index, self._text[index], events)
+            if self.complete:
+                break
+        self._pos = len(self._text)
+        return events
+
+    def result(self):
+        """解析完整的顶层对象
+
+        Returns:
+            顶层对象，尚未接收完整或无法解析时为None
+        """
+        if not self.complete:
+            return None
+        try:
+            return json.loads(self._text[self._root_start:self._root_end])
+        except ValueError as e:
+            logger.warning(f"解析流式JSON失败: {e}")
+            return None
+
+    def replay(self, value):
+        """按字段事件的格式拆分已解析的对象，用于缓存命中时一次性产出各字段
+
+        Args:
+            value: 已解析的顶层对象
+
+        Returns:
+            字段事件列表，顺序与对象中字段的顺序一致
+        """
+        events = []
+        if not isinstance(value, dict):
+            return events
+        for key, item in value.items():
+            if key in self.array_fields and isinstance(item, list):
+                events.extend({"field": key, "index": index, "value": element} for index, element in enumerate(item))
+            elif key in self.fields:
+                events.append({"field": key, "value": item})
+        return events
+
+    def _scan(self, index, ch, events):
+        """处理一个字符"""
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == '\\':
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                self._end_string(index + 1, events)
+            return
+
+        if not self._stack:
+            if ch == '{':
+                self._root_start = index
+                self._push('object', index)
+            return
+
+        top = self._stack[-1]
+        if top['literal']:
+            # 数字、true/false/null在遇到分隔符时结束
+            if ch in ',}] \t\r\n':
+                self._value_done(top, top['start'], index, events)
+            else:
+                return
+
+        if ch in ' \t\r\n':
+            return
+        if ch == '"':
+            self._in_string = True
+            self._string_start = index
+            if top['kind'] == 'array' or top['expect'] == 'value':
+                top['start'] = index
+        elif ch in '{[':
+            top['start'] = index
+            self._push('object' if ch == '{' else 'array', index)
+        elif ch in '}]':
+            self._stack.pop()
+            if not self._stack:
+                self._root_end = index + 1
+            else:
+                parent = self._stack[-1]
+                self._value_done(parent, parent['start'], index + 1, events)
+        elif ch == ':':
+            top['expect'] = 'value'
+        elif ch == ',':
+            if top['kind'] == 'object':
+                top['expect'] = 'key'
+        else:
+            top['start'] = index
+            top['literal'] = True
+
+    def _push(self, kind, index):
+        self._stack.append({'kind': kind, 'key': None, 'expect': 'key' if kind == 'object' else 'value',
+                            'start': None, 'literal': False, 'index': 0})
+
+    def _end_string(self, end, events):
+        """字符串结束：对象的键或一个字符串值"""
+        top = self._stack[-1]
+        if top['kind'] == 'object' and top['expect'] == 'key':
+            top['key'] = json.loads(self._text[self._string_start:end])
+            top['expect'] = 'colon'
+        else:
+            self._value_done(top, self._string_start, end, events)
+
+    def _value_done(self, container, start, end, events):
+        """容器中的一个值完成，属于指定字段时产出事件"""
+        depth = len(self._stack)
+        if depth == 1 and container['key'] in self.fields:
+            self._emit(events, {"field": container['key']}, start, end)
+        elif depth == 2 and container['kind'] == 'array' and self._stack[0]['key'] in self.array_fields:
+            self._emit(events, {"field": self._stack[0]['key'], "index": container['index']}, start, end)
+        if container['kind'] == 'array':
+            container['index'] += 1
+        container['start'] = None
+        container['literal'] = False
+
+    def _emit(self, events, event, start, end):
+        try:
+            event["value"] = json.loads(self._text[start:end])
+        except ValueError as e:
+            logger.warning(f"解析流式字段 {event['field']} 失败: {e}")
+            return
+        events.append(event)
@@ -44,10 +44,23 @@ class Orchestrator:
         """处理用户查询"""
         return self.query_processor.process_query(user_input)
     
+    async def aprocess_query(self, user_input):
+        """异步处理用户查询，等待LLM响应期间不阻塞事件循环"""
+        return await self.query_processor.aprocess_query(user_input)
+    
+    def warm_up_query(self, user_input):
+        """缓存预热的规则阶段（不调用LLM）"""
+        return self.query_processor.warm_up(user_input)
+    
     def process_stream_query(self, user_input, session_id=None, conversation_history=None):
         """处理流式查询"""
         return self.stream_processor.process_stream_query(user_input, session_id, conversation_history)
     
+    async def aprocess_stream_query(self, user_input, session_id=None, conversation_history=None):
+        """异步处理流式查询（异步生成器），等待LLM输出期间不占用线程"""
+        async for chunk in self.stream_processor.aprocess_stream_query(user_input, session_id, conversation_history):
+            yield chunk
+    
     def handle_user_input(self, user_input, session_id=None, conversation_history=None):
         """处理用户输入，基于实时分析生成回答"""
         logger.info(f"处理用户输入: {user_input[:50]}..., session_id: {session_id}")
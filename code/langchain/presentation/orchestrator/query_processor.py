@@ -1,12 +1,32 @@
 import time
-import json
+import asyncio
 import logging
 from ...infrastructure.chatbot import ChatBot
+from ...infrastructure.llm_scheduler import LLMOverloadedError
 from ...infrastructure.policy_analyzer import PolicyAnalyzer
-from .utils import extract_user_preferences, generate_job_reasons, clean_policy_content
+from ...infrastructure.prompt_budget import PromptBuilder, compact_json, prompt_budget
+from .utils import (extract_user_preferences, generate_job_reasons, clean_policy_content,
+                    simplify_jobs_for_prompt, build_preference_text, build_user_input_text)
 
 logger = logging.getLogger(__name__)
 
+# 合并生成提示的输出格式和示例
+COMBINED_OUTPUT_FORMAT = """输出格式：
+{
+  "job_analysis":[{"id":"岗位ID","title":"岗位标题","reasons":{"positive":"推荐理由","negative":""}}],
+  "positive":"符合条件的政策及内容",
+  "negative":"不符合条件的政策及原因",
+  "suggestions":"主动建议"
+}"""
+
+COMBINED_EXAMPLE = """示例：
+{
+  "job_analysis":[{"id":"JOB_A02","title":"职业技能培训讲师","reasons":{"positive":"①持有中级电工证符合要求；②兼职模式满足灵活时间；③岗位特点与经验匹配","negative":""}}],
+  "positive":"您可申请《创业担保贷款贴息政策》（POLICY_A01）：最高贷50万、期限3年，LPR-150BP以上部分财政贴息。",
+  "negative":"根据《返乡创业扶持补贴政策》（POLICY_A03），您需满足'带动3人以上就业'方可申领2万补贴，当前信息未提及，建议补充就业证明后申请。",
+  "suggestions":"简历优化方案：1. 突出与推荐岗位相关的核心技能；2. 强调工作经验和成就；3. 展示学习能力和适应能力；4. 确保简历格式清晰，重点突出。"
+}"""
+
 
 class QueryProcessor:
     def __init__(self, orchestrator):
@@ -42,34 +62,86 @@ class QueryProcessor:
             return out_of_scope_response
         
         # 4. 检查缓存中是否有对应的查询结果（使用真实的intent_info）
-        cached_result = cache_manager.get_query_cache(user_input, intent_info)
+        cached_result = self._get_cached_query(cache_manager, user_input, intent_info, start_time)
         if cached_result:
-            logger.info("使用缓存的查询结果")
-            # 更新执行时间
-            cached_result["execution_time"] = time.time() - start_time
-            cached_result["from_cache"] = True
-            # 记录缓存统计
-            logger.info(f"缓存命中率: {cache_manager.get_cache_stats()['hit_rate']:.2f}%")
-            logger.info(f"查询处理完成（使用缓存），耗时: {cached_result['execution_time']:.2f}秒")
             return cached_result
         
         # 5. 并行检索相关政策和推荐
         relevant_policies, recommended_jobs = self._parallel_retrieve_policies_and_recommendations(user_input, intent_info)
         
         # 6. 合并LLM调用：同时生成岗位推荐理由和结构化回答
-        response, recommended_jobs = self._generate_combined_response(user_input, intent_info, relevant_policies, recommended_jobs)
+        response, recommended_jobs, llm_failed = self._generate_combined_response(user_input, intent_info, relevant_policies, recommended_jobs)
+        
+        return self._build_query_result(cache_manager, user_input, intent_info, relevant_policies, response, recommended_jobs, start_time,
+                                        cacheable=not llm_failed)
+    
+    async def aprocess_query(self, user_input):
+        """process_query的异步版本
+        
+        意图识别和合并生成的LLM调用在事件循环中等待，不占用线程；
+        政策和岗位检索是本地计算，放到线程池中执行，避免阻塞事件循环。
+        """
+        start_time = time.time()
+        logger.info(f"处理用户查询（异步）: {user_input[:50]}...")
+        
+        from ...infrastructure.cache_manager import CacheManager
+        cache_manager = CacheManager()
+        
+        # 1. 意图识别
+        intent_result = await self.orchestrator.intent_recognizer.ir_aidentify_intent(user_input)
+        intent_info = intent_result["result"]
+        
+        # 2. 验证意图是否在服务范围内
+        out_of_scope_response = self._validate_intent(intent_info, start_time)
+        if out_of_scope_response:
+            return out_of_scope_response
         
+        # 3. 检查缓存中是否有对应的查询结果
+        cached_result = self._get_cached_query(cache_manager, user_input, intent_info, start_time)
+        if cached_result:
+            return cached_result
+        
+        # 4. 并行检索相关政策和推荐
+        relevant_policies, recommended_jobs = await asyncio.to_thread(
+            self._parallel_retrieve_policies_and_recommendations, user_input, intent_info
+        )
+        
+        # 5. 合并LLM调用：同时生成岗位推荐理由和结构化回答
+        response, recommended_jobs, llm_failed = await self._agenerate_combined_response(
+            user_input, intent_info, relevant_policies, recommended_jobs
+        )
+        
+        return self._build_query_result(cache_manager, user_input, intent_info, relevant_policies, response, recommended_jobs, start_time,
+                                        cacheable=not llm_failed)
+    
+    def _get_cached_query(self, cache_manager, user_input, intent_info, start_time):
+        """获取缓存的查询结果，未命中时返回None"""
+        cached_result = cache_manager.get_query_cache(user_input, intent_info)
+        if not cached_result:
+            return None
+        logger.info("使用缓存的查询结果")
+        # 更新执行时间
+        cached_result["execution_time"] = time.time() - start_time
+        cached_result["from_cache"] = True
+        # 记录缓存统计
+        logger.info(f"缓存命中率: {cache_manager.get_cache_stats()['hit_rate']:.2f}%")
+        logger.info(f"查询处理完成（使用缓存），耗时: {cached_result['execution_time']:.2f}秒")
+        return cached_result
+    
+    def _build_query_result(self, cache_manager, user_input, intent_info, relevant_policies, response, recommended_jobs, start_time,
+                            cacheable=True):
+        """构建并缓存查询结果，LLM生成失败（cacheable为False）时不缓存"""
         end_time = time.time()
         execution_time = end_time - start_time
         logger.info(f"查询处理完成，耗时: {execution_time:.2f}秒")
         
-        # 7. 构建思考过程
+        # 1. 构建思考过程
         thinking_process = self._build_thinking_process(intent_info, recommended_jobs, relevant_policies, user_input)
         
-        # 8. 生成评估结果
+        # 2. 生成评估结果
         evaluation = self.orchestrator.evaluate_response(user_input, response)
         
-        # 9. 构建结果
+        # 3. 构建结果
         result = {
             "intent": intent_info,
             "relevant_policies": relevant_policies,
@@ -80,15 +152,26 @@ class QueryProcessor:
             "recommended_jobs": recommended_jobs
         }
         
-        # 10. 缓存查询结果
-        cache_manager.set_query_cache(user_input, intent_info, result)
+        # 4. 缓存查询结果，LLM生成失败时的默认回答不缓存
+        if cacheable:
+            cache_manager.set_query_cache(user_input, intent_info, result)
         
-        # 11. 记录缓存统计
+        # 5. 记录缓存统计
         logger.info(f"缓存命中率: {cache_manager.get_cache_stats()['hit_rate']:.2f}%")
         
-        # 12. 返回结果
+        # 6. 返回结果
         return result
     
+    def warm_up(self, user_input):
+        """缓存预热的规则阶段：规则意图识别 + 政策和岗位检索，不调用LLM
+        
+        只预热检索路径，不写入缓存；热门查询的意图、LLM响应和查询结果由预热的LLM阶段（process_query）写入。
+        """
+        intent_info = self.orchestrator.intent_recognizer.ir_rule_identify_intent(user_input)
+        if intent_info.get("needs_job_recommendation") or intent_info.get("needs_policy_recommendation"):
+            self._parallel_retrieve_policies_and_recommendations(user_input, intent_info)
+        return intent_info
+    
     def _identify_intent(self, user_input):
         """识别用户意图和实体"""
         intent_result = self.orchestrator.intent_recognizer.ir_identify_intent(user_input)
@@ -298,6 +381,49 @@ class QueryProcessor:
     
     def _generate_combined_response(self, user_input, intent_info, relevant_policies, recommended_jobs):
         """合并生成岗位推荐理由和结构化回答，减少LLM调用次数"""
+        relevant_policies, tasks = self._combined_tasks(user_input, intent_info, relevant_policies, recommended_jobs)
+        
+        # 使用批处理器处理任务
+        from ...infrastructure.llm_batch_processor import LMBatchProcessor
+        batch_processor = LMBatchProcessor()
+        
+        # 批量处理
+        results = batch_processor.batch_process(tasks)
+        
+        llm_failed = self._check_llm_results(results)
+        return self._apply_combined_results(results, user_input, relevant_policies, recommended_jobs) + (llm_failed,)
+    
+    async def _agenerate_combined_response(self, user_input, intent_info, relevant_policies, recommended_jobs):
+        """_generate_combined_response的异步版本"""
+        relevant_policies, tasks = self._combined_tasks(user_input, intent_info, relevant_policies, recommended_jobs)
+        
+        from ...infrastructure.llm_batch_processor import LMBatchProcessor
+        results = await LMBatchProcessor().abatch_process(tasks)
+        
+        llm_failed = self._check_llm_results(results)
+        return self._apply_combined_results(results, user_input, relevant_policies, recommended_jobs) + (llm_failed,)
+    
+    @staticmethod
+    def _check_llm_results(results):
+        """检查合并生成的任务结果
+        
+        Returns:
+            是否有任务失败，失败时得到的是默认回答，不应缓存
+            
+        Raises:
+            LLMOverloadedError: LLM调用因过载被调度器拒绝，请求直接失败
+        """
+        for result in results:
+            if result.get("overloaded"):
+                raise LLMOverloadedError(result.get("error", "LLM服务繁忙"))
+        return any(result.get("error") for result in results)
+    
+    def _combined_tasks(self, user_input, intent_info, relevant_policies, recommended_jobs):
+        """构建合并生成的批处理任务
+        
+        Returns:
+            (参与生成的政策, 任务列表)
+        """
         # 提取用户偏好
         from .utils import extract_user_preferences
         preferences = extract_user_preferences(intent_info, user_input)
@@ -309,19 +435,17 @@ class QueryProcessor:
         
         # 构建合并的prompt
         prompt = self._build_combined_prompt(user_input, intent_info, relevant_policies, recommended_jobs, time_preference, certificate_level)
-        
-        # 使用批处理器处理任务
-        from ...infrastructure.llm_batch_processor import LMBatchProcessor
-        batch_processor = LMBatchProcessor()
         tasks = [{
             "id": 1,
             "type": "combined_generation",
-            "prompt": prompt
+            "prompt": prompt,
+            # 提示中的用户输入部分，用于语义缓存匹配
+            "semantic_text": user_input
         }]
-        
-        # 批量处理
-        results = batch_processor.batch_process(tasks)
-        
+        return relevant_policies, tasks
+    
+    def _apply_combined_results(self, results, user_input, relevant_policies, recommended_jobs):
+        """把合并生成的结果写入推荐岗位，并补充不符合条件的政策说明"""
         # 处理结果
         job_analysis = []
         response_content = {"positive": "", "negative": "", "suggestions": ""}
@@ -401,75 +525,44 @@ class QueryProcessor:
         return response_content, recommended_jobs
     
     def _build_combined_prompt(self, user_input, intent_info, relevant_policies, recommended_jobs, time_preference, certificate_level):
-        """构建合并的prompt，同时生成岗位推荐理由和结构化回答"""
-        # 简洁的系统指令
-        prompt = f"你是专业政策咨询助手，为用户提供政策咨询和岗位推荐服务。\n\n"
+        """构建合并的prompt，同时生成岗位推荐理由和结构化回答
         
-        # 限制用户输入长度
-        prompt += f"用户输入: {user_input[:80]}...\n\n"
+        超出token预算时按优先级依次移除示例、排名靠后的岗位和政策，指令、用户输入、任务和输出格式始终保留
+        """
+        builder = PromptBuilder(prompt_budget("combined_generation", 1200), name="合并生成")
+        # 简洁的系统指令
+        builder.add("instructions", "你是专业政策咨询助手，为用户提供政策咨询和岗位推荐服务。", required=True)
+        builder.add("user_input", build_user_input_text(user_input), required=True)
         
         # 只包含必要的政策信息
-        simplified_policies = []
-        for policy in relevant_policies[:3]:  # 限制最多3个政策
-            simplified_policy = {
-                "policy_id": policy.get("policy_id"),
-                "title": policy.get("title"),
-                "category": policy.get("category"),
-                "key_info": policy.get("key_info")
-            }
-            simplified_policies.append(simplified_policy)
-        
-        prompt += f"政策: {json.dumps(simplified_policies, ensure_ascii=False, separators=(',', ':'))}\n\n"
+        simplified_policies = [{
+            "policy_id": policy.get("policy_id"),
+            "title": policy.get("title"),
+            "category": policy.get("category"),
+            "key_info": policy.get("key_info")
+        } for policy in relevant_policies[:3]]  # 限制最多3个政策
+        builder.add_items("policies", simplified_policies,
+                          lambda policies: f"政策: {compact_json(policies)}", priority=3)
         
         # 只包含必要的岗位信息
-        simplified_jobs = []
-        for job in recommended_jobs[:5]:  # 限制最多5个岗位
-            simplified_job = {
-                "job_id": job.get("job_id"),
-                "title": job.get("title"),
-                "req": job.get("requirements", [])[:2],  # 只取前2个要求
-                "feat": job.get("features", "")[:50]  # 限制特点长度
-            }
-            simplified_jobs.append(simplified_job)
-        
-        prompt += f"岗位: {json.dumps(simplified_jobs, ensure_ascii=False, separators=(',', ':'))}\n\n"
+        builder.add_items("jobs", simplify_jobs_for_prompt(recommended_jobs),
+                          lambda jobs: f"岗位: {compact_json(jobs)}", priority=2)
         
         # 简洁的用户偏好信息
-        pref_str = []
-        if time_preference:
-            pref_str.append(f"时间:{time_preference}")
-        if certificate_level:
-            pref_str.append(f"证书:{certificate_level}")
-        if pref_str:
-            prompt += f"偏好: {'; '.join(pref_str)}\n\n"
+        builder.add("preferences", build_preference_text(time_preference, certificate_level), priority=4)
         
         # 核心任务要求
-        prompt += f"任务: 同时完成以下两个任务\n"
-        prompt += f"1. 岗位推荐理由：为每个岗位生成3条简洁推荐理由，使用①②③编号格式\n"
-        prompt += f"2. 政策咨询回答：生成结构化的政策咨询回答，包括肯定部分、否定部分和主动建议\n\n"
+        builder.add("task", "任务: 同时完成以下两个任务\n"
+                            "1. 岗位推荐理由：为每个岗位生成3条简洁推荐理由，使用①②③编号格式\n"
+                            "2. 政策咨询回答：生成结构化的政策咨询回答，包括肯定部分、否定部分和主动建议", required=True)
         
         # 输出格式
-        prompt += f"输出格式：\n"
-        prompt += f"{{\n"
-        prompt += f"  \"job_analysis\":[{{\"id\":\"岗位ID\",\"title\":\"岗位标题\",\"reasons\":{{\"positive\":\"推荐理由\",\"negative\":\"\"}}}}],\n"
-        prompt += f"  \"positive\":\"符合条件的政策及内容\",\n"
-        prompt += f"  \"negative\":\"不符合条件的政策及原因\",\n"
-        prompt += f"  \"suggestions\":\"主动建议\"\n"
-        prompt += f"}}\n\n"
+        builder.add("output_format", COMBINED_OUTPUT_FORMAT, required=True)
         
         # 简洁的示例
-        prompt += f"示例：\n"
-        prompt += f"{{\n"
-        prompt += f"  \"job_analysis\":[{{\"id\":\"JOB_A02\",\"title\":\"职业技能培训讲师\",\"reasons\":{{\"positive\":\"①持有中级电工证符合要求；②兼职模式满足灵活时间；③岗位特点与经验匹配\",\"negative\":\"\"}}}}],\n"
-        prompt += f"  \"positive\":\"您可申请《创业担保贷款贴息政策》（POLICY_A01）：最高贷50万、期限3年，LPR-150BP以上部分财政贴息。\",\n"
-        prompt += f"  \"negative\":\"根据《返乡创业扶持补贴政策》（POLICY_A03），您需满足'带动3人以上就业'方可申领2万补贴，当前信息未提及，建议补充就业证明后申请。\",\n"
-        prompt += f"  \"suggestions\":\"简历优化方案：1. 突出与推荐岗位相关的核心技能；2. 强调工作经验和成就；3. 展示学习能力和适应能力；4. 确保简历格式清晰，重点突出。\"\n"
-        prompt += f"}}"
-        
-        # 严格限制prompt长度
-        if len(prompt) > 1000:
-            prompt = prompt[:1000] + "...\n\n请直接输出JSON格式回答。"
+        builder.add("example", COMBINED_EXAMPLE, priority=1)
         
+        prompt, _ = builder.build()
         logger.info(f"生成的合并提示: {prompt[:100]}...")
         return prompt
     
@@ -2,15 +2,19 @@ import json
 import logging
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-from typing import List, Dict, Any, Generator
+from typing import List, Dict, Any, Generator, AsyncGenerator
 
 from ...infrastructure.chatbot import ChatBot
 from ...infrastructure.policy_analyzer import PolicyAnalyzer
 from ...infrastructure.cache_manager import CacheManager
+from ...infrastructure.llm_batch_processor import LMBatchProcessor
 from .utils import extract_user_preferences, generate_resume_suggestions, generate_job_reasons
 
 logger = logging.getLogger(__name__)
 
+# 流式发送的回答字段
+ANSWER_FIELDS = ("positive", "negative", "suggestions")
+
 
 class StreamProcessor:
     def __init__(self, orchestrator):
@@ -69,6 +73,43 @@ class StreamProcessor:
             # 缓存流式查询结果
             self._cache_result(cache_key, stream_results)
     
+    async def aprocess_stream_query(self, user_input: str, session_id: str = None,
+                                    conversation_history: List[Dict] = None) -> AsyncGenerator[str, None]:
+        """process_stream_query的异步版本（异步生成器）
+        
+        意图识别和合并生成的LLM调用（包括流式输出）在事件循环中等待，不占用线程；
+        检索等本地计算放到线程池中执行，避免阻塞事件循环。
+        """
+        logger.info(f"处理流式查询（异步）: {user_input[:50]}..., session_id: {session_id}")
+        cache_key = self.cache_manager.generate_cache_key('stream_query', user_input)
+        stream_results = []
+        
+        try:
+            # 1. 识别意图
+            intent_info = await self._aidentify_intent(user_input)
+            entities_info = intent_info.get('entities', [])
+            entity_descriptions = self._extract_entity_descriptions(entities_info)
+            intent_content = f"意图与实体识别: 核心意图：{intent_info['intent']}，提取实体：{', '.join(entity_descriptions)}"
+            for chunk in self._stream_chunk('thinking', intent_content, stream_results):
+                yield chunk
+            
+            # 2. 验证意图是否在服务范围内
+            needs_job = intent_info.get("needs_job_recommendation", False)
+            needs_policy = intent_info.get("needs_policy_recommendation", False)
+            if not (needs_job or needs_policy):
+                for chunk in self._handle_out_of_scope(intent_info, entity_descriptions, stream_results):
+                    yield chunk
+            else:
+                async for chunk in self._ahandle_in_scope(user_input, intent_info, entities_info, needs_job, needs_policy,
+                                                          conversation_history, stream_results):
+                    yield chunk
+        except Exception as e:
+            logger.error(f"流式处理异常: {e}")
+            for chunk in self._stream_chunk('error', f"处理过程中出现错误: {str(e)}", stream_results):
+                yield chunk
+        finally:
+            self._cache_result(cache_key, stream_results)
+    
     def _get_cached_result(self, cache_key: str) -> List[str]:
         """获取缓存的结果"""
         cached_result = self.cache_manager.get(cache_key)
@@ -107,6 +148,20 @@ class StreamProcessor:
                 "needs_policy_recommendation": False
             }
     
+    async def _aidentify_intent(self, user_input: str) -> Dict[str, Any]:
+        """_identify_intent的异步版本"""
+        try:
+            intent_result = await self.orchestrator.intent_recognizer.ir_aidentify_intent(user_input)
+            return intent_result["result"]
+        except Exception as e:
+            logger.error(f"意图识别失败: {e}")
+            return {
+                "intent": "通用查询",
+                "entities": [],
+                "needs_job_recommendation": False,
+                "needs_policy_recommendation": False
+            }
+    
     def _extract_entity_descriptions(self, entities_info: List[Dict]) -> List[str]:
         """提取实体描述"""
         entity_descriptions = []
@@ -162,130 +217,236 @@ class StreamProcessor:
         # 4. 处理分析结果
         if analysis_result.get('needs_more_info', False):
             # 需要追问
-            follow_up_data = {
-                "content": analysis_result.get('follow_up_question'),
-                "missing_info": analysis_result.get('missing_info')
-            }
-            yield from self._stream_chunk('follow_up', follow_up_data, stream_results)
-        else:
-            # 开始分析
-            yield from self._stream_chunk('analysis_start', "开始分析用户需求...", stream_results)
-            
-            # 5. 并行检索政策和推荐（仅对需要的服务）
-            logger.info("开始并行处理任务")
-            
-            # 定义并行任务
-            def retrieve_policy_data():
-                """检索政策数据"""
-                if needs_policy:
-                    return self.orchestrator.policy_retriever.pr_process_query(user_input, intent_info)
-                return {"relevant_policies": [], "recommended_jobs": []}
-            
-            def generate_suggestions():
-                """生成简历优化建议"""
-                return generate_resume_suggestions(user_input, [])
-            
-            # 执行并行任务
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                # 提交任务
-                policy_future = executor.submit(retrieve_policy_data)
-                suggestions_future = executor.submit(generate_suggestions)
-                
-                # 获取结果
-                retrieve_result = policy_future.result()
-                suggestions = suggestions_future.result()
-            
-            relevant_policies = retrieve_result["relevant_policies"]
-            recommended_jobs = retrieve_result["recommended_jobs"]
-            recommended_courses = []
-            
-            # 构建精准检索与推理内容
-            retrieval_content = self._build_retrieval_content(needs_job, needs_policy)
-            
-            # 发送精准检索与推理的开始
-            yield from self._stream_chunk('thinking', retrieval_content, stream_results)
-            
-            # 发送岗位检索结果
-            if needs_job:
-                yield from self._stream_chunk('thinking', f"岗位检索: 生成 {len(recommended_jobs)} 个岗位推荐", stream_results)
-            
-            # 发送政策检索结果
+            yield from self._follow_up_chunk(analysis_result, stream_results)
+            return
+        
+        # 开始分析
+        yield from self._stream_chunk('analysis_start', "开始分析用户需求...", stream_results)
+        
+        # 5. 并行检索政策和推荐（仅对需要的服务）
+        relevant_policies, recommended_jobs, suggestions = self._retrieve_for_stream(user_input, intent_info, needs_policy)
+        yield from self._retrieval_chunks(needs_job, needs_policy, relevant_policies, recommended_jobs, stream_results)
+        
+        # 6. 流式生成回答，回答字段和岗位推荐理由一完成就发送
+        response, recommended_jobs = yield from self._stream_combined_response(
+            user_input, intent_info, relevant_policies, recommended_jobs, suggestions, stream_results
+        )
+        
+        # 7. 返回分析结果，8. 分析完成
+        yield from self._analysis_result_chunks(user_input, intent_info, entities_info, needs_job, needs_policy,
+                                                relevant_policies, recommended_jobs, response, stream_results)
+    
+    async def _ahandle_in_scope(self, user_input: str, intent_info: Dict, entities_info: List[Dict],
+                                needs_job: bool, needs_policy: bool, conversation_history: List[Dict],
+                                stream_results: List[str]) -> AsyncGenerator[str, None]:
+        """_handle_in_scope的异步版本"""
+        analysis_result = await asyncio.to_thread(
+            self.orchestrator.policy_retriever.pr_analyze_input, user_input, conversation_history
+        )
+        if analysis_result.get('needs_more_info', False):
+            for chunk in self._follow_up_chunk(analysis_result, stream_results):
+                yield chunk
+            return
+        
+        for chunk in self._stream_chunk('analysis_start', "开始分析用户需求...", stream_results):
+            yield chunk
+        
+        relevant_policies, recommended_jobs, suggestions = await asyncio.to_thread(
+            self._retrieve_for_stream, user_input, intent_info, needs_policy
+        )
+        for chunk in self._retrieval_chunks(needs_job, needs_policy, relevant_policies, recommended_jobs, stream_results):
+            yield chunk
+        
+        # 流式生成回答：LLM输出在事件循环中等待
+        query_processor = self.orchestrator.query_processor
+        combined_policies, tasks = query_processor._combined_tasks(user_input, intent_info, relevant_policies, recommended_jobs)
+        outcome = {}
+        async for event in LMBatchProcessor().astream_task(tasks[0], fields=ANSWER_FIELDS, array_fields=("job_analysis",),
+                                                           outcome=outcome):
+            for chunk in self._stream_field(event, stream_results):
+                yield chunk
+        # 规则引擎降级可能调用LLM，放到线程池中执行
+        response, recommended_jobs = await asyncio.to_thread(
+            self._finish_combined_response, outcome["task_result"], user_input, intent_info, combined_policies,
+            relevant_policies, recommended_jobs, suggestions
+        )
+        
+        for chunk in self._analysis_result_chunks(user_input, intent_info, entities_info, needs_job, needs_policy,
+                                                  relevant_policies, recommended_jobs, response, stream_results):
+            yield chunk
+    
+    def _follow_up_chunk(self, analysis_result: Dict, stream_results: List[str]) -> Generator[str, None, None]:
+        """发送追问"""
+        follow_up_data = {
+            "content": analysis_result.get('follow_up_question'),
+            "missing_info": analysis_result.get('missing_info')
+        }
+        yield from self._stream_chunk('follow_up', follow_up_data, stream_results)
+    
+    def _retrieve_for_stream(self, user_input: str, intent_info: Dict, needs_policy: bool) -> tuple:
+        """并行检索政策、岗位和生成简历优化建议
+        
+        Returns:
+            (相关政策, 推荐岗位, 简历优化建议)
+        """
+        logger.info("开始并行处理任务")
+        
+        # 定义并行任务
+        def retrieve_policy_data():
+            """检索政策数据"""
             if needs_policy:
-                yield from self._stream_chunk('thinking', f"政策检索: 分析 {len(relevant_policies)} 条相关政策", stream_results)
-            
-            # 6. 生成回答
-            yield from self._stream_chunk('thinking', "生成结构化回答...", stream_results)
-            
-            # 生成默认的响应
-            response = {
-                "positive": "",
-                "negative": "",
-                "suggestions": suggestions
-            }
+                return self.orchestrator.policy_retriever.pr_process_query(user_input, intent_info)
+            return {"relevant_policies": [], "recommended_jobs": []}
+        
+        def generate_suggestions():
+            """生成简历优化建议"""
+            return generate_resume_suggestions(user_input, [])
+        
+        # 执行并行任务
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            # 提交任务
+            policy_future = executor.submit(retrieve_policy_data)
+            suggestions_future = executor.submit(generate_suggestions)
             
-            # 尝试调用response_generator获取更详细的响应
+            # 获取结果
+            retrieve_result = policy_future.result()
+            suggestions = suggestions_future.result()
+        
+        return retrieve_result["relevant_policies"], retrieve_result["recommended_jobs"], suggestions
+    
+    def _retrieval_chunks(self, needs_job: bool, needs_policy: bool, relevant_policies: List[Dict],
+                          recommended_jobs: List[Dict], stream_results: List[str]) -> Generator[str, None, None]:
+        """发送检索结果的思考过程"""
+        # 发送精准检索与推理的开始
+        yield from self._stream_chunk('thinking', self._build_retrieval_content(needs_job, needs_policy), stream_results)
+        
+        # 发送岗位检索结果
+        if needs_job:
+            yield from self._stream_chunk('thinking', f"岗位检索: 生成 {len(recommended_jobs)} 个岗位推荐", stream_results)
+        
+        # 发送政策检索结果
+        if needs_policy:
+            yield from self._stream_chunk('thinking', f"政策检索: 分析 {len(relevant_policies)} 条相关政策", stream_results)
+        
+        yield from self._stream_chunk('thinking', "生成结构化回答...", stream_results)
+    
+    def _analysis_result_chunks(self, user_input: str, intent_info: Dict, entities_info: List[Dict], needs_job: bool,
+                                needs_policy: bool, relevant_policies: List[Dict], recommended_jobs: List[Dict],
+                                response: Dict, stream_results: List[str]) -> Generator[str, None, None]:
+        """发送分析结果和分析完成事件"""
+        # 构建详细的思考过程
+        retrieval_content = self._build_retrieval_content(needs_job, needs_policy)
+        thinking_process = self._build_thinking_process(needs_job, needs_policy, recommended_jobs, relevant_policies, 
+                                                      entities_info, user_input, intent_info, retrieval_content)
+        
+        # 不符合条件的政策信息已经在合并生成结果中处理，这里不再重复处理
+        analysis_result_data = {
+            "type": "analysis_result",
+            "content": response,
+            "intent": intent_info,
+            "relevant_policies": relevant_policies,
+            "recommended_jobs": recommended_jobs,
+            "recommended_courses": [],
+            "thinking_process": thinking_process
+        }
+        # 确保思考过程不为空
+        if not analysis_result_data["thinking_process"]:
+            # 添加默认思考过程
+            analysis_result_data["thinking_process"] = [
+                {
+                    "step": "意图与实体识别",
+                    "content": f"核心意图：{intent_info['intent']}，提取实体：{', '.join(self._extract_entity_descriptions(entities_info))}",
+                    "status": "completed"
+                },
+                {
+                    "step": "分析完成",
+                    "content": "已完成分析，未找到相关岗位或政策信息",
+                    "status": "completed"
+                }
+            ]
+        logger.info(f"发送analysis_result事件，思考过程长度: {len(analysis_result_data['thinking_process'])}")
+        # 直接发送analysis_result_data，不使用_stream_chunk方法，因为它会添加额外的content字段
+        chunk = json.dumps(analysis_result_data, ensure_ascii=False)
+        stream_results.append(chunk)
+        yield chunk
+        
+        # 分析完成
+        yield from self._stream_chunk('analysis_complete', "分析完成", stream_results)
+    
+    def _stream_combined_response(self, user_input: str, intent_info: Dict, relevant_policies: List[Dict],
+                                  recommended_jobs: List[Dict], suggestions: str,
+                                  stream_results: List[str]) -> Generator[str, None, tuple]:
+        """流式合并生成岗位推荐理由和结构化回答
+        
+        使用与非流式查询相同的合并生成提示，LLM输出中的positive、negative、suggestions
+        和job_analysis的每个元素一完成就作为answer_field事件发送，不必等待整个回答生成结束。
+        完整结果按非流式查询的规则写入推荐岗位，LLM调用失败时退回规则引擎生成的回答。
+        
+        Returns:
+            (回答, 推荐岗位)
+        """
+        query_processor = self.orchestrator.query_processor
+        combined_policies, tasks = query_processor._combined_tasks(user_input, intent_info, relevant_policies, recommended_jobs)
+        events = LMBatchProcessor().stream_task(tasks[0], fields=ANSWER_FIELDS, array_fields=("job_analysis",))
+        while True:
             try:
-                generated_response = self.orchestrator.response_generator.rg_generate_response(
-                    user_input,
-                    relevant_policies,
-                    "通用场景",
-                    recommended_jobs=recommended_jobs
-                )
-                
-                # 如果生成的响应不为空，使用它
-                if generated_response and isinstance(generated_response, dict):
-                    # 确保suggestions字段不为空
-                    if not generated_response.get('suggestions', ''):
-                        generated_response['suggestions'] = suggestions
-                    response = generated_response
-            except Exception as e:
-                logger.error(f"生成响应失败: {e}")
-                # 如果生成响应失败，使用默认的响应
-                pass
-            
-            # 构建详细的思考过程
-            thinking_process = self._build_thinking_process(needs_job, needs_policy, recommended_jobs, relevant_policies, 
-                                                          entities_info, user_input, intent_info, retrieval_content)
-            
-            # 生成岗位推荐理由
-            self._generate_job_recommendations(user_input, intent_info, recommended_jobs)
-            
-            # 7. 返回分析结果
-        # 不符合条件的政策信息已经由response_generator处理，这里不再重复处理
-            
-            analysis_result_data = {
-                "type": "analysis_result",
-                "content": response,
-                "intent": intent_info,
-                "relevant_policies": relevant_policies,
-                "recommended_jobs": recommended_jobs,
-                "recommended_courses": recommended_courses,
-                "thinking_process": thinking_process
-            }
-            # 确保思考过程不为空
-            if not analysis_result_data["thinking_process"]:
-                # 添加默认思考过程
-                analysis_result_data["thinking_process"] = [
-                    {
-                        "step": "意图与实体识别",
-                        "content": f"核心意图：{intent_info['intent']}，提取实体：{', '.join(self._extract_entity_descriptions(entities_info))}",
-                        "status": "completed"
-                    },
-                    {
-                        "step": "分析完成",
-                        "content": "已完成分析，未找到相关岗位或政策信息",
-                        "status": "completed"
-                    }
-                ]
-            logger.info(f"发送analysis_result事件，思考过程长度: {len(analysis_result_data['thinking_process'])}")
-            # 直接发送analysis_result_data，不使用_stream_chunk方法，因为它会添加额外的content字段
-            chunk = json.dumps(analysis_result_data, ensure_ascii=False)
-            stream_results.append(chunk)
-            yield chunk
-            
-            # 8. 分析完成
-            yield from self._stream_chunk('analysis_complete', "分析完成", stream_results)
+                event = next(events)
+            except StopIteration as stop:
+                task_result = stop.value
+                break
+            yield from self._stream_field(event, stream_results)
+        return self._finish_combined_response(task_result, user_input, intent_info, combined_policies,
+                                              relevant_policies, recommended_jobs, suggestions)
+    
+    def _finish_combined_response(self, task_result: Dict[str, Any], user_input: str, intent_info: Dict,
+                                  combined_policies: List[Dict], relevant_policies: List[Dict],
+                                  recommended_jobs: List[Dict], suggestions: str) -> tuple:
+        """按流式合并生成的结果写入推荐岗位，失败时退回规则引擎生成的回答
+        
+        Returns:
+            (回答, 推荐岗位)
+        """
+        query_processor = self.orchestrator.query_processor
+        if task_result.get("result"):
+            response, recommended_jobs = query_processor._apply_combined_results(
+                [task_result], user_input, combined_policies, recommended_jobs
+            )
+            if not response.get('suggestions', ''):
+                response['suggestions'] = suggestions
+            return response, recommended_jobs
+        
+        logger.warning(f"流式生成回答失败，使用规则引擎生成: {task_result.get('error')}")
+        response = {
+            "positive": "",
+            "negative": "",
+            "suggestions": suggestions
+        }
+        try:
+            generated_response = self.orchestrator.response_generator.rg_generate_response(
+                user_input,
+                relevant_policies,
+                "通用场景",
+                recommended_jobs=recommended_jobs
+            )
+            if generated_response and isinstance(generated_response, dict):
+                if not generated_response.get('suggestions', ''):
+                    generated_response['suggestions'] = suggestions
+                response = generated_response
+        except Exception as e:
+            logger.error(f"生成响应失败: {e}")
+        self._generate_job_recommendations(user_input, intent_info, recommended_jobs)
+        return response, recommended_jobs
+    
+    def _stream_field(self, event: Dict[str, Any], stream_results: List[str]) -> Generator[str, None, None]:
+        """发送回答中已完成的字段，岗位推荐理由附带其在job_analysis中的序号"""
+        data = {"type": "answer_field", "field": event["field"]}
+        if "index" in event:
+            data["index"] = event["index"]
+        data["content"] = event["value"]
+        chunk = json.dumps(data, ensure_ascii=False)
+        stream_results.append(chunk)
+        yield chunk
     
     def _build_retrieval_content(self, needs_job: bool, needs_policy: bool) -> str:
         """构建精准检索与推理内容"""
@@ -1,5 +1,5 @@
-import json
 from ...infrastructure.llm_batch_processor import LMBatchProcessor
+from ...infrastructure.prompt_budget import PromptBuilder, compact_json, prompt_budget, token_estimator
 
 
 
@@ -202,48 +202,56 @@ def clean_policy_content(reasons):
     return reasons
 
 
-def build_job_analysis_prompt(user_input, recommended_jobs, time_preference, certificate_level):
-    """构建岗位分析的prompt"""
-    # 简洁的系统指令
-    prompt = f"你是专业政策咨询助手，为用户生成岗位推荐理由。\n\n"
-    
-    # 限制用户输入长度
-    prompt += f"用户输入: {user_input[:80]}...\n\n"
-    
-    # 只包含必要的岗位信息
-    simplified_jobs = []
-    for job in recommended_jobs[:5]:  # 限制最多5个岗位
-        simplified_job = {
-            "job_id": job.get("job_id"),
-            "title": job.get("title"),
-            "req": job.get("requirements", [])[:2],  # 只取前2个要求
-            "feat": job.get("features", "")[:50]  # 限制特点长度
-        }
-        simplified_jobs.append(simplified_job)
-    
-    prompt += f"岗位: {json.dumps(simplified_jobs, ensure_ascii=False, separators=(',', ':'))}\n\n"
-    
-    # 简洁的用户偏好信息
+def simplify_jobs_for_prompt(recommended_jobs):
+    """提取岗位中提示需要的字段，按推荐顺序排列"""
+    return [{
+        "job_id": job.get("job_id"),
+        "title": job.get("title"),
+        "req": job.get("requirements", [])[:2],  # 只取前2个要求
+        "feat": job.get("features", "")[:50]  # 限制特点长度
+    } for job in recommended_jobs[:5]]  # 限制最多5个岗位
+
+
+def build_preference_text(time_preference, certificate_level):
+    """生成提示中的用户偏好段，没有偏好时返回空字符串"""
     pref_str = []
     if time_preference:
         pref_str.append(f"时间:{time_preference}")
     if certificate_level:
         pref_str.append(f"证书:{certificate_level}")
-    if pref_str:
-        prompt += f"偏好: {'; '.join(pref_str)}\n\n"
+    return f"偏好: {'; '.join(pref_str)}" if pref_str else ""
+
+
+def build_user_input_text(user_input, max_tokens=200):
+    """生成提示中的用户输入段，超过max_tokens时截断"""
+    truncated = token_estimator.truncate(user_input, max_tokens)
+    return f"用户输入: {truncated}" + ("..." if truncated != user_input else "")
+
+
+def build_job_analysis_prompt(user_input, recommended_jobs, time_preference, certificate_level):
+    """构建岗位分析的prompt，超出token预算时先移除示例，再移除排名靠后的岗位"""
+    builder = PromptBuilder(prompt_budget("job_analysis", 800), name="岗位分析")
+    # 简洁的系统指令
+    builder.add("instructions", "你是专业政策咨询助手，为用户生成岗位推荐理由。", required=True)
+    builder.add("user_input", build_user_input_text(user_input), required=True)
+    # 只包含必要的岗位信息
+    builder.add_items("jobs", simplify_jobs_for_prompt(recommended_jobs),
+                      lambda jobs: f"岗位: {compact_json(jobs)}", priority=3)
+    builder.add("preferences", build_preference_text(time_preference, certificate_level), priority=4)
     
     # 核心分析要求
-    prompt += f"要求：\n"
-    prompt += f"1. 为每个岗位生成3条简洁推荐理由\n"
-    prompt += f"2. 使用①②③编号格式\n"
-    prompt += f"3. 严格按JSON输出，无其他内容\n\n"
+    builder.add("task", "要求：\n"
+                        "1. 为每个岗位生成3条简洁推荐理由\n"
+                        "2. 使用①②③编号格式\n"
+                        "3. 严格按JSON输出，无其他内容", required=True)
     
     # 简洁的输出结构
-    prompt += f"输出结构：{{\"job_analysis\":[{{\"id\":\"岗位ID\",\"title\":\"岗位标题\",\"reasons\":{{\"positive\":\"推荐理由\",\"negative\":\"\"}}}}]}}\n\n"
+    builder.add("output_format", "输出结构：{\"job_analysis\":[{\"id\":\"岗位ID\",\"title\":\"岗位标题\",\"reasons\":{\"positive\":\"推荐理由\",\"negative\":\"\"}}]}", required=True)
     
     # 简洁的示例
-    prompt += f"示例：{{\"job_analysis\":[{{\"id\":\"JOB_A02\",\"title\":\"职业技能培训讲师\",\"reasons\":{{\"positive\":\"①持有中级电工证符合要求；②兼职模式满足灵活时间；③岗位特点与经验匹配\",\"negative\":\"\"}}}}]}}"
+    builder.add("example", "示例：{\"job_analysis\":[{\"id\":\"JOB_A02\",\"title\":\"职业技能培训讲师\",\"reasons\":{\"positive\":\"①持有中级电工证符合要求；②兼职模式满足灵活时间；③岗位特点与经验匹配\",\"negative\":\"\"}}]}", priority=1)
     
+    prompt, _ = builder.build()
     return prompt
 
 
@@ -34,6 +34,11 @@ from langchain.presentation.orchestrator import Orchestrator
 from langchain.business.job_matcher import JobMatcher
 from langchain.business.user_matcher import UserMatcher
 from langchain.infrastructure.history_manager import HistoryManager
+from langchain.infrastructure.cache_warmer import CacheWarmer
+from langchain.infrastructure.config_manager import ConfigManager
+from langchain.infrastructure.chatbot import http_pool, micro_batcher, session_memory, hedger, llm_scheduler, model_router
+from langchain.infrastructure.llm_scheduler import llm_priority, PRIORITY_BATCH, LLMOverloadedError
+from langchain.infrastructure.prompt_budget import token_estimator
 
 # 初始化应用
 app = FastAPI(title="政策咨询智能体API", description="政策咨询智能体POC服务")
@@ -87,6 +92,24 @@ agent = Orchestrator()
 # 初始化历史记录管理器
 history_manager = HistoryManager()
 
+# 后台加载tiktoken编码，加载完成前按字符类型估算提示token数
+token_estimator.start_loading()
+
+# 后台缓存预热：用对话历史中的热门查询预热缓存，不阻塞服务启动
+warmup_config = ConfigManager().get('cache.warmup', {})
+cache_warmer = None
+if warmup_config.get('enabled', False):
+    cache_warmer = CacheWarmer(
+        rule_fn=agent.warm_up_query,
+        llm_fn=agent.process_query,
+        history_file=history_manager.storage_file,
+        top_n=warmup_config.get('top_n', 10),
+        time_budget=warmup_config.get('time_budget_seconds', 60),
+        use_llm=warmup_config.get('use_llm', True),
+        llm_concurrency=warmup_config.get('llm_concurrency', 1)
+    )
+    cache_warmer.start()
+
 # 请求模型
 class ChatRequest(BaseModel):
     message: str
@@ -184,11 +207,11 @@ async def chat_stream(request: ChatRequest):
             # 发送 session_id 给前端，以便后续使用
             yield f"event: session\ndata: {json.dumps({'session_id': session_id})}\n\n"
 
-            # 获取流式生成器
-            stream = agent.process_stream_query(request.message, session_id, conversation_history)
+            # 获取异步流式生成器，等待下一段输出时不阻塞事件循环
+            stream = agent.aprocess_stream_query(request.message, session_id, conversation_history)
             
             # 处理流式响应
-            for chunk in stream:
+            async for chunk in stream:
                 if chunk:
                     # 解析JSON数据
                     try:
@@ -208,6 +231,9 @@ async def chat_stream(request: ChatRequest):
                         elif event_type == "thinking":
                             # 思考过程事件
                             yield f"event: thinking\ndata: {chunk}\n\n"
+                        elif event_type == "answer_field":
+                            # 回答字段事件，字段生成完成即发送，最终内容以analysis_result为准
+                            yield f"event: answer_field\ndata: {chunk}\n\n"
                         elif event_type == "analysis_result":
                             # 分析结果事件
                             yield f"event: analysis_result\ndata: {chunk}\n\n"
@@ -264,7 +290,8 @@ async def chat(request: ChatRequest, raw_request: Request):
         if request.scenario != "general":
             result = agent.handle_scenario(request.scenario, request.message)
         else:
-            result = agent.process_query(request.message)
+            # 异步处理，等待LLM响应期间事件循环可以处理其他请求
+            result = await agent.aprocess_query(request.message)
         
         end_time = time.time()
         execution_time = end_time - start_time
@@ -286,6 +313,10 @@ async def chat(request: ChatRequest, raw_request: Request):
             data=optimized_result,
             execution_time=execution_time
         )
+    except LLMOverloadedError as e:
+        # LLM服务过载，直接返回503，客户端稍后重试
+        logger.warning(f"LLM服务过载，拒绝请求: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         end_time = time.time()
         execution_time = end_time - start_time
@@ -360,6 +391,14 @@ async def get_performance_metrics():
     """获取性能指标"""
     try:
         metrics = performance_monitor.get_metrics()
+        if cache_warmer is not None:
+            metrics["cache_warmup"] = cache_warmer.stats
+        metrics["llm_http_pool"] = http_pool.get_stats()
+        metrics["llm_micro_batch"] = micro_batcher.get_stats()
+        metrics["chat_memory"] = session_memory.get_stats()
+        metrics["llm_hedging"] = hedger.get_stats()
+        metrics["llm_scheduler"] = llm_scheduler.get_stats()
+        metrics["llm_routing"] = model_router.get_stats()
         return OptimizedResponse(
             success=True,
             data=metrics
@@ -672,7 +711,9 @@ async def batch_process(request: BatchRequest):
                     if chat_request.scenario != "general":
                         result = agent.handle_scenario(chat_request.scenario, chat_request.message)
                     else:
-                        result = agent.process_query(chat_request.message)
+                        # 批处理请求以批处理优先级排队，不影响交互请求的延迟
+                        with llm_priority(PRIORITY_BATCH):
+                            result = await agent.aprocess_query(chat_request.message)
                     item_result = result
                 
                 elif item.type == "policies":
@@ -706,6 +747,9 @@ async def batch_process(request: BatchRequest):
                         }
                 
                 item_result["success"] = True
+            except LLMOverloadedError:
+                # LLM服务过载时后续条目同样会被拒绝，整个批处理直接返回503
+                raise
             except Exception as e:
                 item_result = {
                     "success": False,
@@ -717,6 +761,9 @@ async def batch_process(request: BatchRequest):
         
         total_time = time.time() - start_time
         return BatchResponse(results=results, total_execution_time=total_time)
+    except LLMOverloadedError as e:
+        logger.warning(f"LLM服务过载，拒绝批处理请求: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"批量处理失败: {str(e)}")
 
@@ -0,0 +1,293 @@
+"""缓存性能微基准测试
+
+用法：
+    python code/test/benchmark_cache.py              # 运行全部基准
+    python code/test/benchmark_cache.py eviction     # 只运行指定基准
+"""
+import time
+import json
+import random
+import hashlib
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import logging
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain.infrastructure.cache_manager import CacheManager
+from langchain.infrastructure.disk_cache import DiskCache
+
+# 基准测试时关闭缓存管理器的日志输出，避免日志开销干扰结果
+logging.getLogger('langchain.infrastructure.cache_manager').setLevel(logging.WARNING)
+
+
+def _new_cache_manager(max_cache_size):
+    """创建一个新的缓存管理器实例（重置单例），每个缓存区域使用相同容量且不限制内存"""
+    CacheManager._instance = None
+    return CacheManager(max_cache_size=max_cache_size, max_memory_mb=4096)
+
+
+def benchmark_eviction(sizes=(1000, 10000, 100000, 1000000), ops=20000):
+    """测试缓存满载时set/get的单次耗时随容量的变化
+
+    缓存先填满到容量上限，之后的每次set都会触发一次淘汰。
+    """
+    print("=== 缓存满载时 set/get 单次耗时 ===")
+    print(f"{'容量':>10} {'set(μs)':>10} {'get命中(μs)':>12} {'get未命中(μs)':>14}")
+    for size in sizes:
+        cache_manager = _new_cache_manager(size)
+        for i in range(size):
+            cache_manager.set(f"fill:{i}", i, ttl=3600)
+
+        start = time.perf_counter()
+        for i in range(ops):
+            cache_manager.set(f"new:{i}", i, ttl=3600)
+        set_cost = (time.perf_counter() - start) / ops * 1e6
+
+        # 最近写入的键一定仍在缓存中
+        start = time.perf_counter()
+        for i in range(ops):
+            cache_manager.get(f"new:{i}")
+        hit_cost = (time.perf_counter() - start) / ops * 1e6
+
+        start = time.perf_counter()
+        for i in range(ops):
+            cache_manager.get(f"missing:{i}")
+        miss_cost = (time.perf_counter() - start) / ops * 1e6
+
+        print(f"{size:>10} {set_cost:>10.2f} {hit_cost:>12.2f} {miss_cost:>14.2f}")
+    CacheManager._instance = None
+
+
+def _generate_queries(count, seed=7):
+    """生成模拟的中文用户查询
+
+    由身份、技能、诉求、补充说明等片段随机组合并打乱顺序，
+    模拟真实流量中措辞各异的查询。
+    """
+    rng = random.Random(seed)
+    fragments = [
+        ['我是退役军人', '我是返乡农民工', '我刚从大学毕业', '我失业半年了', '我家是脱贫户', '我是残疾人',
+         '我在工厂做电工', '我开了一家个体小店', '我是低保家庭成员', '我在外地打工多年'],
+        ['持有中级电工证', '有高级电工证', '做过三年直播带货', '熟悉网店运营', '会电焊', '有厨师证',
+         '开过货车', '学过会计', '懂汽车维修', '会做短视频'],
+        ['想了解技能补贴政策', '想申请创业担保贷款', '想找一份兼职工作', '想入驻孵化基地', '想开一家小加工厂',
+         '想了解场地租金补贴', '想知道税收优惠怎么申请', '想参加技能培训', '想找固定时间的工作', '想带动老乡就业'],
+        ['家在县城', '孩子还小', '时间比较灵活', '希望离家近', '手头资金不多', '已经注册了营业执照',
+         '身体不太好', '明年打算扩大规模', '不太懂电脑', '每周只能工作三天'],
+    ]
+    queries = set()
+    while len(queries) < count:
+        parts = [rng.choice(group) for group in fragments if rng.random() < 0.9]
+        rng.shuffle(parts)
+        parts.append(f"今年{rng.randint(18, 60)}岁")
+        queries.add('，'.join(parts) + rng.choice(['。', '？', '，请问怎么办？', '，有什么建议？']))
+    return list(queries)
+
+
+def benchmark_similarity(sizes=(1000, 10000, 100000), lookups=200):
+    """测试相似查询查找耗时随已缓存查询数量的变化"""
+    print("=== 相似查询查找单次耗时 ===")
+    print(f"{'已缓存查询数':>12} {'查找(ms)':>10} {'平均候选数':>10}")
+    for size in sizes:
+        cache_manager = _new_cache_manager(size + 100)
+        queries = _generate_queries(size)
+        for i, query in enumerate(queries):
+            cache_manager.set(f"query:{i}", i, ttl=3600, query_text=query)
+
+        probes = [query[:-1] + '？' for query in queries[:lookups]]
+        candidate_total = 0
+        start = time.perf_counter()
+        for probe in probes:
+            cache_manager.find_similar_queries(probe)
+        lookup_cost = (time.perf_counter() - start) / lookups * 1e3
+        for probe in probes:
+            candidate_total += len(cache_manager.query_index.candidates(probe))
+
+        print(f"{size:>12} {lookup_cost:>10.2f} {candidate_total / lookups:>10.1f}")
+    CacheManager._instance = None
+
+
+def benchmark_concurrency(workers=(1, 2, 4, 8, 16), ops_per_worker=2000, io_wait=0.0005):
+    """并发压力测试：吞吐量随线程数的变化
+
+    模拟线程池中的查询流水线：每次操作读一次缓存，未命中时写入，并等待一段
+    模拟的检索/LLM I/O时间。I/O等待期间GIL被释放，吞吐量应随线程数增长；
+    如果缓存锁成为瓶颈，吞吐量会停滞。同时校验并发下命中/未命中计数没有丢失。
+    """
+    print("=== 并发压力测试（每次操作含模拟I/O等待） ===")
+    print(f"{'线程数':>8} {'吞吐量(ops/s)':>14} {'加速比':>8} {'计数校验':>8}")
+    baseline = None
+    for worker_count in workers:
+        cache_manager = _new_cache_manager(10000)
+        keys = [f"query:{i}" for i in range(5000)]
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(ops_per_worker):
+                key = rng.choice(keys)
+                if cache_manager.get(key) is None:
+                    cache_manager.set(key, {'result': key}, ttl=3600)
+                time.sleep(io_wait)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=worker_count) as executor:
+            list(executor.map(worker, range(worker_count)))
+        elapsed = time.perf_counter() - start
+
+        total_ops = worker_count * ops_per_worker
+        throughput = total_ops / elapsed
+        baseline = baseline or throughput
+        stats = cache_manager.get_cache_stats()
+        counted = stats['total_requests'] == total_ops
+        print(f"{worker_count:>8} {throughput:>14.0f} {throughput / baseline:>8.2f} {'OK' if counted else 'LOST':>8}")
+    CacheManager._instance = None
+
+
+def benchmark_contention(workers=(1, 4, 16), ops_per_worker=20000):
+    """纯缓存操作下的锁竞争测试：对比单分片和多分片的吞吐量"""
+    from langchain.infrastructure.cache_store import ShardedCacheStore
+
+    print("=== 纯缓存操作吞吐量（单分片 vs 16分片） ===")
+    print(f"{'线程数':>8} {'1分片(ops/s)':>14} {'16分片(ops/s)':>14}")
+    for worker_count in workers:
+        row = []
+        for num_shards in (1, 16):
+            store = ShardedCacheStore(100000, num_shards=num_shards)
+            barrier = threading.Barrier(worker_count)
+
+            def worker(seed):
+                rng = random.Random(seed)
+                barrier.wait()
+                for _ in range(ops_per_worker):
+                    key = f"k{rng.randrange(20000)}"
+                    if store.get(key) is None:
+                        store.set(key, {'value': key, 'expiry': time.time() + 3600})
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=worker_count) as executor:
+                list(executor.map(worker, range(worker_count)))
+            row.append(worker_count * ops_per_worker / (time.perf_counter() - start))
+        print(f"{worker_count:>8} {row[0]:>14.0f} {row[1]:>14.0f}")
+
+
+def _legacy_cache_key(prefix, *args, **kwargs):
+    """原缓存键生成方式：整体json.dumps(sort_keys=True)后计算md5"""
+    if len(args) == 1 and isinstance(args[0], str) and not kwargs:
+        return f"{prefix}:{hashlib.md5(args[0].encode('utf-8')).hexdigest()}"
+    key_str = json.dumps({'prefix': prefix, 'args': args, 'kwargs': kwargs}, ensure_ascii=False, sort_keys=True)
+    return f"{prefix}:{hashlib.md5(key_str.encode('utf-8')).hexdigest()}"
+
+
+def benchmark_keys(ops=5000, content_scales=(1, 20)):
+    """测试缓存键生成耗时：原方式与规范化方式对比
+
+    参数取自真实的政策、岗位目录：response键为3条政策 + 3个岗位 + 用户输入，
+    llm_task键为包含这些政策、岗位的组合生成提示。content_scales把政策content放大，
+    模拟正文更长的真实政策。
+    """
+    data_dir = os.path.join(os.path.dirname(__file__), '..', 'langchain', 'data', 'data_files')
+    with open(os.path.join(data_dir, 'policies.json'), 'r', encoding='utf-8') as f:
+        base_policies = json.load(f)
+    with open(os.path.join(data_dir, 'jobs.json'), 'r', encoding='utf-8') as f:
+        base_jobs = json.load(f)
+
+    print("=== 缓存键生成单次耗时 ===")
+    print(f"{'content倍数':>10} {'键':>10} {'参数(KB)':>9} {'原方式(μs)':>11} {'规范化(μs)':>11} {'加速':>7}")
+    for scale in content_scales:
+        cache_manager = _new_cache_manager(1000)
+        policies = [dict(policy, content=policy['content'] * scale) for policy in base_policies[:3]]
+        jobs = [dict(job, entity_info={'has_middle_electrician_cert': True}) for job in base_jobs[:3]]
+        cache_manager.update_catalog_version('policies', CacheManager.catalog_version(json.dumps(policies).encode('utf-8')))
+        cache_manager.update_catalog_version('jobs', CacheManager.catalog_version(json.dumps(jobs).encode('utf-8')))
+        user_input = _generate_queries(1)[0]
+        prompt = f"用户输入: {user_input}\n政策: {json.dumps(policies, ensure_ascii=False)}\n岗位: {json.dumps(jobs, ensure_ascii=False)}"
+        cases = [
+            ('response', ('response', user_input, policies, '通用场景', None, jobs)),
+            ('llm_task', ('llm_task', 'combined_generation', prompt)),
+            ('llm', ('llm', prompt)),
+        ]
+        for name, args in cases:
+            # 原方式也要带上目录版本标签，与当前缓存键包含的内容一致
+            tags = cache_manager._catalog_tags(args[0]) or ()
+            size_kb = len(json.dumps(args, ensure_ascii=False).encode('utf-8')) / 1024
+
+            start = time.perf_counter()
+            for _ in range(ops):
+                _legacy_cache_key(args[0], *args[1:], *tags)
+            legacy_cost = (time.perf_counter() - start) / ops * 1e6
+
+            start = time.perf_counter()
+            for _ in range(ops):
+                cache_manager.generate_cache_key(*args)
+            new_cost = (time.perf_counter() - start) / ops * 1e6
+
+            print(f"{scale:>10} {name:>10} {size_kb:>9.1f} {legacy_cost:>11.2f} {new_cost:>11.2f} "
+                  f"{legacy_cost / new_cost:>6.1f}x")
+    CacheManager._instance = None
+
+
+def _run_cache_worker(prompts, shared_path):
+    """模拟一个工作进程：缓存未命中时"调用LLM"并写入缓存，返回 (命中数, 请求数)"""
+    logging.getLogger('langchain.infrastructure.cache_manager').setLevel(logging.WARNING)
+    cache_manager = _new_cache_manager(100000)
+    if shared_path:
+        cache_manager.disk_cache = DiskCache(shared_path, max_bytes=1024 * 1024 * 1024, shared=True)
+    hits = 0
+    for prompt in prompts:
+        if cache_manager.get_llm_cache(prompt) is not None:
+            hits += 1
+        else:
+            cache_manager.set_llm_cache(prompt, {'content': f'回答:{prompt}', 'time': 1})
+    if shared_path:
+        cache_manager.disk_cache.close()
+    return hits, len(prompts)
+
+
+def benchmark_workers(worker_counts=(1, 2, 4, 8), requests=4000, distinct=800):
+    """测试多工作进程部署下的总体命中率：各进程独立缓存 vs 共享磁盘缓存
+
+    请求按Zipf分布从distinct个提示中抽取，轮流分配给各工作进程。
+    """
+    rng = random.Random(11)
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    prompts = rng.choices([f'提示{i}' for i in range(distinct)], weights=weights, k=requests)
+
+    print("=== 多工作进程总体命中率 ===")
+    print(f"{'进程数':>6} {'独立缓存':>10} {'共享缓存':>10}")
+    context = multiprocessing.get_context('spawn')
+    for workers in worker_counts:
+        shards = [prompts[i::workers] for i in range(workers)]
+        rates = []
+        for shared in (False, True):
+            temp_dir = tempfile.mkdtemp()
+            shared_path = os.path.join(temp_dir, 'cache.db') if shared else None
+            try:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                    results = list(executor.map(_run_cache_worker, shards, [shared_path] * workers))
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            rates.append(sum(hits for hits, _ in results) / requests)
+        print(f"{workers:>6} {rates[0]:>10.1%} {rates[1]:>10.1%}")
+
+
+BENCHMARKS = {
+    'eviction': benchmark_eviction,
+    'similarity': benchmark_similarity,
+    'concurrency': benchmark_concurrency,
+    'contention': benchmark_contention,
+    'keys': benchmark_keys,
+    'workers': benchmark_workers,
+}
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
@@ -0,0 +1,59 @@
+import json
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.cache_manager import CacheManager
+from langchain.infrastructure.llm_batch_processor import LMBatchProcessor
+
+
+COMBINED_RESULT = {"job_analysis": [], "positive": "符合条件", "negative": "", "suggestions": "建议"}
+
+
+class TestAsyncBatchProcess(unittest.TestCase):
+    """测试异步LLM批处理"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.batch_processor = LMBatchProcessor()
+
+        async def achat(prompt, prompt_type="general", semantic_text=None):
+            await asyncio.sleep(0.05)
+            return {"content": json.dumps(COMBINED_RESULT, ensure_ascii=False), "time": 0.05}
+
+        self.batch_processor.chatbot.achat_with_memory = AsyncMock(side_effect=achat)
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_result_parsed_and_cached(self):
+        """异步处理的结果按任务类型解析并写入缓存"""
+        tasks = [{"id": 1, "type": "combined_generation", "prompt": "提示"}]
+
+        results = asyncio.run(self.batch_processor.abatch_process(tasks))
+        self.assertEqual(results[0]["result"], COMBINED_RESULT)
+
+        cached = asyncio.run(self.batch_processor.abatch_process(tasks))
+        self.assertTrue(cached[0]["from_cache"])
+        self.assertEqual(self.batch_processor.chatbot.achat_with_memory.await_count, 1)
+
+    def test_concurrent_requests_share_llm_call(self):
+        """并发的相同任务只调用一次LLM"""
+        tasks = [{"id": 1, "type": "combined_generation", "prompt": "并发提示"}]
+
+        async def main():
+            return await asyncio.gather(*(self.batch_processor.abatch_process(tasks) for _ in range(20)))
+
+        results = asyncio.run(main())
+        self.assertTrue(all(result[0]["result"] == COMBINED_RESULT for result in results))
+        self.assertEqual(self.batch_processor.chatbot.achat_with_memory.await_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
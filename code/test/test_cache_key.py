@@ -0,0 +1,92 @@
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.cache_key import CacheKeyBuilder
+from langchain.infrastructure.cache_manager import CacheManager
+
+
+def make_policy(policy_id, content):
+    return {'policy_id': policy_id, 'title': '创业担保贷款贴息政策', 'content': content}
+
+
+class TestCacheKeyBuilder(unittest.TestCase):
+    """测试规范化缓存键生成"""
+
+    def setUp(self):
+        self.builder = CacheKeyBuilder(memo_min_length=8, memo_max_entries=2)
+
+    def test_stable_and_order_independent(self):
+        """相同参数生成相同的键，字典键顺序不影响结果"""
+        key = self.builder.build('query', ('我想创业', {'a': 1, 'b': [1, 2]}))
+        self.assertEqual(key, self.builder.build('query', ('我想创业', {'b': [1, 2], 'a': 1})))
+        self.assertNotEqual(key, self.builder.build('query', ('我想创业', {'a': 2, 'b': [1, 2]})))
+        self.assertTrue(key.startswith('query:'))
+
+    def test_entities_reduced_to_id_for_versioned_catalogs(self):
+        """目录版本已在键中时实体只按ID参与哈希，否则按完整内容"""
+        old = (make_policy('POLICY_A01', '旧正文'),)
+        new = (make_policy('POLICY_A01', '新正文'),)
+        other = (make_policy('POLICY_A02', '旧正文'),)
+
+        self.assertEqual(self.builder.build('response', old, catalogs=('policies',)),
+                         self.builder.build('response', new, catalogs=('policies',)))
+        self.assertNotEqual(self.builder.build('response', old, catalogs=('policies',)),
+                            self.builder.build('response', other, catalogs=('policies',)))
+        self.assertNotEqual(self.builder.build('response', old, catalogs=('jobs',)),
+                            self.builder.build('response', new, catalogs=('jobs',)))
+
+    def test_long_string_digest_memoized(self):
+        """长字符串的摘要被记忆，数量超过上限时淘汰最早的摘要"""
+        digest = self.builder.digest_text('很长的LLM提示内容')
+        self.assertEqual(digest, self.builder.digest_text('很长的LLM提示内容'))
+        self.assertIn('很长的LLM提示内容', self.builder._memo)
+
+        self.builder.digest_text('第二个很长的提示内容')
+        self.builder.digest_text('第三个很长的提示内容')
+        self.assertEqual(len(self.builder._memo), 2)
+        self.assertNotIn('很长的LLM提示内容', self.builder._memo)
+        self.assertNotIn('短', self.builder._memo)
+
+
+class TestCacheManagerKeys(unittest.TestCase):
+    """测试CacheManager按目录版本生成缓存键"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.cache_manager = CacheManager()
+        self.cache_manager.update_catalog_version('policies', 'v1')
+        self.cache_manager.update_catalog_version('jobs', 'j1')
+
+    def tearDown(self):
+        if self.cache_manager.disk_cache:
+            self.cache_manager.disk_cache.close()
+        CacheManager._instance = None
+
+    def test_response_key_follows_ids_and_versions(self):
+        """response键只随实体ID和目录版本变化"""
+        jobs = [{'job_id': 'JOB_A01', 'title': '电工'}]
+        key = self.cache_manager.generate_cache_key(
+            'response', '我想创业', [make_policy('POLICY_A01', '正文')], '通用场景', None, jobs)
+        annotated = [dict(jobs[0], entity_info={'has_middle_electrician_cert': True})]
+        self.assertEqual(key, self.cache_manager.generate_cache_key(
+            'response', '我想创业', [make_policy('POLICY_A01', '正文' * 100)], '通用场景', None, annotated))
+
+        self.cache_manager.update_catalog_version('jobs', 'j2')
+        self.assertNotEqual(key, self.cache_manager.generate_cache_key(
+            'response', '我想创业', [make_policy('POLICY_A01', '正文')], '通用场景', None, jobs))
+
+    def test_unversioned_catalog_uses_full_content(self):
+        """目录尚未登记版本时实体按完整内容参与哈希"""
+        del self.cache_manager.catalog_versions['policies']
+        self.assertNotEqual(
+            self.cache_manager.generate_cache_key('response', [make_policy('POLICY_A01', '旧正文')]),
+            self.cache_manager.generate_cache_key('response', [make_policy('POLICY_A01', '新正文')]))
+
+
+if __name__ == "__main__":
+    unittest.main()
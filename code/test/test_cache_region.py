@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.cache_region import CacheRegionSet
+from langchain.infrastructure.cache_manager import CacheManager
+
+
+class TestCacheRegionSet(unittest.TestCase):
+    """测试缓存区域路由和独立配置"""
+
+    def setUp(self):
+        self.regions = CacheRegionSet({
+            'llm': {'max_size': 3},
+            'query': {'max_size': 3},
+            'catalog': {'max_size': 2, 'policy': 'fifo'}
+        })
+
+    def _entry(self, value):
+        return {'value': value, 'expiry': float('inf'), 'created': 0}
+
+    def test_routing(self):
+        """按缓存键前缀路由到区域"""
+        self.assertEqual(self.regions.region_for('llm_task:abc').name, 'llm')
+        self.assertEqual(self.regions.region_for('stream_query:abc').name, 'stream')
+        self.assertEqual(self.regions.region_for('policies').name, 'catalog')
+        self.assertEqual(self.regions.region_for('user_1').name, 'default')
+
+    def test_query_burst_does_not_evict_llm(self):
+        """查询区域的写入突增不会淘汰LLM区域的缓存项"""
+        self.regions.set('llm:1', self._entry('answer'))
+        for i in range(100):
+            self.regions.set(f'query:{i}', self._entry(i))
+
+        self.assertIn('llm:1', self.regions)
+        self.assertEqual(len(self.regions.regions['query'].store), 3)
+        self.assertEqual(self.regions.get_region_stats()['llm']['eviction_count'], 0)
+
+    def test_fifo_policy(self):
+        """catalog区域使用FIFO，命中不改变淘汰顺序"""
+        self.regions.set('policy:1', self._entry(1))
+        self.regions.set('policy:2', self._entry(2))
+        self.regions.get('policy:1')
+        self.regions.set('policy:3', self._entry(3))
+
+        self.assertNotIn('policy:1', self.regions)
+        self.assertEqual(self.regions.policy_name['catalog'], 'fifo')
+
+    def test_region_hit_stats(self):
+        """每个区域独立统计命中率"""
+        self.regions.record('llm:1', True)
+        self.regions.record('llm:2', False)
+        self.regions.record('query:1', False)
+
+        stats = self.regions.get_region_stats()
+        self.assertEqual(stats['llm']['hit_count'], 1)
+        self.assertEqual(stats['llm']['miss_count'], 1)
+        self.assertEqual(stats['llm']['hit_rate'], 50)
+        self.assertEqual(stats['query']['miss_count'], 1)
+
+    def test_unknown_policy(self):
+        """未知淘汰策略直接报错"""
+        with self.assertRaises(ValueError):
+            CacheRegionSet({'llm': {'policy': 'random'}})
+
+
+class TestCacheManagerRegions(unittest.TestCase):
+    """测试缓存管理器使用区域TTL"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.cache_manager = CacheManager()
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_region_default_ttl(self):
+        """未指定TTL时使用所属区域的TTL"""
+        self.cache_manager.set('stream_query:1', [1, 2])
+        entry = self.cache_manager.cache.get('stream_query:1')
+        region = self.cache_manager.cache.regions['stream']
+        self.assertAlmostEqual(entry['fresh_until'] - entry['created'], region.ttl, delta=region.ttl * region.ttl_jitter)
+
+    def test_stats_include_regions(self):
+        """统计信息包含各区域的命中率"""
+        self.cache_manager.set_llm_cache('问题', '回答')
+        self.cache_manager.get_llm_cache('问题')
+
+        stats = self.cache_manager.get_cache_stats()
+        self.assertEqual(stats['regions']['llm']['hit_count'], 1)
+        self.assertIn('catalog', stats['regions'])
+
+
+if __name__ == "__main__":
+    unittest.main()
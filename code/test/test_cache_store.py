@@ -0,0 +1,348 @@
+import time
+import threading
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.cache_store import CacheStore, LRUEvictionPolicy, GreedyDualSizeEvictionPolicy, ShardedCacheStore
+from langchain.infrastructure.cache_manager import CacheManager
+
+
+def make_entry(value, ttl=60, now=None):
+    """构建测试用缓存项"""
+    now = time.time() if now is None else now
+    return {'value': value, 'expiry': now + ttl, 'created': now}
+
+
+class TestCacheStore(unittest.TestCase):
+    """测试缓存存储引擎的LRU淘汰和过期堆"""
+
+    def test_lru_eviction(self):
+        """容量满时淘汰最久未使用的缓存项"""
+        store = CacheStore(max_size=3)
+        for key in ['a', 'b', 'c']:
+            store.set(key, make_entry(key))
+
+        # 访问a，使b成为最久未使用的缓存项
+        self.assertIsNotNone(store.get('a'))
+        store.set('d', make_entry('d'))
+
+        self.assertEqual(len(store), 3)
+        self.assertNotIn('b', store)
+        self.assertIn('a', store)
+        self.assertEqual(store.eviction_count, 1)
+
+    def test_overwrite_does_not_evict(self):
+        """覆盖写入已有缓存键不触发淘汰"""
+        store = CacheStore(max_size=2)
+        store.set('a', make_entry(1))
+        store.set('b', make_entry(2))
+        store.set('a', make_entry(3))
+
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get('a')['value'], 3)
+        self.assertEqual(store.eviction_count, 0)
+
+    def test_lazy_expiry_on_get(self):
+        """读取时惰性判断过期"""
+        store = CacheStore(max_size=10)
+        now = time.time()
+        store.set('a', make_entry('a', ttl=1, now=now), now)
+
+        self.assertIsNotNone(store.get('a', now + 0.5))
+        self.assertIsNone(store.get('a', now + 2))
+        self.assertNotIn('a', store)
+        self.assertEqual(store.expired_count, 1)
+
+    def test_pop_expired_skips_overwritten_heap_items(self):
+        """覆盖写入后，旧的过期堆元素不会误删新缓存项"""
+        store = CacheStore(max_size=10)
+        now = time.time()
+        store.set('a', make_entry('old', ttl=1, now=now), now)
+        store.set('a', make_entry('new', ttl=100, now=now), now)
+        store.set('b', make_entry('b', ttl=1, now=now), now)
+
+        removed = store.pop_expired(now + 2)
+
+        self.assertEqual(removed, 1)
+        self.assertEqual(store.get('a', now + 2)['value'], 'new')
+        self.assertNotIn('b', store)
+
+    def test_pop_expired_limit(self):
+        """写入时只清理有限个过期项"""
+        store = CacheStore(max_size=100)
+        now = time.time()
+        for i in range(10):
+            store.set(f'k{i}', make_entry(i, ttl=1, now=now), now)
+
+        self.assertEqual(store.pop_expired(now + 2, limit=3), 3)
+        self.assertEqual(len(store), 7)
+
+    def test_on_remove_callback(self):
+        """移除回调携带移除原因"""
+        removed = []
+        store = CacheStore(max_size=1, on_remove=lambda key, entry, reason: removed.append((key, reason)))
+        store.set('a', make_entry('a'))
+        store.set('b', make_entry('b'))
+        store.delete('b')
+
+        self.assertEqual(removed, [('a', 'evicted'), ('b', 'deleted')])
+
+    def test_policy_victim_order(self):
+        """LRU策略的淘汰顺序"""
+        policy = LRUEvictionPolicy()
+        policy.on_insert('a', None)
+        policy.on_insert('b', None)
+        policy.on_access('a', None)
+        self.assertEqual(policy.victim(), 'b')
+        policy.on_remove('b')
+        self.assertEqual(policy.victim(), 'a')
+
+
+class TestCacheManagerEviction(unittest.TestCase):
+    """测试缓存管理器接入新的存储引擎"""
+
+    def setUp(self):
+        """重置单例，使用小容量缓存"""
+        CacheManager._instance = None
+        self.cache_manager = CacheManager(max_cache_size=5)
+        self.cache_manager.clear()
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_query_map_cleaned_on_eviction(self):
+        """缓存项被淘汰时同步清理查询映射"""
+        self.cache_manager.set('query:1', {'v': 1}, query_text='第一个查询')
+        for i in range(5):
+            self.cache_manager.set(f'query:other:{i}', i)
+
+        self.assertIsNone(self.cache_manager.get('query:1'))
+        self.assertNotIn('第一个查询', self.cache_manager.query_cache_map)
+
+    def test_cleanup_expired(self):
+        """cleanup_expired只清理已过期的缓存项"""
+        self.cache_manager.set('short', 1, ttl=0.01)
+        self.cache_manager.set('long', 2, ttl=60)
+        time.sleep(0.02)
+        self.cache_manager.cleanup_expired()
+
+        self.assertEqual(self.cache_manager.get_cache_size(), 1)
+        self.assertEqual(self.cache_manager.get('long'), 2)
+        self.assertEqual(self.cache_manager.get_cache_stats()['eviction_policy']['default'], 'lru')
+
+
+
+class TestByteBudget(unittest.TestCase):
+    """测试按字节预算淘汰"""
+
+    def _entry(self, value, size, namespace='query'):
+        entry = make_entry(value)
+        entry.update({'size': size, 'namespace': namespace})
+        return entry
+
+    def test_evict_to_byte_budget(self):
+        """总字节数超出预算时按LRU淘汰"""
+        store = CacheStore(max_size=100, max_bytes=1000)
+        for i in range(4):
+            store.set(f'k{i}', self._entry(i, 300))
+
+        self.assertLessEqual(store.total_bytes, 1000)
+        self.assertNotIn('k0', store)
+        self.assertIn('k3', store)
+
+    def test_overwrite_updates_bytes(self):
+        """覆盖写入时按新值重新计算占用"""
+        store = CacheStore(max_size=100, max_bytes=1000)
+        store.set('a', self._entry(1, 100))
+        store.set('a', self._entry(2, 400))
+        self.assertEqual(store.total_bytes, 400)
+
+    def test_oversized_entry_rejected(self):
+        """单个缓存项超出预算时不写入，并删除旧值"""
+        store = CacheStore(max_size=100, max_bytes=1000)
+        store.set('a', self._entry(1, 100))
+
+        self.assertFalse(store.set('a', self._entry(2, 2000)))
+        self.assertNotIn('a', store)
+        self.assertEqual(store.total_bytes, 0)
+        self.assertEqual(store.rejected_count, 1)
+
+    def test_namespace_usage(self):
+        """按命名空间统计缓存项数量和字节数"""
+        store = ShardedCacheStore(max_size=1000)
+        store.set('llm:1', self._entry(1, 100, 'llm'))
+        store.set('llm:2', self._entry(2, 200, 'llm'))
+        store.set('query:1', self._entry(3, 50))
+        store.delete('llm:1')
+
+        usage = store.get_namespace_usage()
+        self.assertEqual(usage['llm'], {'entries': 1, 'bytes': 200})
+        self.assertEqual(usage['query'], {'entries': 1, 'bytes': 50})
+
+    def test_cache_manager_reports_namespaces(self):
+        """缓存管理器按序列化大小统计命名空间占用"""
+        CacheManager._instance = None
+        try:
+            cache_manager = CacheManager(max_cache_size=100, max_memory_mb=1)
+            cache_manager.clear()
+            cache_manager.set('llm:1', {'content': '政策'})
+
+            stats = cache_manager.get_cache_stats()
+            self.assertEqual(stats['namespaces']['llm']['bytes'], len('{"content": "政策"}'.encode('utf-8')))
+            self.assertEqual(stats['regions']['llm']['max_memory_bytes'], 1024 * 1024)
+        finally:
+            CacheManager._instance = None
+
+
+class TestGreedyDualSize(unittest.TestCase):
+    """测试代价感知的GreedyDual-Size淘汰"""
+
+    def _entry(self, cost, size=100):
+        entry = make_entry(cost)
+        entry.update({'cost': cost, 'size': size})
+        return entry
+
+    def _store(self, max_size=3, max_bytes=None):
+        return CacheStore(max_size=max_size, policy=GreedyDualSizeEvictionPolicy(), max_bytes=max_bytes)
+
+    def test_cheap_entry_evicted_first(self):
+        """重新计算代价低的缓存项先被淘汰，与写入顺序无关"""
+        store = self._store()
+        store.set('slow', self._entry(20))
+        store.set('fast', self._entry(0.001))
+        store.set('medium', self._entry(2))
+        store.set('new', self._entry(5))
+
+        self.assertNotIn('fast', store)
+        self.assertIn('slow', store)
+
+    def test_cost_per_byte(self):
+        """代价相同时体积大的缓存项先被淘汰"""
+        store = self._store(max_size=2)
+        store.set('big', self._entry(1, size=10000))
+        store.set('small', self._entry(1, size=100))
+        store.set('other', self._entry(1, size=100))
+
+        self.assertNotIn('big', store)
+
+    def test_low_value_entry_not_admitted(self):
+        """缓存已满时不准入代价低于所有现有缓存项的新缓存项"""
+        store = self._store(max_size=2)
+        store.set('a', self._entry(10))
+        store.set('b', self._entry(10))
+
+        self.assertFalse(store.set('free', self._entry(0)))
+        self.assertNotIn('free', store)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.rejected_count, 1)
+
+    def test_inflation_ages_out_idle_entries(self):
+        """淘汰抬高膨胀值，长期未访问的高代价缓存项最终也会被淘汰"""
+        store = self._store(max_size=2)
+        store.set('old', self._entry(3))
+        for i in range(10):
+            store.set(f'k{i}', self._entry(1))
+            store.get(f'k{i}')
+
+        self.assertNotIn('old', store)
+
+    def test_byte_budget_with_gds(self):
+        """超出字节预算时按代价淘汰"""
+        store = self._store(max_size=100, max_bytes=250)
+        store.set('slow', self._entry(10))
+        store.set('fast', self._entry(0.1))
+        store.set('medium', self._entry(1))
+
+        self.assertLessEqual(store.total_bytes, 250)
+        self.assertNotIn('fast', store)
+
+    def test_cache_manager_reports_seconds_saved(self):
+        """缓存命中累计省下的LLM调用耗时"""
+        CacheManager._instance = None
+        try:
+            cache_manager = CacheManager()
+            cache_manager.clear()
+            cache_manager.set_llm_cache('我想创业', {'content': '创业担保贷款', 'time': 2.5})
+            cache_manager.set('llm_task:1', {'job_analysis': []}, cost=1.0)
+            cache_manager.get_llm_cache('我想创业')
+            cache_manager.get_llm_cache('我想创业')
+            cache_manager.get('llm_task:1')
+
+            stats = cache_manager.get_cache_stats()
+            self.assertAlmostEqual(stats['llm_seconds_saved'], 6.0)
+            self.assertAlmostEqual(stats['regions']['llm']['llm_seconds_saved'], 6.0)
+            self.assertEqual(stats['eviction_policy']['llm'], 'gds')
+            cache_manager.reset_cache_stats()
+            self.assertEqual(cache_manager.get_cache_stats()['llm_seconds_saved'], 0)
+        finally:
+            CacheManager._instance = None
+
+
+class TestShardedCacheStore(unittest.TestCase):
+    """测试分片缓存存储"""
+
+    def test_capacity_split_across_shards(self):
+        """容量按分片均分，总量不超过上限"""
+        store = ShardedCacheStore(max_size=1024, num_shards=16)
+        self.assertEqual(store.num_shards, 16)
+        for i in range(5000):
+            store.set(f'k{i}', make_entry(i))
+
+        self.assertLessEqual(len(store), 1024)
+        self.assertTrue(all(size <= 64 for size in store.get_shard_sizes()))
+        self.assertEqual(store.eviction_count, 5000 - len(store))
+
+    def test_small_capacity_uses_single_shard(self):
+        """容量较小时只使用一个分片，保持精确的LRU语义"""
+        self.assertEqual(ShardedCacheStore(max_size=5).num_shards, 1)
+
+
+class TestCacheManagerConcurrency(unittest.TestCase):
+    """测试缓存管理器在线程池中的并发读写"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.cache_manager = CacheManager(max_cache_size=2048)
+        self.cache_manager.reset_cache_stats()
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_concurrent_access_keeps_counts(self):
+        """并发读写、相似查找和过期清理不抛异常，命中计数不丢失"""
+        errors = []
+        ops_per_thread = 500
+        thread_count = 8
+
+        def worker(seed):
+            try:
+                for i in range(ops_per_thread):
+                    key = f'query:{(seed * 7 + i) % 3000}'
+                    if self.cache_manager.get(key) is None:
+                        self.cache_manager.set(key, i, ttl=0.05 if i % 5 == 0 else 60,
+                                               query_text=f'我想了解第{i % 300}项补贴政策')
+                    if i % 50 == 0:
+                        self.cache_manager.cleanup_expired()
+                        self.cache_manager.find_similar_queries(f'我想了解第{i % 300}项补贴')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        stats = self.cache_manager.get_cache_stats()
+        self.assertEqual(stats['hit_count'] + stats['miss_count'], thread_count * ops_per_thread)
+        self.assertLessEqual(stats['cache_size'], 2048)
+
+
+if __name__ == "__main__":
+    unittest.main()
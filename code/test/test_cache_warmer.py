@@ -0,0 +1,171 @@
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+import sys
+import os
+import uuid
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.cache_warmer import CacheWarmer, mine_popular_queries
+from langchain.infrastructure import chatbot
+from langchain.infrastructure.cache_manager import CacheManager
+from langchain.infrastructure.config_manager import ConfigManager
+from langchain.presentation.orchestrator import Orchestrator
+
+
+def write_history(path, user_messages):
+    """按HistoryManager的格式写入对话历史，每条用户消息一个会话"""
+    sessions = {}
+    for i, content in enumerate(user_messages):
+        sessions[str(i)] = {
+            "id": str(i),
+            "title": content[:20],
+            "created_at": i,
+            "updated_at": i,
+            "messages": [
+                {"role": "user", "content": content, "timestamp": i},
+                {"role": "ai", "content": "{}", "timestamp": i}
+            ]
+        }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(sessions, f, ensure_ascii=False)
+
+
+class TestMinePopularQueries(unittest.TestCase):
+    """测试从对话历史统计热门查询"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'chat_history.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_rank_by_frequency(self):
+        """按出现次数排序，只统计用户消息，次数相同时最近的在前"""
+        write_history(self.path, ['我想创业', '技能补贴', '我想创业 ', '找兼职', '我想创业', '技能补贴'])
+
+        ranked = mine_popular_queries(self.path, top_n=2)
+        self.assertEqual(ranked, [('我想创业', 3), ('技能补贴', 2)])
+        self.assertEqual(mine_popular_queries(self.path)[-1], ('找兼职', 1))
+
+    def test_missing_file(self):
+        """对话历史不存在时返回空列表"""
+        self.assertEqual(mine_popular_queries(os.path.join(self.temp_dir, 'none.json')), [])
+
+
+class TestCacheWarmer(unittest.TestCase):
+    """测试后台缓存预热"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'chat_history.json')
+        write_history(self.path, [f'查询{i}' for i in range(6)])
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_rule_stage_only_by_default(self):
+        """默认只执行规则阶段，不调用LLM"""
+        warmed = []
+        warmer = CacheWarmer(warmed.append, llm_fn=lambda q: self.fail('不应调用LLM'), history_file=self.path)
+
+        stats = warmer.warm_up()
+        self.assertEqual(len(warmed), 6)
+        self.assertEqual(stats['rule_warmed'], 6)
+        self.assertEqual(stats['status'], 'completed')
+
+    def test_llm_stage_respects_concurrency(self):
+        """LLM阶段的并发数不超过上限"""
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def llm_fn(query):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        warmer = CacheWarmer(lambda q: None, llm_fn=llm_fn, history_file=self.path,
+                             use_llm=True, llm_concurrency=2)
+        stats = warmer.warm_up()
+
+        self.assertEqual(stats['llm_warmed'], 6)
+        self.assertLessEqual(peak[0], 2)
+
+    def test_time_budget(self):
+        """超过时间上限后不再提交新的LLM任务"""
+        warmer = CacheWarmer(lambda q: None, llm_fn=lambda q: time.sleep(0.1), history_file=self.path,
+                             time_budget=0.15, use_llm=True, llm_concurrency=1)
+        stats = warmer.warm_up()
+
+        self.assertTrue(stats['timed_out'])
+        self.assertLess(stats['llm_warmed'], 6)
+        self.assertLess(stats['elapsed'], 0.5)
+
+    def test_errors_do_not_stop_warm_up(self):
+        """单个查询预热失败不影响其他查询"""
+        def rule_fn(query):
+            if query == '查询0':
+                raise ValueError('规则失败')
+
+        stats = CacheWarmer(rule_fn, history_file=self.path).warm_up()
+        self.assertEqual(stats['rule_warmed'], 5)
+        self.assertEqual(stats['error_count'], 1)
+
+    def test_start_runs_in_background(self):
+        """start立即返回，预热在后台线程完成"""
+        release = threading.Event()
+        warmer = CacheWarmer(lambda q: release.wait(2), history_file=self.path)
+
+        started = time.time()
+        warmer.start()
+        self.assertLess(time.time() - started, 0.5)
+        release.set()
+        warmer.join(2)
+        self.assertEqual(warmer.stats['rule_warmed'], 6)
+
+
+
+class TestWarmedQueryHitsCache(unittest.TestCase):
+    """测试预热后的热门查询由缓存直接返回"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'chat_history.json')
+
+    def tearDown(self):
+        CacheManager._instance = None
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_default_config_warms_query_cache(self):
+        """默认配置开启LLM阶段，预热过的查询首个真实请求命中查询缓存"""
+        config = ConfigManager().get('cache.warmup', {})
+        self.assertTrue(config['use_llm'])
+
+        # 查询中带随机后缀，避免命中之前测试写入磁盘缓存的结果
+        query = f"我想创业，有什么补贴政策？{uuid.uuid4().hex[:8]}"
+        write_history(self.path, [query, query])
+        agent = Orchestrator()
+        with patch.object(chatbot, 'USE_MOCK', True):
+            stats = CacheWarmer(agent.warm_up_query, llm_fn=agent.process_query, history_file=self.path,
+                                top_n=config['top_n'], use_llm=config['use_llm'],
+                                llm_concurrency=config['llm_concurrency']).warm_up()
+            self.assertEqual(stats['llm_warmed'], 1)
+            result = agent.process_query(query)
+        self.assertTrue(result.get('from_cache'))
+
+
+if __name__ == "__main__":
+    unittest.main()
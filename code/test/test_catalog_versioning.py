@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.disk_cache import DiskCache
+from langchain.infrastructure.cache_manager import CacheManager
+
+
+class TestCatalogVersioning(unittest.TestCase):
+    """测试数据目录版本驱动的缓存失效"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.cache_manager = CacheManager()
+        self.cache_manager.clear()
+        self.cache_manager.update_catalog_version('policies', 'v1')
+        self.cache_manager.update_catalog_version('jobs', 'j1')
+
+    def tearDown(self):
+        if self.cache_manager.disk_cache:
+            self.cache_manager.disk_cache.close()
+        CacheManager._instance = None
+
+    def test_catalog_version(self):
+        """版本为文件内容哈希"""
+        self.assertEqual(CacheManager.catalog_version(b'[1]'), CacheManager.catalog_version(b'[1]'))
+        self.assertNotEqual(CacheManager.catalog_version(b'[1]'), CacheManager.catalog_version(b'[2]'))
+
+    def test_bump_invalidates_only_dependent_entries(self):
+        """目录更新只失效依赖该目录的缓存项"""
+        self.cache_manager.set_query_cache('我想创业', {}, {'response': '创业担保贷款'})
+        response_key = self.cache_manager.generate_cache_key('response', '我想创业')
+        self.cache_manager.set(response_key, {'positive': '...'})
+        self.cache_manager.set_llm_cache('与政策无关的提示', {'content': '回答', 'time': 1})
+
+        invalidated = self.cache_manager.update_catalog_version('policies', 'v2')
+
+        self.assertEqual(invalidated, 2)
+        self.assertIsNone(self.cache_manager.get(response_key))
+        self.assertIsNone(self.cache_manager.get_query_cache('我想创业', {}))
+        self.assertEqual(self.cache_manager.get_llm_cache('与政策无关的提示')['content'], '回答')
+        self.assertEqual(self.cache_manager.get_cache_stats()['invalidated_count'], 2)
+        self.assertEqual(self.cache_manager._tag_index, {})
+
+    def test_keys_include_versions(self):
+        """依赖目录的缓存键随版本变化，其他缓存键不变"""
+        query_key = self.cache_manager.generate_cache_key('query', '我想创业')
+        llm_key = self.cache_manager.generate_cache_key('llm', '我想创业')
+        self.cache_manager.update_catalog_version('jobs', 'j2')
+
+        self.assertNotEqual(self.cache_manager.generate_cache_key('query', '我想创业'), query_key)
+        self.assertEqual(self.cache_manager.generate_cache_key('llm', '我想创业'), llm_key)
+
+    def test_same_version_is_noop(self):
+        """版本未变化时不失效缓存"""
+        self.cache_manager.set_query_cache('我想创业', {}, {'response': '创业担保贷款'})
+        self.assertEqual(self.cache_manager.update_catalog_version('policies', 'v1'), 0)
+        self.assertIsNotNone(self.cache_manager.get_query_cache('我想创业', {}))
+
+    def test_removed_entries_untagged(self):
+        """缓存项删除后从版本标签中移除"""
+        key = self.cache_manager.generate_cache_key('llm_task', 'combined_generation', 'prompt')
+        self.cache_manager.set(key, {'job_analysis': []})
+        self.cache_manager.delete(key)
+        self.assertEqual(self.cache_manager._tag_index, {})
+
+    def test_stale_tags_not_registered(self):
+        """写入期间目录已更新时，按旧版本写入的缓存项被删除"""
+        key = self.cache_manager.generate_cache_key('query', '我想创业')
+        self.cache_manager.set(key, {'response': '旧政策'})
+        self.cache_manager.catalog_versions['policies'] = 'v2'
+        self.cache_manager._tag_key(key, ('policies@v1', 'jobs@j1'))
+        self.assertIsNone(self.cache_manager.get(key))
+
+    def test_bump_removes_disk_entries(self):
+        """目录更新同时删除磁盘缓存中依赖旧版本的缓存项"""
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        self.cache_manager.disk_cache = DiskCache(os.path.join(temp_dir, 'cache.db'))
+        self.cache_manager.set_query_cache('我想创业', {}, {'response': '创业担保贷款'})
+        self.assertEqual(len(self.cache_manager.disk_cache), 1)
+
+        self.cache_manager.update_catalog_version('policies', 'v2')
+        self.assertEqual(len(self.cache_manager.disk_cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
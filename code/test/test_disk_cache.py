@@ -0,0 +1,124 @@
+import time
+import shutil
+import tempfile
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.disk_cache import DiskCache
+from langchain.infrastructure.cache_manager import CacheManager
+
+
+def make_entry(value, ttl=60, now=None, query_text=None):
+    """构建测试用缓存项"""
+    now = time.time() if now is None else now
+    return {'value': value, 'expiry': now + ttl, 'created': now, 'query_text': query_text}
+
+
+class TestDiskCache(unittest.TestCase):
+    """测试SQLite磁盘缓存"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'cache.db')
+        self.disk_cache = DiskCache(self.path)
+
+    def tearDown(self):
+        self.disk_cache.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_persist_across_instances(self):
+        """关闭后重新打开仍能读取缓存项"""
+        self.disk_cache.set('llm:1', make_entry({'content': '政策解读'}))
+        self.disk_cache.close()
+
+        self.disk_cache = DiskCache(self.path)
+        entry = self.disk_cache.get('llm:1')
+        self.assertEqual(entry['value'], {'content': '政策解读'})
+
+    def test_expiry(self):
+        """过期项读取时返回None并被删除"""
+        now = time.time()
+        self.disk_cache.set('llm:1', make_entry('v', ttl=1, now=now), now)
+
+        self.assertIsNotNone(self.disk_cache.get('llm:1', now + 0.5))
+        self.assertIsNone(self.disk_cache.get('llm:1', now + 2))
+        self.assertEqual(len(self.disk_cache), 0)
+        self.assertEqual(self.disk_cache.total_bytes, 0)
+
+    def test_unserializable_value_skipped(self):
+        """无法JSON序列化的值不写入磁盘"""
+        self.assertFalse(self.disk_cache.set('llm:1', make_entry(object())))
+        self.assertEqual(len(self.disk_cache), 0)
+
+    def test_compact_respects_budget(self):
+        """超出容量预算时按最近访问时间淘汰"""
+        self.disk_cache.max_bytes = 300
+        now = time.time()
+        for i in range(10):
+            self.disk_cache.set(f'llm:{i}', make_entry('x' * 48, now=now), now + i)
+
+        self.assertLessEqual(self.disk_cache.total_bytes, 300)
+        self.assertIsNone(self.disk_cache.get('llm:0'))
+        self.assertIsNotNone(self.disk_cache.get('llm:9'))
+        self.assertGreater(self.disk_cache.eviction_count, 0)
+
+
+class TestCacheManagerDiskTier(unittest.TestCase):
+    """测试缓存管理器的磁盘二级缓存"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'cache.db')
+        self.cache_manager = self._restart()
+
+    def tearDown(self):
+        self.cache_manager.disk_cache.close()
+        CacheManager._instance = None
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _restart(self):
+        """模拟进程重启：重建单例并挂载同一个磁盘缓存文件"""
+        if CacheManager._instance is not None and CacheManager._instance.disk_cache:
+            CacheManager._instance.disk_cache.close()
+        CacheManager._instance = None
+        cache_manager = CacheManager(max_cache_size=5)
+        cache_manager.disk_cache = DiskCache(self.path)
+        return cache_manager
+
+    def test_llm_cache_survives_restart(self):
+        """LLM缓存在重启后从磁盘命中并提升到内存"""
+        self.cache_manager.set_llm_cache('我想创业', {'content': '创业担保贷款'})
+        self.cache_manager = self._restart()
+
+        self.assertEqual(self.cache_manager.get_llm_cache('我想创业'), {'content': '创业担保贷款'})
+        self.assertEqual(self.cache_manager.disk_hit_count.value, 1)
+        key = self.cache_manager.generate_cache_key('llm', '我想创业')
+        self.assertIn(key, self.cache_manager.cache)
+
+    def test_non_persistent_prefix(self):
+        """未配置持久化的前缀不写入磁盘"""
+        self.cache_manager.set('policies', [1, 2, 3])
+        self.assertEqual(len(self.cache_manager.disk_cache), 0)
+
+    def test_evicted_entry_promoted(self):
+        """内存淘汰后仍能从磁盘读取"""
+        self.cache_manager.set_llm_cache('问题0', 'answer0')
+        for i in range(5):
+            self.cache_manager.set(f'other:{i}', i)
+
+        self.assertEqual(self.cache_manager.get_llm_cache('问题0'), 'answer0')
+
+    def test_delete_removes_from_disk(self):
+        """删除缓存同时删除磁盘中的缓存项"""
+        self.cache_manager.set_llm_cache('我想创业', 'v')
+        self.cache_manager.delete(self.cache_manager.generate_cache_key('llm', '我想创业'))
+        self.assertEqual(len(self.cache_manager.disk_cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
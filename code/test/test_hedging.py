@@ -0,0 +1,235 @@
+import time
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.hedging import LLMHedger
+from langchain.infrastructure.llm_scheduler import LLMScheduler, llm_priority, current_priority, PRIORITY_BATCH
+from langchain.infrastructure import chatbot
+from langchain.infrastructure.model_router import ModelRoute
+
+
+class FakeLLM:
+    """按调用顺序返回不同首字节延迟的模拟流式LLM"""
+
+    def __init__(self, first_byte_delays, output_time=0.01):
+        self.first_byte_delays = list(first_byte_delays)
+        self.output_time = output_time
+        self.calls = 0
+        self.cancelled = []
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            index = self.calls
+            self.calls += 1
+        return index, self.first_byte_delays[min(index, len(self.first_byte_delays) - 1)]
+
+    def attempt(self, on_first_byte, cancelled):
+        index, delay = self._next()
+        deadline = time.monotonic() + delay
+        while time.monotonic() < deadline:
+            if cancelled.is_set():
+                self.cancelled.append(index)
+                return None
+            time.sleep(0.005)
+        on_first_byte()
+        time.sleep(self.output_time)
+        return f"回答{index}"
+
+    async def aattempt(self, on_first_byte):
+        index, delay = self._next()
+        try:
+            await asyncio.sleep(delay)
+            on_first_byte()
+            await asyncio.sleep(self.output_time)
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        return f"回答{index}"
+
+
+class TestLLMHedger(unittest.TestCase):
+    """测试LLM对冲请求"""
+
+    def setUp(self):
+        self.hedger = LLMHedger(prompt_types=["intent"], min_samples=5, initial_delay=0.1,
+                                min_delay=0.05, max_delay=1.0, window_size=20, max_hedge_ratio=0.5)
+
+    def test_fast_first_byte_not_hedged(self):
+        """在对冲延迟内收到首字节时不发出备份请求"""
+        llm = FakeLLM([0.01])
+        self.assertEqual(self.hedger.call("intent", llm.attempt), "回答0")
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(self.hedger.get_stats()["hedged"], 0)
+
+    def test_slow_primary_hedged_and_cancelled(self):
+        """主请求迟迟没有首字节时发出备份请求，备份胜出后取消主请求"""
+        llm = FakeLLM([2.0, 0.01])
+        start = time.time()
+        self.assertEqual(self.hedger.call("intent", llm.attempt), "回答1")
+        self.assertLess(time.time() - start, 0.5)
+        time.sleep(0.05)
+        self.assertEqual(llm.cancelled, [0])
+
+        stats = self.hedger.get_stats()
+        self.assertEqual((stats["requests"], stats["hedged"], stats["backup_wins"]), (1, 1, 1))
+        self.assertEqual(stats["by_type"]["intent"]["hedge_rate"], 1.0)
+
+    def test_failed_primary_uses_backup(self):
+        """对冲后主请求失败时采用备份请求的结果"""
+        calls = []
+
+        def attempt(on_first_byte, cancelled):
+            calls.append(len(calls))
+            if len(calls) == 1:
+                time.sleep(0.2)
+                raise RuntimeError("连接中断")
+            time.sleep(0.3)
+            on_first_byte()
+            return "备份回答"
+
+        self.assertEqual(self.hedger.call("intent", attempt), "备份回答")
+
+    def test_primary_error_raised_when_both_fail(self):
+        """主备请求都失败时抛出主请求的异常，而不是先失败的备份请求的异常"""
+        calls = []
+
+        def attempt(on_first_byte, cancelled):
+            calls.append(len(calls))
+            if len(calls) == 1:
+                time.sleep(0.3)
+                raise TimeoutError("读取超时")
+            raise RuntimeError("未获得调度")
+
+        with self.assertRaises(TimeoutError):
+            self.hedger.call("intent", attempt)
+
+    def test_fast_failure_not_delayed(self):
+        """主请求在对冲延迟内失败时立即返回异常"""
+        def attempt(on_first_byte, cancelled):
+            raise RuntimeError("认证失败")
+
+        hedger = LLMHedger(prompt_types=["intent"], initial_delay=2.0, max_delay=5.0)
+        start = time.time()
+        with self.assertRaises(RuntimeError):
+            hedger.call("intent", attempt)
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(hedger.get_stats()["hedged"], 0)
+
+    def test_attempts_keep_caller_priority(self):
+        """主请求和备份请求都沿用调用方的LLM调度优先级"""
+        priorities = []
+
+        def attempt(on_first_byte, cancelled):
+            priorities.append(current_priority())
+            if len(priorities) == 1:
+                time.sleep(0.3)
+            on_first_byte()
+            return "回答"
+
+        with llm_priority(PRIORITY_BATCH):
+            self.hedger.call("intent", attempt)
+        self.assertEqual(priorities, [PRIORITY_BATCH, PRIORITY_BATCH])
+
+    def test_adaptive_delay(self):
+        """对冲延迟跟随最近首字节延迟的百分位数，并受上下限约束"""
+        self.assertEqual(self.hedger.hedge_delay("intent"), 0.1)
+        for latency in [0.2, 0.21, 0.22, 0.23, 0.3]:
+            self.hedger._record("intent", latency)
+        self.assertAlmostEqual(self.hedger.hedge_delay("intent"), 0.3)
+        for _ in range(20):
+            self.hedger._record("intent", 5.0)
+        self.assertEqual(self.hedger.hedge_delay("intent"), 1.0)
+
+    def test_hedge_budget(self):
+        """对冲预算用完后不再发出备份请求"""
+        hedger = LLMHedger(prompt_types=["intent"], min_samples=100, initial_delay=0.05,
+                           min_delay=0.01, window_size=4, max_hedge_ratio=0.25)
+        llm = FakeLLM([0.15, 0.01, 0.15])
+        self.assertEqual(hedger.call("intent", llm.attempt), "回答1")
+        self.assertEqual(hedger.call("intent", llm.attempt), "回答2")
+        stats = hedger.get_stats()
+        self.assertEqual((stats["hedged"], stats["budget_skipped"]), (1, 1))
+
+    def test_async_hedge(self):
+        """异步版本取消落败的任务"""
+        llm = FakeLLM([2.0, 0.01])
+
+        async def main():
+            result = await self.hedger.acall("intent", llm.aattempt)
+            await asyncio.sleep(0)
+            return result
+
+        start = time.time()
+        self.assertEqual(asyncio.run(main()), "回答1")
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(llm.cancelled, [0])
+        self.assertEqual(self.hedger.get_stats()["backup_wins"], 1)
+
+    def test_attempt_read_timeout(self):
+        """对冲调用的读取超时有界且不小于对冲延迟上限，落败的调用不会占用线程和连接到LLM总超时"""
+        self.assertEqual(LLMHedger(max_delay=15.0, attempt_read_timeout=5.0).attempt_read_timeout, 15.0)
+
+        route = ModelRoute("hedge_test", "primary", None, model="small", max_tokens=256)
+        with patch.object(chatbot, "ChatOpenAI") as chat_openai, patch.dict(chatbot._hedge_llms, clear=True):
+            self.assertIs(chatbot._hedge_llm(route), chatbot._hedge_llm(route))
+        chat_openai.assert_called_once()
+        kwargs = chat_openai.call_args.kwargs
+        self.assertEqual((kwargs["model"], kwargs["max_tokens"]), ("small", 256))
+        self.assertEqual(kwargs["timeout"].read, chatbot.hedger.attempt_read_timeout)
+        self.assertGreater(kwargs["timeout"].connect, kwargs["timeout"].read)
+
+
+
+class TestHedgedCallScheduling(unittest.TestCase):
+    """测试对冲调用的每次尝试各占一个调度名额"""
+
+    def invoke(self, max_concurrency):
+        """主请求首字节慢，备份请求快；返回 (回复, 各次尝试执行时的占用名额数, 调度器)"""
+        scheduler = LLMScheduler(max_concurrency=max_concurrency)
+        hedger = LLMHedger(prompt_types=["hedge_slot_test"], initial_delay=0.05, min_delay=0.01, max_delay=1.0)
+        in_flight = []
+
+        def stream_content(route_llm, user_input, on_first_byte, cancelled, **call_kwargs):
+            index = len(in_flight)
+            in_flight.append(scheduler.get_stats()["in_flight"])
+            if index == 0:
+                time.sleep(0.2)
+            on_first_byte()
+            return f"回答{index}"
+
+        with patch.object(chatbot, "llm_scheduler", scheduler), patch.object(chatbot, "hedger", hedger), \
+                patch.object(chatbot, "_hedge_llm", return_value=None), \
+                patch.object(chatbot.ChatBot, "_stream_content", side_effect=stream_content):
+            reply = chatbot.ChatBot._invoke_llm("对冲调度测试", "hedge_slot_test")
+            # 等待落败的主请求结束并释放名额
+            time.sleep(0.3)
+        return reply, in_flight, scheduler
+
+    def test_backup_takes_its_own_slot(self):
+        """有空闲名额时备份请求另占一个名额，两次尝试结束后都释放"""
+        reply, in_flight, scheduler = self.invoke(max_concurrency=2)
+        self.assertEqual(reply["content"], "回答1")
+        self.assertEqual(in_flight, [1, 2])
+        self.assertEqual(scheduler.get_stats()["in_flight"], 0)
+
+    def test_backup_dropped_without_spare_slot(self):
+        """没有空闲名额时不发出备份请求的LLM调用，由主请求完成"""
+        reply, in_flight, scheduler = self.invoke(max_concurrency=1)
+        self.assertEqual(reply["content"], "回答0")
+        self.assertEqual(in_flight, [1])
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["by_priority"]["interactive"]["shed"] + stats["by_priority"]["interactive"]["expired"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import time
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.http_pool import HTTPClientPool
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """模拟LLM服务的HTTP/1.1长连接接口，每个请求耗时delay秒，设置release时等待其被设置后再响应"""
+    protocol_version = 'HTTP/1.1'
+    delay = 0
+    release = None
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.release is not None:
+            self.release.wait(5)
+        time.sleep(self.delay)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHTTPClientPool(unittest.TestCase):
+    """测试LLM服务的共享HTTP连接池"""
+
+    def setUp(self):
+        StubHandler.delay = 0
+        StubHandler.release = None
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/chat/completions'
+        self.pool = HTTPClientPool(max_connections=10, per_host_limit=2, timeout=5)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _wait_for(self, condition, timeout=2):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_sequential_requests_reuse_connection(self):
+        """顺序请求复用同一个长连接"""
+        for _ in range(20):
+            self.assertEqual(self.pool.client.post(self.url, json={}).json(), {'ok': True})
+
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['requests'], 20)
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 19)
+        self.assertEqual(stats['in_use'], 0)
+
+    def test_per_host_limit_queues_requests(self):
+        """超过单主机并发上限的请求排队等待，连接数不超过上限"""
+        StubHandler.release = threading.Event()
+        observed = []
+
+        def request():
+            response = self.pool.client.post(self.url, json={})
+            observed.append(self.pool.get_stats()['in_use'])
+            return response.status_code
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            futures = [executor.submit(request) for _ in range(6)]
+            # 前两个请求阻塞在服务端，其余请求在连接池中排队
+            self.assertTrue(self._wait_for(lambda: self.pool.get_stats()['waiting'] == 4))
+            self.assertEqual(self.pool.get_stats()['in_use'], 2)
+            StubHandler.release.set()
+            self.assertEqual([future.result() for future in futures], [200] * 6)
+
+        stats = self.pool.get_stats()
+        self.assertLessEqual(max(observed), 2)
+        self.assertLessEqual(stats['created'], 2)
+        self.assertEqual((stats['in_use'], stats['waiting']), (0, 0))
+
+    def test_async_client_shares_configuration(self):
+        """异步客户端使用相同的连接池配置，指标分别统计"""
+        async def main():
+            responses = await asyncio.gather(*(self.pool.async_client.post(self.url, json={}) for _ in range(5)))
+            await self.pool.aclose()
+            return [response.status_code for response in responses]
+
+        self.assertEqual(asyncio.run(main()), [200] * 5)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['async']['requests'], 5)
+        self.assertLessEqual(stats['async']['created'], 2)
+        self.assertEqual(stats['sync']['requests'], 0)
+        self.assertEqual(stats['requests'], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import uuid
+import asyncio
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure import chatbot
+from langchain.infrastructure.cache_manager import CacheManager
+from langchain.business.intent_analyzer import IntentAnalyzer
+
+
+class TestIntentCacheStats(unittest.TestCase):
+    """测试意图识别的LLM缓存统计"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.analyzer = IntentAnalyzer()
+        self.cache_manager = CacheManager()
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def counts(self):
+        return self.cache_manager.hit_count.value, self.cache_manager.miss_count.value
+
+    def assert_counted_once(self, identify):
+        # 规则无法判断意图的输入需要LLM识别；带随机后缀，避免命中之前测试写入磁盘缓存的结果
+        user_input = f"你好，想咨询一下 {uuid.uuid4().hex[:8]}"
+        with patch.object(chatbot, "USE_MOCK", True):
+            hits, misses = self.counts()
+            identify(user_input)
+            self.assertEqual(self.counts(), (hits, misses + 1))
+            identify(user_input)
+            self.assertEqual(self.counts(), (hits + 1, misses + 1))
+
+    def test_miss_counted_once(self):
+        """一次未命中只统计一次，再次识别同一输入统计一次命中"""
+        self.assert_counted_once(self.analyzer.ir_identify_intent)
+
+    def test_async_miss_counted_once(self):
+        """异步版本同样只统计一次"""
+        self.assert_counted_once(lambda user_input: asyncio.run(self.analyzer.ir_aidentify_intent(user_input)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import time
+import asyncio
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.cache_manager import CacheManager
+from langchain.infrastructure.llm_batch_processor import LMBatchProcessor
+
+
+LLM_LATENCY = 0.2
+
+
+def make_tasks(count, prefix="提示"):
+    return [{"id": i, "type": "general", "prompt": f"{prefix}{i}"} for i in range(count)]
+
+
+class TestConcurrentBatchProcess(unittest.TestCase):
+    """测试批处理并发执行"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.batch_processor = LMBatchProcessor(max_concurrency=8, task_timeout=5)
+
+        def chat(prompt, prompt_type="general", semantic_text=None):
+            time.sleep(LLM_LATENCY * 3 if "慢" in prompt else LLM_LATENCY)
+            return {"content": f"回答:{prompt}", "time": LLM_LATENCY}
+
+        async def achat(prompt, prompt_type="general", semantic_text=None):
+            await asyncio.sleep(LLM_LATENCY * 3 if "慢" in prompt else LLM_LATENCY)
+            return {"content": f"回答:{prompt}", "time": LLM_LATENCY}
+
+        self.batch_processor.chatbot.chat_with_memory = MagicMock(side_effect=chat)
+        self.batch_processor.chatbot.achat_with_memory = AsyncMock(side_effect=achat)
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_batch_takes_max_latency_not_sum(self):
+        """多个任务并发执行，总耗时接近单个任务的耗时"""
+        start = time.time()
+        results = self.batch_processor.batch_process(make_tasks(6))
+        self.assertLess(time.time() - start, LLM_LATENCY * 3)
+        self.assertEqual([r["result"]["content"] for r in results], [f"回答:提示{i}" for i in range(6)])
+
+    def test_order_and_from_cache_kept(self):
+        """结果保持任务顺序，命中缓存的任务标记from_cache"""
+        self.batch_processor.batch_process(make_tasks(2))
+        tasks = [{"id": 9, "type": "general", "prompt": "新提示"}] + make_tasks(2)
+
+        results = self.batch_processor.batch_process(tasks)
+        self.assertEqual([r["id"] for r in results], [9, 0, 1])
+        self.assertEqual([r["from_cache"] for r in results], [False, True, True])
+
+    def test_concurrency_limit(self):
+        """同时执行的任务数不超过并发上限"""
+        self.batch_processor.max_concurrency = 2
+        start = time.time()
+        self.batch_processor.batch_process(make_tasks(4))
+        self.assertGreaterEqual(time.time() - start, LLM_LATENCY * 2)
+
+    def test_task_timeout(self):
+        """超时的任务返回错误结果，不影响其他任务"""
+        self.batch_processor.task_timeout = LLM_LATENCY * 2
+        tasks = make_tasks(2) + [{"id": 2, "type": "general", "prompt": "慢提示"}]
+
+        start = time.time()
+        results = self.batch_processor.batch_process(tasks)
+        self.assertLess(time.time() - start, LLM_LATENCY * 3)
+        self.assertEqual([r.get("timeout", False) for r in results], [False, False, True])
+        self.assertIsNone(results[2]["result"])
+
+    def test_async_batch_takes_max_latency_not_sum(self):
+        """异步批处理同样并发执行并保持顺序"""
+        start = time.time()
+        results = asyncio.run(self.batch_processor.abatch_process(make_tasks(6)))
+        self.assertLess(time.time() - start, LLM_LATENCY * 3)
+        self.assertEqual([r["id"] for r in results], list(range(6)))
+
+    def test_async_task_timeout_keeps_call_running(self):
+        """异步超时的任务在后台继续执行，完成后写入缓存"""
+        self.batch_processor.task_timeout = LLM_LATENCY
+        tasks = [{"id": 0, "type": "general", "prompt": "慢提示"}]
+
+        async def main():
+            results = await self.batch_processor.abatch_process(tasks)
+            await asyncio.sleep(LLM_LATENCY * 3)
+            return results
+
+        self.assertTrue(asyncio.run(main())[0]["timeout"])
+        cached = self.batch_processor.batch_process(tasks)
+        self.assertTrue(cached[0]["from_cache"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import time
+import asyncio
+import threading
+import contextvars
+import unittest
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.llm_scheduler import (
+    LLMScheduler, LLMOverloadedError, TokenBucket, llm_priority, current_priority,
+    PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITY_BACKGROUND
+)
+from langchain.infrastructure import chatbot
+from langchain.infrastructure.cache_manager import CacheManager
+from langchain.infrastructure.llm_batch_processor import LMBatchProcessor
+from langchain.presentation.orchestrator.query_processor import QueryProcessor
+
+
+class TestTokenBucket(unittest.TestCase):
+    """测试令牌桶"""
+
+    def test_refill(self):
+        """令牌按每分钟速率补充，不超过容量"""
+        bucket = TokenBucket(600)
+        now = time.monotonic()
+        bucket.consume(600, now)
+        self.assertAlmostEqual(bucket.time_until(10, now), 1.0, places=2)
+        self.assertEqual(bucket.time_until(10, now + 1.0), 0)
+        self.assertEqual(bucket.time_until(1, now + 1000), 0)
+        self.assertLessEqual(bucket.tokens, 600)
+
+    def test_unlimited(self):
+        """速率为0时不限制"""
+        bucket = TokenBucket(0)
+        bucket.consume(10 ** 9, time.monotonic())
+        self.assertEqual(bucket.time_until(10 ** 9, time.monotonic()), 0)
+
+
+class TestLLMScheduler(unittest.TestCase):
+    """测试LLM调度器"""
+
+    def test_unlimited_passthrough(self):
+        """不限速时立即调度并统计"""
+        scheduler = LLMScheduler()
+        with scheduler.slot(100):
+            self.assertEqual(scheduler.get_stats()["in_flight"], 1)
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["by_priority"]["interactive"]["granted"], 1)
+
+    def test_priority_order(self):
+        """令牌不足时交互请求先于先到的批处理和后台请求获得调度"""
+        scheduler = LLMScheduler(requests_per_minute=600)
+        scheduler.request_bucket.consume(600, time.monotonic())
+        order = []
+
+        def call(priority):
+            with scheduler.slot(10, priority=priority):
+                order.append(priority)
+
+        threads = []
+        for priority in (PRIORITY_BACKGROUND, PRIORITY_BATCH, PRIORITY_INTERACTIVE):
+            thread = threading.Thread(target=call, args=(priority,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, [PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITY_BACKGROUND])
+        stats = scheduler.get_stats()["by_priority"]
+        self.assertGreater(stats["background"]["avg_queue_ms"], stats["interactive"]["avg_queue_ms"])
+
+    def test_interactive_reserve(self):
+        """批处理占满非保留名额时，交互请求仍可立即执行"""
+        scheduler = LLMScheduler(max_concurrency=2, interactive_reserve=1)
+        scheduler.acquire(10, priority=PRIORITY_BATCH)
+        with self.assertRaises(LLMOverloadedError):
+            scheduler.acquire(10, priority=PRIORITY_BATCH, deadline=0.1)
+
+        start = time.time()
+        with scheduler.slot(10, priority=PRIORITY_INTERACTIVE):
+            self.assertLess(time.time() - start, 0.05)
+        scheduler.release()
+        self.assertEqual(scheduler.get_stats()["by_priority"]["batch"]["expired"], 1)
+
+    def test_shed_when_wait_exceeds_deadline(self):
+        """预计排队时间超过截止时间时直接拒绝"""
+        scheduler = LLMScheduler(tokens_per_minute=6000)
+        scheduler.token_bucket.consume(6000, time.monotonic())
+        start = time.time()
+        with self.assertRaises(LLMOverloadedError):
+            scheduler.acquire(1000, priority=PRIORITY_BATCH, deadline=1)
+        self.assertLess(time.time() - start, 0.05)
+        self.assertEqual(scheduler.get_stats()["by_priority"]["batch"]["shed"], 1)
+
+        # 等待时间在截止时间内的请求排队后获得调度
+        with scheduler.slot(10, deadline=1):
+            pass
+        self.assertEqual(scheduler.get_stats()["by_priority"]["interactive"]["granted"], 1)
+
+    def test_async_slot(self):
+        """异步等待不阻塞事件循环，取消时退出队列"""
+        scheduler = LLMScheduler(max_concurrency=1)
+
+        async def main():
+            scheduler.acquire(10)
+            ticks = 0
+            waiter = asyncio.ensure_future(scheduler.aacquire(10))
+            for _ in range(5):
+                await asyncio.sleep(0.01)
+                ticks += 1
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            scheduler.release()
+            async with scheduler.aslot(10):
+                in_flight = scheduler.get_stats()["in_flight"]
+            return ticks, in_flight
+
+        self.assertEqual(asyncio.run(main()), (5, 1))
+        self.assertEqual(scheduler.get_stats()["in_flight"], 0)
+
+    def test_priority_context(self):
+        """优先级随上下文传递到线程池任务"""
+        self.assertEqual(current_priority(), PRIORITY_INTERACTIVE)
+        scheduler = LLMScheduler()
+        with llm_priority(PRIORITY_BATCH), ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertEqual(executor.submit(contextvars.copy_context().run, current_priority).result(),
+                             PRIORITY_BATCH)
+            with scheduler.slot(10):
+                pass
+        self.assertEqual(current_priority(), PRIORITY_INTERACTIVE)
+        self.assertEqual(scheduler.get_stats()["by_priority"]["batch"]["granted"], 1)
+
+
+class TestOverloadNotCached(unittest.TestCase):
+    """测试过载拒绝的调用不被缓存"""
+
+    def setUp(self):
+        CacheManager._instance = None
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_shed_task_not_cached(self):
+        """被拒绝的任务返回过载错误，不写入任务缓存，下次请求重新排队"""
+        tasks = [{"id": 1, "type": "combined_generation", "prompt": "过载测试提示"}]
+        # 关闭模拟模式，结果不受环境变量 LLM_MOCK 影响
+        with patch.object(chatbot, "USE_MOCK", False), \
+                patch.object(chatbot.llm_scheduler, "acquire", side_effect=LLMOverloadedError("LLM服务繁忙")) as acquire:
+            for _ in range(2):
+                result = LMBatchProcessor().batch_process(tasks)[0]
+                self.assertIsNone(result["result"])
+                self.assertTrue(result["overloaded"])
+                self.assertFalse(result["from_cache"])
+        self.assertEqual(acquire.call_count, 2)
+
+        with self.assertRaises(LLMOverloadedError):
+            QueryProcessor._check_llm_results([result])
+        self.assertTrue(QueryProcessor._check_llm_results([{"result": None, "error": "连接中断"}]))
+        self.assertFalse(QueryProcessor._check_llm_results([{"result": {"positive": "回答"}}]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import json
+import time
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.micro_batcher import LLMMicroBatcher
+
+
+class FakeLLM:
+    """模拟LLM：合并提示返回JSON数组，单独提示返回对应的JSON对象"""
+
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.prompts = []
+        self.batch_sizes = []
+        self._lock = threading.Lock()
+
+    def answer(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        if "### 任务" in prompt:
+            if self.broken:
+                return {"content": "无法解析的回答", "time": 0.01}
+            tasks = [line.split("：", 1)[1] for line in prompt.splitlines() if line.startswith("问题：")]
+            return {"content": "```json\n" + json.dumps([{"answer": task} for task in tasks], ensure_ascii=False) + "\n```",
+                    "time": 0.01}
+        return {"content": json.dumps({"answer": prompt.split("：", 1)[1]}, ensure_ascii=False), "time": 0.01}
+
+    def invoke(self, prompt, prompt_type=None, batch_size=1):
+        self.batch_sizes.append(batch_size)
+        time.sleep(0.01)
+        return self.answer(prompt)
+
+    async def ainvoke(self, prompt, prompt_type=None, batch_size=1):
+        self.batch_sizes.append(batch_size)
+        await asyncio.sleep(0.01)
+        return self.answer(prompt)
+
+
+class TestLLMMicroBatcher(unittest.TestCase):
+    """测试跨请求LLM微批处理"""
+
+    def setUp(self):
+        self.llm = FakeLLM()
+        self.batcher = LLMMicroBatcher(self.llm.invoke, self.llm.ainvoke, window_ms=50,
+                                       max_batch_size=4, prompt_types=("intent",))
+
+    def submit_concurrently(self, count):
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            futures = [executor.submit(self.batcher.submit, "intent", f"问题：{i}") for i in range(count)]
+            return [json.loads(future.result()["content"]) for future in futures]
+
+    def test_concurrent_prompts_merged(self):
+        """窗口内的并发提示合并为一次调用，答案按顺序分发给各个调用方"""
+        results = self.submit_concurrently(4)
+        self.assertEqual(results, [{"answer": str(i)} for i in range(4)])
+        self.assertEqual(len(self.llm.prompts), 1)
+        # 合并调用带上提示数，用于放大max_tokens
+        self.assertEqual(self.llm.batch_sizes, [4])
+        self.assertEqual(self.batcher.get_stats()["llm_calls_saved"], 3)
+
+    def test_batch_size_limit(self):
+        """超过批次上限的提示进入新的批次"""
+        self.submit_concurrently(6)
+        self.assertEqual(len(self.llm.prompts), 2)
+        self.assertEqual(self.batcher.get_stats()["batched_prompts"], 6)
+
+    def test_single_prompt_called_directly(self):
+        """窗口内只有一个提示时使用原始提示单独调用"""
+        result = self.batcher.submit("intent", "问题：独立")
+        self.assertEqual(json.loads(result["content"]), {"answer": "独立"})
+        self.assertEqual(self.llm.prompts, ["问题：独立"])
+
+    def test_fallback_to_individual_calls(self):
+        """合并响应无法解析时逐个单独调用"""
+        self.llm.broken = True
+        results = self.submit_concurrently(3)
+        self.assertEqual(results, [{"answer": str(i)} for i in range(3)])
+        self.assertEqual(len(self.llm.prompts), 4)
+        self.assertEqual(self.llm.batch_sizes, [3, 1, 1, 1])
+        self.assertEqual(self.batcher.get_stats()["fallbacks"], 1)
+
+    def test_registered_builder(self):
+        """注册的构建函数生成合并提示"""
+        self.batcher.register_builder("intent", lambda prompts, texts: "\n\n".join(
+            f"### 任务{i}\n{prompt}" for i, prompt in enumerate(prompts, 1)) + "\n紧凑格式")
+        self.submit_concurrently(2)
+        self.assertTrue(self.llm.prompts[0].endswith("紧凑格式"))
+
+    def test_async_prompts_merged(self):
+        """异步调用方同样合并，等待期间不阻塞事件循环"""
+        async def main():
+            return await asyncio.gather(*(self.batcher.asubmit("intent", f"问题：{i}") for i in range(3)))
+
+        results = asyncio.run(main())
+        self.assertEqual([json.loads(r["content"]) for r in results], [{"answer": str(i)} for i in range(3)])
+        self.assertEqual(len(self.llm.prompts), 1)
+        self.assertEqual(results[0]["micro_batch_size"], 3)
+        # 合并调用的耗时按提示分摊
+        self.assertAlmostEqual(sum(r["time"] for r in results), 0.01)
+        self.assertEqual(results[0]["micro_batch_time"], 0.01)
+
+    def test_error_delivered_to_all_callers(self):
+        """合并调用失败时所有调用方都收到异常"""
+        def failing(prompt, prompt_type=None, batch_size=1):
+            time.sleep(0.01)
+            raise RuntimeError("服务不可用")
+        self.batcher.invoke = failing
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(self.batcher.submit, "intent", f"问题：{i}") for i in range(3)]
+            for future in futures:
+                with self.assertRaises(RuntimeError):
+                    future.result()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import json
+import time
+import statistics
+import unittest
+import sys
+import os
+
+import httpx
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.http_pool import HTTPClientPool
+from langchain.infrastructure.mock_llm_server import MockLLMServer, MockResponder, LatencyModel
+
+
+QUESTION = "我有中级电工证，想了解技能补贴政策"
+
+
+def chat_request(stream=False):
+    return {"model": "mock-llm", "stream": stream,
+            "messages": [{"role": "system", "content": "系统提示"}, {"role": "user", "content": QUESTION}]}
+
+
+class TestMockLLMServer(unittest.TestCase):
+    """测试本地OpenAI兼容的模拟LLM服务"""
+
+    def setUp(self):
+        self.responder = MockResponder()
+        self.servers = []
+        self.pool = HTTPClientPool(timeout=5)
+
+    def tearDown(self):
+        self.pool.close()
+        for server in self.servers:
+            server.stop()
+
+    def start(self, **latency):
+        latency.setdefault('ttft_median_ms', 0)
+        latency.setdefault('tokens_per_second', 0)
+        server = MockLLMServer(responder=self.responder, latency=LatencyModel(seed=1, **latency)).start()
+        self.servers.append(server)
+        return server
+
+    def test_completion_replays_mock_responses(self):
+        """非流式请求回放模拟数据，返回OpenAI格式的响应"""
+        server = self.start()
+        response = self.pool.client.post(f"{server.base_url}/chat/completions", json=chat_request())
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["object"], "chat.completion")
+        self.assertEqual(json.loads(body["choices"][0]["message"]["content"]),
+                         self.responder.mock_responses[QUESTION])
+        self.assertGreater(body["usage"]["completion_tokens"], 0)
+
+    def test_stream_with_latency(self):
+        """流式请求按SSE分块输出，首个片段前等待TTFT，总耗时受输出速度限制"""
+        server = self.start(ttft_median_ms=200, ttft_sigma=0, tokens_per_second=2000)
+        expected = self.responder.answer_reply(QUESTION)
+        start = time.time()
+        first_content_at = None
+        parts = []
+        with self.pool.client.stream("POST", f"{server.base_url}/chat/completions", json=chat_request(True)) as response:
+            for line in response.iter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                delta = json.loads(line[6:])["choices"][0]["delta"]
+                if delta.get("content"):
+                    first_content_at = first_content_at or time.time() - start
+                    parts.append(delta["content"])
+        total = time.time() - start
+
+        self.assertEqual("".join(parts), expected)
+        self.assertGreaterEqual(first_content_at, 0.2)
+        self.assertGreater(len(parts), 10)
+        self.assertGreaterEqual(total, 0.2 + server.completion(QUESTION)[1] / 2000 * 0.9)
+
+    def test_keepalive_across_requests(self):
+        """流式和非流式请求复用同一个长连接"""
+        server = self.start()
+        for stream in (False, True, False, True):
+            with self.pool.client.stream("POST", f"{server.base_url}/chat/completions",
+                                         json=chat_request(stream)) as response:
+                response.read()
+        self.assertEqual(self.pool.get_stats()["created"], 1)
+        self.assertEqual(server.get_stats()["requests"], 4)
+
+    def test_error_and_timeout_injection(self):
+        """按错误率返回500，按挂起率不响应"""
+        server = self.start(error_rate=1.0)
+        response = self.pool.client.post(f"{server.base_url}/chat/completions", json=chat_request())
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()["error"]["type"], "server_error")
+
+        server = self.start(timeout_rate=1.0, timeout_seconds=1)
+        with self.assertRaises(httpx.HTTPError):
+            httpx.post(f"{server.base_url}/chat/completions", json=chat_request(), timeout=0.2)
+        self.assertEqual(server.get_stats()["timeouts"], 1)
+
+    def test_lognormal_ttft(self):
+        """首token时间的中位数接近配置值，且有长尾"""
+        latency = LatencyModel(ttft_median_ms=300, ttft_sigma=0.5, seed=7)
+        samples = [latency.ttft() for _ in range(2000)]
+        self.assertAlmostEqual(statistics.median(samples), 0.3, delta=0.03)
+        self.assertGreater(max(samples), 0.3 * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import time
+import math
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.model_router import ModelRouter
+from langchain.infrastructure.config_manager import ConfigManager
+from langchain.infrastructure import chatbot
+
+
+class FakeLLM:
+    """记录创建参数的模拟LLM"""
+
+    def __init__(self, **params):
+        self.params = params
+        self.invoke_kwargs = []
+
+    def invoke(self, messages, **kwargs):
+        self.invoke_kwargs.append(kwargs)
+        return type("Message", (), {"content": "回答"})()
+
+
+ROUTES = {
+    "intent": {
+        "primary": {"model": "large", "max_tokens": 512, "temperature": 0.1},
+        "secondary": {"model": "flash", "max_tokens": 512, "api_base": "http://backup/v1"},
+        "p95_budget_seconds": 1.0
+    },
+    "job_analysis": {
+        "primary": {"max_tokens": 1024}
+    }
+}
+
+
+class TestModelRouter(unittest.TestCase):
+    """测试按提示类型的模型路由"""
+
+    def setUp(self):
+        self.router = ModelRouter(FakeLLM(default=True), FakeLLM, routes=ROUTES, window_size=20,
+                                  min_samples=5, cooldown_seconds=0.2)
+
+    def test_routes_by_prompt_type(self):
+        """各提示类型使用各自的模型和生成参数，未配置的类型使用默认路由"""
+        intent = self.router.route("intent")
+        self.assertEqual((intent.tier, intent.llm.params["model"], intent.llm.params["max_tokens"]),
+                         ("primary", "large", 512))
+        self.assertEqual(self.router.route("job_analysis").llm.params["max_tokens"], 1024)
+        self.assertTrue(self.router.route("general").llm.params["default"])
+
+    def test_failover_and_recovery(self):
+        """主路由p95超过预算时切换到备用路由，冷却后回到主路由试探"""
+        primary = self.router.route("intent")
+        for _ in range(19):
+            self.router.record(primary, 2.0)
+        # 样本数不足min_samples时不判断
+        self.assertEqual(self.router.route("intent").tier, "primary")
+        self.router.record(primary, 2.0)
+
+        secondary = self.router.route("intent")
+        self.assertEqual((secondary.tier, secondary.llm.params["api_base"]), ("secondary", "http://backup/v1"))
+        stats = self.router.get_stats()["routes"]["intent"]
+        self.assertEqual((stats["active"], stats["failovers"]), ("secondary", 1))
+
+        time.sleep(0.25)
+        self.assertEqual(self.router.route("intent").tier, "primary")
+        self.assertEqual(self.router.get_stats()["routes"]["intent"]["primary"]["samples"], 0)
+
+    def test_errors_count_as_slow(self):
+        """失败的调用按无穷大耗时计入p95，但单次失败不会触发切换"""
+        primary = self.router.route("intent")
+        for _ in range(19):
+            self.router.record(primary, 0.1)
+        self.router.record(primary, 0.1, ok=False)
+        self.assertEqual(self.router.route("intent").tier, "primary")
+        self.router.record(primary, 0.1, ok=False)
+        self.assertEqual(self.router.route("intent").tier, "secondary")
+        self.assertEqual(self.router.get_stats()["routes"]["intent"]["primary"]["errors"], 2)
+
+    def test_no_failover_without_secondary(self):
+        """没有备用路由的类型不切换"""
+        route = self.router.route("job_analysis")
+        for _ in range(30):
+            self.router.record(route, 100.0)
+        self.assertEqual(self.router.route("job_analysis").tier, "primary")
+
+    def test_quality_fallbacks(self):
+        """质量降级按响应所用的路由统计，缓存响应不计入"""
+        primary = self.router.route("intent")
+        self.router.record(primary, 0.1)
+        self.router.record(primary, 0.1)
+        self.router.record_fallback("intent", {"content": "不是JSON", "route": "primary"})
+        self.router.record_fallback("intent", {"content": "不是JSON", "from_cache": True})
+        self.router.record_fallback("intent", None)
+        stats = self.router.get_stats()["routes"]["intent"]["primary"]
+        self.assertEqual((stats["fallbacks"], stats["fallback_rate"]), (1, 0.5))
+
+    def test_min_samples_floor(self):
+        """min_samples小于20时按20计"""
+        self.assertEqual(self.router.min_samples, 20)
+        self.assertEqual(ModelRouter._p95([1.0] * 19 + [math.inf]), 1.0)
+        self.assertEqual(ModelRouter._p95([1.0] * 9 + [math.inf]), math.inf)
+
+    def test_batched_max_tokens(self):
+        """合并多个提示的微批调用按提示数放大max_tokens"""
+        intent = self.router.route("intent")
+        self.assertIsNone(intent.max_tokens_for(1))
+        self.assertEqual(intent.max_tokens_for(8), 4096)
+        self.assertIsNone(self.router.route("general").max_tokens_for(8))
+
+    def test_default_config_fails_over(self):
+        """默认配置中intent有可用的备用路由（默认模型、更小的max_tokens），主路由变慢时能切换"""
+        router = ModelRouter.from_config(FakeLLM(default=True), FakeLLM, ConfigManager())
+        primary = router.route("intent")
+        for _ in range(20):
+            router.record(primary, 100.0)
+        secondary = router.route("intent")
+        self.assertEqual(secondary.tier, "secondary")
+        self.assertIsNone(secondary.llm.params["model"])
+        self.assertLess(secondary.max_tokens, primary.max_tokens)
+
+
+class TestInvokeMaxTokens(unittest.TestCase):
+    """测试经_invoke_llm调用时的max_tokens"""
+
+    def invoke(self, batch_size):
+        router = ModelRouter(FakeLLM(default=True), FakeLLM,
+                             routes={"max_tokens_test": {"primary": {"max_tokens": 3072}}})
+        with patch.object(chatbot, "model_router", router), patch.dict(os.environ, {"LLM_MAX_TOKENS": "8192"}):
+            reply = chatbot.ChatBot._invoke_llm("问题", "max_tokens_test", batch_size=batch_size)
+        self.assertEqual(reply["content"], "回答")
+        return router.route("max_tokens_test").llm.invoke_kwargs[-1]
+
+    def test_batched_max_tokens_capped(self):
+        """微批调用放大的max_tokens不超过LLM_MAX_TOKENS，单个提示时使用路由自身的配置"""
+        self.assertEqual(self.invoke(batch_size=2), {"max_tokens": 6144})
+        self.assertEqual(self.invoke(batch_size=4), {"max_tokens": 8192})
+        self.assertEqual(self.invoke(batch_size=1), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
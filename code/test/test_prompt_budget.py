@@ -0,0 +1,168 @@
+import json
+import time
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.prompt_budget import TokenEstimator, PromptBuilder, compact_json
+
+
+class ByteEncoding:
+    """按UTF-8字节分词的模拟tiktoken编码，一个token可能只是多字节字符的一部分"""
+
+    def encode(self, text, disallowed_special=()):
+        return list(text.encode('utf-8'))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode('utf-8', errors='replace')
+
+    def decode_bytes(self, tokens):
+        return bytes(tokens)
+
+
+def render_jobs(jobs):
+    return f"岗位: {compact_json(jobs)}"
+
+
+class TestTokenEstimator(unittest.TestCase):
+    """测试本地token估算"""
+
+    def setUp(self):
+        self.estimator = TokenEstimator()
+
+    def test_count_and_truncate(self):
+        """截断结果不超过上限，未超过上限时原样返回"""
+        text = "我是退役军人，想申请创业担保贷款 and some English words" * 10
+        self.assertGreater(self.estimator.count(text), 0)
+        self.assertEqual(self.estimator.truncate("短文本", 100), "短文本")
+        truncated = self.estimator.truncate(text, 50)
+        self.assertLessEqual(self.estimator.count(truncated), 50)
+        self.assertTrue(text.startswith(truncated))
+
+    def wait_loaded(self, estimator, timeout=2):
+        deadline = time.time() + timeout
+        while not estimator._loaded and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(estimator._loaded)
+
+    def test_encoding_loaded_in_background(self):
+        """创建估算器时不加载编码；加载在后台进行，完成前按估算计数，完成后改用tiktoken"""
+        loaded = threading.Event()
+        fake_tiktoken = MagicMock()
+        fake_tiktoken.get_encoding.side_effect = lambda name: loaded.wait(2) and ByteEncoding()
+        with patch("langchain.infrastructure.prompt_budget.tiktoken", fake_tiktoken):
+            estimator = TokenEstimator()
+            fake_tiktoken.get_encoding.assert_not_called()
+            self.assertEqual(estimator.count("中文abcd"), 3)
+            self.assertEqual(estimator.source, "heuristic")
+            estimator.start_loading()
+            loaded.set()
+            self.wait_loaded(estimator)
+            self.assertEqual(estimator.source, "tiktoken")
+            # 加载前记忆的估算计数已作废
+            self.assertEqual(estimator.count("中文abcd"), 10)
+        fake_tiktoken.get_encoding.assert_called_once_with("cl100k_base")
+
+    def test_load_failure_keeps_heuristic(self):
+        """编码加载失败时一直使用估算计数"""
+        fake_tiktoken = MagicMock()
+        fake_tiktoken.get_encoding.side_effect = OSError("网络不可用")
+        with patch("langchain.infrastructure.prompt_budget.tiktoken", fake_tiktoken):
+            estimator = TokenEstimator()
+            estimator.start_loading()
+            self.wait_loaded(estimator)
+            self.assertEqual(estimator.count("其他文本"), 4)
+            self.assertEqual(estimator.source, "heuristic")
+
+    def test_load_timeout_keeps_heuristic(self):
+        """加载超时后放弃，之后才完成的加载结果不再使用"""
+        release = threading.Event()
+        finished = threading.Event()
+
+        def get_encoding(name):
+            release.wait(2)
+            finished.set()
+            return ByteEncoding()
+
+        fake_tiktoken = MagicMock()
+        fake_tiktoken.get_encoding.side_effect = get_encoding
+        with patch("langchain.infrastructure.prompt_budget.tiktoken", fake_tiktoken):
+            estimator = TokenEstimator(load_timeout=0.05)
+            estimator.start_loading()
+            self.wait_loaded(estimator)
+            release.set()
+            self.assertTrue(finished.wait(2))
+            time.sleep(0.05)
+            self.assertEqual(estimator.source, "heuristic")
+
+    def test_truncate_keeps_character_boundary(self):
+        """截断位置落在多字节字符中间时丢弃不完整的字节，不产生替换字符"""
+        estimator = TokenEstimator()
+        estimator._loading_started = estimator._loaded = True
+        estimator._encoding = ByteEncoding()
+        # “中”占3个字节，第4个token只是“文”的第一个字节
+        self.assertEqual(estimator.truncate("中文", 4), "中")
+        self.assertEqual(estimator.truncate("中文", 6), "中文")
+
+
+class TestPromptBuilder(unittest.TestCase):
+    """测试按token预算组装提示"""
+
+    def setUp(self):
+        self.estimator = TokenEstimator()
+        self.jobs = [{"job_id": f"JOB_A0{i}", "title": "职业技能培训讲师", "feat": "兼职灵活"} for i in range(5)]
+        self.example = '示例：{"job_analysis":[{"id":"JOB_A02","reasons":{"positive":"①持有中级电工证符合要求"}}]}'
+
+    def new_builder(self, budget):
+        builder = PromptBuilder(budget, estimator=self.estimator)
+        builder.add("instructions", "你是专业政策咨询助手。", required=True)
+        builder.add_items("jobs", self.jobs, render_jobs, priority=2)
+        builder.add("example", self.example, priority=1)
+        builder.add("output_format", '输出结构：{"job_analysis":[]}', required=True)
+        return builder
+
+    def test_within_budget_keeps_everything(self):
+        """预算充足时保留所有段并按添加顺序拼接"""
+        prompt, report = self.new_builder(10000).build()
+        self.assertEqual(report["dropped"], [])
+        self.assertEqual(list(report["sections"]), ["instructions", "jobs", "example", "output_format"])
+        self.assertTrue(prompt.startswith("你是专业政策咨询助手。"))
+        self.assertFalse(report["over_budget"])
+
+    def test_low_priority_dropped_first(self):
+        """超出预算时先整段移除低优先级的示例，再从末尾移除岗位"""
+        _, full = self.new_builder(10000).build()
+        budget = full["total_tokens"] - full["sections"]["example"] - 20
+        prompt, report = self.new_builder(budget).build()
+
+        self.assertIn("example", report["dropped"])
+        self.assertNotIn("示例", prompt)
+        self.assertGreaterEqual(report["trimmed"]["jobs"], 1)
+        self.assertLessEqual(report["total_tokens"], budget)
+        # 保留的岗位仍是完整的JSON
+        jobs_line = prompt.split("\n\n")[1]
+        self.assertEqual(json.loads(jobs_line[len("岗位: "):]), self.jobs[:5 - report["trimmed"]["jobs"]])
+
+    def test_required_sections_never_dropped(self):
+        """预算不足以容纳必需段时保留必需段并标记超出预算"""
+        prompt, report = self.new_builder(5).build()
+        self.assertEqual(list(report["sections"]), ["instructions", "output_format"])
+        self.assertTrue(report["over_budget"])
+
+    def test_section_cap(self):
+        """列表段超过自身上限时从末尾移除条目"""
+        builder = PromptBuilder(10000, estimator=self.estimator)
+        one_job = self.estimator.count(render_jobs(self.jobs[:1]))
+        builder.add_items("jobs", self.jobs, render_jobs, max_tokens=one_job)
+        _, report = builder.build()
+        self.assertEqual(report["trimmed"], {"jobs": 4})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.query_similarity_index import QuerySimilarityIndex
+from langchain.infrastructure.cache_manager import CacheManager
+
+
+class TestQuerySimilarityIndex(unittest.TestCase):
+    """测试相似查询候选索引"""
+
+    def setUp(self):
+        self.index = QuerySimilarityIndex()
+
+    def test_normalize(self):
+        """归一化去除空白、标点和符号"""
+        self.assertEqual(QuerySimilarityIndex.normalize("我想 创业，有什么补贴？"), "我想创业有什么补贴")
+        self.assertEqual(QuerySimilarityIndex.normalize("ABC-123"), "abc123")
+
+    def test_similar_query_is_candidate(self):
+        """措辞相近的查询能被找回"""
+        self.index.add("我是退役军人，想申请创业担保贷款")
+        self.index.add("请问技能补贴怎么领取")
+
+        candidates = self.index.candidates("我是退役军人，想申请创业担保贷款？")
+        self.assertIn("我是退役军人，想申请创业担保贷款", candidates)
+
+    def test_unrelated_query_not_candidate(self):
+        """无关查询不会成为候选"""
+        self.index.add("我是退役军人，想申请创业担保贷款")
+        self.assertEqual(self.index.candidates("hello world"), [])
+
+    def test_remove(self):
+        """删除后查询不再作为候选"""
+        self.index.add("想了解场地租金补贴")
+        self.index.remove("想了解场地租金补贴")
+
+        self.assertNotIn("想了解场地租金补贴", self.index)
+        self.assertEqual(self.index.candidates("想了解场地租金补贴"), [])
+        self.assertEqual(self.index.get_stats()['bucket_count'], 0)
+
+    def test_candidate_limit(self):
+        """候选数量受上限约束"""
+        for i in range(50):
+            self.index.add(f"想了解场地租金补贴{i}")
+        self.assertLessEqual(len(self.index.candidates("想了解场地租金补贴", limit=5)), 5)
+
+
+class TestCacheManagerSimilarQuery(unittest.TestCase):
+    """测试缓存管理器的相似查询命中"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.cache_manager = CacheManager(max_cache_size=100)
+        self.cache_manager.clear()
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_similar_query_hit(self):
+        """相似查询命中已缓存的结果"""
+        self.cache_manager.set_query_cache("我是退役军人，想申请创业担保贷款", {}, {'answer': 1})
+
+        result = self.cache_manager.get_query_cache("我是退役军人，想申请创业担保贷款？", {})
+        self.assertEqual(result, {'answer': 1})
+
+    def test_index_cleaned_on_delete(self):
+        """删除缓存项时同步清理索引"""
+        self.cache_manager.set('query:1', {'v': 1}, query_text='想了解场地租金补贴')
+        self.cache_manager.delete('query:1')
+
+        self.assertEqual(self.cache_manager.find_similar_queries('想了解场地租金补贴'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
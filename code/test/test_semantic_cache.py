@@ -0,0 +1,110 @@
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.semantic_cache import SemanticLLMCache
+from langchain.infrastructure.cache_manager import CacheManager
+
+
+def build_prompt(user_input, context='政策: POLICY_A01'):
+    """构建测试用提示：模板 + 用户输入 + 检索上下文"""
+    return f"请根据政策回答。\n用户输入: {user_input}\n{context}\n输出JSON格式"
+
+
+class TestSemanticLLMCache(unittest.TestCase):
+    """测试TF-IDF语义缓存"""
+
+    def setUp(self):
+        self.cache = SemanticLLMCache(mode='on', thresholds={'intent': 0.8, 'strict': 0.99})
+        for text in ['我有中级电工证，想了解技能补贴政策', '我想找一份兼职工作', '我是退役军人想创业，有什么税收优惠']:
+            self.cache.add('intent', build_prompt(text), text, f'llm:{text}')
+
+    def test_similar_input_matches(self):
+        """措辞略有不同的用户输入命中最相似的已缓存提示"""
+        text = '我有中级电工证,想了解一下技能补贴政策'
+        key, similarity, cached_text = self.cache.lookup('intent', build_prompt(text), text)
+
+        self.assertEqual(cached_text, '我有中级电工证，想了解技能补贴政策')
+        self.assertGreaterEqual(similarity, 0.8)
+
+    def test_threshold_per_prompt_type(self):
+        """不同提示类型使用各自的阈值"""
+        text = '我有中级电工证,想了解一下技能补贴政策'
+        self.cache.add('strict', build_prompt('我有中级电工证，想了解技能补贴政策'), '我有中级电工证，想了解技能补贴政策', 'llm:strict')
+        self.assertIsNone(self.cache.lookup('strict', build_prompt(text), text))
+
+    def test_unrelated_input_misses(self):
+        """不相关的用户输入不命中"""
+        text = '今天天气怎么样'
+        self.assertIsNone(self.cache.lookup('intent', build_prompt(text), text))
+
+    def test_different_context_misses(self):
+        """用户输入相同但检索上下文不同时不复用回答"""
+        text = '我想找一份兼职工作'
+        self.assertIsNone(self.cache.lookup('intent', build_prompt(text, context='政策: POLICY_B02'), text))
+
+    def test_max_entries(self):
+        """超出容量时淘汰最早加入的条目"""
+        cache = SemanticLLMCache(mode='on', max_entries=2)
+        for i, text in enumerate(['我想找一份兼职工作', '我想申请创业贷款', '我想了解技能补贴']):
+            cache.add('general', build_prompt(text), text, f'llm:{i}')
+
+        self.assertEqual(cache.get_stats()['entries'], 2)
+        self.assertIsNone(cache.lookup('general', build_prompt('我想找一份兼职工作'), '我想找一份兼职工作'))
+
+    def test_discard(self):
+        """缓存项不存在后移除对应的语义条目"""
+        self.cache.discard('llm:我想找一份兼职工作')
+        self.assertIsNone(self.cache.lookup('intent', build_prompt('我想找一份兼职工作'), '我想找一份兼职工作'))
+        self.assertEqual(self.cache.get_stats()['entries'], 2)
+
+    def test_off_mode(self):
+        """关闭时不记录也不查找"""
+        cache = SemanticLLMCache()
+        cache.add('intent', build_prompt('我想找一份兼职工作'), '我想找一份兼职工作', 'llm:1')
+        self.assertEqual(cache.get_stats()['entries'], 0)
+
+
+class TestCacheManagerSemanticCache(unittest.TestCase):
+    """测试缓存管理器的语义缓存查找"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.cache_manager = CacheManager()
+        self.cache_manager.clear()
+        self.cache_manager.semantic_cache = SemanticLLMCache(mode='on', thresholds={'intent': 0.75})
+        cached_text = '我有中级电工证，想了解技能补贴政策'
+        self.cache_manager.set_llm_cache(build_prompt(cached_text), {'content': '技能补贴', 'time': 3})
+        self.cache_manager.set_semantic_llm_cache('intent', build_prompt(cached_text), cached_text)
+        self.text = '我有中级电工证,想了解一下技能补贴政策'
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_semantic_hit(self):
+        """相似输入返回已缓存的LLM响应"""
+        value = self.cache_manager.get_semantic_llm_cache('intent', build_prompt(self.text), self.text)
+        self.assertEqual(value['content'], '技能补贴')
+        self.assertEqual(self.cache_manager.get_cache_stats()['semantic_cache']['hit_count'], 1)
+
+    def test_audit_mode(self):
+        """审计模式只记录本可命中的请求，不返回缓存"""
+        self.cache_manager.semantic_cache.mode = 'audit'
+        self.assertIsNone(self.cache_manager.get_semantic_llm_cache('intent', build_prompt(self.text), self.text))
+        stats = self.cache_manager.get_cache_stats()['semantic_cache']
+        self.assertEqual(stats['audit_hit_count'], 1)
+        self.assertEqual(stats['hit_count'], 0)
+
+    def test_evicted_response_misses(self):
+        """精确缓存项被删除后语义缓存不再命中"""
+        self.cache_manager.delete(self.cache_manager.generate_cache_key('llm', build_prompt('我有中级电工证，想了解技能补贴政策')))
+        self.assertIsNone(self.cache_manager.get_semantic_llm_cache('intent', build_prompt(self.text), self.text))
+        self.assertEqual(self.cache_manager.semantic_cache.get_stats()['entries'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
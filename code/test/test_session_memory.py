@@ -0,0 +1,68 @@
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.session_memory import SessionMemoryStore
+
+
+class TestSessionMemoryStore(unittest.TestCase):
+    """测试按会话保存的有界对话记忆"""
+
+    def setUp(self):
+        self.store = SessionMemoryStore(max_messages=4, idle_ttl=60, max_total_chars=100)
+
+    def test_sessions_isolated_and_capped(self):
+        """不同会话的消息互不混合，单个会话只保留最新的消息"""
+        for i in range(3):
+            self.store.add_messages('a', [('user', f'问{i}'), ('ai', f'答{i}')], now=0)
+        self.store.add_messages('b', [('user', '你好')], now=0)
+
+        self.assertEqual(self.store.get_messages('a', now=1),
+                         [('user', '问1'), ('ai', '答1'), ('user', '问2'), ('ai', '答2')])
+        self.assertEqual(self.store.get_messages('b', now=1), [('user', '你好')])
+        self.assertEqual(self.store.get_stats()['total_chars'], 10)
+
+    def test_idle_sessions_evicted(self):
+        """空闲超时的会话被移除，访问会延长会话的有效期"""
+        self.store.add_messages('a', [('user', '问')], now=0)
+        self.store.add_messages('b', [('user', '问')], now=0)
+        self.store.get_messages('b', now=50)
+
+        self.store.add_messages('c', [('user', '问')], now=70)
+        self.assertEqual(self.store.get_messages('a', now=70), [])
+        self.assertEqual(self.store.get_messages('b', now=70), [('user', '问')])
+        self.assertEqual(self.store.get_stats()['idle_evicted'], 1)
+
+    def test_budget_evicts_least_recently_used(self):
+        """总字符数超出预算时移除最近最少访问的会话"""
+        self.store.add_messages('a', [('user', 'x' * 40)], now=0)
+        self.store.add_messages('b', [('user', 'y' * 40)], now=1)
+        self.store.get_messages('a', now=2)
+        self.store.add_messages('c', [('user', 'z' * 40)], now=3)
+
+        self.assertEqual(self.store.get_messages('b', now=4), [])
+        self.assertEqual(len(self.store.get_messages('a', now=4)), 1)
+        stats = self.store.get_stats()
+        self.assertEqual((stats['sessions'], stats['total_chars'], stats['budget_evicted']), (2, 80, 1))
+
+    def test_oversized_session_keeps_latest_message(self):
+        """单个会话超出预算时只保留最新的消息"""
+        self.store.add_messages('a', [('user', 'x' * 60), ('ai', 'y' * 60)], now=0)
+        self.assertEqual(self.store.get_messages('a', now=0), [('ai', 'y' * 60)])
+
+    def test_clear(self):
+        """清空单个会话或所有会话"""
+        self.store.add_messages('a', [('user', '问')], now=0)
+        self.store.add_messages('b', [('user', '问')], now=0)
+        self.store.clear('a')
+        self.assertEqual(self.store.get_stats()['sessions'], 1)
+        self.store.clear()
+        self.assertEqual((self.store.get_stats()['sessions'], self.store.get_stats()['total_chars']), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import time
+import shutil
+import tempfile
+import unittest
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.disk_cache import DiskCache
+from langchain.infrastructure.cache_manager import CacheManager
+
+
+def make_entry(value, ttl=60, now=None, query_text=None):
+    """构建测试用缓存项"""
+    now = time.time() if now is None else now
+    return {'value': value, 'expiry': now + ttl, 'created': now, 'query_text': query_text}
+
+
+def new_shared_manager(path):
+    """创建挂载共享磁盘缓存的缓存管理器，每次读取都同步事件"""
+    CacheManager._instance = None
+    cache_manager = CacheManager()
+    cache_manager.disk_cache = DiskCache(path, shared=True)
+    cache_manager.shared_sync_interval = 0
+    return cache_manager
+
+
+def run_worker(path, prompts):
+    """模拟一个工作进程处理LLM请求，返回实际调用LLM的次数"""
+    cache_manager = new_shared_manager(path)
+    llm_calls = 0
+    for prompt in prompts:
+        if cache_manager.get_llm_cache(prompt) is None:
+            llm_calls += 1
+            cache_manager.set_llm_cache(prompt, {'content': f'回答:{prompt}', 'time': 1})
+    cache_manager.disk_cache.close()
+    return llm_calls
+
+
+class TestSharedDiskCacheEvents(unittest.TestCase):
+    """测试共享磁盘缓存的事件日志"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'cache.db')
+        self.worker_a = DiskCache(self.path, shared=True)
+        self.worker_b = DiskCache(self.path, shared=True)
+
+    def tearDown(self):
+        self.worker_a.close()
+        self.worker_b.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_events_delivered_to_other_processes(self):
+        """写入、删除和清空事件只同步给其他进程"""
+        entry = make_entry('v', query_text='我想创业')
+        self.worker_a.set('llm:1', entry)
+        self.worker_a.delete('llm:1')
+        self.worker_a.clear()
+
+        events, lost = self.worker_b.poll_events()
+        self.assertFalse(lost)
+        self.assertEqual(events, [('set', 'llm:1', '我想创业', entry['expiry']),
+                                  ('delete', 'llm:1', None, None),
+                                  ('clear', None, None, None)])
+        self.assertEqual(self.worker_a.poll_events(), ([], False))
+        self.assertEqual(self.worker_b.poll_events(), ([], False))
+
+    def test_pruned_events_reported_as_lost(self):
+        """未读取的事件被清理后报告丢失"""
+        self.worker_a.event_retention = 0
+        self.worker_a.set('llm:1', make_entry('v'))
+        self.worker_a.poll_events(now=time.time() + 100)
+
+        events, lost = self.worker_b.poll_events()
+        self.assertEqual(events, [])
+        self.assertTrue(lost)
+
+    def test_private_cache_records_no_events(self):
+        """非共享模式不记录事件"""
+        private = DiskCache(os.path.join(self.temp_dir, 'private.db'))
+        private.set('llm:1', make_entry('v'))
+        self.assertEqual(private.poll_events(), ([], False))
+        count = private._conn.execute("SELECT COUNT(*) FROM cache_events").fetchone()[0]
+        private.close()
+        self.assertEqual(count, 0)
+
+
+class TestCacheManagerSharedTier(unittest.TestCase):
+    """测试缓存管理器在共享磁盘缓存上的一级缓存同步"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'cache.db')
+        self.cache_manager = new_shared_manager(self.path)
+        # 模拟另一个工作进程
+        self.other_worker = DiskCache(self.path, shared=True)
+
+    def tearDown(self):
+        self.cache_manager.disk_cache.close()
+        self.other_worker.close()
+        CacheManager._instance = None
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_remote_write_and_delete_invalidate_local_copy(self):
+        """其他进程覆盖或删除缓存项后，本进程不再返回内存中的旧副本"""
+        self.cache_manager.set_llm_cache('我想创业', '旧回答')
+        key = self.cache_manager.generate_cache_key('llm', '我想创业')
+
+        self.other_worker.set(key, make_entry('新回答', ttl=7200))
+        self.assertEqual(self.cache_manager.get_llm_cache('我想创业'), '新回答')
+
+        self.other_worker.delete(key)
+        self.assertIsNone(self.cache_manager.get_llm_cache('我想创业'))
+        self.assertEqual(self.cache_manager.get_cache_stats()['shared_event_count'], 2)
+
+    def test_remote_query_text_enables_similar_hits(self):
+        """其他进程写入的查询结果也能被相似查询命中"""
+        self.other_worker.set('query:remote', make_entry({'response': '创业担保贷款'}, query_text='我想申请创业担保贷款'))
+
+        self.cache_manager.get('query:unrelated')
+        self.assertEqual(self.cache_manager.query_cache_map['我想申请创业担保贷款']['key'], 'query:remote')
+
+    def test_sync_interval(self):
+        """同步间隔内不重复读取事件"""
+        self.cache_manager.shared_sync_interval = 60
+        self.cache_manager.set_llm_cache('我想创业', '旧回答')
+        self.cache_manager.get_llm_cache('我想创业')
+        key = self.cache_manager.generate_cache_key('llm', '我想创业')
+        self.other_worker.delete(key)
+
+        self.assertEqual(self.cache_manager.get_llm_cache('我想创业'), '旧回答')
+        self.cache_manager._sync_shared_cache(force=True)
+        self.assertIsNone(self.cache_manager.get_llm_cache('我想创业'))
+
+
+class TestMultiProcessHitRate(unittest.TestCase):
+    """测试多个工作进程共享缓存时LLM调用次数不随进程数增加"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_prompts_paid_once_across_workers(self):
+        """一个进程已处理过的提示，其他进程直接命中"""
+        prompts = [f'提示{i}' for i in range(20)]
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=3, mp_context=context) as executor:
+            self.assertEqual(executor.submit(run_worker, self.path, prompts).result(), 20)
+            calls = list(executor.map(run_worker, [self.path] * 3, [prompts] * 3))
+        self.assertEqual(calls, [0, 0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
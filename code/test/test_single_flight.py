@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.single_flight import SingleFlight
+from langchain.infrastructure.cache_manager import CacheManager
+
+
+def run_concurrently(count, target):
+    """并发执行target并按线程序号收集返回值"""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight(unittest.TestCase):
+    """测试请求合并"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """并发调用相同键只执行一次"""
+        single_flight = SingleFlight()
+        calls = []
+
+        def slow_call():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'answer'
+
+        results = run_concurrently(8, lambda: single_flight.do('llm:1', slow_call))
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result[0] == 'answer' for result in results))
+        self.assertEqual(sum(1 for result in results if result[1]), 7)
+        self.assertEqual(single_flight.get_stats()['shared_count'], 7)
+        self.assertEqual(single_flight.in_flight_count(), 0)
+
+    def test_exception_shared_with_followers(self):
+        """leader的异常同时抛给follower"""
+        single_flight = SingleFlight()
+
+        def failing_call():
+            time.sleep(0.1)
+            raise RuntimeError('LLM超时')
+
+        results = run_concurrently(4, lambda: single_flight.do('llm:1', failing_call))
+
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(single_flight.in_flight_count(), 0)
+
+    def test_sequential_calls_not_shared(self):
+        """计算结束后键被释放，后续调用重新执行"""
+        single_flight = SingleFlight()
+        self.assertEqual(single_flight.do('k', lambda: 1), (1, False))
+        self.assertEqual(single_flight.do('k', lambda: 2), (2, False))
+
+
+class TestAsyncSingleFlight(unittest.TestCase):
+    """测试异步请求合并"""
+
+    def test_async_calls_share_one_execution(self):
+        """并发协程调用相同键只执行一次"""
+        single_flight = SingleFlight()
+        calls = []
+
+        async def slow_call():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'answer'
+
+        async def main():
+            return await asyncio.gather(*(single_flight.ado('llm:1', slow_call) for _ in range(8)))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result[0] == 'answer' for result in results))
+        self.assertEqual(sum(1 for result in results if result[1]), 7)
+        self.assertEqual(single_flight.in_flight_count(), 0)
+
+    def test_async_follower_of_thread_leader(self):
+        """协程等待线程中的同步计算时不阻塞事件循环"""
+        single_flight = SingleFlight()
+        started = threading.Event()
+
+        def slow_call():
+            started.set()
+            time.sleep(0.1)
+            return 'answer'
+
+        leader = threading.Thread(target=single_flight.do, args=('llm:1', slow_call))
+        leader.start()
+        started.wait(1)
+
+        async def main():
+            ticks = []
+
+            async def ticker():
+                while len(ticks) < 5:
+                    ticks.append(1)
+                    await asyncio.sleep(0.01)
+
+            result, _ = await asyncio.gather(single_flight.ado('llm:1', self.fail), ticker())
+            return result, len(ticks)
+
+        (result, shared), ticks = asyncio.run(main())
+        leader.join()
+        self.assertEqual((result, shared), ('answer', True))
+        self.assertEqual(ticks, 5)
+
+    def test_cancelled_follower_does_not_cancel_leader(self):
+        """follower被取消不影响leader和其他follower"""
+        single_flight = SingleFlight()
+
+        async def slow_call():
+            await asyncio.sleep(0.05)
+            return 'answer'
+
+        async def main():
+            leader = asyncio.ensure_future(single_flight.ado('llm:1', slow_call))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(single_flight.ado('llm:1', slow_call))
+            await asyncio.sleep(0)
+            follower.cancel()
+            return await leader
+
+        self.assertEqual(asyncio.run(main()), ('answer', False))
+
+
+class TestCacheManagerCoalesce(unittest.TestCase):
+    """测试缓存管理器的合并命中统计"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.cache_manager = CacheManager(max_cache_size=100)
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_coalesced_hits_in_stats(self):
+        """follower计入合并命中统计"""
+        def slow_call():
+            time.sleep(0.1)
+            return {'content': 'answer'}
+
+        run_concurrently(5, lambda: self.cache_manager.coalesce('llm:1', slow_call))
+
+        stats = self.cache_manager.get_cache_stats()
+        self.assertEqual(stats['coalesced_hit_count'], 4)
+        self.cache_manager.reset_cache_stats()
+        self.assertEqual(self.cache_manager.get_cache_stats()['coalesced_hit_count'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import time
+import asyncio
+import threading
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure.cache_region import CacheRegion
+from langchain.infrastructure.cache_manager import CacheManager
+from langchain.infrastructure.llm_scheduler import current_priority, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+
+class TestTTLJitter(unittest.TestCase):
+    """测试TTL随机抖动"""
+
+    def test_jitter_within_range(self):
+        """抖动后的TTL在配置范围内且不全相同"""
+        region = CacheRegion('catalog', max_size=10, ttl=86400, ttl_jitter=0.1)
+        ttls = [region.jittered_ttl(86400) for _ in range(100)]
+
+        self.assertTrue(all(86400 * 0.9 <= ttl <= 86400 * 1.1 for ttl in ttls))
+        self.assertGreater(len(set(ttls)), 1)
+
+    def test_no_jitter(self):
+        """抖动比例为0时TTL不变"""
+        region = CacheRegion('default', max_size=10, ttl=60)
+        self.assertEqual(region.jittered_ttl(60), 60)
+
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    """测试过期后先返回旧值再后台刷新"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.cache_manager = CacheManager()
+        self.cache_manager.clear()
+        # 固定catalog区域的抖动和旧值保留时长，便于构造过期场景
+        region = self.cache_manager.cache.regions['catalog']
+        region.ttl_jitter = 0
+        region.stale_ttl = 60
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def _wait_for(self, condition, timeout=2):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_fresh_value(self):
+        """新鲜值直接返回，不调用加载函数"""
+        self.cache_manager.set('policies', ['v1'])
+        value, source = self.cache_manager.get_or_refresh('policies', lambda: self.fail('不应加载'))
+        self.assertEqual((value, source), (['v1'], 'fresh'))
+
+    def test_miss_loads_synchronously(self):
+        """未命中时同步加载并写入缓存"""
+        value, source = self.cache_manager.get_or_refresh('policies', lambda: ['v1'])
+        self.assertEqual((value, source), (['v1'], 'loaded'))
+        self.assertEqual(self.cache_manager.get('policies'), ['v1'])
+
+    def test_stale_value_served_and_refreshed(self):
+        """过期但在保留期内：立即返回旧值，后台只刷新一次"""
+        self.cache_manager.set('policies', ['v1'], ttl=0.01)
+        time.sleep(0.02)
+
+        # 过新鲜期后，普通get视为未命中
+        self.assertIsNone(self.cache_manager.get('policies'))
+
+        release = threading.Event()
+        calls = []
+
+        def slow_loader():
+            calls.append(1)
+            release.wait(2)
+            return ['v2']
+
+        results = [self.cache_manager.get_or_refresh('policies', slow_loader) for _ in range(5)]
+        self.assertTrue(all(result == (['v1'], 'stale') for result in results))
+
+        release.set()
+        self.assertTrue(self._wait_for(lambda: self.cache_manager.get('policies') == ['v2']))
+        self.assertEqual(len(calls), 1)
+        stats = self.cache_manager.get_cache_stats()
+        self.assertEqual(stats['stale_hit_count'], 5)
+        self.assertEqual(stats['refresh_count'], 1)
+
+    def test_refresh_runs_at_background_priority(self):
+        """后台刷新中的LLM调用以后台优先级排队"""
+        self.cache_manager.set('policies', ['v1'], ttl=0.01)
+        time.sleep(0.02)
+        priorities = []
+
+        def loader():
+            priorities.append(current_priority())
+            return ['v2']
+
+        self.assertEqual(self.cache_manager.get_or_refresh('policies', loader), (['v1'], 'stale'))
+        self.assertTrue(self._wait_for(lambda: priorities))
+        self.assertEqual(priorities, [PRIORITY_BACKGROUND])
+        self.assertEqual(current_priority(), PRIORITY_INTERACTIVE)
+
+    def test_refresh_failure_keeps_stale_value(self):
+        """后台刷新失败时保留旧值"""
+        self.cache_manager.set('policies', ['v1'], ttl=0.01)
+        time.sleep(0.02)
+
+        def failing_loader():
+            raise IOError('文件读取失败')
+
+        self.assertEqual(self.cache_manager.get_or_refresh('policies', failing_loader), (['v1'], 'stale'))
+        self.assertTrue(self._wait_for(lambda: self.cache_manager.get_cache_stats()['refresh_error_count'] == 1))
+        self.assertEqual(self.cache_manager.get_or_refresh('policies', lambda: ['v2'])[0], ['v1'])
+
+    def test_setter_used_for_refresh(self):
+        """提供setter时由setter写入缓存"""
+        written = []
+        self.cache_manager.get_or_refresh('jobs', lambda: ['job'], setter=written.append)
+        self.assertEqual(written, [['job']])
+        self.assertIsNone(self.cache_manager.get('jobs'))
+
+
+class TestAsyncGetOrRefresh(unittest.TestCase):
+    """测试异步获取缓存和后台刷新"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.cache_manager = CacheManager()
+        self.cache_manager.clear()
+        region = self.cache_manager.cache.regions['catalog']
+        region.ttl_jitter = 0
+        region.stale_ttl = 60
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_concurrent_misses_multiplexed(self):
+        """大量并发未命中在一个事件循环中等待同一次加载"""
+        calls = []
+
+        async def aloader():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return ['v1']
+
+        async def main():
+            return await asyncio.gather(*(self.cache_manager.aget_or_refresh('policies', aloader) for _ in range(200)))
+
+        started = time.time()
+        results = asyncio.run(main())
+        self.assertLess(time.time() - started, 1)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results[0], (['v1'], 'loaded'))
+        self.assertTrue(all(result == (['v1'], 'coalesced') for result in results[1:]))
+        self.assertEqual(self.cache_manager.get('policies'), ['v1'])
+
+    def test_stale_value_refreshed_in_task(self):
+        """过期旧值立即返回，刷新作为事件循环中的任务以后台优先级执行"""
+        self.cache_manager.set('policies', ['v1'], ttl=0.01)
+        time.sleep(0.02)
+
+        priorities = []
+
+        async def aloader():
+            priorities.append(current_priority())
+            await asyncio.sleep(0.01)
+            return ['v2']
+
+        async def main():
+            first = await self.cache_manager.aget_or_refresh('policies', aloader)
+            await asyncio.sleep(0.05)
+            return first, await self.cache_manager.aget_or_refresh('policies', aloader)
+
+        first, second = asyncio.run(main())
+        self.assertEqual(priorities, [PRIORITY_BACKGROUND])
+        self.assertEqual(first, (['v1'], 'stale'))
+        self.assertEqual(second, (['v2'], 'fresh'))
+        self.assertEqual(self.cache_manager.get_cache_stats()['refresh_count'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+import json
+import uuid
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 导入要测试的模块
+from langchain.infrastructure import chatbot
+from langchain.infrastructure.stream_json import StreamingJSONExtractor
+from langchain.infrastructure.cache_manager import CacheManager
+from langchain.infrastructure.llm_batch_processor import LMBatchProcessor
+from langchain.presentation.orchestrator import Orchestrator
+from langchain.presentation.orchestrator.stream_processor import StreamProcessor
+
+
+ANSWER = {
+    "job_analysis": [
+        {"id": "JOB_A01", "reasons": {"positive": "持有\"中级电工证\"，符合{要求}", "negative": ""}},
+        {"id": "JOB_A02", "reasons": {"positive": "时间灵活", "negative": "需要夜班"}, "score": [0.9, None, True]}
+    ],
+    "positive": "符合《职业技能提升补贴政策》（POLICY_A02）",
+    "negative": "",
+    "suggestions": "补充证书信息\\n后申请"
+}
+FIELDS = ("positive", "negative", "suggestions")
+
+
+def answer_text():
+    return "```json\n" + json.dumps(ANSWER, ensure_ascii=False, indent=2) + "\n```"
+
+
+class TestStreamingJSONExtractor(unittest.TestCase):
+    """测试增量JSON字段提取器"""
+
+    def test_fields_emitted_as_soon_as_complete(self):
+        """逐字符输入时，字段在其结束位置产出，不等待整个对象"""
+        text = answer_text()
+        extractor = StreamingJSONExtractor(FIELDS, ["job_analysis"])
+        emitted = []
+        for position, ch in enumerate(text):
+            for event in extractor.feed(ch):
+                emitted.append((position, event))
+
+        self.assertEqual([(event["field"], event.get("index")) for _, event in emitted],
+                         [("job_analysis", 0), ("job_analysis", 1), ("positive", None),
+                          ("negative", None), ("suggestions", None)])
+        self.assertEqual(emitted[0][1]["value"], ANSWER["job_analysis"][0])
+        self.assertEqual(emitted[-1][1]["value"], ANSWER["suggestions"])
+        # 第一个岗位推荐理由在对象结束前很早就产出
+        self.assertLess(emitted[0][0], len(text) // 2)
+        self.assertTrue(extractor.complete)
+        self.assertEqual(extractor.result(), ANSWER)
+
+    def test_chunk_boundaries_do_not_matter(self):
+        """任意切分输出得到相同的事件"""
+        text = answer_text()
+        expected = StreamingJSONExtractor(FIELDS, ["job_analysis"]).feed(text)
+        for size in (2, 7, 50):
+            extractor = StreamingJSONExtractor(FIELDS, ["job_analysis"])
+            events = []
+            for i in range(0, len(text), size):
+                events.extend(extractor.feed(text[i:i + size]))
+            self.assertEqual(events, expected)
+
+    def test_incomplete_output(self):
+        """输出中断时不产出未完成的字段"""
+        text = json.dumps({"positive": "完整", "negative": "未完"}, ensure_ascii=False)
+        extractor = StreamingJSONExtractor(FIELDS)
+        events = extractor.feed(text[:-5])
+        self.assertEqual(events, [{"field": "positive", "value": "完整"}])
+        self.assertFalse(extractor.complete)
+        self.assertIsNone(extractor.result())
+
+    def test_replay_matches_stream(self):
+        """缓存结果的事件与流式解析的事件一致"""
+        extractor = StreamingJSONExtractor(FIELDS, ["job_analysis"])
+        self.assertEqual(extractor.replay(ANSWER), StreamingJSONExtractor(FIELDS, ["job_analysis"]).feed(answer_text()))
+
+
+class TestStreamTask(unittest.TestCase):
+    """测试批处理器的流式结构化任务"""
+
+    def setUp(self):
+        CacheManager._instance = None
+        self.batch_processor = LMBatchProcessor()
+        self.task = {"id": 1, "type": "combined_generation", "prompt": "合并生成提示"}
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def collect(self, stream):
+        events = []
+        while True:
+            try:
+                events.append(next(stream))
+            except StopIteration as stop:
+                return events, stop.value
+
+    def test_stream_then_cache(self):
+        """流式解析的结果写入缓存，再次请求时从缓存一次性产出"""
+        text = answer_text()
+        self.batch_processor.chatbot.chat_stream = MagicMock(
+            return_value=iter(text[i:i + 10] for i in range(0, len(text), 10)))
+
+        events, result = self.collect(self.batch_processor.stream_task(self.task, FIELDS, ["job_analysis"]))
+        self.assertEqual(len(events), 5)
+        self.assertEqual(result["result"], ANSWER)
+        self.assertFalse(result["from_cache"])
+        self.batch_processor.chatbot.chat_stream.assert_called_once_with("合并生成提示", include_reasoning=False,
+                                                                        prompt_type="combined_generation")
+
+        cached_events, cached = self.collect(self.batch_processor.stream_task(self.task, FIELDS, ["job_analysis"]))
+        self.assertEqual(cached_events, events)
+        self.assertTrue(cached["from_cache"])
+        self.assertEqual(self.batch_processor.chatbot.chat_stream.call_count, 1)
+
+    def test_incomplete_stream_not_cached(self):
+        """流式输出不完整时返回失败结果且不写入缓存"""
+        self.batch_processor.chatbot.chat_stream = MagicMock(return_value=iter(['{"positive": "部分', "错误: 连接中断"]))
+
+        events, result = self.collect(self.batch_processor.stream_task(self.task, FIELDS, ["job_analysis"]))
+        self.assertEqual(events, [])
+        self.assertIsNone(result["result"])
+        self.assertIn("不完整", result["error"])
+        self.assertIsNone(self.batch_processor.cache_manager.get(
+            self.batch_processor._generate_task_cache_key(self.task)))
+
+    def test_async_stream_then_cache(self):
+        """异步流式任务产出相同的事件，结果写入outcome并写入缓存"""
+        text = answer_text()
+
+        async def achat_stream(prompt, include_reasoning=True, prompt_type="general"):
+            for i in range(0, len(text), 10):
+                await asyncio.sleep(0)
+                yield text[i:i + 10]
+
+        async def collect():
+            outcome = {}
+            events = [event async for event in self.batch_processor.astream_task(
+                self.task, FIELDS, ["job_analysis"], outcome=outcome)]
+            return events, outcome["task_result"]
+
+        self.batch_processor.chatbot.achat_stream = MagicMock(side_effect=achat_stream)
+        events, result = asyncio.run(collect())
+        self.assertEqual(events, StreamingJSONExtractor(FIELDS, ["job_analysis"]).replay(ANSWER))
+        self.assertEqual(result["result"], ANSWER)
+        self.assertFalse(result["from_cache"])
+
+        cached_events, cached = asyncio.run(collect())
+        self.assertEqual(cached_events, events)
+        self.assertTrue(cached["from_cache"])
+        self.assertEqual(self.batch_processor.chatbot.achat_stream.call_count, 1)
+
+
+class TestAsyncStreamQuery(unittest.TestCase):
+    """测试异步流式查询"""
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_async_stream_does_not_use_sync_stream(self):
+        """异步流式查询基于achat_stream，产出与同步版本相同的事件序列"""
+        agent = Orchestrator()
+        # 查询中带随机后缀，避免命中之前测试写入磁盘缓存的结果
+        query = f"我有中级电工证，想找兼职，有什么补贴？{uuid.uuid4().hex[:8]}"
+
+        async def collect():
+            return [chunk async for chunk in agent.aprocess_stream_query(query)]
+
+        with patch.object(chatbot, "USE_MOCK", True), \
+                patch.object(chatbot.ChatBot, "chat_stream", side_effect=AssertionError("不应调用同步流式接口")):
+            chunks = asyncio.run(collect())
+        types = [json.loads(chunk)["type"] for chunk in chunks]
+        self.assertEqual(types, ["thinking", "analysis_start", "thinking", "thinking", "thinking",
+                                 "answer_field", "answer_field", "answer_field", "analysis_result", "analysis_complete"])
+
+        with patch.object(chatbot, "USE_MOCK", True):
+            sync_chunks = list(agent.process_stream_query(query + "（同步）"))
+        self.assertEqual([json.loads(chunk)["type"] for chunk in sync_chunks], types)
+
+
+class TestStreamCombinedResponse(unittest.TestCase):
+    """测试流式合并生成的降级"""
+
+    def tearDown(self):
+        CacheManager._instance = None
+
+    def test_incomplete_stream_falls_back_to_rules(self):
+        """流式输出不完整时使用规则引擎生成回答"""
+        orchestrator = MagicMock()
+        orchestrator.query_processor._combined_tasks.return_value = ([], [{"id": 0, "type": "combined_generation",
+                                                                           "prompt": "合并生成提示"}])
+        orchestrator.response_generator.rg_generate_response.return_value = {
+            "positive": "规则回答", "negative": "", "suggestions": ""}
+        processor = StreamProcessor(orchestrator)
+        processor._generate_job_recommendations = MagicMock()
+
+        with patch.object(LMBatchProcessor, "_generate_task_cache_key", return_value="stream-fallback-test"), \
+                patch("langchain.infrastructure.chatbot.ChatBot.chat_stream",
+                      return_value=iter(['{"positive": "部分', "错误: 连接中断"])):
+            stream = processor._stream_combined_response("问题", {}, [], [], "默认建议", [])
+            while True:
+                try:
+                    next(stream)
+                except StopIteration as stop:
+                    response, _ = stop.value
+                    break
+
+        self.assertEqual(response["positive"], "规则回答")
+        self.assertEqual(response["suggestions"], "默认建议")
+        orchestrator.query_processor._apply_combined_results.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -447,9 +447,19 @@ async function sendMessage() {
                                 console.log('收到thinking事件，忽略简单思考过程:', data);
                                 break;
                                 
+                            case 'answer_field':
+                                // 回答字段生成完成即预览，收到完整分析结果后替换
+                                renderAnswerField(data, aiMessageDiv);
+                                break;
+                                
                             case 'analysis_result':
                                 // 显示分析结果，移除之前的简单思考过程容器，只保留详细的思考过程
                                 console.log('渲染分析结果:', data);
+                                // 移除流式回答预览
+                                const answerPreview = aiMessageDiv.querySelector('.answer-preview');
+                                if (answerPreview) {
+                                    answerPreview.remove();
+                                }
                                 // 检查data是否是字符串，如果是则解析为JSON
                                 if (typeof data === 'string') {
                                     try {
@@ -690,6 +700,37 @@ function renderFollowUp(data, container) {
     document.getElementById('user-input').focus();
 }
 
+// 渲染流式回答字段预览
+function renderAnswerField(data, container) {
+    const messageContent = container.querySelector('.message-content');
+    if (!messageContent || !data.content) return;
+    
+    let preview = messageContent.querySelector('.answer-preview');
+    if (!preview) {
+        preview = document.createElement('div');
+        preview.className = 'answer-preview';
+        messageContent.appendChild(preview);
+    }
+    
+    const titles = {
+        positive: '符合条件的政策',
+        negative: '暂不符合的政策',
+        suggestions: '建议',
+        job_analysis: '岗位推荐理由'
+    };
+    let text = data.content;
+    if (data.field === 'job_analysis') {
+        const reasons = data.content.reasons || {};
+        text = `${data.content.id || data.content.job_id || ''}：${reasons.positive || ''}`;
+    }
+    if (typeof text !== 'string' || !text) return;
+    
+    const item = document.createElement('p');
+    item.textContent = `${titles[data.field] || data.field}：${text}`;
+    preview.appendChild(item);
+    scrollToBottom();
+}
+
 // 渲染分析结果
 function renderAnalysisResult(data, container) {
     if (!container) {